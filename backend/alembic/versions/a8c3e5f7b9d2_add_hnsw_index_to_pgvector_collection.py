@@ -0,0 +1,60 @@
+"""add_hnsw_index_to_pgvector_collection
+
+Revision ID: a8c3e5f7b9d2
+Revises: f7a2c4e6b8d1
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c3e5f7b9d2'
+down_revision: Union[str, None] = 'f7a2c4e6b8d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Coleção do Chef Virtual (app.core.rag_service.DEFAULT_COLLECTION_NAME)
+COLLECTION_NAME = 'tastematch_knowledge'
+
+
+def upgrade() -> None:
+    """
+    Índice HNSW (cosseno) parcial por coleção em langchain_pg_embedding.
+
+    As tabelas do PGVector são criadas pelo LangChain em tempo de execução:
+    se ainda não existirem (banco novo, SQLite ou sem pgvector), nada é feito
+    aqui e o índice é criado após a primeira carga da base de conhecimento.
+    """
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+
+    import logging
+    from app.core.vector_index import ensure_hnsw_index
+
+    logger = logging.getLogger('alembic')
+    try:
+        # Savepoint: falha (ex.: vetores de dimensões diferentes) não aborta a migração
+        with connection.begin_nested():
+            result = ensure_hnsw_index(connection, COLLECTION_NAME)
+    except Exception as e:
+        logger.warning(f"Índice HNSW não criado: {str(e)[:200]}")
+        return
+    if result.get('skipped'):
+        logger.info(f"Índice HNSW adiado: {result['skipped']}")
+    elif result['created']:
+        logger.info(f"Índice HNSW {result['index']} criado")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+
+    from app.core.vector_index import hnsw_index_name
+
+    # A coluna embedding continua com dimensão fixa (compatível com o PGVector)
+    op.execute(f'DROP INDEX IF EXISTS {hnsw_index_name(COLLECTION_NAME)}')
@@ -0,0 +1,42 @@
+"""add_cuisine_centroids_table
+
+Revision ID: b7e4c2a9d1f3
+Revises: 48acbbe5baf4
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c2a9d1f3'
+down_revision: Union[str, None] = '48acbbe5baf4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Centróides por culinária (price_range '' = todas as faixas)
+    # Popular com: python scripts/rebuild_cuisine_centroids.py
+    op.create_table(
+        'cuisine_centroids',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cuisine_type', sa.String(length=100), nullable=False),
+        sa.Column('price_range', sa.String(length=10), nullable=False, server_default=''),
+        sa.Column('vector_sum', sa.Text(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cuisine_type', 'price_range', name='uq_cuisine_centroids_cuisine_price')
+    )
+    op.create_index(op.f('ix_cuisine_centroids_id'), 'cuisine_centroids', ['id'], unique=False)
+    op.create_index(op.f('ix_cuisine_centroids_cuisine_type'), 'cuisine_centroids', ['cuisine_type'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cuisine_centroids_cuisine_type'), table_name='cuisine_centroids')
+    op.drop_index(op.f('ix_cuisine_centroids_id'), table_name='cuisine_centroids')
+    op.drop_table('cuisine_centroids')
@@ -0,0 +1,65 @@
+"""add_restaurant_text_search
+
+Revision ID: b9d4f6a8c1e3
+Revises: a8c3e5f7b9d2
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d4f6a8c1e3'
+down_revision: Union[str, None] = 'a8c3e5f7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Busca textual indexada de restaurantes (apenas PostgreSQL).
+
+    - search_vector: tsvector em português (nome peso A, descrição peso B),
+      coluna gerada e mantida pelo próprio banco, com índice GIN
+    - índice GIN pg_trgm no nome (ILIKE '%termo%' e similaridade com erros de digitação)
+
+    Sem pg_trgm disponível, só o tsvector é criado (crud detecta o que existe).
+    """
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+
+    import logging
+    logger = logging.getLogger('alembic')
+
+    op.execute(
+        "ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('portuguese', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('portuguese', coalesce(description, '')), 'B')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_restaurants_search_vector ON restaurants USING gin (search_vector)")
+
+    try:
+        # Savepoint: sem permissão para a extensão, a migração segue sem o índice de trigramas
+        with connection.begin_nested():
+            connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(sa.text(
+                "CREATE INDEX IF NOT EXISTS ix_restaurants_name_trgm ON restaurants USING gin (name gin_trgm_ops)"
+            ))
+    except Exception as e:
+        logger.warning(f"Índice de trigramas não criado (pg_trgm indisponível): {str(e)[:200]}")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_restaurants_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_restaurants_search_vector")
+    op.execute("ALTER TABLE restaurants DROP COLUMN IF EXISTS search_vector")
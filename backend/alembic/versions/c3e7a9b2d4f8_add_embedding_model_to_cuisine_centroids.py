@@ -0,0 +1,57 @@
+"""add_embedding_model_to_cuisine_centroids
+
+Revision ID: c3e7a9b2d4f8
+Revises: b9d4f6a8c1e3
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e7a9b2d4f8'
+down_revision: Union[str, None] = 'b9d4f6a8c1e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Versão do modelo ("modelo@versão") dos vetores somados em cada centróide
+    op.add_column(
+        'cuisine_centroids',
+        sa.Column('embedding_model', sa.String(length=255), nullable=False, server_default='')
+    )
+
+    # Centróides existentes somam os vetores marcados em d2f6a8b1c3e7 com a
+    # mesma tag; centróides de outro modelo passam a ser linhas separadas
+    legacy_tag = f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+    op.execute(
+        sa.text("UPDATE cuisine_centroids SET embedding_model = :tag").bindparams(tag=legacy_tag)
+    )
+
+    op.drop_constraint('uq_cuisine_centroids_cuisine_price', 'cuisine_centroids', type_='unique')
+    op.create_unique_constraint(
+        'uq_cuisine_centroids_cuisine_price_model',
+        'cuisine_centroids',
+        ['cuisine_type', 'price_range', 'embedding_model']
+    )
+
+
+def downgrade() -> None:
+    # Mantém só os centróides do modelo configurado antes de restaurar a chave antiga
+    current_tag = f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+    op.execute(
+        sa.text("DELETE FROM cuisine_centroids WHERE embedding_model != :tag").bindparams(tag=current_tag)
+    )
+    op.drop_constraint('uq_cuisine_centroids_cuisine_price_model', 'cuisine_centroids', type_='unique')
+    op.create_unique_constraint(
+        'uq_cuisine_centroids_cuisine_price',
+        'cuisine_centroids',
+        ['cuisine_type', 'price_range']
+    )
+    op.drop_column('cuisine_centroids', 'embedding_model')
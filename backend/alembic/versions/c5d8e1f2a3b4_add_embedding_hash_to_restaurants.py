@@ -0,0 +1,31 @@
+"""add_embedding_hash_to_restaurants
+
+Revision ID: c5d8e1f2a3b4
+Revises: b7e4c2a9d1f3
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8e1f2a3b4'
+down_revision: Union[str, None] = 'b7e4c2a9d1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Hash do texto embedado (restaurantes sem alteração são pulados pelo job de embeddings)
+    op.add_column(
+        'restaurants',
+        sa.Column('embedding_hash', sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    # Remover coluna embedding_hash
+    op.drop_column('restaurants', 'embedding_hash')
@@ -0,0 +1,63 @@
+"""add_embedding_model_tags
+
+Revision ID: d2f6a8b1c3e7
+Revises: c5d8e1f2a3b4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f6a8b1c3e7'
+down_revision: Union[str, None] = 'c5d8e1f2a3b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Identidade do modelo ("modelo@versão") de cada vetor gravado
+    op.add_column(
+        'restaurants',
+        sa.Column('embedding_model', sa.String(length=255), nullable=True)
+    )
+    # Vetor do próximo modelo, preenchido em segundo plano durante a migração
+    op.add_column(
+        'restaurants',
+        sa.Column('embedding_next', sa.Text(), nullable=True)
+    )
+    op.add_column(
+        'restaurants',
+        sa.Column('embedding_next_model', sa.String(length=255), nullable=True)
+    )
+    op.add_column(
+        'user_preferences',
+        sa.Column('embedding_model', sa.String(length=255), nullable=True)
+    )
+
+    # Vetores existentes foram gerados pelo modelo configurado antes desta
+    # migração: marcá-los com essa tag. Linhas sem tag não são comparadas com
+    # nenhuma versão, então trocar de modelo fica para depois, com
+    # scripts/migrate_embeddings.py.
+    legacy_tag = f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+    op.execute(
+        sa.text("UPDATE restaurants SET embedding_model = :tag WHERE embedding IS NOT NULL")
+        .bindparams(tag=legacy_tag)
+    )
+    op.execute(
+        sa.text("UPDATE user_preferences SET embedding_model = :tag WHERE preference_embedding IS NOT NULL")
+        .bindparams(tag=legacy_tag)
+    )
+
+
+def downgrade() -> None:
+    # Remover colunas de versionamento de embeddings
+    op.drop_column('user_preferences', 'embedding_model')
+    op.drop_column('restaurants', 'embedding_next_model')
+    op.drop_column('restaurants', 'embedding_next')
+    op.drop_column('restaurants', 'embedding_model')
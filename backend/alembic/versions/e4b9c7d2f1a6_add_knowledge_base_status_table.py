@@ -0,0 +1,34 @@
+"""add_knowledge_base_status_table
+
+Revision ID: e4b9c7d2f1a6
+Revises: d2f6a8b1c3e7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9c7d2f1a6'
+down_revision: Union[str, None] = 'd2f6a8b1c3e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Contagem de documentos e versão sincronizada por coleção do vector store
+    op.create_table(
+        'knowledge_base_status',
+        sa.Column('collection_name', sa.String(length=255), nullable=False),
+        sa.Column('document_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sync_version', sa.String(length=64), nullable=True),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('collection_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('knowledge_base_status')
@@ -0,0 +1,34 @@
+"""add_knowledge_base_documents_table
+
+Revision ID: f7a2c4e6b8d1
+Revises: e4b9c7d2f1a6
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a2c4e6b8d1'
+down_revision: Union[str, None] = 'e4b9c7d2f1a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Id estável e hash do conteúdo de cada documento indexado (sincronização incremental)
+    op.create_table(
+        'knowledge_base_documents',
+        sa.Column('collection_name', sa.String(length=255), nullable=False),
+        sa.Column('document_id', sa.String(length=255), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('collection_name', 'document_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('knowledge_base_documents')
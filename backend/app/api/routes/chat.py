@@ -15,7 +15,7 @@ from app.database.models import User
 from app.core.rag_service import get_rag_service
 from app.core.chef_chat import get_chef_response, validate_question, detect_social_interaction
 from app.core.audio_service import get_audio_service
-from app.core.knowledge_base import update_knowledge_base
+from app.core.knowledge_base import is_knowledge_base_populated
 from app.core.rate_limiter import user_limiter
 from app.config import settings
 
@@ -217,23 +217,10 @@ async def chat(
         
         raise HTTPException(status_code=500, detail=detail)
     
-    # Popular base de conhecimento se estiver vazia
-    try:
-        if not rag_service.has_documents():
-            # Verificar se há restaurantes no banco antes de popular
-            from app.database import crud
-            restaurant_count = len(crud.get_restaurants(db, skip=0, limit=1))
-            if restaurant_count > 0:
-                # Popular base com restaurantes e conhecimento estático
-                update_knowledge_base(db, rag_service, user_id=current_user.id)
-            else:
-                # Apenas conhecimento estático se não houver restaurantes
-                update_knowledge_base(db, rag_service, user_id=current_user.id)
-    except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        logger.warning(f"Erro ao popular base de conhecimento: {str(e)}\n{error_traceback}")
-        # Não falhar se não conseguir popular, apenas continuar
+    # Checagem em memória: a carga da base roda no startup (aquecimento) e
+    # após mudanças no catálogo, nunca no caminho da mensagem
+    if not is_knowledge_base_populated():
+        logger.warning("Base de conhecimento ainda não carregada; respondendo sem documentos do catálogo")
     
     # Obter resposta do Chef
     try:
@@ -11,7 +11,10 @@ from app.database.base import get_db
 from app.api.deps import get_current_user
 from app.database.models import User
 from app.core.llm_monitoring import get_llm_metrics_summary
+from app.core.embedding_cache import get_embedding_cache
+from app.core.embedding_batcher import get_embedding_batcher
 from app.core.logging_config import get_logger
+from app.config import settings
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -67,3 +70,40 @@ async def get_llm_metrics_summary_endpoint(
             detail="Erro ao obter métricas"
         )
 
+
+@router.get("/embeddings/cache")
+async def get_embedding_cache_stats_endpoint(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtém estatísticas do cache de embeddings de consultas (deste worker).
+    
+    Retorna:
+    - hits / disk_hits: Acertos na memória e no cache persistente
+    - misses: Consultas que passaram pelo encoder
+    - hit_rate: Taxa de acerto em porcentagem
+    - size: Vetores em memória
+    """
+    return {
+        "stats": get_embedding_cache().get_stats(),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+@router.get("/embeddings/batching")
+async def get_embedding_batching_stats_endpoint(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtém estatísticas do micro-batching de embeddings (deste worker).
+    
+    Retorna:
+    - batches / items: Passadas do encoder e consultas atendidas
+    - avg_batch_size / largest_batch: Tamanho médio e máximo dos lotes
+    - histogram: Distribuição dos tamanhos de lote
+    """
+    return {
+        "enabled": settings.EMBEDDING_MICRO_BATCHING,
+        "stats": get_embedding_batcher().get_stats(),
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
@@ -2,7 +2,7 @@
 Endpoints relacionados a pedidos.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 from typing import List, Optional, Dict, Any
@@ -12,6 +12,14 @@ from app.api.deps import get_current_user
 from app.database.models import User, Order, Restaurant
 from app.models.order import OrderCreate, OrderResponse
 from app.database.crud import get_user_orders, create_order, get_restaurant
+from app.core.order_import import (
+    detect_format,
+    iter_records,
+    import_orders,
+    OrderImportError,
+    SUPPORTED_FORMATS
+)
+from app.core.recommendation_feed import invalidate_user_feeds
 from pydantic import BaseModel
 import json
 
@@ -25,6 +33,16 @@ class OrderListResponse(BaseModel):
     count: int
 
 
+class OrderImportResponse(BaseModel):
+    """Resposta da importação em lote de pedidos."""
+    received: int
+    imported: int
+    rejected: int
+    errors: List[Dict[str, Any]]  # Primeiros erros por linha ({"line", "error"})
+    affected_users: int
+    seconds: float
+
+
 @router.get("", response_model=OrderListResponse)
 def list_user_orders(
     limit: int = Query(20, ge=1, le=100, description="Número de pedidos"),
@@ -121,6 +139,8 @@ def create_new_order(
         order=order_data,
         user_id=current_user.id
     )
+    # O restaurante pedido sai do topo do feed: descartar os snapshots antigos
+    invalidate_user_feeds(current_user.id)
     
     # Converter items de JSON string para lista se necessário
     order_dict = {
@@ -138,6 +158,54 @@ def create_new_order(
     return OrderResponse.model_validate(order_dict)
 
 
+@router.post("/import", response_model=OrderImportResponse)
+def import_user_orders(
+    file: UploadFile = File(..., description="Arquivo NDJSON (um pedido por linha) ou CSV com cabeçalho"),
+    format: Optional[str] = Query(None, description="ndjson ou csv (padrão: deduzido do arquivo)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Importa o histórico de pedidos do usuário autenticado em lote.
+    
+    Cada linha segue o formato de OrderCreate; os pedidos são validados e
+    inseridos em blocos e as preferências do usuário são recalculadas uma
+    única vez ao final. Linhas inválidas são rejeitadas sem interromper a importação.
+    
+    Args:
+        file: Arquivo NDJSON ou CSV
+        format: Formato do arquivo (opcional)
+        current_user: Usuário autenticado (dono de todos os pedidos importados)
+        db: Sessão do banco de dados
+        
+    Returns:
+        OrderImportResponse: Contadores e erros da importação
+        
+    Raises:
+        HTTPException: Se o formato não for suportado ou o arquivo for ilegível
+    """
+    fmt = (format or detect_format(file.filename, file.content_type)).lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato não suportado: {fmt}. Use ndjson ou csv."
+        )
+    
+    try:
+        stats = import_orders(
+            db=db,
+            records=iter_records(file.file, fmt),
+            user_id=current_user.id
+        )
+    except (OrderImportError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Arquivo inválido: {str(e)}"
+        )
+    
+    return OrderImportResponse(**stats)
+
+
 @router.delete("/simulation", status_code=status.HTTP_200_OK)
 def reset_simulation(
     current_user: User = Depends(get_current_user),
@@ -171,6 +239,7 @@ def reset_simulation(
         db.delete(order)
     
     db.commit()
+    invalidate_user_feeds(current_user.id)
     deleted_count = total_before
     
     return {"deleted": deleted_count, "message": f"{deleted_count} pedido(s) simulado(s) removido(s)"}
@@ -29,6 +29,11 @@ from app.core.recommender import (
     extract_user_patterns,
     select_chef_recommendation
 )
+from app.core.recommendation_feed import (
+    get_feed_page,
+    InvalidFeedCursor,
+    FeedSnapshotExpired
+)
 from app.core.llm_service import (
     generate_insight,
     generate_chef_explanation
@@ -47,6 +52,16 @@ class RecommendationsListResponse(BaseModel):
     generated_at: datetime
 
 
+class RecommendationFeedResponse(BaseModel):
+    """Resposta paginada do feed de recomendações."""
+    recommendations: List[RecommendationResponse]
+    count: int
+    total: int  # Tamanho do ranking completo do snapshot
+    next_cursor: Optional[str] = None  # None = fim do feed
+    snapshot_id: str
+    generated_at: datetime
+
+
 class ChefRecommendationResponse(BaseModel):
     """Resposta para recomendação única do Chef."""
     restaurant: RestaurantResponse
@@ -248,6 +263,73 @@ def get_recommendations(
         )
 
 
+@router.get("/feed", response_model=RecommendationFeedResponse)
+def get_recommendations_feed(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor da página anterior (omitir na primeira página)"),
+    limit: int = Query(20, ge=1, le=100, description="Itens por página"),
+    refresh: bool = Query(False, description="Recalcular embedding do usuário (apenas na primeira página)")
+):
+    """
+    Feed de recomendações paginado por cursor (rolagem infinita).
+    
+    A primeira página ranqueia o catálogo inteiro e guarda um snapshot do ranking;
+    as páginas seguintes são fatias desse snapshot, com ordem estável entre páginas.
+    Os itens não trazem insight (use /{restaurant_id}/insight sob demanda).
+    
+    Args:
+        current_user: Usuário autenticado (via JWT)
+        db: Sessão do banco de dados
+        cursor: Cursor retornado em next_cursor
+        limit: Itens por página (1-100, padrão: 20)
+        refresh: Se True, recalcula o embedding ao criar o snapshot
+        
+    Returns:
+        RecommendationFeedResponse: Página do feed e cursor da próxima
+        
+    Raises:
+        HTTPException: 400 se o cursor for inválido, 410 se o snapshot expirou
+    """
+    try:
+        page = get_feed_page(
+            user_id=current_user.id,
+            db=db,
+            cursor=cursor,
+            limit=limit,
+            min_rating=3.0,
+            refresh=refresh
+        )
+    except InvalidFeedCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+    except FeedSnapshotExpired:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="O feed expirou. Recarregue a partir da primeira página."
+        )
+    
+    recommendations = [
+        RecommendationResponse(
+            restaurant=RestaurantResponse.model_validate(item["restaurant"]),
+            similarity_score=item["similarity_score"],
+            generated_at=page["generated_at"]
+        )
+        for item in page["items"]
+    ]
+    
+    return RecommendationFeedResponse(
+        recommendations=recommendations,
+        count=len(recommendations),
+        total=page["total"],
+        next_cursor=page["next_cursor"],
+        snapshot_id=page["snapshot_id"],
+        generated_at=page["generated_at"]
+    )
+
+
 @router.get("/{restaurant_id}/insight", response_model=Dict[str, Any])
 def get_restaurant_insight(
     restaurant_id: int,
@@ -4,10 +4,9 @@ Endpoints relacionados a restaurantes.
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
 from typing import List, Optional
 from app.database.base import get_db
-from app.database.crud import get_restaurant, get_restaurants
+from app.database.crud import get_restaurant, get_restaurants_page
 from app.models.restaurant import RestaurantResponse
 from pydantic import BaseModel
 
@@ -55,8 +54,8 @@ def list_restaurants(
     # Calcular offset
     skip = (page - 1) * limit
     
-    # Buscar restaurantes com filtros
-    restaurants = get_restaurants(
+    # Página e total numa única consulta (busca textual indexada, ver crud.restaurant_search_clauses)
+    restaurants, total = get_restaurants_page(
         db=db,
         skip=skip,
         limit=limit,
@@ -67,25 +66,6 @@ def list_restaurants(
         sort_by=sort_by
     )
     
-    # Contar total de restaurantes (com filtros aplicados)
-    from app.database.models import Restaurant
-    
-    count_stmt = select(func.count(Restaurant.id))
-    if cuisine_type:
-        count_stmt = count_stmt.where(Restaurant.cuisine_type == cuisine_type)
-    if min_rating is not None:
-        count_stmt = count_stmt.where(Restaurant.rating >= min_rating)
-    if price_range:
-        count_stmt = count_stmt.where(Restaurant.price_range == price_range)
-    if search:
-        search_pattern = f"%{search}%"
-        count_stmt = count_stmt.where(
-            (Restaurant.name.ilike(search_pattern)) |
-            (Restaurant.description.ilike(search_pattern))
-        )
-    
-    total = db.execute(count_stmt).scalar() or 0
-    
     return RestaurantListResponse(
         restaurants=[RestaurantResponse.model_validate(r) for r in restaurants],
         total=total,
@@ -7,7 +7,7 @@ import os
 from pathlib import Path
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Dict, Optional
 
 
 def get_env_file_path() -> str:
@@ -61,10 +61,137 @@ class Settings(BaseSettings):
     # OpenAI API (Opcional)
     OPENAI_API_KEY: Optional[str] = Field(default=None, description="API key do OpenAI (opcional)")
     
-    # Embeddings
+    # Embeddings (modelo único compartilhado por recomendações e RAG)
     EMBEDDING_MODEL: str = Field(
         default="sentence-transformers/all-MiniLM-L6-v2",
-        description="Modelo de embeddings a ser usado"
+        description="Modelo de embeddings a ser usado (recomendações e RAG; trocar via scripts/migrate_embeddings.py)"
+    )
+    EMBEDDING_MODEL_VERSION: str = Field(
+        default="1",
+        description="Versão dos vetores gravados (EMBEDDING_MODEL@versão); só vetores da mesma versão são comparados"
+    )
+    EMBEDDING_DEVICE: str = Field(default="cpu", description="Dispositivo do modelo de embeddings")
+    EMBEDDING_NUM_THREADS: int = Field(
+        default=1,
+        description="Threads de inferência do PyTorch/ONNX Runtime (1 = menor memória)"
+    )
+    EMBEDDING_BATCH_SIZE: int = Field(default=32, description="Tamanho do lote em encode de vários textos")
+    EMBEDDING_BACKEND: str = Field(
+        default="torch",
+        description="Backend de inferência: 'torch' (sentence-transformers) ou 'onnx' (ONNX Runtime int8)"
+    )
+    EMBEDDING_ONNX_PATH: str = Field(
+        default="./models/onnx-embeddings",
+        description="Diretório do modelo exportado por scripts/export_onnx_embeddings.py"
+    )
+    EMBEDDING_MICRO_BATCHING: bool = Field(
+        default=True,
+        description="Agrupar embeddings de consultas concorrentes em uma única passada do encoder"
+    )
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(default=32, description="Máximo de consultas por micro-lote")
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = Field(
+        default=5.0,
+        description="Espera máxima (ms) por outras consultas antes de rodar o micro-lote"
+    )
+    EMBEDDING_CACHE_SIZE: int = Field(default=2048, description="Máximo de embeddings de consultas em memória")
+    EMBEDDING_CACHE_PATH: Optional[str] = Field(
+        default=None,
+        description="Arquivo SQLite do cache persistente de embeddings de consultas (None = só memória)"
+    )
+    
+    # Sidecar de inferência por host (scripts/run_inference_sidecar.py)
+    INFERENCE_SIDECAR_SOCKET: Optional[str] = Field(
+        default=None,
+        description="Socket Unix do sidecar de inferência; se definido, os workers não carregam o modelo"
+    )
+    INFERENCE_SIDECAR_TIMEOUT: float = Field(
+        default=10.0,
+        description="Timeout (s) de cada chamada ao sidecar de inferência"
+    )
+    
+    # Snapshot do catálogo mapeado em memória (compartilhado entre workers do host)
+    CATALOG_SNAPSHOT_DIR: Optional[str] = Field(
+        default=None,
+        description="Diretório do snapshot do catálogo (scripts/build_catalog_snapshot.py); None = ranking a partir do banco"
+    )
+    CATALOG_SNAPSHOT_CHECK_SECONDS: float = Field(
+        default=5.0,
+        description="Intervalo mínimo entre verificações de nova versão do snapshot"
+    )
+    
+    # Compressão do snapshot para o primeiro estágio do ranking (avaliar com
+    # scripts/evaluate_vector_compression.py antes de ativar)
+    EMBEDDING_COMPRESSION_DIMS: int = Field(
+        default=0,
+        description="Dimensões da projeção PCA do catálogo no snapshot (0 = sem PCA)"
+    )
+    EMBEDDING_COMPRESSION_INT8: bool = Field(
+        default=False,
+        description="Quantizar vetores do snapshot em int8 com escala por vetor"
+    )
+    RERANK_CANDIDATES: int = Field(
+        default=200,
+        description="Candidatos do primeiro estágio reordenados com os vetores completos"
+    )
+    
+    # Aquecimento no startup (modelo, PGVector e pool) com gate em /health/ready
+    WARMUP_ON_STARTUP: bool = Field(
+        default=True,
+        description="Aquecer modelo de embeddings, PGVector e pool do banco em segundo plano no startup"
+    )
+    
+    # Busca vetorial do Chef Virtual (índice HNSW em langchain_pg_embedding)
+    RAG_SEARCH_K: int = Field(
+        default=4,
+        description="Documentos retornados por busca semântica quando o chamador não define k"
+    )
+    RAG_HNSW_EF_SEARCH: int = Field(
+        default=40,
+        description="hnsw.ef_search aplicado na transação de cada busca (maior = mais recall, mais latência)"
+    )
+    RAG_HNSW_M: int = Field(default=16, description="Parâmetro m do índice HNSW (vizinhos por nó)")
+    RAG_HNSW_EF_CONSTRUCTION: int = Field(
+        default=64,
+        description="Parâmetro ef_construction do índice HNSW"
+    )
+    RAG_VECTOR_QUANTIZATION: str = Field(
+        default="none",
+        description="Índice do primeiro estágio da busca: none, halfvec ou binary (reordenado em precisão total)"
+    )
+    RAG_COLLECTION_QUANTIZATION: Dict[str, str] = Field(
+        default_factory=dict,
+        description='Quantização por coleção, em JSON (ex.: {"tastematch_knowledge": "halfvec"})'
+    )
+    RAG_RERANK_CANDIDATES: int = Field(
+        default=40,
+        description="Candidatos do índice quantizado reordenados com o cosseno exato"
+    )
+    RAG_HYBRID_MODE: str = Field(
+        default="rrf",
+        description="Busca híbrida: rrf (uma instrução SQL, reciprocal rank fusion) ou sequential (exata e depois semântica)"
+    )
+    RAG_RRF_K: int = Field(default=60, description="Constante k do reciprocal rank fusion")
+    RAG_LOCAL_VECTOR_DIR: Optional[str] = Field(
+        default=None,
+        description="Diretório do vector store local fora do PostgreSQL (padrão: <arquivo SQLite>.vectors)"
+    )
+    RAG_HYBRID_LEG_TIMEOUT: float = Field(
+        default=2.0,
+        description="Prazo (s) de cada busca da híbrida sequencial; a que estourar é descartada"
+    )
+    RAG_HYBRID_LEG_WORKERS: int = Field(
+        default=8,
+        description="Threads do pool que executa as buscas exata e semântica em paralelo"
+    )
+    
+    # Sincronização incremental da base de conhecimento do Chef Virtual
+    KNOWLEDGE_BASE_SYNC_ON_WRITE: bool = Field(
+        default=True,
+        description="Agendar sincronização da base de conhecimento em segundo plano após gravações de restaurantes (PostgreSQL)"
+    )
+    KNOWLEDGE_BASE_SYNC_DEBOUNCE: float = Field(
+        default=2.0,
+        description="Segundos de espera para agrupar gravações de restaurantes numa única sincronização"
     )
     
     class Config:
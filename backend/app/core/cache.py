@@ -77,6 +77,24 @@ class SafeMemoryCache:
             self._cache[key] = (value, expiry)
             self._cache.move_to_end(key)
 
+    def delete(self, key: str) -> None:
+        """Remove um item do cache (se existir)."""
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Remove todos os itens cuja chave começa com o prefixo.
+        
+        Returns:
+            Número de itens removidos
+        """
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                del self._cache[key]
+            return len(keys)
+
     def clear(self) -> None:
         """Limpa todo o cache."""
         with self._lock:
@@ -91,6 +109,11 @@ class SafeMemoryCache:
 # Instância global do cache
 # Limite de 50 chunks de metadados para garantir baixo footprint de memória
 metadata_cache = SafeMemoryCache(max_items=50, default_ttl_minutes=60)
+RESTAURANT_LOCATIONS_KEY = "restaurant_locations"
+
+# Centróides de culinária do onboarding (chave: centroid:{culinária}:{faixa de preço}:{modelo@versão})
+# TTL curto limita a defasagem entre workers; o próprio worker invalida ao atualizar
+centroid_cache = SafeMemoryCache(max_items=500, default_ttl_minutes=10)
 
 
 def get_cached_restaurants_metadata(db: Session, ttl_minutes: int = 60) -> list:
@@ -125,3 +148,27 @@ def get_cached_restaurants_metadata(db: Session, ttl_minutes: int = 60) -> list:
     
     return data
 
+
+
+def get_cached_restaurant_locations(db: Session, ttl_minutes: int = 10) -> list:
+    """
+    Localizações distintas do catálogo com cache (consultadas a cada mensagem do chat).
+    
+    TTL curto limita a defasagem entre workers; create_restaurant invalida
+    no próprio worker.
+    
+    Args:
+        db: Sessão do banco de dados
+        ttl_minutes: TTL do cache em minutos (padrão: 10)
+        
+    Returns:
+        Lista de localizações
+    """
+    cached_data = metadata_cache.get(RESTAURANT_LOCATIONS_KEY)
+    if cached_data is not None:
+        return cached_data
+    
+    from app.database.crud import get_restaurant_locations
+    data = get_restaurant_locations(db)
+    metadata_cache.set(RESTAURANT_LOCATIONS_KEY, data, ttl_minutes=ttl_minutes)
+    return data
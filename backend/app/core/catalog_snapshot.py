@@ -0,0 +1,358 @@
+"""
+Snapshot do catálogo em arquivos mapeados em memória, compartilhado entre workers.
+
+O escritor grava a matriz de embeddings (linhas já normalizadas), ids,
+ratings e códigos de culinária como .npy em um diretório versionado e troca
+o ponteiro CURRENT com os.replace (atômico). Os workers abrem os arquivos
+com np.load(mmap_mode="r"): todas as instâncias do host usam a mesma cópia
+no page cache, e a memória não cresce com o número de workers.
+
+Layout de CATALOG_SNAPSHOT_DIR:
+    CURRENT                    nome da versão ativa
+    <versão>/ids.npy           int64, ordenados
+    <versão>/matrix.npy        float32 n x dim, linhas com norma 1
+    <versão>/ratings.npy       float32
+    <versão>/cuisine_codes.npy int32 (índice em cuisine_names, -1 = sem culinária)
+    <versão>/meta.json         versão, dimensão, modelo (embedding_tag), cuisine_names e
+                               source_version (crud.get_catalog_version na geração)
+    <versão>/compressed_*.npy  primeiro estágio comprimido (opcional, vector_compression)
+
+Cada worker confere o ponteiro no máximo a cada CATALOG_SNAPSHOT_CHECK_SECONDS
+e troca a referência para a nova versão; a antiga é liberada quando as
+requisições em andamento terminam. Um snapshot de outra versão do modelo
+(embedding_tag) é ignorado e o ranking volta a ser feito a partir do banco.
+
+Gravações de restaurantes republicam o snapshot em segundo plano
+(knowledge_base.schedule_knowledge_base_sync). Enquanto isso não acontece
+(ou em hosts que não receberam a gravação), get_catalog_ranker(db) compara
+source_version com a versão atual do catálogo no banco e, se diferirem,
+ranqueia a partir do banco.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.embeddings import get_embedding_tag
+from app.core.logging_config import get_logger
+from app.core.recommender import EMBEDDING_COLUMNS, build_restaurant_matrix, normalize_rows
+from app.core.vector_compression import VectorCompressor, two_stage_rank
+from app.database.crud import get_catalog_version
+from app.database.models import Restaurant
+
+logger = get_logger(__name__)
+
+POINTER_FILENAME = "CURRENT"
+ARRAY_NAMES = ("ids", "matrix", "ratings", "cuisine_codes")
+# Versões antigas mantidas no disco (workers atrasados ainda podem abri-las)
+KEEP_VERSIONS = 3
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_last_check = 0.0
+
+# Versão do catálogo no banco (relida no máximo a cada CATALOG_SNAPSHOT_CHECK_SECONDS)
+_database_version: Optional[str] = None
+_database_version_checked = 0.0
+
+
+class CatalogSnapshot:
+    """Versão aberta do snapshot (arrays somente leitura, mapeados em memória)."""
+
+    def __init__(self, directory: str, version: str):
+        path = os.path.join(directory, version)
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self.version = version
+        self.embedding_tag: Optional[str] = self.meta.get("embedding_tag")
+        self.source_version: Optional[str] = self.meta.get("source_version")
+        self.cuisine_names: List[str] = self.meta["cuisine_names"]
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.matrix = np.load(os.path.join(path, "matrix.npy"), mmap_mode="r")
+        self.ratings = np.load(os.path.join(path, "ratings.npy"), mmap_mode="r")
+        self.cuisine_codes = np.load(os.path.join(path, "cuisine_codes.npy"), mmap_mode="r")
+
+        # Primeiro estágio comprimido (opcional, ver vector_compression)
+        self.compressor = VectorCompressor.load(path)
+        self.codes = self.scales = None
+        if self.compressor is not None:
+            self.codes = np.load(os.path.join(path, "compressed_codes.npy"), mmap_mode="r")
+            if self.compressor.quantize:
+                self.scales = np.load(os.path.join(path, "compressed_scales.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def rank(
+        self,
+        user_embedding: List[float],
+        exclude_ids: Optional[Iterable[int]] = None,
+        min_rating: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mesmo contrato de recommender.rank_catalog, sobre o snapshot.
+
+        A multiplicação lê a matriz direto do mapeamento (sem cópia por
+        requisição); filtros se aplicam aos scores.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (IDs int32, scores float32) em ordem decrescente
+        """
+        user_vec = np.asarray(user_embedding, dtype=np.float32)
+        if len(self) == 0 or self.matrix.shape[1] != user_vec.shape[0]:
+            if len(self):
+                logger.warning(
+                    "Dimensão do embedding do usuário difere do snapshot do catálogo",
+                    extra={"user_embedding_len": int(user_vec.shape[0]), "catalog_dim": int(self.matrix.shape[1])}
+                )
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        norm = np.linalg.norm(user_vec)
+        if norm > 0:
+            user_vec = user_vec / norm
+
+        valid = np.ones(len(self), dtype=bool)
+        if min_rating is not None:
+            valid &= self.ratings >= min_rating
+        if exclude_ids:
+            valid &= ~np.isin(self.ids, np.fromiter(exclude_ids, dtype=np.int64))
+        candidates = np.flatnonzero(valid)
+
+        if self.compressor is not None:
+            # Dois estágios: vetores comprimidos para todos, completos só para o topo
+            approx = self.compressor.score(self.codes, self.scales, user_vec)
+            rows, scores = two_stage_rank(user_vec, candidates, self.matrix, approx, settings.RERANK_CANDIDATES)
+            return self.ids[rows].astype(np.int32), np.clip(scores, 0.0, 1.0)
+
+        scores = self.matrix @ user_vec
+        candidate_scores = np.clip(scores[candidates], 0.0, 1.0).astype(np.float32)
+        order = np.argsort(-candidate_scores, kind="stable")
+        return self.ids[candidates[order]].astype(np.int32), candidate_scores[order]
+
+
+def _read_pointer(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, POINTER_FILENAME), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_catalog_snapshot(db: Session, directory: str, keep: int = KEEP_VERSIONS) -> Dict[str, Any]:
+    """
+    Gera uma nova versão do snapshot e a publica atomicamente.
+
+    Se o conteúdo for idêntico ao da versão ativa, nada é gravado.
+
+    Returns:
+        dict: version, restaurants, dimension e changed
+    """
+    from app.core.embeddings import get_model_id
+
+    embedding_tag = get_embedding_tag()
+    source_version = get_catalog_version(db)
+    rows = db.execute(
+        select(Restaurant.id, Restaurant.rating, Restaurant.cuisine_type, *EMBEDDING_COLUMNS)
+        .order_by(Restaurant.id)
+    ).all()
+    ids, matrix = build_restaurant_matrix(rows, embedding_tag)
+    by_id = {row.id: row for row in rows}
+
+    cuisine_names = sorted({row.cuisine_type for row in rows if row.cuisine_type})
+    code_of = {name: i for i, name in enumerate(cuisine_names)}
+    arrays = {
+        "ids": ids.astype(np.int64),
+        "matrix": normalize_rows(matrix).astype(np.float32) if ids.size else matrix,
+        "ratings": np.asarray([float(by_id[i].rating or 0) for i in ids.tolist()], dtype=np.float32),
+        "cuisine_codes": np.asarray([code_of.get(by_id[i].cuisine_type, -1) for i in ids.tolist()], dtype=np.int32),
+    }
+
+    compression = {
+        "dims": settings.EMBEDDING_COMPRESSION_DIMS or None,
+        "quantize": settings.EMBEDDING_COMPRESSION_INT8,
+    }
+
+    digest = hashlib.sha256()
+    for name in ARRAY_NAMES:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    digest.update(json.dumps([cuisine_names, compression, embedding_tag, source_version]).encode("utf-8"))
+    content_hash = digest.hexdigest()[:12]
+
+    os.makedirs(directory, exist_ok=True)
+    current = _read_pointer(directory)
+    if current and current.endswith(content_hash):
+        return {"version": current, "restaurants": int(ids.size), "dimension": int(matrix.shape[1]), "changed": False}
+
+    version = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{content_hash}"
+    tmp_dir = os.path.join(directory, f".tmp-{version}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), arrays[name])
+    if (compression["dims"] or compression["quantize"]) and ids.size:
+        compressor = VectorCompressor.fit(arrays["matrix"], dims=compression["dims"], quantize=compression["quantize"])
+        if compressor.enabled:
+            codes, scales = compressor.encode(arrays["matrix"])
+            np.save(os.path.join(tmp_dir, "compressed_codes.npy"), codes)
+            if scales is not None:
+                np.save(os.path.join(tmp_dir, "compressed_scales.npy"), scales)
+            compressor.save(tmp_dir)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "dimension": int(matrix.shape[1]),
+            "restaurants": int(ids.size),
+            "model_id": get_model_id(),
+            "embedding_tag": embedding_tag,
+            "source_version": source_version,
+            "cuisine_names": cuisine_names,
+            "compression": compression,
+        }, f)
+    os.rename(tmp_dir, os.path.join(directory, version))
+
+    # Publicação atômica: leitores veem a versão antiga ou a nova, nunca um arquivo parcial
+    pointer_tmp = os.path.join(directory, f".{POINTER_FILENAME}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(directory, POINTER_FILENAME))
+
+    versions = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and name != POINTER_FILENAME
+    )
+    for old in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    logger.info(
+        "Snapshot do catálogo publicado",
+        extra={"version": version, "restaurants": int(ids.size), "dimension": int(matrix.shape[1])}
+    )
+    return {"version": version, "restaurants": int(ids.size), "dimension": int(matrix.shape[1]), "changed": True}
+
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """
+    Retorna o snapshot ativo deste worker (None se desativado, inexistente ou
+    gerado com outra versão do modelo de embeddings).
+
+    O ponteiro CURRENT é relido no máximo a cada CATALOG_SNAPSHOT_CHECK_SECONDS.
+    """
+    snapshot = _current_snapshot()
+    if snapshot is not None and snapshot.embedding_tag != get_embedding_tag():
+        return None
+    return snapshot
+
+
+def _current_snapshot() -> Optional[CatalogSnapshot]:
+    global _snapshot, _last_check
+    directory = settings.CATALOG_SNAPSHOT_DIR
+    if not directory:
+        return None
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _last_check < settings.CATALOG_SNAPSHOT_CHECK_SECONDS:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot is not None and now - _last_check < settings.CATALOG_SNAPSHOT_CHECK_SECONDS:
+            return _snapshot
+        _last_check = now
+        version = _read_pointer(directory)
+        if version is None:
+            _snapshot = None
+        elif _snapshot is None or _snapshot.version != version:
+            try:
+                _snapshot = CatalogSnapshot(directory, version)
+                logger.info("Snapshot do catálogo carregado", extra={"version": version, "restaurants": len(_snapshot)})
+                if _snapshot.embedding_tag != get_embedding_tag():
+                    logger.warning(
+                        "Snapshot do catálogo de outra versão do modelo; ranking a partir do banco",
+                        extra={"version": version, "embedding_tag": _snapshot.embedding_tag}
+                    )
+            except (OSError, ValueError, KeyError) as e:
+                # Mantém a versão anterior (se houver) em vez de derrubar o ranking
+                logger.warning(f"Erro ao abrir snapshot do catálogo {version}: {e}")
+        return _snapshot
+
+
+def _is_current(ranker: Any, db: Session) -> bool:
+    """True se o snapshot do ranker foi gerado a partir da versão atual do catálogo."""
+    global _database_version, _database_version_checked
+    source_version = getattr(ranker, "source_version", None)
+    if source_version is None:
+        return True  # Snapshot anterior ao campo: mantém o comportamento antigo
+
+    now = time.monotonic()
+    if _database_version is None or now - _database_version_checked >= settings.CATALOG_SNAPSHOT_CHECK_SECONDS:
+        _database_version = get_catalog_version(db)
+        _database_version_checked = now
+    if source_version != _database_version:
+        logger.debug(
+            "Snapshot do catálogo desatualizado; ranking a partir do banco",
+            extra={"source_version": source_version, "catalog_version": _database_version}
+        )
+        return False
+    return True
+
+
+def get_catalog_ranker(db: Optional[Session] = None):
+    """
+    Quem ranqueia o catálogo neste processo: o sidecar de inferência (se
+    INFERENCE_SIDECAR_SOCKET estiver configurado), senão o snapshot local.
+
+    Args:
+        db: Sessão do banco; se informada, um snapshot gerado antes da última
+            mudança no catálogo é descartado (restaurantes novos ainda de fora)
+
+    Returns:
+        Objeto com rank(user_embedding, exclude_ids, min_rating) ou None
+        (ranking a partir do banco)
+    """
+    if settings.INFERENCE_SIDECAR_SOCKET:
+        from app.core.inference_sidecar import get_sidecar_ranker
+        ranker = get_sidecar_ranker()
+    else:
+        ranker = get_catalog_snapshot()
+    if ranker is not None and db is not None and not _is_current(ranker, db):
+        return None
+    return ranker
+
+
+def rank_with_catalog_ranker(
+    ranker,
+    user_embedding: List[float],
+    exclude_ids: Optional[Iterable[int]] = None,
+    min_rating: Optional[float] = None
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Ranking pelo ranker de get_catalog_ranker (None: ranquear a partir do banco).
+
+    O sidecar pode reiniciar ou perder o snapshot entre a verificação de
+    info (cacheada) e o rank; a falha vira None em vez de erro na requisição.
+    """
+    if ranker is None:
+        return None
+    from app.core.inference_sidecar import SidecarError
+    try:
+        return ranker.rank(user_embedding, exclude_ids, min_rating)
+    except SidecarError as e:
+        logger.warning(f"Sidecar falhou no ranking; ranking a partir do banco: {e}")
+        return None
+
+
+def reset_catalog_snapshot() -> None:
+    """Descarta o snapshot aberto (próxima chamada relê o ponteiro e a versão do catálogo)."""
+    global _snapshot, _last_check, _database_version
+    with _snapshot_lock:
+        _snapshot = None
+        _last_check = 0.0
+        _database_version = None
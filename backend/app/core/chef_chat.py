@@ -3,7 +3,7 @@ Lógica específica do Chef Virtual
 Gerencia prompts, chains LangChain e integração com RAG
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 import re
 from sqlalchemy.orm import Session
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
@@ -22,6 +22,7 @@ from app.core.prompt_versions import get_prompt_version_for_user
 from app.core.llm_monitoring import LLMMonitoringCallback, log_llm_metrics
 from app.core.query_expansion import expand_query_with_synonyms, should_expand_query
 from app.core.response_cache import get_response_cache, should_cache_query
+from app.core.cache import get_cached_restaurant_locations
 from app.database import crud
 from app.core.logging_config import get_logger
 
@@ -1599,6 +1600,74 @@ def clean_answer(answer: str, user_name: Optional[str] = None, question: Optiona
     return answer
 
 
+# Restrições da pergunta que viram filtros de metadados na busca (valores do catálogo)
+_CUISINE_PATTERNS = [
+    (r"\bitalian[oa]s?\b", "italiana"),
+    (r"\bjapon[eê]s[ae]?s?\b", "japonesa"),
+    (r"\bbrasileir[oa]s?\b", "brasileira"),
+    (r"\bmexican[oa]s?\b", "mexicana"),
+    (r"\bchin[eê]s[ae]?s?\b", "chinesa"),
+    (r"\b[áa]rabes?\b", "árabe"),
+    (r"\bvegetarian[oa]s?\b", "vegetariana"),
+    (r"\bamerican[oa]s?\b", "americana"),
+]
+_PRICE_PATTERNS = [
+    (r"\bn[ãa]o (?:muito |t[ãa]o )?car[oa]s?\b", ["low", "medium"]),
+    (r"\bbarat[oa]s?\b|\becon[ôo]mic[oa]s?\b|\bem conta\b", ["low"]),
+    (r"\bpre[çc]o (?:m[ée]dio|justo|moderado)\b", ["medium"]),
+    (r"\bsofisticad[oa]s?\b|\brequintad[oa]s?\b|\bchiques?\b|\bde luxo\b|\balto padr[ãa]o\b", ["high"]),
+]
+_HIGH_RATING_PATTERN = r"\b(?:bem|melhor(?:es)?) avaliad[oa]s?\b|\bnota alta\b"
+_HIGH_RATING = 4.5
+_RATING_PATTERNS = [
+    r"\b(?:nota|avalia[çc][ãa]o|rating)\s*(?:acima de|maior que|m[íi]nima de|de pelo menos|pelo menos)?\s*(\d(?:[.,]\d)?)\b",
+    r"\b(\d(?:[.,]\d)?)\s*estrelas?\b",
+]
+
+
+def extract_metadata_filter(question: str, locations: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Filtro de metadados implícito na pergunta (culinária, preço, nota mínima, local).
+
+    O filtro vai para dentro da busca (PGVector, vector store local e busca
+    exata), que já devolve só restaurantes que atendem às restrições, em vez
+    de buscar documentos a mais e descartá-los depois.
+
+    Args:
+        question: Pergunta do usuário
+        locations: Localizações do catálogo reconhecidas na pergunta
+
+    Returns:
+        Filtro no formato do PGVector (vazio se a pergunta não restringe nada)
+    """
+    text = question.lower()
+    filter: Dict[str, Any] = {}
+
+    cuisines = [cuisine for pattern, cuisine in _CUISINE_PATTERNS if re.search(pattern, text)]
+    if cuisines:
+        filter["cuisine_type"] = {"in": cuisines}
+
+    for pattern, price_ranges in _PRICE_PATTERNS:
+        if re.search(pattern, text):
+            filter["price_range"] = {"in": price_ranges}
+            break
+
+    min_rating = _HIGH_RATING if re.search(_HIGH_RATING_PATTERN, text) else None
+    for pattern in _RATING_PATTERNS:
+        match = re.search(pattern, text)
+        if match and 0 < float(match.group(1).replace(",", ".")) <= 5:
+            min_rating = float(match.group(1).replace(",", "."))
+            break
+    if min_rating is not None:
+        filter["rating"] = {"gte": min_rating}
+
+    places = [place for place in locations if place and re.search(rf"\b{re.escape(place.lower())}\b", text)]
+    if places:
+        filter["location"] = {"in": places}
+
+    return {"type": "restaurant", **filter} if filter else {}
+
+
 def get_chef_response(
     question: str,
     rag_service: RAGService,
@@ -1671,14 +1740,34 @@ def get_chef_response(
     # FASE 2: Aumentado k de 8 para 15 para melhor recuperação de contexto
     # CORREÇÃO: Filtrar e priorizar por correspondência semântica rigorosa
     try:
-        if use_hybrid:
-            # Usar busca híbrida (exata + semântica) com query expandida
-            logger.info(f"Usando busca híbrida para: '{expanded_question[:100]}...'")
-            source_documents = rag_service.hybrid_search(expanded_question, k=20, exact_weight=0.7, semantic_weight=0.3)  # Mais peso para busca exata
-        else:
+        def retrieve(k: int, metadata_filter: Optional[Dict[str, Any]] = None) -> List[Any]:
+            if use_hybrid:
+                # Usar busca híbrida (exata + semântica) com query expandida
+                logger.info(f"Usando busca híbrida para: '{expanded_question[:100]}...'")
+                return rag_service.hybrid_search(
+                    expanded_question, k=k, exact_weight=0.7, semantic_weight=0.3,  # Mais peso para busca exata
+                    filter=metadata_filter
+                )
             # Usar apenas busca semântica com query expandida
             logger.info(f"Usando busca semântica para: '{expanded_question[:100]}...'")
-            source_documents = rag_service.similarity_search(expanded_question, k=20)
+            return rag_service.similarity_search(expanded_question, k=k, filter=metadata_filter)
+        
+        # Restrições da pergunta vão para dentro da busca: k documentos que já as atendem
+        metadata_filter = extract_metadata_filter(
+            question, get_cached_restaurant_locations(db) if db is not None else ()
+        )
+        # Culinárias já garantidas pela busca: o filtro de tags abaixo não as confere de novo
+        pushed_cuisines = set()
+        if metadata_filter:
+            logger.info(f"Filtros de metadados na busca: {metadata_filter}")
+            source_documents = retrieve(10, metadata_filter)
+            if source_documents:
+                pushed_cuisines = {c.lower() for c in metadata_filter.get("cuisine_type", {}).get("in", [])}
+            else:
+                logger.info("Nenhum restaurante atende aos filtros; buscando sem filtros")
+                source_documents = retrieve(20)
+        else:
+            source_documents = retrieve(20)
         
         # Guardar documentos originais antes do filtro (para fallback se necessário)
         original_docs_before_filter = source_documents.copy() if source_documents else []
@@ -1755,6 +1844,13 @@ def get_chef_response(
                 name = metadata.get('name', '').lower()
                 description = (metadata.get('description', '') or '').lower()
                 
+                # Documento da busca com filtro de culinária: a restrição já foi aplicada no banco
+                # (pratos específicos não estão no filtro e continuam conferidos pelas tags)
+                if cuisine and cuisine in pushed_cuisines and not is_specific_query:
+                    filtered_documents.append(doc)
+                    logger.debug(f"✅ {metadata.get('name')} - Match: filtro de metadados (culinária: {cuisine})")
+                    continue
+                
                 # Verificar correspondência
                 has_match = False
                 match_reason = []
@@ -0,0 +1,149 @@
+"""
+Centróides pré-computados por culinária para o onboarding (cold start).
+
+Cada linha de cuisine_centroids guarda a soma dos embeddings e a contagem
+dos restaurantes bem avaliados de uma culinária, no total e por faixa de
+preço. O vetor do onboarding vira a soma de poucos vetores em cache dividida
+pela soma das contagens, sem carregar restaurantes a cada cadastro.
+
+A manutenção incremental acontece em crud.create_restaurant e
+crud.update_restaurant_embedding; rebuild_cuisine_centroids recalcula tudo
+(após trocar o modelo de embeddings, por exemplo). Cada linha é de uma
+versão do modelo (embedding_model): só a da tag ativa é lida ou atualizada.
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import centroid_cache
+from app.core.embeddings import get_embedding_tag
+from app.core.logging_config import get_logger
+from app.core.recommender import EMBEDDING_COLUMNS, select_embedding
+from app.database.crud import (
+    CENTROID_MIN_RATING,
+    get_cuisine_centroids,
+    replace_cuisine_centroids,
+)
+from app.database.models import Restaurant
+
+logger = get_logger(__name__)
+
+
+def rebuild_cuisine_centroids(db: Session, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Recalcula todos os centróides a partir dos restaurantes (rating >= 4.0).
+
+    Returns:
+        dict: restaurants (contribuições) e centroids (linhas gravadas)
+    """
+    tag = get_embedding_tag()
+    sums: Dict[Tuple[str, str], np.ndarray] = {}
+    counts: Dict[Tuple[str, str], int] = {}
+    restaurants = 0
+
+    # Apenas vetores da versão ativa do modelo (ver recommender.select_embedding)
+    stmt = (
+        select(Restaurant.cuisine_type, Restaurant.price_range, *EMBEDDING_COLUMNS)
+        .where(Restaurant.rating >= CENTROID_MIN_RATING, Restaurant.embedding.isnot(None))
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.execute(stmt):
+        cuisine_type, price_range = row.cuisine_type, row.price_range
+        vector = select_embedding(row)
+        if vector is None:
+            continue
+        vector = np.asarray(vector, dtype=np.float64)
+        restaurants += 1
+
+        for key in ((cuisine_type, ""), (cuisine_type, price_range)) if price_range else ((cuisine_type, ""),):
+            if key in sums and sums[key].shape != vector.shape:
+                continue
+            sums[key] = sums[key] + vector if key in sums else vector.copy()
+            counts[key] = counts.get(key, 0) + 1
+
+    rows = [
+        {
+            "cuisine_type": cuisine_type,
+            "price_range": price_range,
+            "vector_sum": json.dumps(sums[(cuisine_type, price_range)].tolist()),
+            "embedding_model": tag,
+            "count": counts[(cuisine_type, price_range)],
+        }
+        for cuisine_type, price_range in sums
+    ]
+    replace_cuisine_centroids(db, rows)
+
+    logger.info(
+        "Centróides de culinária recalculados",
+        extra={"restaurants": restaurants, "centroids": len(rows)}
+    )
+    return {"restaurants": restaurants, "centroids": len(rows)}
+
+
+def get_centroid_sums(
+    db: Session,
+    cuisine_types: List[str],
+    price_range: str = ""
+) -> List[Tuple[np.ndarray, int]]:
+    """
+    Retorna (soma, contagem) de cada culinária, lendo do cache quando possível.
+
+    Apenas centróides da versão ativa do modelo; culinárias sem centróide
+    nessa versão são omitidas (o onboarding cai na consulta por restaurante).
+    """
+    tag = get_embedding_tag()
+    results: List[Tuple[np.ndarray, int]] = []
+    missing: List[str] = []
+
+    for cuisine_type in cuisine_types:
+        cached = centroid_cache.get(f"centroid:{cuisine_type}:{price_range}:{tag}")
+        if cached is None:
+            missing.append(cuisine_type)
+        elif cached[1] > 0:
+            results.append(cached)
+
+    if missing:
+        found = {c.cuisine_type: c for c in get_cuisine_centroids(db, missing, price_range, tag)}
+        for cuisine_type in missing:
+            centroid = found.get(cuisine_type)
+            entry = (
+                (np.asarray(json.loads(centroid.vector_sum), dtype=np.float64), centroid.count)
+                if centroid is not None else (None, 0)
+            )
+            # Ausência também vai para o cache (evita consulta repetida)
+            centroid_cache.set(f"centroid:{cuisine_type}:{price_range}:{tag}", entry)
+            if entry[1] > 0:
+                results.append(entry)
+
+    return results
+
+
+def combine_centroids(entries: List[Tuple[np.ndarray, int]]) -> Optional[List[float]]:
+    """
+    Média de todos os restaurantes representados (soma das somas / soma das
+    contagens), normalizada. Entradas com dimensão divergente são ignoradas.
+    """
+    if not entries:
+        return None
+
+    dim = entries[0][0].shape
+    total = np.zeros(dim, dtype=np.float64)
+    count = 0
+    for vector_sum, vector_count in entries:
+        if vector_sum.shape != dim:
+            continue
+        total += vector_sum
+        count += vector_count
+
+    if count == 0:
+        return None
+
+    centroid = total / count
+    norm = np.linalg.norm(centroid)
+    if norm > 0:
+        centroid = centroid / norm
+    return centroid.tolist()
@@ -15,7 +15,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text, inspect
 from app.config import settings
 from app.database.base import engine, SessionLocal
-from app.core.rag_service import RAGService, validate_database_requirements
+from app.core.rag_service import RAGService, get_validated_requirements
 from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -260,8 +260,9 @@ def validate_rag_service(db: Session, connection_string: str, eager: bool = True
         Dict com status da validação
     """
     try:
-        # Validar requisitos do banco (sem inicializar vector_store)
-        validation = validate_database_requirements(connection_string, db)
+        # Validar requisitos do banco (sem inicializar vector_store); o resultado
+        # fica cacheado para as requisições do chat
+        validation = get_validated_requirements(connection_string, db)
         
         if not validation["valid"]:
             error_msg = "Requisitos do banco de dados não atendidos:\n"
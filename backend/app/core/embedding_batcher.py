@@ -0,0 +1,182 @@
+"""
+Micro-batching de embeddings de consultas.
+
+Requisições concorrentes (threads do FastAPI ou corrotinas via aencode)
+entram em uma fila; uma thread dedicada junta o que chegar em até
+EMBEDDING_BATCH_MAX_WAIT_MS (ou EMBEDDING_BATCH_MAX_SIZE itens), faz uma
+única passada em lote no encoder e devolve cada vetor ao seu chamador.
+Com tráfego concorrente o throughput por worker cresce com a concorrência
+em vez de ficar limitado a lotes de 1.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+# Faixas do histograma de tamanho de lote (limite superior inclusivo)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher:
+    """
+    Dispatcher que agrupa pedidos de encode concorrentes.
+
+    Args:
+        encode_fn: Função em lote (lista de textos -> matriz n x dim)
+        max_batch: Máximo de textos por passada
+        max_wait_ms: Tempo máximo de espera por mais pedidos após o primeiro
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self._encode_fn = encode_fn
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram_overflow = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Enfileira um texto; o Future recebe o vetor float32."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Versão bloqueante de submit (para código síncrono)."""
+        return self.submit(text).result(timeout=timeout)
+
+    async def aencode(self, text: str) -> np.ndarray:
+        """Versão assíncrona de submit (não bloqueia o event loop)."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> Optional[List[Tuple[str, Future]]]:
+        """Bloqueia até o primeiro pedido e junta os que chegarem na janela."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self._max_wait
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Reenfileira o sinal de parada
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Textos repetidos no mesmo lote são codificados uma vez
+            unique: Dict[str, int] = {}
+            for text, _ in batch:
+                unique.setdefault(text, len(unique))
+
+            try:
+                vectors = self._encode_fn(list(unique))
+            except Exception as e:
+                logger.error(f"Erro no lote de embeddings: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for text, future in batch:
+                future.set_result(vectors[unique[text]])
+            self._record(len(unique))
+
+    def _record(self, size: int) -> None:
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._largest_batch = max(self._largest_batch, size)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._histogram[bucket] += 1
+                    break
+            else:
+                self._histogram_overflow += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas de lote.
+
+        Returns:
+            Dicionário com batches, items, avg_batch_size, largest_batch,
+            histograma por faixa ("<=N") e pending (fila atual)
+        """
+        with self._stats_lock:
+            histogram = {f"<={bucket}": count for bucket, count in self._histogram.items()}
+            histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = self._histogram_overflow
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0,
+                "largest_batch": self._largest_batch,
+                "histogram": histogram,
+                "pending": self._queue.qsize(),
+                "max_batch": self._max_batch,
+                "max_wait_ms": self._max_wait * 1000.0,
+            }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Encerra a thread após processar o que já está na fila."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Retorna o dispatcher do processo (singleton sobre embeddings.encode_texts)."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from app.core.embeddings import encode_texts
+                _batcher = EmbeddingBatcher(
+                    encode_texts,
+                    max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+                )
+    return _batcher
@@ -0,0 +1,177 @@
+"""
+Cache texto → vetor para embeddings de consultas (chat, busca híbrida, RAG).
+
+Camada em memória LRU limitada, com chave sha256(model_id + texto
+normalizado), e camada persistente opcional em SQLite (EMBEDDING_CACHE_PATH)
+compartilhada entre workers e reinícios. Perguntas comuns ("sushi",
+"pizza perto de mim") deixam de passar pelo encoder.
+
+Apenas consultas passam por aqui (embeddings.encode_query); textos de
+restaurantes e documentos da base não são cacheados.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_query_text(text: str) -> str:
+    """Normaliza texto para a chave (minúsculas e espaços colapsados)."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Cache LRU thread-safe de embeddings com camada SQLite opcional.
+
+    Args:
+        max_items: Limite de vetores em memória
+        path: Arquivo SQLite da camada persistente (None desativa)
+    """
+
+    def __init__(self, max_items: int = 2048, path: Optional[str] = None):
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._max_items = max_items
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._disk: Optional[sqlite3.Connection] = None
+        self.path = path
+
+        if path:
+            try:
+                self._disk = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._disk.execute("PRAGMA journal_mode=WAL")
+                self._disk.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "key TEXT PRIMARY KEY, model_id TEXT NOT NULL, "
+                    "vector BLOB NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._disk.commit()
+            except sqlite3.Error as e:
+                # Camada persistente é opcional: seguir só com memória
+                logger.warning(f"Cache persistente de embeddings desativado: {e}")
+                self._disk = None
+
+    @staticmethod
+    def make_key(model_id: str, text: str) -> str:
+        """Chave do cache: sha256 do modelo + texto normalizado."""
+        payload = f"{model_id}\x00{normalize_query_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Insere na camada em memória (chamar com o lock adquirido)."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        """
+        Retorna o vetor (float32, somente leitura) ou None se ausente.
+        """
+        key = self.make_key(model_id, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return vector
+
+            if self._disk is not None:
+                try:
+                    row = self._disk.execute(
+                        "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Erro ao ler cache persistente de embeddings: {e}")
+                    row = None
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self._disk_hits += 1
+                    return vector
+
+            self._misses += 1
+            return None
+
+    def set(self, model_id: str, text: str, vector: np.ndarray) -> np.ndarray:
+        """
+        Armazena o vetor nas duas camadas.
+
+        Returns:
+            np.ndarray: Cópia float32 somente leitura armazenada
+        """
+        key = self.make_key(model_id, text)
+        stored = np.array(vector, dtype=np.float32)
+        stored.setflags(write=False)
+
+        with self._lock:
+            self._remember(key, stored)
+            if self._disk is not None:
+                try:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (key, model_id, vector, created_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, model_id, stored.tobytes(), time.time())
+                    )
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Erro ao gravar cache persistente de embeddings: {e}")
+        return stored
+
+    def clear(self, include_disk: bool = False) -> None:
+        """Limpa a camada em memória (e a persistente, se solicitado)."""
+        with self._lock:
+            self._memory.clear()
+            if include_disk and self._disk is not None:
+                self._disk.execute("DELETE FROM query_embeddings")
+                self._disk.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do cache.
+
+        Returns:
+            Dicionário com hits (memória), disk_hits, misses, hit_rate (%) e size
+        """
+        with self._lock:
+            total = self._hits + self._disk_hits + self._misses
+            hit_rate = ((self._hits + self._disk_hits) / total * 100) if total > 0 else 0
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "total": total,
+                "hit_rate": round(hit_rate, 2),
+                "size": len(self._memory),
+                "max_items": self._max_items,
+                "persistent": self._disk is not None,
+            }
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Retorna o cache de embeddings de consultas do processo (singleton)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_items=settings.EMBEDDING_CACHE_SIZE,
+                    path=settings.EMBEDDING_CACHE_PATH
+                )
+    return _cache
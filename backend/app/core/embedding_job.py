@@ -0,0 +1,187 @@
+"""
+Job de geração de embeddings de restaurantes em lote, retomável.
+
+Lê o catálogo por paginação keyset (id > último id), codifica cada página
+com encode_texts em lotes e grava embeddings e hashes com um único UPDATE
+executemany por página. O hash (sha256 do modelo + texto embedado) fica em
+restaurants.embedding_hash: restaurantes cujo texto e modelo não mudaram
+são pulados. Cada vetor gravado leva a tag do modelo ativo
+(embedding_model = "modelo@versão"); linhas legadas sem tag e com hash
+igual recebem só a tag, sem recodificar. Após cada página o último id
+confirmado vai para um arquivo de checkpoint; uma execução interrompida
+continua de onde parou.
+
+Para trocar de modelo sem parar o serviço use embedding_migration (os
+vetores antigos continuam servindo enquanto os novos são gerados).
+
+UPDATE em massa não passa pela manutenção incremental dos centróides de
+culinária, então eles são recalculados ao final quando algo mudou (assim
+como o snapshot do catálogo, se CATALOG_SNAPSHOT_DIR estiver configurado,
+e a base de conhecimento do Chef Virtual no PostgreSQL).
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.embeddings import build_restaurant_embedding_text, encode_texts, get_embedding_tag, get_model_id
+from app.core.logging_config import get_logger
+from app.database.models import Restaurant
+
+logger = get_logger(__name__)
+
+
+def embedding_text_hash(text: str, model_id: str) -> str:
+    """Hash do conteúdo embedado (trocar o modelo invalida todos os hashes)."""
+    return hashlib.sha256(f"{model_id}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def load_checkpoint(path: Optional[str], model_id: str, force: bool) -> int:
+    """
+    Retorna o último id confirmado de uma execução anterior equivalente (ou 0).
+
+    Checkpoints de outro modelo ou de outro modo (force) são ignorados.
+    """
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Checkpoint ilegível ignorado ({path}): {e}")
+        return 0
+    if checkpoint.get("model_id") != model_id or bool(checkpoint.get("force")) != force:
+        return 0
+    return int(checkpoint.get("last_id", 0))
+
+
+def save_checkpoint(path: Optional[str], last_id: int, model_id: str, force: bool) -> None:
+    """Grava o checkpoint de forma atômica (arquivo temporário + rename)."""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "model_id": model_id, "force": force}, f)
+    os.replace(tmp_path, path)
+
+
+def run_embedding_job(
+    db: Session,
+    page_size: int = 1000,
+    batch_size: Optional[int] = None,
+    force: bool = False,
+    checkpoint_path: Optional[str] = None,
+    rebuild_centroids: bool = True
+) -> Dict[str, Any]:
+    """
+    Gera/atualiza embeddings de todo o catálogo.
+
+    Args:
+        db: Sessão do banco de dados
+        page_size: Restaurantes lidos e gravados por página
+        batch_size: Lote do encoder (padrão: settings.EMBEDDING_BATCH_SIZE)
+        force: Regenerar mesmo com hash igual
+        checkpoint_path: Arquivo de checkpoint (None desativa a retomada)
+        rebuild_centroids: Recalcular centróides de culinária se algo mudou
+
+    Returns:
+        dict: scanned, embedded, tagged, skipped, resumed_from e seconds
+    """
+    start_time = time.perf_counter()
+    model_id = get_model_id()
+    tag = get_embedding_tag()
+    last_id = load_checkpoint(checkpoint_path, model_id, force)
+    stats: Dict[str, Any] = {"scanned": 0, "embedded": 0, "tagged": 0, "skipped": 0, "resumed_from": last_id}
+
+    if last_id:
+        logger.info(f"Retomando job de embeddings após o restaurante {last_id}")
+
+    while True:
+        page = db.execute(
+            select(
+                Restaurant.id,
+                Restaurant.name,
+                Restaurant.cuisine_type,
+                Restaurant.description,
+                Restaurant.embedding_hash,
+                Restaurant.embedding_model,
+                Restaurant.embedding.is_(None).label("missing")
+            )
+            .where(Restaurant.id > last_id)
+            .order_by(Restaurant.id)
+            .limit(page_size)
+        ).all()
+        if not page:
+            break
+
+        stale = []
+        untagged = []
+        for row in page:
+            text = build_restaurant_embedding_text(row)
+            content_hash = embedding_text_hash(text, model_id)
+            if force or row.missing or row.embedding_hash != content_hash or row.embedding_model not in (None, tag):
+                stale.append((row.id, text, content_hash))
+            elif row.embedding_model is None:
+                untagged.append(row.id)
+
+        if untagged:
+            db.execute(update(Restaurant), [
+                {"id": restaurant_id, "embedding_model": tag} for restaurant_id in untagged
+            ])
+            db.commit()
+
+        if stale:
+            vectors = encode_texts([text for _, text, _ in stale], batch_size=batch_size)
+            db.execute(update(Restaurant), [
+                {
+                    "id": restaurant_id,
+                    "embedding": json.dumps(vector.tolist()),
+                    "embedding_hash": content_hash,
+                    "embedding_model": tag,
+                }
+                for (restaurant_id, _, content_hash), vector in zip(stale, vectors)
+            ])
+            db.commit()
+
+        last_id = page[-1].id
+        save_checkpoint(checkpoint_path, last_id, model_id, force)
+
+        stats["scanned"] += len(page)
+        stats["embedded"] += len(stale)
+        stats["tagged"] += len(untagged)
+        stats["skipped"] += len(page) - len(stale) - len(untagged)
+        logger.info(
+            "Página de embeddings processada",
+            extra={"last_id": last_id, "embedded": len(stale), "page": len(page)}
+        )
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    if rebuild_centroids and (stats["embedded"] or stats["resumed_from"]):
+        from app.core.cuisine_centroids import rebuild_cuisine_centroids
+        rebuild_cuisine_centroids(db)
+
+    if settings.CATALOG_SNAPSHOT_DIR and (stats["embedded"] or stats["resumed_from"]):
+        from app.core.catalog_snapshot import write_catalog_snapshot
+        write_catalog_snapshot(db, settings.CATALOG_SNAPSHOT_DIR)
+
+    if stats["embedded"] and db.get_bind().dialect.name == "postgresql":
+        # Catálogo mudou: atualizar a base de conhecimento do Chef Virtual fora do chat
+        try:
+            from app.core.knowledge_base import sync_knowledge_base
+            from app.core.rag_service import RAGService
+            sync_knowledge_base(db, RAGService(db, settings.DATABASE_URL, validate=True))
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Base de conhecimento não sincronizada após o job: {e}")
+
+    stats["seconds"] = round(time.perf_counter() - start_time, 3)
+    logger.info("Job de embeddings concluído", extra=stats)
+    return stats
@@ -0,0 +1,313 @@
+"""
+Migração online de embeddings para um novo modelo (ou nova versão do mesmo).
+
+Cada vetor gravado carrega a tag "modelo@versão" (restaurants.embedding_model
+e user_preferences.embedding_model) e só vetores da mesma tag são comparados
+(recommender.select_embedding). A troca de modelo acontece sem parada:
+
+1. backfill_next_embeddings: gera em segundo plano, em lotes e com checkpoint,
+   os vetores do modelo novo em restaurants.embedding_next. Os servidores
+   continuam servindo os vetores atuais.
+2. Deploy com EMBEDDING_MODEL/EMBEDDING_MODEL_VERSION novos: esses servidores
+   leem embedding_next (tag igual à deles); os antigos seguem em embedding.
+3. promote_next_embeddings (com a configuração nova): move embedding_next
+   para embedding e recalcula o que deriva dos vetores (centróides,
+   preferências dos usuários e snapshot do catálogo).
+
+Vetores de preferência de outra versão são recalculados sob demanda por
+resolve_user_embedding; a promoção os recalcula em lote.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.embedding_job import embedding_text_hash, load_checkpoint, save_checkpoint
+from app.core.embeddings import (
+    build_restaurant_embedding_text,
+    get_embedding_model,
+    get_embedding_tag,
+    make_embedding_tag,
+)
+from app.core.logging_config import get_logger
+from app.database.models import Order, Restaurant, UserPreferences
+
+logger = get_logger(__name__)
+
+
+class EmbeddingMigrationError(Exception):
+    """Estado do catálogo não permite o passo pedido da migração."""
+
+
+def load_target_encoder(target_model: str):
+    """
+    Encoder do modelo de destino.
+
+    Reutiliza o modelo do processo se for o mesmo (ex.: só a versão mudou);
+    caso contrário carrega uma instância separada do SentenceTransformer.
+    """
+    if target_model == settings.EMBEDDING_MODEL:
+        return get_embedding_model()
+
+    from sentence_transformers import SentenceTransformer
+
+    logger.info(f"Carregando modelo de destino da migração: {target_model}")
+    return SentenceTransformer(target_model, device=settings.EMBEDDING_DEVICE)
+
+
+def _stale_for(tag: str):
+    """Filtro: restaurante com embedding mas sem vetor da tag em nenhuma das colunas."""
+    return (
+        Restaurant.embedding.isnot(None)
+        & or_(Restaurant.embedding_model.is_(None), Restaurant.embedding_model != tag)
+        & or_(Restaurant.embedding_next_model.is_(None), Restaurant.embedding_next_model != tag)
+    )
+
+
+def embedding_status(db: Session, target_tag: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Contagem de vetores por versão do modelo.
+
+    Args:
+        db: Sessão do banco de dados
+        target_tag: Tag de destino para calcular pendências (padrão: tag ativa)
+
+    Returns:
+        dict: active_tag, target_tag, restaurants, by_model, by_next_model,
+        pending (restaurantes sem vetor da tag de destino) e user_preferences
+    """
+    target_tag = target_tag or get_embedding_tag()
+    by_model = dict(db.execute(
+        select(Restaurant.embedding_model, func.count())
+        .where(Restaurant.embedding.isnot(None))
+        .group_by(Restaurant.embedding_model)
+    ).all())
+    by_next_model = dict(db.execute(
+        select(Restaurant.embedding_next_model, func.count())
+        .where(Restaurant.embedding_next_model.isnot(None))
+        .group_by(Restaurant.embedding_next_model)
+    ).all())
+    preferences = dict(db.execute(
+        select(UserPreferences.embedding_model, func.count()).group_by(UserPreferences.embedding_model)
+    ).all())
+
+    return {
+        "active_tag": get_embedding_tag(),
+        "target_tag": target_tag,
+        "restaurants": int(db.execute(select(func.count(Restaurant.id))).scalar_one()),
+        "by_model": {str(k): v for k, v in by_model.items()},
+        "by_next_model": {str(k): v for k, v in by_next_model.items()},
+        "pending": int(db.execute(select(func.count(Restaurant.id)).where(_stale_for(target_tag))).scalar_one()),
+        "user_preferences": {str(k): v for k, v in preferences.items()},
+    }
+
+
+def backfill_next_embeddings(
+    db: Session,
+    target_model: str,
+    target_version: str,
+    page_size: int = 1000,
+    batch_size: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    encoder=None
+) -> Dict[str, Any]:
+    """
+    Gera os vetores do modelo de destino em embedding_next, sem tocar em embedding.
+
+    Deve rodar com a configuração atual (antes do deploy do modelo novo):
+    linhas legadas sem tag recebem a tag ativa, para que servidores com a
+    configuração nova não as confundam com vetores do modelo novo.
+
+    Args:
+        db: Sessão do banco de dados
+        target_model: Modelo de destino (nome do sentence-transformers)
+        target_version: Versão de destino
+        page_size: Restaurantes lidos e gravados por página
+        batch_size: Lote do encoder (padrão: settings.EMBEDDING_BATCH_SIZE)
+        checkpoint_path: Arquivo de checkpoint (None desativa a retomada)
+        encoder: Encoder com interface encode() (padrão: load_target_encoder)
+
+    Returns:
+        dict: target_tag, scanned, embedded, tagged_legacy, resumed_from e seconds
+    """
+    start_time = time.perf_counter()
+    target_tag = make_embedding_tag(target_model, target_version)
+    active_tag = get_embedding_tag()
+
+    legacy = Restaurant.embedding.isnot(None) & Restaurant.embedding_model.is_(None)
+    tagged_legacy = 0
+    if db.execute(select(func.count(Restaurant.id)).where(legacy)).scalar_one():
+        if active_tag == target_tag:
+            raise EmbeddingMigrationError(
+                "Há vetores legados sem tag e a configuração ativa já é a de destino; "
+                "rode o backfill com a configuração do modelo atual"
+            )
+        tagged_legacy = db.execute(update(Restaurant).where(legacy).values(embedding_model=active_tag)).rowcount
+        db.commit()
+        logger.info(f"{tagged_legacy} vetores legados marcados com {active_tag}")
+
+    encoder = encoder or load_target_encoder(target_model)
+    last_id = load_checkpoint(checkpoint_path, target_tag, False)
+    stats: Dict[str, Any] = {
+        "target_tag": target_tag,
+        "scanned": 0,
+        "embedded": 0,
+        "tagged_legacy": tagged_legacy,
+        "resumed_from": last_id,
+    }
+    if last_id:
+        logger.info(f"Retomando backfill de {target_tag} após o restaurante {last_id}")
+
+    while True:
+        page = db.execute(
+            select(
+                Restaurant.id,
+                Restaurant.name,
+                Restaurant.cuisine_type,
+                Restaurant.description,
+                Restaurant.embedding_model,
+                Restaurant.embedding_next_model
+            )
+            .where(Restaurant.id > last_id)
+            .order_by(Restaurant.id)
+            .limit(page_size)
+        ).all()
+        if not page:
+            break
+
+        stale = [
+            (row.id, build_restaurant_embedding_text(row)) for row in page
+            if target_tag not in (row.embedding_model, row.embedding_next_model)
+        ]
+        if stale:
+            vectors = np.asarray(encoder.encode(
+                [text for _, text in stale],
+                batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+            db.execute(update(Restaurant), [
+                {"id": restaurant_id, "embedding_next": json.dumps(vector.tolist()), "embedding_next_model": target_tag}
+                for (restaurant_id, _), vector in zip(stale, vectors)
+            ])
+            db.commit()
+
+        last_id = page[-1].id
+        save_checkpoint(checkpoint_path, last_id, target_tag, False)
+        stats["scanned"] += len(page)
+        stats["embedded"] += len(stale)
+        logger.info(
+            "Página do backfill de embeddings processada",
+            extra={"last_id": last_id, "embedded": len(stale), "target_tag": target_tag}
+        )
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stats["seconds"] = round(time.perf_counter() - start_time, 3)
+    logger.info("Backfill de embeddings concluído", extra=stats)
+    return stats
+
+
+def promote_next_embeddings(db: Session, page_size: int = 1000) -> Dict[str, Any]:
+    """
+    Promove embedding_next para embedding na tag ativa deste processo.
+
+    Deve rodar com a configuração nova (EMBEDDING_MODEL/EMBEDDING_MODEL_VERSION
+    de destino). Falha se algum restaurante ainda não tiver vetor da tag
+    ativa. Cada página é promovida numa transação; leitores com a tag nova
+    encontram o vetor em uma das duas colunas durante toda a operação.
+
+    Returns:
+        dict: tag, promoted, preferences, onboarding_refreshed e seconds
+    """
+    start_time = time.perf_counter()
+    tag = get_embedding_tag()
+    pending = db.execute(select(func.count(Restaurant.id)).where(_stale_for(tag))).scalar_one()
+    if pending:
+        raise EmbeddingMigrationError(
+            f"{pending} restaurantes ainda sem vetor de {tag}; rode o backfill antes de promover"
+        )
+
+    promoted = 0
+    last_id = 0
+    while True:
+        page = db.execute(
+            select(Restaurant.id, Restaurant.name, Restaurant.cuisine_type, Restaurant.description)
+            .where(Restaurant.id > last_id, Restaurant.embedding_next_model == tag)
+            .order_by(Restaurant.id)
+            .limit(page_size)
+        ).all()
+        if not page:
+            break
+        ids = [row.id for row in page]
+        # Hash com o modelo de destino: o job de embeddings não recodifica o que acabou de ser promovido
+        db.execute(update(Restaurant), [
+            {"id": row.id, "embedding_hash": embedding_text_hash(build_restaurant_embedding_text(row), settings.EMBEDDING_MODEL)}
+            for row in page
+        ])
+        db.execute(
+            update(Restaurant)
+            .where(Restaurant.id.in_(ids))
+            .values(
+                embedding=Restaurant.embedding_next,
+                embedding_model=Restaurant.embedding_next_model,
+                embedding_next=None,
+                embedding_next_model=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        last_id = ids[-1]
+        promoted += len(ids)
+
+    # Derivados dos vetores: centróides, preferências e snapshot
+    from app.core.cuisine_centroids import rebuild_cuisine_centroids
+    from app.core.onboarding_service import generate_cold_start_embedding
+    from app.core.preference_rebuild import rebuild_user_preferences
+    from app.database.crud import create_or_update_user_preferences
+
+    rebuild_cuisine_centroids(db)
+    preference_stats = rebuild_user_preferences(db)
+
+    # Usuários só com onboarding: vetor sintético a partir dos centróides novos
+    onboarding_refreshed = 0
+    has_orders = select(Order.id).where(Order.user_id == UserPreferences.user_id).exists()
+    onboarding_only = db.execute(
+        select(UserPreferences).where(~has_orders, UserPreferences.favorite_cuisines.isnot(None))
+    ).scalars().all()
+    for preferences in onboarding_only:
+        try:
+            cuisines = json.loads(preferences.favorite_cuisines)
+        except (TypeError, ValueError):
+            continue
+        vector = generate_cold_start_embedding(selected_cuisines=cuisines, db=db) if cuisines else None
+        if vector:
+            create_or_update_user_preferences(
+                db=db,
+                user_id=preferences.user_id,
+                preference_embedding=json.dumps(vector),
+                embedding_model=tag
+            )
+            onboarding_refreshed += 1
+
+    if settings.CATALOG_SNAPSHOT_DIR:
+        from app.core.catalog_snapshot import write_catalog_snapshot
+        write_catalog_snapshot(db, settings.CATALOG_SNAPSHOT_DIR)
+
+    stats = {
+        "tag": tag,
+        "promoted": promoted,
+        "preferences": preference_stats.get("users", 0),
+        "onboarding_refreshed": onboarding_refreshed,
+        "seconds": round(time.perf_counter() - start_time, 3),
+    }
+    logger.info("Promoção de embeddings concluída", extra=stats)
+    return stats
@@ -1,10 +1,25 @@
 """
 Serviço de geração de embeddings usando sentence-transformers.
 Otimizado para uso eficiente de memória em ambientes com recursos limitados.
+
+EMBEDDING_BACKEND=onnx troca o SentenceTransformer pelo encoder ONNX Runtime
+quantizado (app.core.onnx_embeddings), com a mesma interface encode().
+
+É o único ponto do processo que carrega um modelo de embeddings: o
+recommender usa encode_text/encode_texts e o vector store do RAG usa o
+adaptador LangChain (get_langchain_embeddings), ambos sobre a mesma instância.
+
+Com INFERENCE_SIDECAR_SOCKET configurado, o processo não carrega modelo
+nenhum: encode_texts delega ao sidecar de inferência do host
+(app.core.inference_sidecar), que carrega o modelo uma vez para todos os workers.
 """
 
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import List, Optional
+
 import numpy as np
+from langchain_core.embeddings import Embeddings
+
 from app.config import settings
 from app.core.logging_config import get_logger
 
@@ -12,6 +27,62 @@ logger = get_logger(__name__)
 
 # Carregar modelo globalmente (cache)
 _model = None
+_model_lock = threading.Lock()
+_langchain_embeddings = None
+
+
+def _configure_torch_threads() -> None:
+    """Limita as threads do PyTorch (menos memória e contenção com os workers)."""
+    try:
+        import torch
+    except ImportError:
+        return  # PyTorch não disponível, continuar sem otimizações
+
+    num_threads = settings.EMBEDDING_NUM_THREADS
+    torch.set_num_threads(num_threads)
+    try:
+        # Só pode ser definido uma vez por processo (antes de trabalho paralelo)
+        torch.set_num_interop_threads(num_threads)
+    except RuntimeError:
+        pass
+    logger.debug(f"PyTorch configurado com {num_threads} thread(s)")
+
+
+def get_model_id() -> str:
+    """Identificador do modelo ativo (usado para versionar caches e vetores)."""
+    return settings.EMBEDDING_MODEL
+
+
+def make_embedding_tag(model_id: str, version: str) -> str:
+    """Identidade gravada junto de cada vetor: "modelo@versão"."""
+    return f"{model_id}@{version}"
+
+
+def get_embedding_tag() -> str:
+    """
+    Tag dos vetores produzidos por este processo (EMBEDDING_MODEL@EMBEDDING_MODEL_VERSION).
+
+    Vetores com tags diferentes vivem em espaços diferentes e nunca são comparados.
+    """
+    return make_embedding_tag(settings.EMBEDDING_MODEL, settings.EMBEDDING_MODEL_VERSION)
+
+
+def _load_onnx_model():
+    """Carrega o backend ONNX Runtime (sem importar PyTorch)."""
+    from app.core.onnx_embeddings import OnnxSentenceEncoder
+
+    logger.info(f"Carregando modelo ONNX de embeddings: {settings.EMBEDDING_ONNX_PATH}")
+    model = OnnxSentenceEncoder(
+        settings.EMBEDDING_ONNX_PATH,
+        num_threads=settings.EMBEDDING_NUM_THREADS
+    )
+    if model.model_id and model.model_id != settings.EMBEDDING_MODEL:
+        # Vetores de modelos diferentes não são comparáveis
+        logger.warning(
+            "Modelo ONNX exportado difere de EMBEDDING_MODEL",
+            extra={"onnx_model_id": model.model_id, "embedding_model": settings.EMBEDDING_MODEL}
+        )
+    return model
 
 
 def get_embedding_model():
@@ -21,28 +92,27 @@ def get_embedding_model():
     """
     global _model
     if _model is None:
-        logger.info(f"Carregando modelo de embeddings: {settings.EMBEDDING_MODEL}")
-        
-        # Otimizações para reduzir uso de memória
-        try:
-            import torch
-            # Limitar threads para reduzir uso de memória
-            torch.set_num_threads(1)
-            torch.set_num_interop_threads(1)
-            logger.debug("PyTorch configurado com 1 thread para otimização de memória")
-        except ImportError:
-            pass  # PyTorch não disponível, continuar sem otimizações
-        
-        # Carregar modelo com otimizações
-        _model = SentenceTransformer(
-            settings.EMBEDDING_MODEL,
-            device='cpu'  # Forçar uso de CPU (mais eficiente em memória)
-        )
-        
-        # Colocar modelo em modo de avaliação (reduz uso de memória)
-        _model.eval()
-        
-        logger.info("Modelo de embeddings carregado com sucesso (otimizado para memória)")
+        with _model_lock:
+            # Double-check locking pattern
+            if _model is None:
+                if settings.EMBEDDING_BACKEND == "onnx":
+                    _model = _load_onnx_model()
+                    return _model
+
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Carregando modelo de embeddings: {settings.EMBEDDING_MODEL}")
+                _configure_torch_threads()
+
+                model = SentenceTransformer(
+                    settings.EMBEDDING_MODEL,
+                    device=settings.EMBEDDING_DEVICE
+                )
+                # Colocar modelo em modo de avaliação (reduz uso de memória)
+                model.eval()
+                _model = model
+
+                logger.info("Modelo de embeddings carregado com sucesso (otimizado para memória)")
     return _model
 
 
@@ -56,7 +126,7 @@ def unload_model():
         logger.info("Descarregando modelo de embeddings da memória")
         del _model
         _model = None
-        
+
         # Limpeza adicional de memória
         try:
             import gc
@@ -68,25 +138,118 @@ def unload_model():
             pass  # Ignorar erros de limpeza
 
 
-def generate_restaurant_embedding(restaurant) -> np.ndarray:
+def encode_texts(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
     """
-    Gera embedding vetorial para um restaurante.
-    
+    Gera embeddings normalizados para vários textos em lotes.
+
+    Usa o sidecar de inferência se INFERENCE_SIDECAR_SOCKET estiver
+    configurado; caso contrário, o modelo deste processo.
+
     Args:
-        restaurant: Objeto RestaurantCreate ou Restaurant
-        
+        texts: Textos a codificar
+        batch_size: Tamanho do lote (padrão: settings.EMBEDDING_BATCH_SIZE)
+
     Returns:
-        np.ndarray: Embedding vetorial (384 dimensões)
+        np.ndarray: Matriz float32 (n x dim), linhas com norma 1
     """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    if settings.INFERENCE_SIDECAR_SOCKET:
+        from app.core.inference_sidecar import get_sidecar_client
+        return get_sidecar_client().encode(list(texts))
+
+    return encode_texts_local(texts, batch_size)
+
+
+def encode_texts_local(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    """Mesmo que encode_texts, sempre com o modelo carregado neste processo."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
     model = get_embedding_model()
-    
-    # Construir texto para embedding
+    embeddings = model.encode(
+        list(texts),
+        batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def encode_text(text: str) -> np.ndarray:
+    """Gera o embedding normalizado (float32) de um único texto."""
+    return encode_texts([text])[0]
+
+
+def encode_query(text: str) -> np.ndarray:
+    """
+    Embedding de uma consulta, passando pelo cache texto → vetor.
+
+    Em caso de miss, consultas concorrentes são agrupadas pelo micro-batcher
+    (EMBEDDING_MICRO_BATCHING).
+
+    Returns:
+        np.ndarray: Vetor float32 normalizado (somente leitura)
+    """
+    from app.core.embedding_cache import get_embedding_cache
+
+    cache = get_embedding_cache()
+    # Backend na chave: vetores int8 (ONNX) e float32 (torch) não são idênticos
+    model_id = f"{get_embedding_tag()}:{settings.EMBEDDING_BACKEND}"
+    vector = cache.get(model_id, text)
+    if vector is None:
+        if settings.EMBEDDING_MICRO_BATCHING:
+            from app.core.embedding_batcher import get_embedding_batcher
+            vector = get_embedding_batcher().encode(text)
+        else:
+            vector = encode_text(text)
+        vector = cache.set(model_id, text, vector)
+    return vector
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    Adaptador LangChain sobre o modelo compartilhado do processo.
+
+    Substitui HuggingFaceEmbeddings no vector store do RAG, que carregava
+    uma segunda cópia dos pesos.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return encode_texts(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return encode_query(text).tolist()
+
+
+def get_langchain_embeddings() -> SharedEmbeddings:
+    """Retorna o adaptador LangChain (singleton; não carrega o modelo até o primeiro uso)."""
+    global _langchain_embeddings
+    if _langchain_embeddings is None:
+        with _model_lock:
+            if _langchain_embeddings is None:
+                _langchain_embeddings = SharedEmbeddings()
+    return _langchain_embeddings
+
+
+def build_restaurant_embedding_text(restaurant) -> str:
+    """Texto usado para o embedding de um restaurante (nome, culinária e descrição)."""
     text = f"{restaurant.name} {restaurant.cuisine_type}"
     if restaurant.description:
         text += f" {restaurant.description}"
-    
-    # Gerar embedding
-    embedding = model.encode(text, normalize_embeddings=True)
-    
-    return embedding
+    return text
+
+
+def generate_restaurant_embedding(restaurant) -> np.ndarray:
+    """
+    Gera embedding vetorial para um restaurante.
 
+    Args:
+        restaurant: Objeto RestaurantCreate ou Restaurant
+
+    Returns:
+        np.ndarray: Embedding vetorial (384 dimensões)
+    """
+    return encode_text(build_restaurant_embedding_text(restaurant))
@@ -0,0 +1,401 @@
+"""
+Sidecar de inferência acessado por socket Unix (modo de deploy opcional).
+
+Um processo de longa duração por host (scripts/run_inference_sidecar.py)
+carrega o modelo de embeddings e o snapshot do catálogo uma única vez. Os
+workers web, com INFERENCE_SIDECAR_SOCKET configurado, não carregam o modelo
+(nem importam PyTorch): encode_texts e o ranking do catálogo viram chamadas
+ao sidecar. Os encodes de todos os workers passam pelo mesmo
+EmbeddingBatcher do sidecar, então são agrupados entre processos.
+
+Protocolo binário (little-endian), uma conexão persistente por thread:
+    pedido:   op u8 | tamanho u32 | payload
+    resposta: status u8 | tamanho u32 | payload
+
+    OP_INFO    -> JSON (modelo, tag, versão do snapshot, pid)
+    OP_ENCODE  n u32, n x (len u32 + texto utf-8)
+               -> linhas u32 | dim u32 | float32[linhas x dim]
+    OP_RANK    dim u32 | n_excluídos u32 | min_rating f32 (NaN = sem filtro)
+               | float32[dim] | int64[n_excluídos]
+               -> n u32 | int32[n] ids | float32[n] scores
+"""
+
+import json
+import math
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+HEADER = struct.Struct("<BI")
+U32 = struct.Struct("<I")
+RANK_HEADER = struct.Struct("<IIf")
+
+OP_INFO = 0
+OP_ENCODE = 1
+OP_RANK = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_UNAVAILABLE = 2
+
+# Limite de payload por frame (protege o sidecar de pedidos corrompidos)
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class SidecarError(Exception):
+    """Falha de comunicação com o sidecar ou erro reportado por ele."""
+
+
+class SidecarUnavailable(SidecarError):
+    """O sidecar não tem o recurso pedido (ex.: snapshot do catálogo)."""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Conexão com o sidecar encerrada")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _read_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    code, size = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame de {size} bytes excede o limite")
+    return code, _recv_exact(sock, size) if size else b""
+
+
+def _send_frame(sock: socket.socket, code: int, payload: bytes = b"") -> None:
+    sock.sendall(HEADER.pack(code, len(payload)) + payload)
+
+
+def encode_texts_payload(texts: List[str]) -> bytes:
+    parts = [U32.pack(len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_texts_payload(payload: bytes) -> List[str]:
+    (count,) = U32.unpack_from(payload, 0)
+    offset = U32.size
+    texts = []
+    for _ in range(count):
+        (size,) = U32.unpack_from(payload, offset)
+        offset += U32.size
+        texts.append(payload[offset:offset + size].decode("utf-8"))
+        offset += size
+    return texts
+
+
+def encode_matrix_payload(matrix: np.ndarray) -> bytes:
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    rows, dim = matrix.shape if matrix.ndim == 2 else (0, 0)
+    return U32.pack(rows) + U32.pack(dim) + matrix.tobytes()
+
+
+def decode_matrix_payload(payload: bytes) -> np.ndarray:
+    rows, dim = U32.unpack_from(payload, 0)[0], U32.unpack_from(payload, U32.size)[0]
+    return np.frombuffer(payload, dtype="<f4", offset=2 * U32.size, count=rows * dim).reshape(rows, dim)
+
+
+class _SidecarHandler(socketserver.BaseRequestHandler):
+    """Atende pedidos de uma conexão até o cliente fechá-la."""
+
+    def handle(self) -> None:
+        sidecar: "InferenceSidecarServer" = self.server.sidecar
+        while True:
+            try:
+                op, payload = _read_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            except ValueError as e:
+                _send_frame(self.request, STATUS_ERROR, str(e).encode("utf-8"))
+                return
+            try:
+                status, response = sidecar.dispatch(op, payload)
+            except Exception as e:
+                logger.error(f"Erro no sidecar de inferência (op {op}): {e}")
+                status, response = STATUS_ERROR, str(e)[:500].encode("utf-8")
+            try:
+                _send_frame(self.request, status, response)
+            except OSError:
+                return
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceSidecarServer:
+    """
+    Servidor do sidecar.
+
+    Args:
+        socket_path: Caminho do socket Unix
+        encode_fn: Função em lote (textos -> matriz); padrão: modelo local do processo
+        snapshot_fn: Fornece o snapshot do catálogo (padrão: get_catalog_snapshot)
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+        snapshot_fn: Optional[Callable[[], Any]] = None
+    ):
+        from app.core.embedding_batcher import EmbeddingBatcher
+
+        if encode_fn is None:
+            from app.core.embeddings import encode_texts_local
+            encode_fn = encode_texts_local
+        if snapshot_fn is None:
+            from app.core.catalog_snapshot import get_catalog_snapshot
+            snapshot_fn = get_catalog_snapshot
+
+        self.socket_path = socket_path
+        self.batcher = EmbeddingBatcher(
+            encode_fn,
+            max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+        self._snapshot_fn = snapshot_fn
+        self._server: Optional[_ThreadingUnixServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def dispatch(self, op: int, payload: bytes) -> Tuple[int, bytes]:
+        """Executa um pedido e devolve (status, payload da resposta)."""
+        if op == OP_ENCODE:
+            texts = decode_texts_payload(payload)
+            if not texts:
+                return STATUS_OK, encode_matrix_payload(np.empty((0, 0), dtype=np.float32))
+            # Cada texto entra na fila compartilhada: lotes misturam pedidos de todos os workers
+            futures = [self.batcher.submit(text) for text in texts]
+            return STATUS_OK, encode_matrix_payload(np.stack([f.result() for f in futures]))
+
+        if op == OP_RANK:
+            snapshot = self._snapshot_fn()
+            if snapshot is None:
+                return STATUS_UNAVAILABLE, b"Snapshot do catalogo indisponivel"
+            dim, n_exclude, min_rating = RANK_HEADER.unpack_from(payload, 0)
+            offset = RANK_HEADER.size
+            user_vec = np.frombuffer(payload, dtype="<f4", offset=offset, count=dim)
+            exclude = np.frombuffer(payload, dtype="<i8", offset=offset + dim * 4, count=n_exclude)
+            ids, scores = snapshot.rank(
+                user_vec, exclude.tolist() or None, None if math.isnan(min_rating) else min_rating
+            )
+            ids = np.ascontiguousarray(ids, dtype="<i4")
+            return STATUS_OK, U32.pack(ids.size) + ids.tobytes() + np.ascontiguousarray(scores, dtype="<f4").tobytes()
+
+        if op == OP_INFO:
+            from app.core.embeddings import get_embedding_tag, get_model_id
+
+            snapshot = self._snapshot_fn()
+            info = {
+                "model": get_model_id(),
+                "embedding_tag": get_embedding_tag(),
+                "catalog_version": snapshot.version if snapshot is not None else None,
+                "catalog_tag": getattr(snapshot, "embedding_tag", None) if snapshot is not None else None,
+                "catalog_source_version": getattr(snapshot, "source_version", None) if snapshot is not None else None,
+                "pid": os.getpid(),
+                "batching": self.batcher.get_stats(),
+            }
+            return STATUS_OK, json.dumps(info).encode("utf-8")
+
+        return STATUS_ERROR, f"Operação desconhecida: {op}".encode("utf-8")
+
+    def start(self) -> "InferenceSidecarServer":
+        """Abre o socket e atende em uma thread daemon (uso em testes ou embutido)."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Socket órfão de uma execução anterior
+        self._server = _ThreadingUnixServer(self.socket_path, _SidecarHandler)
+        self._server.sidecar = self
+        os.chmod(self.socket_path, 0o660)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="inference-sidecar", daemon=True)
+        self._thread.start()
+        logger.info("Sidecar de inferência escutando", extra={"socket": self.socket_path})
+        return self
+
+    def serve_forever(self) -> None:
+        """Atende na thread atual até stop() (uso pelo script do sidecar)."""
+        if self._server is None:
+            self.start()
+        self._thread.join()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class SidecarClient:
+    """
+    Cliente do sidecar com uma conexão persistente por thread.
+
+    Args:
+        socket_path: Caminho do socket Unix
+        timeout: Timeout (s) de cada pedido
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._info: Optional[Dict[str, Any]] = None
+        self._info_checked = 0.0
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as e:
+                sock.close()
+                raise SidecarError(f"Sidecar indisponível em {self.socket_path}: {e}") from e
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+            self._local.sock = None
+
+    def _request(self, op: int, payload: bytes = b"") -> bytes:
+        # Uma nova tentativa cobre conexões persistentes derrubadas (ex.: sidecar reiniciado)
+        for attempt in (1, 2):
+            try:
+                sock = self._connection()
+                _send_frame(sock, op, payload)
+                status, response = _read_frame(sock)
+                break
+            except (ConnectionError, OSError, ValueError) as e:
+                self._drop_connection()
+                if attempt == 2 or isinstance(e, socket.timeout):
+                    raise SidecarError(f"Falha na chamada ao sidecar: {e}") from e
+        if status == STATUS_UNAVAILABLE:
+            raise SidecarUnavailable(response.decode("utf-8", "replace"))
+        if status != STATUS_OK:
+            raise SidecarError(response.decode("utf-8", "replace"))
+        return response
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embeddings normalizados (float32 n x dim) calculados pelo sidecar."""
+        return decode_matrix_payload(self._request(OP_ENCODE, encode_texts_payload(list(texts))))
+
+    def rank(
+        self,
+        user_embedding: Iterable[float],
+        exclude_ids: Optional[Iterable[int]] = None,
+        min_rating: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Mesmo contrato de CatalogSnapshot.rank, executado no sidecar."""
+        user_vec = np.ascontiguousarray(np.asarray(user_embedding, dtype=np.float32), dtype="<f4")
+        exclude = np.fromiter(exclude_ids or (), dtype="<i8")
+        payload = (
+            RANK_HEADER.pack(user_vec.size, exclude.size, float("nan") if min_rating is None else min_rating)
+            + user_vec.tobytes() + exclude.tobytes()
+        )
+        response = self._request(OP_RANK, payload)
+        (count,) = U32.unpack_from(response, 0)
+        ids = np.frombuffer(response, dtype="<i4", offset=U32.size, count=count)
+        scores = np.frombuffer(response, dtype="<f4", offset=U32.size + count * 4, count=count)
+        return ids, scores
+
+    def info(self, max_age: float = 0.0) -> Dict[str, Any]:
+        """Informações do sidecar (cacheadas por até max_age segundos)."""
+        now = time.monotonic()
+        if self._info is None or now - self._info_checked >= max_age:
+            self._info = json.loads(self._request(OP_INFO).decode("utf-8"))
+            self._info_checked = now
+        return self._info
+
+    def forget_info(self) -> None:
+        """Descarta as informações cacheadas (a próxima info consulta o sidecar)."""
+        self._info = None
+
+    def close(self) -> None:
+        self._drop_connection()
+
+
+class SidecarCatalogRanker:
+    """Adaptador com a interface de CatalogSnapshot.rank sobre o sidecar."""
+
+    def __init__(self, client: SidecarClient, version: str, source_version: Optional[str] = None):
+        self.client = client
+        self.version = version
+        self.source_version = source_version
+
+    def rank(
+        self,
+        user_embedding: List[float],
+        exclude_ids: Optional[Iterable[int]] = None,
+        min_rating: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        try:
+            return self.client.rank(user_embedding, exclude_ids, min_rating)
+        except SidecarError:
+            # Sidecar reiniciado ou sem snapshot: a próxima get_sidecar_ranker consulta info de novo
+            self.client.forget_info()
+            raise
+
+
+def get_sidecar_client() -> Optional[SidecarClient]:
+    """Cliente do processo (None se INFERENCE_SIDECAR_SOCKET não estiver configurado)."""
+    global _client
+    if not settings.INFERENCE_SIDECAR_SOCKET:
+        return None
+    if _client is None or _client.socket_path != settings.INFERENCE_SIDECAR_SOCKET:
+        with _client_lock:
+            if _client is None or _client.socket_path != settings.INFERENCE_SIDECAR_SOCKET:
+                _client = SidecarClient(settings.INFERENCE_SIDECAR_SOCKET, settings.INFERENCE_SIDECAR_TIMEOUT)
+    return _client
+
+
+def get_sidecar_ranker() -> Optional[SidecarCatalogRanker]:
+    """
+    Ranking do catálogo no sidecar, se ele tiver um snapshot da versão ativa do modelo.
+
+    A verificação é refeita no máximo a cada CATALOG_SNAPSHOT_CHECK_SECONDS.
+    """
+    from app.core.embeddings import get_embedding_tag
+
+    client = get_sidecar_client()
+    if client is None:
+        return None
+    try:
+        info = client.info(max_age=settings.CATALOG_SNAPSHOT_CHECK_SECONDS)
+    except SidecarError as e:
+        logger.warning(f"Sidecar sem resposta; ranking a partir do banco: {e}")
+        return None
+    if not info.get("catalog_version") or info.get("catalog_tag") != get_embedding_tag():
+        return None
+    return SidecarCatalogRanker(client, info["catalog_version"], info.get("catalog_source_version"))
@@ -1,15 +1,124 @@
 """
 Gerenciamento da base de conhecimento dinâmica do Chef Virtual
 Combina dados estáticos (arquivo .txt) com dados dinâmicos do banco
+
+O estado de cada coleção (contagem de documentos e versão do catálogo
+sincronizada) fica em knowledge_base_status e numa cópia em memória do
+processo: a checagem de população do chat é só uma leitura de dicionário.
+A carga da base (sync_knowledge_base) roda no aquecimento do startup e
+após mudanças no catálogo, nunca no caminho de uma mensagem.
+
+A sincronização é incremental e idempotente: cada documento tem um id
+estável (restaurant:{id}, static:{seção}, user:{id}:{tipo}) e o hash do
+conteúdo fica em knowledge_base_documents. Só documentos novos ou alterados
+são recodificados; os que sumiram do catálogo são removidos da coleção.
 """
 
-from typing import List, Dict, Any, Optional
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Dict, Any, Optional, Sequence
+from sqlalchemy import delete, func, or_, select, text
 from sqlalchemy.orm import Session
 from langchain_core.documents import Document
 
 from app.database import crud
+from app.database.models import KnowledgeBaseDocument, KnowledgeBaseStatus
+from app.core.embeddings import get_embedding_tag
+from app.core.local_vector_store import LocalVectorStore
+from app.core.logging_config import get_logger
+from app.core.rag_service import DEFAULT_COLLECTION_NAME
 from app.core.recommender import extract_user_patterns
 
+logger = get_logger(__name__)
+
+# Chave do advisory lock da sincronização (um worker por vez no PostgreSQL)
+SYNC_LOCK_KEY = 7301884201
+
+# Escopo da carga do catálogo (documentos de usuários são sincronizados à parte)
+CATALOG_SCOPE = ("static:", "restaurant:")
+
+# Prefixos de todos os ids estáveis (documentos sem eles vêm de cargas antigas)
+STABLE_ID_PREFIXES = CATALOG_SCOPE + ("user:",)
+
+# Documentos recodificados por chamada ao vector store
+SYNC_BATCH_SIZE = 256
+
+# Cópia em memória de knowledge_base_status (collection_name -> estado)
+_statuses: Dict[str, Dict[str, Any]] = {}
+_status_lock = threading.Lock()
+
+
+def get_collection_status(collection_name: str = DEFAULT_COLLECTION_NAME) -> Optional[Dict[str, Any]]:
+    """Estado conhecido da coleção neste processo (leitura em memória; None se desconhecido)."""
+    status = _statuses.get(collection_name)
+    return dict(status) if status is not None else None
+
+
+def is_knowledge_base_populated(collection_name: str = DEFAULT_COLLECTION_NAME) -> bool:
+    """True se a coleção tem documentos (leitura em memória, sem ida ao banco)."""
+    status = _statuses.get(collection_name)
+    return bool(status and status["document_count"] > 0)
+
+
+def _remember(row: KnowledgeBaseStatus) -> Dict[str, Any]:
+    status = {
+        "collection_name": row.collection_name,
+        "document_count": int(row.document_count or 0),
+        "sync_version": row.sync_version,
+        "synced_at": row.synced_at.isoformat() if row.synced_at else None,
+    }
+    with _status_lock:
+        _statuses[row.collection_name] = status
+    return dict(status)
+
+
+def load_collection_status(db: Session, collection_name: str = DEFAULT_COLLECTION_NAME) -> Optional[Dict[str, Any]]:
+    """Relê o estado gravado pelo processo de sincronização (startup de cada worker)."""
+    row = db.get(KnowledgeBaseStatus, collection_name)
+    if row is None:
+        with _status_lock:
+            _statuses.pop(collection_name, None)
+        return None
+    return _remember(row)
+
+
+def record_sync(
+    db: Session,
+    document_count: int,
+    sync_version: Optional[str],
+    collection_name: str = DEFAULT_COLLECTION_NAME
+) -> Dict[str, Any]:
+    """Grava o resultado de uma sincronização (banco + memória deste processo)."""
+    row = db.get(KnowledgeBaseStatus, collection_name)
+    if row is None:
+        row = KnowledgeBaseStatus(collection_name=collection_name)
+        db.add(row)
+    row.document_count = document_count
+    row.sync_version = sync_version
+    row.synced_at = datetime.utcnow()
+    db.commit()
+    return _remember(row)
+
+
+def reset_collection_status() -> None:
+    """Descarta a cópia em memória (testes)."""
+    with _status_lock:
+        _statuses.clear()
+
+
+def catalog_version(db: Session) -> str:
+    """Versão do catálogo de restaurantes (ver crud.get_catalog_version)."""
+    return crud.get_catalog_version(db)
+
+
+def sync_version(db: Session) -> str:
+    """Versão sincronizada: catálogo e modelo de embeddings (trocar o modelo recodifica a coleção)."""
+    raw = f"{catalog_version(db)}:{get_embedding_tag()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
 
 def load_static_knowledge(file_path: Optional[str] = None) -> str:
     """
@@ -265,23 +374,338 @@ def build_complete_knowledge_base(
     return documents
 
 
+def document_id(document: Document) -> str:
+    """
+    Id estável do documento a partir dos metadados.
+
+    Raises:
+        ValueError: Tipo de documento sem id estável
+    """
+    metadata = document.metadata
+    doc_type = metadata.get("type")
+    if doc_type == "restaurant":
+        return f"restaurant:{metadata['restaurant_id']}"
+    if doc_type == "static_knowledge":
+        return f"static:{metadata['section'].strip()[:200]}"
+    if doc_type == "user_preference":
+        return f"user:{metadata['user_id']}:{metadata['preference_type']}"
+    raise ValueError(f"Documento sem id estável (tipo {doc_type!r})")
+
+
+def content_hash(document: Document) -> str:
+    """Hash do texto, dos metadados e da versão do modelo (mudança em qualquer um recodifica o documento)."""
+    metadata = json.dumps(document.metadata, sort_keys=True, ensure_ascii=False, default=str)
+    raw = f"{get_embedding_tag()}\n{document.page_content}\n{metadata}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def assign_document_ids(documents: List[Document]) -> Dict[str, Document]:
+    """Mapeia id estável -> documento (seções estáticas de mesmo título ganham sufixo #n)."""
+    by_id: Dict[str, Document] = {}
+    for document in documents:
+        base_id = document_id(document)
+        doc_id, n = base_id, 1
+        while doc_id in by_id:
+            n += 1
+            doc_id = f"{base_id}#{n}"
+        by_id[doc_id] = document
+    return by_id
+
+
+def sync_documents(
+    db: Session,
+    vector_store,
+    documents: List[Document],
+    scope: Sequence[str],
+    collection_name: str = DEFAULT_COLLECTION_NAME
+) -> Dict[str, int]:
+    """
+    Aplica ao vector store a diferença entre os documentos e os hashes gravados.
+
+    Só considera ids gravados com um dos prefixos de scope (ids fora do escopo
+    nunca são removidos). Cada documento alterado é removido pelo id antes de
+    ser reinserido, então repetir a chamada após uma falha não duplica nada.
+    As linhas de knowledge_base_documents ficam na transação de db (o chamador
+    faz o commit).
+
+    Returns:
+        dict: added, updated, deleted e unchanged
+    """
+    current = assign_document_ids(documents)
+    hashes = {doc_id: content_hash(document) for doc_id, document in current.items()}
+    stored = {
+        row.document_id: row
+        for row in db.execute(
+            select(KnowledgeBaseDocument).where(
+                KnowledgeBaseDocument.collection_name == collection_name,
+                or_(*[KnowledgeBaseDocument.document_id.startswith(prefix) for prefix in scope])
+            )
+        ).scalars()
+    }
+
+    changed = [doc_id for doc_id in current if stored.get(doc_id) is None or stored[doc_id].content_hash != hashes[doc_id]]
+    removed = [doc_id for doc_id in stored if doc_id not in current]
+
+    if changed or removed:
+        vector_store.delete(ids=changed + removed, collection_only=True)
+    for i in range(0, len(changed), SYNC_BATCH_SIZE):
+        batch = changed[i:i + SYNC_BATCH_SIZE]
+        vector_store.add_documents([current[doc_id] for doc_id in batch], ids=batch)
+
+    for doc_id in removed:
+        db.delete(stored[doc_id])
+    for doc_id in changed:
+        if doc_id in stored:
+            stored[doc_id].content_hash = hashes[doc_id]
+        else:
+            db.add(KnowledgeBaseDocument(
+                collection_name=collection_name, document_id=doc_id, content_hash=hashes[doc_id]
+            ))
+    db.flush()
+
+    updated = sum(1 for doc_id in changed if doc_id in stored)
+    return {
+        "added": len(changed) - updated,
+        "updated": updated,
+        "deleted": len(removed),
+        "unchanged": len(current) - len(changed),
+    }
+
+
+def _tracked_count(db: Session, collection_name: str) -> int:
+    return int(db.execute(
+        select(func.count()).select_from(KnowledgeBaseDocument)
+        .where(KnowledgeBaseDocument.collection_name == collection_name)
+    ).scalar_one())
+
+
+def _vector_store(rag_service, collection_name: str):
+    if rag_service.vector_store is None:
+        rag_service.initialize_vector_store(collection_name)
+    return rag_service.vector_store
+
+
+def _delete_legacy_documents(db: Session, vector_store, collection_name: str) -> None:
+    """
+    Primeira carga com ids estáveis: descarta documentos de cargas antigas (sem id estável).
+
+    No PGVector só as linhas são apagadas: a coleção mantém o uuid, que os
+    workers cacheiam para a busca RRF e que o índice HNSW parcial filtra.
+    """
+    if db.get_bind().dialect.name != "postgresql" or isinstance(vector_store, LocalVectorStore):
+        vector_store.delete_collection()
+        vector_store.create_collection()
+        return
+
+    from app.core.vector_index import COLLECTION_TABLE, EMBEDDING_TABLE
+
+    stable = " OR ".join(f"custom_id LIKE '{prefix}%'" for prefix in STABLE_ID_PREFIXES)
+    deleted = db.execute(text(
+        f"DELETE FROM {EMBEDDING_TABLE} "
+        f"WHERE collection_id = (SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name) "
+        f"AND (custom_id IS NULL OR NOT ({stable}))"
+    ), {"name": collection_name}).rowcount
+    if deleted:
+        logger.info(f"{deleted} documentos de cargas antigas removidos da coleção {collection_name}")
+
+
+def _ensure_search_index(db: Session, collection_name: str) -> None:
+    """Índice HNSW da coleção no modo configurado (bancos novos: a coleção só existe após a primeira carga)."""
+    from app.core.vector_index import ensure_hnsw_index
+
+    try:
+        with db.get_bind().begin() as connection:
+            # Modo da coleção; índices de outros modos são removidos (troca de quantização)
+            ensure_hnsw_index(connection, collection_name, drop_others=True)
+    except Exception as e:
+        logger.warning(f"Índice HNSW da base de conhecimento não criado: {e}")
+
+
+def sync_knowledge_base(
+    db: Session,
+    rag_service,
+    force: bool = False,
+    collection_name: str = DEFAULT_COLLECTION_NAME
+) -> Dict[str, Any]:
+    """
+    Sincroniza a base de conhecimento (estática + restaurantes) se o catálogo mudou.
+
+    Compara sync_version com a versão sincronizada em knowledge_base_status;
+    se iguais e a coleção tiver documentos, não faz nada. Caso contrário
+    aplica só a diferença (sync_documents). No PostgreSQL um advisory lock
+    garante que só um worker sincroniza por vez (os demais encontram o estado
+    já atualizado).
+
+    Args:
+        db: Sessão do banco de dados
+        rag_service: RAGService com o vector store da coleção
+        force: Comparar os hashes mesmo sem mudança na versão do catálogo
+        collection_name: Coleção do vector store
+
+    Returns:
+        dict: Estado da coleção, synced (se houve comparação) e contagens
+        added/updated/deleted/unchanged
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Liberado no commit de record_sync (ou no rollback)
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SYNC_LOCK_KEY})
+
+    status = load_collection_status(db, collection_name)
+    version = sync_version(db)
+    if not force and status and status["document_count"] > 0 and status["sync_version"] == version:
+        db.commit()
+        return {**status, "synced": False}
+
+    vector_store = _vector_store(rag_service, collection_name)
+    if isinstance(vector_store, LocalVectorStore) and not len(vector_store) and _tracked_count(db, collection_name):
+        # Arquivos da coleção local apagados: os hashes gravados não valem mais
+        db.execute(delete(KnowledgeBaseDocument).where(KnowledgeBaseDocument.collection_name == collection_name))
+    if not _tracked_count(db, collection_name):
+        _delete_legacy_documents(db, vector_store, collection_name)
+
+    documents = build_static_knowledge_documents() + build_restaurant_documents(db)
+    try:
+        stats = sync_documents(db, vector_store, documents, CATALOG_SCOPE, collection_name)
+    except Exception:
+        db.rollback()
+        raise
+
+    result = record_sync(db, _tracked_count(db, collection_name), version, collection_name)
+    logger.info(
+        "Base de conhecimento sincronizada",
+        extra={"collection": collection_name, "sync_version": version, **stats}
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        _ensure_search_index(db, collection_name)
+    return {**result, "synced": True, **stats}
+
+
+def sync_user_knowledge(
+    db: Session,
+    rag_service,
+    user_id: int,
+    collection_name: str = DEFAULT_COLLECTION_NAME
+) -> Dict[str, int]:
+    """Sincroniza os documentos de preferências de um usuário (escopo user:{id}:)."""
+    documents = build_user_preference_documents(db, user_id)
+    try:
+        stats = sync_documents(
+            db, _vector_store(rag_service, collection_name), documents, (f"user:{user_id}:",), collection_name
+        )
+    except Exception:
+        db.rollback()
+        raise
+    status = get_collection_status(collection_name)
+    record_sync(db, _tracked_count(db, collection_name), status["sync_version"] if status else None, collection_name)
+    return stats
+
+
 def update_knowledge_base(
     db: Session,
     rag_service,
     user_id: Optional[int] = None
-):
+) -> Dict[str, Any]:
     """
-    Atualiza a base de conhecimento no vector store
+    Atualiza a base de conhecimento no vector store (idempotente)
     
     Args:
         db: Sessão do banco de dados
         rag_service: Instância do RAGService
         user_id: ID do usuário (opcional)
+
+    Returns:
+        dict: Resultado de sync_knowledge_base
     """
-    # Construir documentos completos
-    documents = build_complete_knowledge_base(db, user_id)
-    
-    # Adicionar ao vector store
-    if documents:
-        rag_service.add_documents(documents)
+    result = sync_knowledge_base(db, rag_service, force=True)
+    if user_id:
+        sync_user_knowledge(db, rag_service, user_id)
+    return result
+
+
+class KnowledgeBaseSyncWorker:
+    """
+    Sincronização em segundo plano disparada por gravações de restaurantes
+    (base de conhecimento e snapshot do catálogo).
+
+    Gravações próximas são agrupadas: schedule() só marca a pendência e a
+    thread roda sync_fn uma vez após debounce segundos sem espera adicional.
+    """
+
+    def __init__(self, sync_fn: Callable[[], Any], debounce: float = 2.0):
+        self._sync_fn = sync_fn
+        self._debounce = debounce
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+
+    def schedule(self) -> None:
+        self._pending.set()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="knowledge-base-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._pending.wait()
+            time.sleep(self._debounce)
+            self._pending.clear()
+            try:
+                self._sync_fn()
+            except Exception as e:
+                logger.warning(f"Sincronização da base de conhecimento em segundo plano falhou: {e}")
+            self.runs += 1
+
+
+def _syncs_knowledge_base(db: Session) -> bool:
+    from app.config import settings
+    return settings.KNOWLEDGE_BASE_SYNC_ON_WRITE and db.get_bind().dialect.name == "postgresql"
+
+
+def _sync_with_new_session() -> Dict[str, Any]:
+    from app.config import settings
+    from app.core.rag_service import RAGService
+    from app.database.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result: Dict[str, Any] = {}
+        if settings.CATALOG_SNAPSHOT_DIR:
+            # Restaurantes novos entram no ranking sem esperar o job de embeddings
+            from app.core.catalog_snapshot import write_catalog_snapshot
+            result["snapshot"] = write_catalog_snapshot(db, settings.CATALOG_SNAPSHOT_DIR)
+        if _syncs_knowledge_base(db):
+            result.update(sync_knowledge_base(db, RAGService(db, settings.DATABASE_URL, validate=True)))
+        return result
+    finally:
+        db.close()
+
+
+_sync_worker: Optional[KnowledgeBaseSyncWorker] = None
+_sync_worker_lock = threading.Lock()
+
+
+def schedule_knowledge_base_sync(db: Session) -> bool:
+    """
+    Agenda a sincronização em segundo plano após uma gravação no catálogo.
+
+    A base de conhecimento só no PostgreSQL (PGVector) e com
+    KNOWLEDGE_BASE_SYNC_ON_WRITE ativo (no vector store local ela é
+    sincronizada no aquecimento do startup); o snapshot do catálogo sempre
+    que CATALOG_SNAPSHOT_DIR estiver configurado.
+
+    Returns:
+        bool: True se a sincronização foi agendada
+    """
+    global _sync_worker
+    from app.config import settings
 
+    if not settings.CATALOG_SNAPSHOT_DIR and not _syncs_knowledge_base(db):
+        return False
+    if _sync_worker is None:
+        with _sync_worker_lock:
+            if _sync_worker is None:
+                _sync_worker = KnowledgeBaseSyncWorker(_sync_with_new_session, settings.KNOWLEDGE_BASE_SYNC_DEBOUNCE)
+    _sync_worker.schedule()
+    return True
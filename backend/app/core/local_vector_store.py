@@ -0,0 +1,352 @@
+"""
+Vector store local (NumPy) para SQLite, desenvolvimento e instalações pequenas.
+
+Implementa a parte da interface do PGVector usada pelo RAGService e pela base
+de conhecimento: add_documents com ids (substitui ids existentes), delete,
+delete_collection/create_collection, similarity_search[_with_score][_by_vector]
+e as_retriever. Os documentos ficam numa lista indexada e os vetores numa
+matriz float32 com linhas normalizadas; a busca é força bruta (produto
+matricial), exata e, para catálogos pequenos, mais rápida que uma ida ao
+pgvector pela rede. O score devolvido é a distância de cosseno, como no PGVector.
+
+Persistência (RAG_LOCAL_VECTOR_DIR ou <arquivo SQLite>.vectors/):
+    <coleção>.npy   float32 n x dim, linhas com norma 1
+    <coleção>.json  ids, textos e metadados na ordem das linhas
+
+Os dois arquivos são gravados como temporários e trocados com os.replace
+(atômico), o .json por último; os outros workers recarregam a coleção quando
+o mtime do .json muda. Banco SQLite em memória: coleção só no processo.
+"""
+
+import json
+import os
+import re
+import threading
+import uuid
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def default_directory(connection_string: str) -> Optional[str]:
+    """
+    Diretório das coleções locais do banco (None = só em memória).
+
+    Returns:
+        RAG_LOCAL_VECTOR_DIR, ou <arquivo SQLite>.vectors ao lado do banco
+    """
+    if settings.RAG_LOCAL_VECTOR_DIR:
+        return settings.RAG_LOCAL_VECTOR_DIR
+    try:
+        database = make_url(connection_string).database
+    except Exception:
+        return None
+    if not database or database == ":memory:" or database.startswith("file::memory:"):
+        return None
+    return f"{database}.vectors"
+
+
+class _Collection(NamedTuple):
+    """Estado imutável da coleção (trocado inteiro a cada gravação)."""
+
+    ids: Tuple[str, ...]
+    texts: Tuple[str, ...]
+    metadatas: Tuple[Dict[str, Any], ...]
+    matrix: np.ndarray
+
+
+_EMPTY = _Collection((), (), (), np.empty((0, 0), dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """
+    Filtro de metadados no formato do PGVector: igualdade, in/nin, eq/ne
+    (comparados como texto) e gte/lte (numéricos, como em TunedPGVector).
+    """
+    for key, condition in filter.items():
+        value = str(metadata.get(key))
+        if not isinstance(condition, dict):
+            if value != str(condition):
+                return False
+            continue
+        for operator, operand in condition.items():
+            operator = operator.lower().lstrip("$")
+            if operator == "in" and value not in {str(v) for v in operand}:
+                return False
+            if operator == "nin" and value in {str(v) for v in operand}:
+                return False
+            if operator == "eq" and value != str(operand):
+                return False
+            if operator == "ne" and value == str(operand):
+                return False
+            if operator in ("gte", "lte"):
+                number = _number(metadata.get(key))
+                if number is None:
+                    return False
+                if operator == "gte" and number < float(operand):
+                    return False
+                if operator == "lte" and number > float(operand):
+                    return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Coleção de documentos em memória com persistência opcional em .npy/.json.
+
+    Leituras usam o estado corrente sem lock (referência imutável); gravações
+    são serializadas no processo. Entre processos, um escritor por vez (a
+    sincronização da base roda no aquecimento do startup).
+    """
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        collection_name: str,
+        directory: Optional[str] = None
+    ):
+        self.embedding_function = embedding_function
+        self.collection_name = collection_name
+        self.directory = directory
+        self._state = _EMPTY
+        self._mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+        self._reload()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def __len__(self) -> int:
+        return len(self._state.ids)
+
+    def _paths(self) -> Tuple[str, str]:
+        slug = re.sub(r"[^a-z0-9_]", "_", self.collection_name.lower())
+        return os.path.join(self.directory, f"{slug}.npy"), os.path.join(self.directory, f"{slug}.json")
+
+    def _reload(self) -> None:
+        """Relê a coleção do disco se outro processo a gravou (mtime do .json)."""
+        if not self.directory:
+            return
+        matrix_path, meta_path = self._paths()
+        try:
+            mtime_ns = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            if self._mtime_ns is not None:
+                self._state, self._mtime_ns = _EMPTY, None
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(matrix_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Coleção local {self.collection_name} não carregada: {e}")
+            return
+        if matrix.shape[0] != len(meta["ids"]):
+            # Gravação concorrente entre os dois arquivos: tentar de novo na próxima busca
+            return
+        self._state = _Collection(
+            tuple(meta["ids"]), tuple(meta["texts"]), tuple(meta["metadatas"]), matrix.astype(np.float32, copy=False)
+        )
+        self._mtime_ns = mtime_ns
+
+    def _save(self, state: _Collection) -> None:
+        self._state = state
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, meta_path = self._paths()
+        with open(matrix_path + ".tmp", "wb") as f:
+            np.save(f, state.matrix)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": list(state.ids), "texts": list(state.texts), "metadatas": list(state.metadatas)},
+                f, ensure_ascii=False, default=str
+            )
+        os.replace(matrix_path + ".tmp", matrix_path)
+        os.replace(meta_path + ".tmp", meta_path)
+        self._mtime_ns = os.stat(meta_path).st_mtime_ns
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Codifica e grava os textos; ids já existentes são substituídos.
+
+        Raises:
+            ValueError: Dimensão dos vetores diferente da coleção
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize(np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32))
+
+        with self._lock:
+            self._reload()
+            state = self._state
+            if len(state.ids) and state.matrix.shape[1] != vectors.shape[1]:
+                raise ValueError(
+                    f"Dimensão {vectors.shape[1]} difere da coleção {self.collection_name} ({state.matrix.shape[1]})"
+                )
+            new_ids = set(ids)
+            keep = [i for i, doc_id in enumerate(state.ids) if doc_id not in new_ids]
+            matrix = state.matrix[keep] if len(state.ids) else np.empty((0, vectors.shape[1]), dtype=np.float32)
+            self._save(_Collection(
+                tuple(state.ids[i] for i in keep) + tuple(ids),
+                tuple(state.texts[i] for i in keep) + tuple(texts),
+                tuple(state.metadatas[i] for i in keep) + tuple(dict(m) for m in metadatas),
+                np.vstack([matrix, vectors]),
+            ))
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Remove os documentos pelos ids (collection_only aceito por compatibilidade com o PGVector)."""
+        if not ids:
+            return None
+        removed = set(ids)
+        with self._lock:
+            self._reload()
+            state = self._state
+            keep = [i for i, doc_id in enumerate(state.ids) if doc_id not in removed]
+            if len(keep) != len(state.ids):
+                self._save(_Collection(
+                    tuple(state.ids[i] for i in keep),
+                    tuple(state.texts[i] for i in keep),
+                    tuple(state.metadatas[i] for i in keep),
+                    state.matrix[keep],
+                ))
+        return True
+
+    def delete_collection(self) -> None:
+        """Descarta todos os documentos (e os arquivos da coleção)."""
+        with self._lock:
+            self._state, self._mtime_ns = _EMPTY, None
+            if self.directory:
+                for path in self._paths():
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def create_collection(self) -> None:
+        """Sem efeito: a coleção local existe a partir do primeiro documento."""
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Top-k por cosseno (força bruta), com a distância (1 - cosseno) como score."""
+        self._reload()
+        state = self._state
+        query = np.asarray(embedding, dtype=np.float32)
+        if not len(state.ids):
+            return []
+        if state.matrix.shape[1] != query.shape[0]:
+            logger.warning(
+                "Dimensão da consulta difere da coleção local",
+                extra={"collection": self.collection_name, "query_dim": int(query.shape[0]),
+                       "collection_dim": int(state.matrix.shape[1])}
+            )
+            return []
+
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        rows = np.arange(len(state.ids))
+        if filter:
+            rows = np.fromiter((i for i in rows if _matches(state.metadatas[i], filter)), dtype=np.int64)
+            if not len(rows):
+                return []
+
+        scores = state.matrix[rows] @ query
+        if k < len(rows):
+            top = np.argpartition(-scores, k)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [
+            (
+                Document(page_content=state.texts[rows[i]], metadata=dict(state.metadatas[rows[i]]), id=state.ids[rows[i]]),
+                float(1.0 - scores[i]),
+            )
+            for i in top
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding_function.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        collection_name: str = "langchain",
+        directory: Optional[str] = None,
+        **kwargs: Any
+    ) -> "LocalVectorStore":
+        store = cls(embedding, collection_name, directory)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
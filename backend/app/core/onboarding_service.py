@@ -11,6 +11,8 @@ from sqlalchemy import select, func
 
 from app.database.crud import get_restaurants, create_or_update_user_preferences
 from app.database.models import Restaurant
+from app.core.cuisine_centroids import get_centroid_sums, combine_centroids
+from app.core.recommender import select_embedding
 from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -49,9 +51,10 @@ def generate_cold_start_embedding(
     Gera um vetor sintético para usuários novos baseado no onboarding.
     
     Técnica: Centróide de Categoria
-    - Busca os melhores restaurantes das culinárias escolhidas
-    - Calcula a média vetorial (centróide) desses restaurantes
+    - Usa os centróides pré-computados (cuisine_centroids) das culinárias escolhidas
+    - Combina soma dos vetores / soma das contagens e normaliza
     - Isso coloca o usuário no "centro" do cluster de culinárias que ele gosta
+    - Sem centróides (tabela ainda não populada), calcula a partir dos restaurantes
     
     Args:
         selected_cuisines: Lista de tipos de culinária selecionados pelo usuário
@@ -69,16 +72,8 @@ def generate_cold_start_embedding(
         # Normalizar tipos de culinária
         normalized_cuisines = [normalize_cuisine_type(c) for c in selected_cuisines]
         
-        # Buscar restaurantes que representam as escolhas (arquétipos)
-        # Pegamos os top 20 restaurantes de cada culinária escolhida
-        # com alta avaliação (rating >= 4.0) para garantir qualidade
-        query = select(Restaurant).where(
-            Restaurant.cuisine_type.in_(normalized_cuisines),
-            Restaurant.rating >= 4.0,  # Apenas restaurantes bem avaliados
-            Restaurant.embedding.isnot(None)  # Deve ter embedding
-        )
-        
-        # Filtro opcional de preço
+        # Mapear preferência de preço para o valor do banco
+        mapped_price = None
         if price_preference:
             price_mapping = {
                 'low': 'low',
@@ -92,6 +87,30 @@ def generate_cold_start_embedding(
                 'caro': 'high',
             }
             mapped_price = price_mapping.get(price_preference.lower(), price_preference.lower())
+        
+        # Caminho rápido: centróides pré-computados (poucos vetores em cache)
+        synthetic_vector = combine_centroids(
+            get_centroid_sums(db, normalized_cuisines, mapped_price or "")
+        )
+        if synthetic_vector is not None:
+            logger.info(
+                "Vetor sintético gerado a partir de centróides",
+                extra={"cuisines": normalized_cuisines, "price_preference": mapped_price}
+            )
+            return synthetic_vector
+        
+        # Fallback: centróides ainda não populados (rode scripts/rebuild_cuisine_centroids.py)
+        # Buscar restaurantes que representam as escolhas (arquétipos)
+        # Pegamos os top 20 restaurantes de cada culinária escolhida
+        # com alta avaliação (rating >= 4.0) para garantir qualidade
+        query = select(Restaurant).where(
+            Restaurant.cuisine_type.in_(normalized_cuisines),
+            Restaurant.rating >= 4.0,  # Apenas restaurantes bem avaliados
+            Restaurant.embedding.isnot(None)  # Deve ter embedding
+        )
+        
+        # Filtro opcional de preço
+        if mapped_price:
             query = query.where(Restaurant.price_range == mapped_price)
         
         # Executar query e coletar restaurantes
@@ -113,10 +132,8 @@ def generate_cold_start_embedding(
         archetype_embeddings = []
         for restaurant in archetype_restaurants:
             try:
-                if isinstance(restaurant.embedding, str):
-                    embedding = json.loads(restaurant.embedding)
-                else:
-                    embedding = restaurant.embedding
+                # Apenas vetores da versão ativa do modelo
+                embedding = select_embedding(restaurant)
                 
                 if embedding and isinstance(embedding, list) and len(embedding) > 0:
                     archetype_embeddings.append(embedding)
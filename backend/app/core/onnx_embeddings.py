@@ -0,0 +1,208 @@
+"""
+Backend ONNX Runtime para o serviço de embeddings (CPU, int8 dinâmico).
+
+OnnxSentenceEncoder expõe o mesmo encode() usado do SentenceTransformer
+(tokenização com `tokenizers`, mean pooling e normalização L2), sem importar
+PyTorch: carga mais rápida e RSS bem menor no worker. O diretório do modelo
+é gerado por scripts/export_onnx_embeddings.py (export_onnx_model).
+
+Layout do diretório:
+    model.onnx          grafo (quantizado int8 por padrão)
+    tokenizer.json      tokenizer rápido do HuggingFace
+    onnx_config.json    model_id, max_seq_length, pad_token, pad_token_id, quantized
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_FILENAME = "model.onnx"
+TOKENIZER_FILENAME = "tokenizer.json"
+CONFIG_FILENAME = "onnx_config.json"
+
+
+class OnnxSentenceEncoder:
+    """
+    Encoder de sentenças sobre ONNX Runtime, compatível com SentenceTransformer.encode.
+
+    Args:
+        model_dir: Diretório gerado por export_onnx_model
+        num_threads: Threads intra-op do ONNX Runtime
+    """
+
+    def __init__(self, model_dir: str, num_threads: int = 1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILENAME), "r", encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+
+        self.model_id = self.config.get("model_id")
+        self.max_seq_length = int(self.config.get("max_seq_length", 128))
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILENAME))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(
+            pad_id=int(self.config.get("pad_token_id", 0)),
+            pad_token=self.config.get("pad_token", "[PAD]")
+        )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILENAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+        logger.info(
+            "Modelo ONNX de embeddings carregado",
+            extra={"model_dir": model_dir, "model_id": self.model_id, "quantized": self.config.get("quantized")}
+        )
+
+    def eval(self) -> "OnnxSentenceEncoder":
+        """Compatibilidade com a interface do SentenceTransformer (sem efeito)."""
+        return self
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: feed[name] for name in self.input_names})[0]
+
+        # Mean pooling considerando apenas tokens reais (mesmo do módulo Pooling)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (hidden * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return summed / counts
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Gera embeddings (mesma assinatura básica de SentenceTransformer.encode).
+
+        Returns:
+            np.ndarray: float32 (dim,) para texto único ou (n, dim) para lista
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Ordenar por tamanho reduz padding dentro de cada lote
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = [
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(batches, axis=0)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.clip(norms, 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx_model(
+    model,
+    output_dir: str,
+    quantize: bool = True,
+    opset: int = 14,
+    model_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Exporta um SentenceTransformer (Transformer + mean Pooling) para ONNX.
+
+    Args:
+        model: Instância de SentenceTransformer
+        output_dir: Diretório de saída (layout descrito no módulo)
+        quantize: Aplicar quantização dinâmica int8 nos pesos
+        opset: Versão do opset ONNX
+        model_id: Identificador gravado em onnx_config.json
+
+    Returns:
+        dict: Configuração gravada
+
+    Raises:
+        ValueError: Se o pooling do modelo não for mean pooling
+    """
+    import torch
+
+    transformer, pooling = model[0], model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError("Apenas modelos com mean pooling são suportados pelo backend ONNX")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    input_names = [
+        name for name in ("input_ids", "attention_mask", "token_type_ids")
+        if name in tokenizer.model_input_names
+    ]
+
+    class _HiddenStateModule(torch.nn.Module):
+        """Recebe entradas posicionais (exigência do exportador) e devolve last_hidden_state."""
+
+        def __init__(self):
+            super().__init__()
+            self.model = auto_model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dummy = tokenizer(["exemplo de texto", "outro"], padding=True, return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx" if quantize else MODEL_FILENAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStateModule(),
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, MODEL_FILENAME), weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILENAME))
+
+    config = {
+        "model_id": model_id,
+        "max_seq_length": int(transformer.max_seq_length),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": int(tokenizer.pad_token_id),
+        "quantized": quantize,
+        "opset": opset,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    return config
@@ -0,0 +1,217 @@
+"""
+Importação em lote de pedidos (NDJSON ou CSV) em streaming.
+
+Os registros são lidos linha a linha, validados em blocos com o mesmo modelo
+do endpoint de criação (OrderCreate) e inseridos com um único INSERT
+executemany por bloco. Ao final, as preferências dos usuários afetados são
+recalculadas uma única vez (preference_rebuild) e seus snapshots de feed
+descartados. A memória depende do tamanho do bloco, não do arquivo.
+"""
+
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from app.core.logging_config import get_logger
+from app.core.preference_rebuild import rebuild_user_preferences
+from app.core.recommendation_feed import invalidate_user_feeds
+from app.database.models import Order, Restaurant, User
+from app.models.order import OrderCreate
+
+logger = get_logger(__name__)
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+# Limite de erros detalhados na resposta (o total continua sendo contado)
+MAX_REPORTED_ERRORS = 100
+
+
+class OrderImportError(ValueError):
+    """Arquivo de importação inválido (formato não suportado ou cabeçalho ausente)."""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """Deduz o formato pelo nome do arquivo ou content-type (padrão: ndjson)."""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in ctype:
+        return "csv"
+    return "ndjson"
+
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """Lê registros NDJSON: (número da linha, dict ou exceção de parsing)."""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+def iter_csv_records(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Lê registros CSV com cabeçalho (restaurant_id, order_date, total_amount,
+    items, rating, is_simulation e opcionalmente user_id). items é JSON.
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or "restaurant_id" not in reader.fieldnames:
+        raise OrderImportError("Cabeçalho CSV deve conter restaurant_id e order_date")
+
+    for record in reader:
+        line_number = reader.line_num
+        # Campos vazios = ausentes (deixa a validação aplicar os defaults)
+        record = {k: v for k, v in record.items() if k and v not in (None, "")}
+        try:
+            if "items" in record:
+                record["items"] = json.loads(record["items"])
+            if "is_simulation" in record:
+                record["is_simulation"] = record["is_simulation"].strip().lower() in ("1", "true", "t", "yes", "sim")
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, record
+
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Decodifica um stream binário (UTF-8) no formato informado."""
+    if fmt not in SUPPORTED_FORMATS:
+        raise OrderImportError(f"Formato não suportado: {fmt}")
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        return iter_csv_records(text)
+    return iter_ndjson_records(text)
+
+
+def _validate_chunk(
+    db: Session,
+    chunk: List[Tuple[int, Any]],
+    user_id: Optional[int]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Valida um bloco de registros.
+
+    Returns:
+        Tuple: (linhas prontas para INSERT, erros por linha)
+    """
+    candidates = []
+    errors = []
+
+    for line_number, record in chunk:
+        if isinstance(record, Exception):
+            errors.append({"line": line_number, "error": f"JSON inválido: {record}"})
+            continue
+        if not isinstance(record, dict):
+            errors.append({"line": line_number, "error": "Registro deve ser um objeto"})
+            continue
+        try:
+            order = OrderCreate.model_validate(record)
+            owner_id = user_id if user_id is not None else int(record["user_id"])
+        except ValidationError as e:
+            errors.append({"line": line_number, "error": e.errors()[0].get("msg", str(e))})
+            continue
+        except (KeyError, TypeError, ValueError):
+            errors.append({"line": line_number, "error": "user_id ausente ou inválido"})
+            continue
+        candidates.append((line_number, owner_id, order))
+
+    if not candidates:
+        return [], errors
+
+    # Uma consulta por bloco para checar existência das chaves estrangeiras
+    restaurant_ids = {order.restaurant_id for _, _, order in candidates}
+    known_restaurants = set(db.execute(
+        select(Restaurant.id).where(Restaurant.id.in_(restaurant_ids))
+    ).scalars())
+
+    known_users = {user_id} if user_id is not None else set(db.execute(
+        select(User.id).where(User.id.in_({owner for _, owner, _ in candidates}))
+    ).scalars())
+
+    rows = []
+    for line_number, owner_id, order in candidates:
+        if order.restaurant_id not in known_restaurants:
+            errors.append({"line": line_number, "error": f"Restaurante com ID {order.restaurant_id} não encontrado"})
+            continue
+        if owner_id not in known_users:
+            errors.append({"line": line_number, "error": f"Usuário com ID {owner_id} não encontrado"})
+            continue
+        rows.append({
+            "user_id": owner_id,
+            "restaurant_id": order.restaurant_id,
+            "order_date": order.order_date,
+            "total_amount": order.total_amount,
+            "items": json.dumps(order.items) if order.items else None,
+            "rating": order.rating,
+            "is_simulation": bool(order.is_simulation),
+        })
+
+    errors.sort(key=lambda error: error["line"])
+    return rows, errors
+
+
+def import_orders(
+    db: Session,
+    records: Iterable[Tuple[int, Any]],
+    user_id: Optional[int] = None,
+    chunk_size: int = 2000,
+    update_preferences: bool = True
+) -> Dict[str, Any]:
+    """
+    Importa pedidos em blocos e atualiza uma vez as preferências afetadas.
+
+    Args:
+        db: Sessão do banco de dados
+        records: Registros (número da linha, dict) de iter_records
+        user_id: Força o dono de todos os pedidos (endpoint autenticado);
+            None usa o user_id de cada registro (CLI)
+        chunk_size: Registros por bloco de validação/INSERT
+        update_preferences: Recalcular preferências dos usuários afetados ao final
+
+    Returns:
+        dict: received, imported, rejected, errors, affected_users e seconds
+    """
+    start_time = time.perf_counter()
+    stats: Dict[str, Any] = {"received": 0, "imported": 0, "rejected": 0, "errors": []}
+    affected_users: Set[int] = set()
+
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+
+        rows, errors = _validate_chunk(db, chunk, user_id)
+        if rows:
+            db.execute(insert(Order), rows)
+            db.commit()
+
+        stats["received"] += len(chunk)
+        stats["imported"] += len(rows)
+        stats["rejected"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(stats["errors"])
+        if room > 0:
+            stats["errors"].extend(errors[:room])
+        affected_users.update(row["user_id"] for row in rows)
+
+    if affected_users and update_preferences:
+        rebuild_user_preferences(db, user_ids=affected_users)
+        for affected_user in affected_users:
+            invalidate_user_feeds(affected_user)
+
+    stats["affected_users"] = len(affected_users)
+    stats["seconds"] = round(time.perf_counter() - start_time, 3)
+
+    logger.info(
+        "Importação de pedidos concluída",
+        extra={k: v for k, v in stats.items() if k != "errors"}
+    )
+    return stats
@@ -0,0 +1,288 @@
+"""
+Recalculo em lote dos vetores de preferência dos usuários (user_preferences).
+
+Equivalente offline de generate_recommendations(refresh=True) para toda a base:
+os pedidos são lidos em blocos de usuários (keyset por user_id), os pesos são
+calculados de forma vetorizada e a média ponderada por usuário sai de uma
+redução por segmentos (np.add.reduceat). O resultado é gravado com upsert em
+lote. O trabalho pode ser dividido em shards (user_id % num_shards) para rodar
+em vários processos.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.recommender import (
+    calculate_weights,
+    build_restaurant_matrix,
+    aggregate_user_embeddings,
+    EMBEDDING_COLUMNS,
+)
+from app.core.logging_config import get_logger
+from app.database.crud import bulk_upsert_user_preferences
+from app.database.models import Order, Restaurant
+
+logger = get_logger(__name__)
+
+# Mesmo limite de pedidos considerado por generate_recommendations
+MAX_ORDERS_PER_USER = 1000
+# Mesmo tamanho de extract_user_patterns (top 3)
+FAVORITE_CUISINES_LIMIT = 3
+
+
+class RestaurantCatalog:
+    """
+    Catálogo em memória para o recalculo: matriz de embeddings e culinária por ID.
+
+    IDs ordenados permitem mapear restaurant_id -> linha com np.searchsorted.
+    """
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, cuisine_ids: np.ndarray,
+                 cuisine_codes: np.ndarray, cuisine_names: List[str]):
+        self.ids = ids
+        self.matrix = matrix
+        self.cuisine_ids = cuisine_ids
+        self.cuisine_codes = cuisine_codes
+        self.cuisine_names = cuisine_names
+
+    @classmethod
+    def load(cls, db: Session) -> "RestaurantCatalog":
+        """Carrega id, embedding (versão ativa) e culinária de todos os restaurantes."""
+        rows = db.execute(
+            select(Restaurant.id, Restaurant.cuisine_type, *EMBEDDING_COLUMNS)
+            .order_by(Restaurant.id)
+        ).all()
+
+        ids, matrix = build_restaurant_matrix(rows)
+        order = np.argsort(ids)
+
+        cuisine_names = sorted({r.cuisine_type for r in rows if r.cuisine_type})
+        code_of = {name: i for i, name in enumerate(cuisine_names)}
+        cuisine_ids = np.asarray([r.id for r in rows if r.cuisine_type], dtype=np.int64)
+        cuisine_codes = np.asarray(
+            [code_of[r.cuisine_type] for r in rows if r.cuisine_type], dtype=np.int32
+        )
+
+        return cls(ids[order].astype(np.int64), matrix[order], cuisine_ids, cuisine_codes, cuisine_names)
+
+    @staticmethod
+    def _lookup(sorted_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+        if sorted_ids.size == 0:
+            return np.full(values.shape, -1, dtype=np.int64)
+        positions = np.clip(np.searchsorted(sorted_ids, values), 0, sorted_ids.size - 1)
+        return np.where(sorted_ids[positions] == values, positions, -1)
+
+    def embedding_rows(self, restaurant_ids: np.ndarray) -> np.ndarray:
+        """Linha de cada restaurante na matriz (-1 = sem embedding)."""
+        return self._lookup(self.ids, restaurant_ids)
+
+    def cuisine_of(self, restaurant_ids: np.ndarray) -> np.ndarray:
+        """Código da culinária de cada restaurante (-1 = desconhecida)."""
+        positions = self._lookup(self.cuisine_ids, restaurant_ids)
+        return np.where(positions >= 0, self.cuisine_codes[np.maximum(positions, 0)], -1)
+
+
+def iter_order_chunks(
+    db: Session,
+    users_per_chunk: int = 2000,
+    shard: int = 0,
+    num_shards: int = 1,
+    user_ids: Optional[Iterable[int]] = None
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Lê os pedidos em blocos fechados por usuário, ordenados por (user_id, order_date desc).
+
+    Cada bloco contém todos os pedidos de até `users_per_chunk` usuários, de modo
+    que nenhum usuário fica dividido entre blocos.
+
+    Args:
+        db: Sessão do banco de dados
+        users_per_chunk: Usuários por bloco (limita a memória)
+        shard: Índice do shard deste processo
+        num_shards: Total de shards (user_id % num_shards == shard)
+        user_ids: Restringe a estes usuários (recalculo incremental)
+    """
+    restrict = None
+    if user_ids is not None:
+        restrict = sorted(u for u in set(user_ids) if u % num_shards == shard)
+    offset = 0
+    last_user_id = None
+
+    while True:
+        if restrict is not None:
+            batch = restrict[offset:offset + users_per_chunk]
+            offset += users_per_chunk
+        else:
+            stmt = select(Order.user_id).distinct().order_by(Order.user_id).limit(users_per_chunk)
+            if last_user_id is not None:
+                stmt = stmt.where(Order.user_id > last_user_id)
+            if num_shards > 1:
+                stmt = stmt.where(Order.user_id % num_shards == shard)
+            batch = list(db.execute(stmt).scalars())
+        if not batch:
+            return
+
+        rows = db.execute(
+            select(Order.user_id, Order.restaurant_id, Order.order_date, Order.rating)
+            .where(Order.user_id.in_(batch))
+            .order_by(Order.user_id, Order.order_date.desc())
+        ).all()
+        last_user_id = batch[-1]
+        if not rows:
+            continue
+
+        user_col, restaurant_col, date_col, rating_col = zip(*rows)
+        dates = [d.astimezone().replace(tzinfo=None) if d.tzinfo else d for d in date_col]
+        yield {
+            "user_id": np.asarray(user_col, dtype=np.int64),
+            "restaurant_id": np.asarray(restaurant_col, dtype=np.int64),
+            "order_date": np.asarray(dates, dtype="datetime64[s]"),
+            "rating": np.asarray([np.nan if r is None else r for r in rating_col], dtype=np.float64),
+        }
+
+
+def _segment_starts(user_ids: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+
+
+def _cap_orders_per_user(chunk: Dict[str, np.ndarray], limit: int) -> Dict[str, np.ndarray]:
+    """Mantém apenas os `limit` pedidos mais recentes de cada usuário."""
+    user_ids = chunk["user_id"]
+    starts = _segment_starts(user_ids)
+    lengths = np.diff(np.r_[starts, user_ids.size])
+    if lengths.max(initial=0) <= limit:
+        return chunk
+    rank = np.arange(user_ids.size) - np.repeat(starts, lengths)
+    keep = rank < limit
+    return {key: values[keep] for key, values in chunk.items()}
+
+
+def favorite_cuisines_batch(
+    user_ids: np.ndarray,
+    cuisine_codes: np.ndarray,
+    cuisine_names: List[str],
+    limit: int = FAVORITE_CUISINES_LIMIT
+) -> Dict[int, List[str]]:
+    """
+    Top culinárias por usuário (mesma ordem de Counter.most_common).
+
+    Os pedidos devem estar ordenados por (usuário, data desc): empates na
+    contagem são desempatados pela primeira ocorrência, como em extract_user_patterns.
+    """
+    valid = cuisine_codes >= 0
+    if not valid.any():
+        return {}
+
+    users = user_ids[valid]
+    codes = cuisine_codes[valid].astype(np.int64)
+    positions = np.flatnonzero(valid)
+
+    n_codes = len(cuisine_names)
+    pair_keys = users * n_codes + codes
+    unique_pairs, first_index, counts = np.unique(pair_keys, return_index=True, return_counts=True)
+    pair_users = unique_pairs // n_codes
+    pair_codes = unique_pairs % n_codes
+    first_position = positions[first_index]
+
+    # Ordenar por usuário, contagem desc e primeira ocorrência
+    order = np.lexsort((first_position, -counts, pair_users))
+    pair_users, pair_codes = pair_users[order], pair_codes[order]
+
+    starts = _segment_starts(pair_users)
+    lengths = np.diff(np.r_[starts, pair_users.size])
+    rank = np.arange(pair_users.size) - np.repeat(starts, lengths)
+    top = rank < limit
+
+    favorites: Dict[int, List[str]] = {}
+    for user_id, code in zip(pair_users[top].tolist(), pair_codes[top].tolist()):
+        favorites.setdefault(user_id, []).append(cuisine_names[code])
+    return favorites
+
+
+def rebuild_chunk(
+    chunk: Dict[str, np.ndarray],
+    catalog: RestaurantCatalog,
+    now: datetime
+) -> List[Dict[str, Any]]:
+    """
+    Calcula embedding e culinárias favoritas de todos os usuários do bloco.
+
+    Returns:
+        Linhas prontas para bulk_upsert_user_preferences
+    """
+    chunk = _cap_orders_per_user(chunk, MAX_ORDERS_PER_USER)
+
+    weights = calculate_weights(chunk["order_date"], chunk["rating"], now=now)
+    rows = catalog.embedding_rows(chunk["restaurant_id"])
+    user_ids, embeddings = aggregate_user_embeddings(chunk["user_id"], rows, weights, catalog.matrix)
+
+    favorites = favorite_cuisines_batch(
+        chunk["user_id"], catalog.cuisine_of(chunk["restaurant_id"]), catalog.cuisine_names
+    )
+
+    return [
+        {
+            "user_id": int(user_id),
+            "preference_embedding": json.dumps(embedding.astype(np.float64).tolist()),
+            "favorite_cuisines": json.dumps(favorites[int(user_id)]) if int(user_id) in favorites else None,
+        }
+        for user_id, embedding in zip(user_ids, embeddings)
+    ]
+
+
+def rebuild_user_preferences(
+    db: Session,
+    users_per_chunk: int = 2000,
+    shard: int = 0,
+    num_shards: int = 1,
+    user_ids: Optional[Iterable[int]] = None,
+    now: Optional[datetime] = None,
+    catalog: Optional[RestaurantCatalog] = None
+) -> Dict[str, Any]:
+    """
+    Recalcula e grava os vetores de preferência a partir do histórico de pedidos.
+
+    Usuários sem pedidos com embedding não são tocados (preserva vetores
+    sintéticos de onboarding).
+
+    Args:
+        db: Sessão do banco de dados
+        users_per_chunk: Usuários por bloco de leitura/escrita
+        shard: Índice do shard deste processo
+        num_shards: Total de shards
+        user_ids: Recalcular apenas estes usuários (None = todos)
+        now: Data de referência dos pesos (padrão: agora)
+        catalog: Catálogo já carregado (evita recarregar em chamadas repetidas)
+
+    Returns:
+        dict: users, orders, chunks e seconds
+    """
+    start_time = time.perf_counter()
+    now = now or datetime.now()
+    catalog = catalog or RestaurantCatalog.load(db)
+
+    stats = {"users": 0, "orders": 0, "chunks": 0}
+    for chunk in iter_order_chunks(db, users_per_chunk, shard, num_shards, user_ids):
+        rows = rebuild_chunk(chunk, catalog, now)
+        bulk_upsert_user_preferences(db, rows)
+
+        stats["users"] += len(rows)
+        stats["orders"] += int(chunk["user_id"].size)
+        stats["chunks"] += 1
+        logger.debug(
+            "Bloco de preferências recalculado",
+            extra={"shard": shard, "chunk": stats["chunks"], "users": len(rows)}
+        )
+
+    stats["seconds"] = round(time.perf_counter() - start_time, 3)
+    logger.info(
+        "Recalculo de preferências concluído",
+        extra={"shard": shard, "num_shards": num_shards, **stats}
+    )
+    return stats
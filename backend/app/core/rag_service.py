@@ -1,52 +1,394 @@
 """
 Serviço RAG (Retrieval-Augmented Generation) para Chef Virtual
 Utiliza PGVector para armazenamento persistente de embeddings
+
+O vector store PGVector é único por processo e usa o engine (e o pool) de
+app.database.base; a validação do banco é feita uma vez (no startup) e
+cacheada. Cada requisição cria apenas um RAGService leve com a sua sessão.
+
+As buscas usam o índice HNSW da coleção (app.core.vector_index); o
+hnsw.ef_search é aplicado na transação de cada consulta (TunedPGVector).
+Em coleções quantizadas (halfvec/binary) o índice do primeiro estágio
+devolve RAG_RERANK_CANDIDATES candidatos, reordenados no SQL pelo cosseno
+com os vetores em precisão total.
+
+A busca híbrida (RAG_HYBRID_MODE="rrf") é uma única instrução SQL: ranking
+léxico (tsvector/trigramas) e vetorial (HNSW) em CTEs, fundidos por
+reciprocal rank fusion com os pesos como parâmetros.
+
+Fora do PostgreSQL (SQLite em desenvolvimento, testes e instalações
+pequenas) o vector store é o LocalVectorStore (app.core.local_vector_store),
+com a mesma interface; a busca híbrida usa o modo sequencial.
 """
 
-from typing import List, Optional, Set
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine, text
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from sqlalchemy import Float, Integer, asc, bindparam, cast, column, create_engine, func, literal, select, table, text, union_all
+from sqlalchemy.dialects.postgresql import JSON, UUID
+from pgvector.sqlalchemy import Vector
 from langchain_community.vectorstores import PGVector
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 import logging
-import threading
 
+from app.config import settings
 from app.database.models import Restaurant
 from app.database import crud
+from app.core.embeddings import get_langchain_embeddings
+from app.core.local_vector_store import LocalVectorStore, default_directory
 
 # LLM será injetado via LangChain Groq
 
 logger = logging.getLogger(__name__)
 
-# OTIMIZAÇÃO MEMÓRIA: Singleton para modelo de embeddings
-# Compartilha a mesma instância entre todas as requisições, evitando carregar múltiplas vezes
-_shared_embeddings = None
-_embeddings_lock = threading.Lock()
+DEFAULT_COLLECTION_NAME = "tastematch_knowledge"
+
+# Estado compartilhado do processo (vector store por coleção e validações bem-sucedidas)
+_vector_stores: Dict[str, VectorStore] = {}
+_validations: Dict[str, dict] = {}
+_collection_ids: Dict[str, Any] = {}
+_state_lock = threading.Lock()
+
+# Threads das buscas exata e semântica da busca híbrida sequencial (criado sob demanda)
+_leg_executor: Optional[ThreadPoolExecutor] = None
+
+# Parâmetros da busca em andamento (definidos por RAGService a cada consulta)
+_search_params: ContextVar[Optional[Dict[str, Any]]] = ContextVar("hnsw_search_params", default=None)
+
+
+@contextmanager
+def hnsw_search(
+    ef_search: Optional[int] = None,
+    exact: bool = False,
+    quantization: Optional[str] = None,
+    candidates: Optional[int] = None
+) -> Iterator[None]:
+    """
+    Parâmetros das buscas do PGVector feitas dentro do bloco.
+
+    Args:
+        ef_search: hnsw.ef_search (None = RAG_HNSW_EF_SEARCH)
+        exact: Desligar o índice (busca exata, referência do benchmark)
+        quantization: Modo do primeiro estágio (None = o da coleção)
+        candidates: Candidatos reordenados (None = RAG_RERANK_CANDIDATES)
+    """
+    token = _search_params.set({
+        "ef_search": ef_search, "exact": exact, "quantization": quantization, "candidates": candidates
+    })
+    try:
+        yield
+    finally:
+        _search_params.reset(token)
+
+
+class TunedPGVector(PGVector):
+    """
+    PGVector que aplica hnsw.ef_search na transação de cada consulta.
+
+    set_config(..., true) vale só até o fim da transação: a conexão volta ao
+    pool sem herdar o ajuste. Sem quantização a consulta é a mesma do
+    PGVector; com quantização o filtro passa a ser o top de candidatos do
+    índice quantizado (subconsulta) e a ordem final é a do cosseno exato.
+    """
+
+    def __init__(self, *args, quantization: str = "none", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.quantization = quantization
+
+    def _create_filter_clause_deprecated(self, key: str, value: Dict[str, Any]):
+        # gte/lte numéricos (ex.: {"rating": {"gte": 4.5}}); o PGVector compara gt/lt como texto
+        bounds = {operator.lower(): operand for operator, operand in value.items()}
+        if "gte" in bounds or "lte" in bounds:
+            number = cast(self.EmbeddingStore.cmetadata[key].astext, Float)
+            if "gte" in bounds:
+                return number >= float(bounds["gte"])
+            return number <= float(bounds["lte"])
+        return super()._create_filter_clause_deprecated(key, value)
+
+    def _query_collection(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, str]] = None,
+    ) -> List[Any]:
+        params = _search_params.get() or {}
+        quantization = "none" if params.get("exact") else (params.get("quantization") or self.quantization)
+        candidates = k
+        if quantization != "none":
+            candidates = max(params.get("candidates") or settings.RAG_RERANK_CANDIDATES, k)
+        ef_search = max(params.get("ef_search") or settings.RAG_HNSW_EF_SEARCH, candidates)
+
+        with Session(self._bind) as session:
+            session.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(ef_search)})
+            if params.get("exact"):
+                session.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+
+            filter_by = [self.EmbeddingStore.collection_id == collection.uuid]
+            if filter:
+                if self.use_jsonb:
+                    filter_clauses = self._create_filter_clause(filter)
+                    if filter_clauses is not None:
+                        filter_by.append(filter_clauses)
+                else:
+                    filter_by.extend(self._create_filter_clause_json_deprecated(filter))
+
+            if quantization != "none":
+                from app.core.vector_index import quantized_distance
+
+                # Primeiro estágio no índice quantizado; reordenação em precisão total abaixo
+                first_pass = (
+                    select(self.EmbeddingStore.uuid)
+                    .where(*filter_by)
+                    .order_by(quantized_distance(quantization, embedding))
+                    .limit(candidates)
+                )
+                filter_by = [self.EmbeddingStore.uuid.in_(first_pass)]
+
+            return (
+                session.query(
+                    self.EmbeddingStore,
+                    self.distance_strategy(embedding).label("distance"),
+                )
+                .filter(*filter_by)
+                .order_by(asc("distance"))
+                .join(
+                    self.CollectionStore,
+                    self.EmbeddingStore.collection_id == self.CollectionStore.uuid,
+                )
+                .limit(k)
+                .all()
+            )
+
 
 def get_shared_embeddings():
     """
-    Retorna instância compartilhada do modelo de embeddings (singleton).
-    Reduz uso de memória evitando carregar o modelo múltiplas vezes.
+    Retorna o adaptador LangChain do serviço de embeddings do processo.
+    
+    OTIMIZAÇÃO MEMÓRIA: RAG e recomendações usam o mesmo modelo
+    (settings.EMBEDDING_MODEL), carregado uma única vez em app.core.embeddings.
     
     Returns:
-        HuggingFaceEmbeddings: Instância compartilhada do modelo
+        SharedEmbeddings: Adaptador compatível com LangChain Embeddings
     """
-    global _shared_embeddings
-    
-    if _shared_embeddings is None:
-        with _embeddings_lock:
-            # Double-check locking pattern
-            if _shared_embeddings is None:
-                model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-                _shared_embeddings = HuggingFaceEmbeddings(
-                    model_name=model_name,
-                    model_kwargs={'device': 'cpu'},
-                    encode_kwargs={'normalize_embeddings': True}
-                )
-                logger.info("Modelo de embeddings carregado (singleton)")
+    return get_langchain_embeddings()
+
+
+def uses_pgvector(connection_string: str) -> bool:
+    """True para PostgreSQL (PGVector); outros bancos usam o LocalVectorStore."""
+    lowered = connection_string.lower()
+    return "postgresql" in lowered or "postgres://" in lowered
+
+
+def get_validated_requirements(connection_string: str, db: Session) -> dict:
+    """
+    validate_database_requirements com cache por processo.
     
-    return _shared_embeddings
+    Apenas validações bem-sucedidas são cacheadas: se o banco ainda não
+    estiver pronto, a próxima chamada valida de novo.
+    """
+    # postgres:// e postgresql:// apontam para o mesmo banco
+    key = connection_string.replace("postgres://", "postgresql://", 1)
+    validation = _validations.get(key)
+    if validation is None:
+        validation = validate_database_requirements(connection_string, db)
+        if validation["valid"]:
+            with _state_lock:
+                _validations[key] = validation
+    return validation
+
+
+def get_shared_vector_store(
+    collection_name: str = DEFAULT_COLLECTION_NAME,
+    connection_string: Optional[str] = None
+) -> VectorStore:
+    """
+    Vector store do processo (criado na primeira chamada).
+    
+    PostgreSQL: PGVector sobre o engine de app.database.base (mesmo pool das
+    sessões) em vez de um engine próprio, sem tentar criar a extensão
+    (verificada na validação). Outros bancos: LocalVectorStore persistido ao
+    lado do arquivo SQLite.
+    
+    Args:
+        collection_name: Nome da coleção
+        connection_string: Banco que define o backend (padrão: o de app.database.base)
+    """
+    vector_store = _vector_stores.get(collection_name)
+    if vector_store is None:
+        with _state_lock:
+            vector_store = _vector_stores.get(collection_name)
+            if vector_store is None:
+                from app.database.base import engine, database_url
+
+                connection_string = connection_string or database_url
+                if not uses_pgvector(connection_string):
+                    directory = default_directory(connection_string)
+                    logger.info(f"Inicializando vector store local: {collection_name} ({directory or 'memória'})")
+                    vector_store = LocalVectorStore(get_shared_embeddings(), collection_name, directory)
+                    _vector_stores[collection_name] = vector_store
+                    return vector_store
+
+                logger.info(f"Inicializando PGVector com collection: {collection_name}")
+                from app.core.vector_index import collection_quantization
+
+                vector_store = TunedPGVector(
+                    quantization=collection_quantization(collection_name),
+                    connection_string=database_url,
+                    embedding_function=get_shared_embeddings(),
+                    collection_name=collection_name,
+                    pre_delete_collection=False,  # Não deletar coleção existente
+                    connection=engine,  # Sessões do PGVector usam o pool da aplicação
+                    create_extension=False
+                )
+                _vector_stores[collection_name] = vector_store
+                logger.info("PGVector inicializado com sucesso")
+    return vector_store
+
+
+def get_leg_executor() -> ThreadPoolExecutor:
+    """Pool compartilhado que executa as duas buscas da busca híbrida em paralelo."""
+    global _leg_executor
+    if _leg_executor is None:
+        with _state_lock:
+            if _leg_executor is None:
+                _leg_executor = ThreadPoolExecutor(
+                    max_workers=settings.RAG_HYBRID_LEG_WORKERS,
+                    thread_name_prefix="rag-hybrid"
+                )
+    return _leg_executor
+
+
+def reset_rag_state() -> None:
+    """Descarta vector stores e validações cacheadas (testes ou troca de banco)."""
+    with _state_lock:
+        _vector_stores.clear()
+        _validations.clear()
+        _collection_ids.clear()
+
+
+def restaurant_constraints(filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Restrições de um filtro de metadados sobre as colunas de restaurants.
+
+    Converte {"cuisine_type": {"in": [...]}, "price_range": ..., "location": ...,
+    "rating": {"gte": x}} nos argumentos de crud.restaurant_filters, para a
+    busca exata aplicar as mesmas restrições da busca vetorial.
+    """
+    constraints: Dict[str, Any] = {}
+    for key in ("cuisine_type", "price_range", "location"):
+        condition = (filter or {}).get(key)
+        if condition is not None:
+            constraints[key] = list(condition["in"]) if isinstance(condition, dict) else [condition]
+    rating = (filter or {}).get("rating")
+    if isinstance(rating, dict) and "gte" in rating:
+        constraints["min_rating"] = float(rating["gte"])
+    return constraints
+
+
+def build_rrf_statement(
+    db: Session,
+    query: str,
+    query_embedding: List[float],
+    collection_id: Any,
+    k: int,
+    lexical_weight: float = 0.5,
+    vector_weight: float = 0.5,
+    candidates: Optional[int] = None,
+    rrf_k: Optional[int] = None,
+    filter: Optional[Dict[str, Any]] = None
+):
+    """
+    Instrução única da busca híbrida: restaurantes já fundidos por RRF.
+
+    score = lexical_weight / (rrf_k + posição léxica) + vector_weight / (rrf_k + posição vetorial);
+    restaurante ausente de um dos rankings só soma o termo do outro.
+
+    Args:
+        db: Sessão (define os recursos de busca textual disponíveis)
+        query: Texto da consulta (ranking léxico)
+        query_embedding: Vetor da consulta (ranking vetorial)
+        collection_id: uuid da coleção (literal no SQL: casa com o índice HNSW parcial)
+        k: Restaurantes retornados
+        lexical_weight: Peso do ranking léxico
+        vector_weight: Peso do ranking vetorial
+        candidates: Tamanho de cada ranking (padrão: max(k * 2, RAG_RERANK_CANDIDATES))
+        rrf_k: Constante do RRF (padrão: RAG_RRF_K)
+        filter: Restrições de restaurante (restaurant_constraints), aplicadas
+                dentro dos dois rankings (colunas e cmetadata)
+
+    Returns:
+        Select com colunas Restaurant e score
+    """
+    candidates = candidates or max(k * 2, settings.RAG_RERANK_CANDIDATES)
+    rrf_k = rrf_k or settings.RAG_RRF_K
+
+    constraints = restaurant_constraints(filter)
+    condition, lexical_rank = crud.restaurant_search_clauses(db, query, match_any=True)
+    lexical = (
+        select(
+            Restaurant.id.label("restaurant_id"),
+            func.row_number().over(order_by=lexical_rank.desc()).label("position")
+        )
+        .where(condition, *crud.restaurant_filters(**constraints))
+        .order_by(lexical_rank.desc())
+        .limit(candidates)
+        .cte("lexical")
+    )
+
+    embeddings = table(
+        "langchain_pg_embedding",
+        column("embedding", Vector(len(query_embedding))),
+        column("cmetadata", JSON),
+        column("collection_id", UUID(as_uuid=True)),
+    )
+    distance = embeddings.c.embedding.cosine_distance(query_embedding)
+    metadata_filters = [
+        embeddings.c.cmetadata[key].astext.in_(constraints[key])
+        for key in ("cuisine_type", "price_range", "location") if key in constraints
+    ]
+    if "min_rating" in constraints:
+        metadata_filters.append(cast(embeddings.c.cmetadata["rating"].astext, Float) >= constraints["min_rating"])
+    vector = (
+        select(
+            cast(embeddings.c.cmetadata["restaurant_id"].astext, Integer).label("restaurant_id"),
+            func.row_number().over(order_by=distance).label("position")
+        )
+        .where(
+            embeddings.c.collection_id == literal(collection_id, UUID(as_uuid=True), literal_execute=True),
+            embeddings.c.cmetadata["type"].astext == "restaurant",
+            *metadata_filters
+        )
+        .order_by(distance)
+        .limit(candidates)
+        .cte("semantic")
+    )
+
+    constant = bindparam("rrf_k", rrf_k, type_=Float)
+    contributions = union_all(
+        select(lexical.c.restaurant_id, (bindparam("lexical_weight", lexical_weight, type_=Float) / (constant + lexical.c.position)).label("score")),
+        select(vector.c.restaurant_id, (bindparam("vector_weight", vector_weight, type_=Float) / (constant + vector.c.position)).label("score")),
+    ).subquery("contributions")
+    fused = (
+        select(contributions.c.restaurant_id, func.sum(contributions.c.score).label("score"))
+        .group_by(contributions.c.restaurant_id)
+        .cte("fused")
+    )
+
+    return (
+        select(Restaurant, fused.c.score)
+        .join(fused, Restaurant.id == fused.c.restaurant_id)
+        .order_by(fused.c.score.desc(), Restaurant.rating.desc(), Restaurant.id)
+        .limit(k)
+    )
 
 
 def validate_database_requirements(connection_string: str, db: Session) -> dict:
@@ -54,16 +396,17 @@ def validate_database_requirements(connection_string: str, db: Session) -> dict:
     Valida requisitos do banco de dados para RAG Service.
     
     Verifica:
-    - Se é PostgreSQL (não SQLite)
+    - Se é PostgreSQL (outros bancos usam o LocalVectorStore, sem requisitos)
     - Se extensão 'vector' está instalada
     - Se conexão está funcionando
     
     Args:
-        connection_string: String de conexão PostgreSQL
+        connection_string: String de conexão do banco
         db: Sessão do banco de dados
         
     Returns:
-        dict: Resultado da validação com status e mensagens
+        dict: Resultado da validação com status, mensagens e backend
+        ("pgvector" ou "local")
         
     Raises:
         ValueError: Se algum requisito não for atendido
@@ -71,13 +414,10 @@ def validate_database_requirements(connection_string: str, db: Session) -> dict:
     errors = []
     warnings = []
     
-    # 1. Verificar se é PostgreSQL
-    if "sqlite" in connection_string.lower():
-        errors.append(
-            "PGVector requer PostgreSQL. SQLite não é suportado. "
-            "Configure DATABASE_URL para usar PostgreSQL."
-        )
-        return {"valid": False, "errors": errors, "warnings": warnings}
+    # 1. Fora do PostgreSQL: vector store local (NumPy), nada a validar no banco
+    if not uses_pgvector(connection_string):
+        logger.info("Banco sem PGVector: Chef Virtual usa o vector store local")
+        return {"valid": True, "errors": errors, "warnings": warnings, "is_supabase": False, "backend": "local"}
     
     # 2. Verificar conexão ao banco
     try:
@@ -130,12 +470,13 @@ def validate_database_requirements(connection_string: str, db: Session) -> dict:
         "valid": len(errors) == 0,
         "errors": errors,
         "warnings": warnings,
-        "is_supabase": is_supabase
+        "is_supabase": is_supabase,
+        "backend": "pgvector"
     }
 
 
 class RAGService:
-    """Serviço RAG usando PGVector para persistência garantida"""
+    """Serviço RAG usando PGVector para persistência garantida (LocalVectorStore fora do PostgreSQL)"""
     
     def __init__(self, db: Session, connection_string: str, validate: bool = True, initialize_vector_store: bool = False):
         """
@@ -143,7 +484,7 @@ class RAGService:
         
         Args:
             db: Sessão do banco de dados
-            connection_string: String de conexão PostgreSQL para PGVector
+            connection_string: String de conexão do banco (define PGVector ou vector store local)
             validate: Se True, valida requisitos do banco antes de inicializar
             initialize_vector_store: Se True, inicializa vector_store imediatamente (eager).
                                     Se False, inicializa apenas quando necessário (lazy, padrão).
@@ -152,10 +493,13 @@ class RAGService:
         self.connection_string = connection_string
         self.embeddings = None
         self.vector_store = None
+        # Ajustes de busca desta instância (requisição); padrão das configurações
+        self.ef_search = settings.RAG_HNSW_EF_SEARCH
+        self.k = settings.RAG_SEARCH_K
         
-        # Validar requisitos do banco se solicitado
+        # Validar requisitos do banco se solicitado (cacheado após o primeiro sucesso)
         if validate:
-            validation = validate_database_requirements(connection_string, db)
+            validation = get_validated_requirements(connection_string, db)
             
             if not validation["valid"]:
                 error_msg = "Requisitos do banco de dados não atendidos:\n"
@@ -188,23 +532,16 @@ class RAGService:
         # Usar instância compartilhada (singleton) do modelo de embeddings
         self.embeddings = get_shared_embeddings()
     
-    def initialize_vector_store(self, collection_name: str = "tastematch_knowledge"):
+    def initialize_vector_store(self, collection_name: str = DEFAULT_COLLECTION_NAME):
         """
-        Inicializa ou carrega o vector store PGVector
+        Obtém o vector store compartilhado do processo (PGVector ou local)
         
         Args:
-            collection_name: Nome da coleção no PGVector
+            collection_name: Nome da coleção no vector store
         """
         if self.vector_store is None:
             try:
-                logger.info(f"Inicializando PGVector com collection: {collection_name}")
-                self.vector_store = PGVector(
-                    connection_string=self.connection_string,
-                    embedding_function=self.embeddings,
-                    collection_name=collection_name,
-                    pre_delete_collection=False  # Não deletar coleção existente
-                )
-                logger.info("PGVector inicializado com sucesso")
+                self.vector_store = get_shared_vector_store(collection_name, self.connection_string)
             except Exception as e:
                 error_msg = str(e)
                 logger.error(f"Erro ao inicializar PGVector: {error_msg}", exc_info=True)
@@ -247,7 +584,7 @@ class RAGService:
     def similarity_search(
         self, 
         query: str, 
-        k: int = 4,
+        k: Optional[int] = None,
         filter: Optional[dict] = None
     ) -> List[Document]:
         """
@@ -255,7 +592,7 @@ class RAGService:
         
         Args:
             query: Texto da consulta
-            k: Número de resultados
+            k: Número de resultados (padrão: self.k)
             filter: Filtros opcionais (ex: {"metadata": {"type": "restaurant"}})
         
         Returns:
@@ -264,16 +601,17 @@ class RAGService:
         if self.vector_store is None:
             self.initialize_vector_store()
         
-        if filter:
-            return self.vector_store.similarity_search(
-                query, k=k, filter=filter
-            )
-        return self.vector_store.similarity_search(query, k=k)
+        with hnsw_search(self.ef_search):
+            if filter:
+                return self.vector_store.similarity_search(
+                    query, k=k or self.k, filter=filter
+                )
+            return self.vector_store.similarity_search(query, k=k or self.k)
     
     def similarity_search_with_score(
         self,
         query: str,
-        k: int = 4,
+        k: Optional[int] = None,
         filter: Optional[dict] = None
     ) -> List[tuple]:
         """
@@ -285,18 +623,20 @@ class RAGService:
         if self.vector_store is None:
             self.initialize_vector_store()
         
-        if filter:
-            return self.vector_store.similarity_search_with_score(
-                query, k=k, filter=filter
-            )
-        return self.vector_store.similarity_search_with_score(query, k=k)
+        with hnsw_search(self.ef_search):
+            if filter:
+                return self.vector_store.similarity_search_with_score(
+                    query, k=k or self.k, filter=filter
+                )
+            return self.vector_store.similarity_search_with_score(query, k=k or self.k)
     
-    def get_retriever(self, k: int = 4, search_type: str = "similarity"):
+    def get_retriever(self, k: Optional[int] = None, search_type: str = "similarity"):
         """
         Retorna um retriever LangChain configurado
         
         Args:
-            k: Número de documentos a recuperar
+            k: Número de documentos a recuperar (padrão: self.k; ef_search
+               padrão de RAG_HNSW_EF_SEARCH, pois o retriever roda fora desta instância)
             search_type: Tipo de busca ("similarity" ou "mmr")
         
         Returns:
@@ -306,7 +646,7 @@ class RAGService:
             self.initialize_vector_store()
         
         return self.vector_store.as_retriever(
-            search_kwargs={"k": k},
+            search_kwargs={"k": k or self.k},
             search_type=search_type
         )
     
@@ -328,21 +668,9 @@ class RAGService:
             # Se falhar, assumir que não há documentos
             return False
     
-    def _exact_search_restaurants(
-        self,
-        query: str,
-        k: int = 4
-    ) -> List[Document]:
-        """
-        Busca exata de restaurantes usando SQL LIKE/ILIKE
-        
-        Args:
-            query: Texto da consulta
-            k: Número máximo de resultados
-        
-        Returns:
-            Lista de documentos de restaurantes encontrados por busca exata
-        """
+    @staticmethod
+    def _query_terms(query: str) -> List[str]:
+        """Possíveis nomes/termos de restaurante da pergunta (sem stopwords, 3+ caracteres)."""
         # Palavras comuns a ignorar (stopwords)
         stopwords = {
             'o', 'a', 'os', 'as', 'um', 'uma', 'de', 'do', 'da', 'dos', 'das',
@@ -354,59 +682,45 @@ class RAGService:
             'recomende', 'recomendar', 'sugira', 'sugerir', 'quero', 'queria'
         }
         
-        # Extrair possíveis nomes de restaurantes da query
-        query_lower = query.lower()
         # Remover pontuação e dividir em palavras
         import re
-        words = [w.strip() for w in re.split(r'[\s,\.!?;:]+', query_lower) 
-                 if w.strip() and w.strip() not in stopwords and len(w.strip()) >= 3]
+        return [w.strip() for w in re.split(r'[\s,\.!?;:]+', query.lower())
+                if w.strip() and w.strip() not in stopwords and len(w.strip()) >= 3]
+    
+    def _exact_search_restaurants(
+        self,
+        query: str,
+        k: int = 4,
+        db: Optional[Session] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Busca exata de restaurantes por nome e descrição (qualquer termo, por relevância)
+        
+        Args:
+            query: Texto da consulta
+            k: Número máximo de resultados
+            db: Sessão usada na consulta (padrão: self.db)
+            filter: Filtro de metadados da busca semântica (mesmas restrições em SQL)
+        
+        Returns:
+            Lista de documentos de restaurantes encontrados por busca exata
+        """
+        words = self._query_terms(query)
         
         if not words:
             return []
         
-        documents = []
-        seen_ids: Set[int] = set()
-        
-        # Buscar por nome exato primeiro (maior prioridade)
-        # Tentar busca completa primeiro, depois palavras individuais
-        full_query_restaurants = crud.get_restaurants(
-            db=self.db,
+        # Uma consulta ranqueada para todos os termos (tsvector + trigramas no PostgreSQL)
+        restaurants, _ = crud.get_restaurants_page(
+            db=db or self.db,
             skip=0,
             limit=k,
-            search=query  # Buscar pela query completa
+            search=" ".join(words),
+            match_any=True,
+            **restaurant_constraints(filter)
         )
-        
-        for restaurant in full_query_restaurants:
-            if restaurant.id not in seen_ids:
-                seen_ids.add(restaurant.id)
-                doc = self._create_restaurant_document(restaurant, search_type="exact")
-                documents.append(doc)
-                if len(documents) >= k:
-                    break
-        
-        # Se não encontrou o suficiente, buscar por palavras individuais
-        if len(documents) < k:
-            for word in words:
-                if len(documents) >= k:
-                    break
-                
-                restaurants = crud.get_restaurants(
-                    db=self.db,
-                    skip=0,
-                    limit=k * 2,
-                    search=word
-                )
-                
-                for restaurant in restaurants:
-                    if restaurant.id in seen_ids:
-                        continue
-                    seen_ids.add(restaurant.id)
-                    doc = self._create_restaurant_document(restaurant, search_type="exact")
-                    documents.append(doc)
-                    if len(documents) >= k:
-                        break
-        
-        return documents[:k]
+        return [self._create_restaurant_document(r, search_type="exact") for r in restaurants]
     
     def _create_restaurant_document(
         self,
@@ -451,9 +765,10 @@ class RAGService:
     def hybrid_search(
         self,
         query: str,
-        k: int = 4,
+        k: Optional[int] = None,
         exact_weight: float = 0.6,
-        semantic_weight: float = 0.4
+        semantic_weight: float = 0.4,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
         """
         Busca híbrida: combina busca exata (SQL) + busca semântica (PGVector)
@@ -465,22 +780,41 @@ class RAGService:
         
         Args:
             query: Texto da consulta
-            k: Número total de resultados desejados
+            k: Número total de resultados desejados (padrão: self.k)
             exact_weight: Peso da busca exata (0.0 a 1.0)
             semantic_weight: Peso da busca semântica (0.0 a 1.0)
+            filter: Filtro de metadados (ex: {"type": "restaurant", "price_range": {"in": ["low"]}}),
+                    aplicado dentro das duas buscas
         
         Returns:
             Lista de documentos combinados (exatos primeiro, depois semânticos)
+        
+        Nota:
+            Com RAG_HYBRID_MODE="rrf" no PostgreSQL usa hybrid_search_rrf (uma
+            ida ao banco, pesos como parâmetros do RRF), que só ranqueia
+            restaurantes: os documentos de outros tipos (static_knowledge,
+            preferências) da busca semântica são somados ao resultado
+            (_with_knowledge_documents). A estratégia acima é o modo
+            "sequential" e o fallback se a instrução única falhar.
+            No modo sequencial as duas buscas rodam em paralelo (_run_legs).
         """
+        k = k or self.k
+        if settings.RAG_HYBRID_MODE == "rrf" and self.db.get_bind().dialect.name == "postgresql":
+            try:
+                fused_docs = self.hybrid_search_rrf(
+                    query, k=k, lexical_weight=exact_weight, vector_weight=semantic_weight, filter=filter
+                )
+            except Exception as e:
+                # Só o SAVEPOINT do RRF foi desfeito: a transação do chamador segue válida
+                logger.warning(f"Busca híbrida RRF falhou, usando busca sequencial: {e}")
+            else:
+                return self._with_knowledge_documents(query, fused_docs, k, semantic_weight, filter)
         # Calcular quantos resultados buscar de cada tipo
         k_exact = max(1, int(k * exact_weight))
         k_semantic = max(1, int(k * semantic_weight))
         
-        # 1. Busca exata (prioridade)
-        exact_docs = self._exact_search_restaurants(query, k=k_exact)
-        
-        # 2. Busca semântica (complemento)
-        semantic_docs = self.similarity_search(query, k=k_semantic * 2)  # Buscar mais para ter opções
+        # 1. Busca exata (prioridade) e 2. busca semântica (complemento), em paralelo
+        exact_docs, semantic_docs = self._run_legs(query, k_exact, k_semantic * 2, filter)  # Semântica: buscar mais para ter opções
         
         # 3. Combinar resultados (exatos primeiro, depois semânticos)
         combined_docs = []
@@ -510,6 +844,150 @@ class RAGService:
         
         return combined_docs[:k]
 
+    
+    def _with_knowledge_documents(
+        self,
+        query: str,
+        restaurant_docs: List[Document],
+        k: int,
+        semantic_weight: float,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Completa o resultado do RRF com os documentos que não são de restaurante.
+        
+        Mesma cota da busca semântica do modo sequencial (k * semantic_weight,
+        dobrada); os restaurantes fundidos ocupam o restante das k posições.
+        Com filtro restrito a restaurantes não há o que completar.
+        
+        Returns:
+            Restaurantes (ordem do RRF) seguidos dos documentos semânticos
+        """
+        if filter and filter.get("type") == "restaurant":
+            return restaurant_docs[:k]
+        
+        k_semantic = max(1, int(k * semantic_weight))
+        knowledge_docs = [
+            doc for doc in self.similarity_search(query, k_semantic * 2, filter)
+            if doc.metadata.get("type") != "restaurant"
+        ][:k_semantic]
+        for doc in knowledge_docs:
+            doc.metadata["search_type"] = "semantic"
+        return restaurant_docs[:k - len(knowledge_docs)] + knowledge_docs
+    
+    def _run_legs(
+        self,
+        query: str,
+        k_exact: int,
+        k_semantic: int,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Document], List[Document]]:
+        """
+        Executa a busca exata e a semântica (embedding + PGVector) ao mesmo tempo.
+        
+        A latência passa a ser a da busca mais lenta, não a soma. Cada busca tem
+        até RAG_HYBRID_LEG_TIMEOUT segundos; a que estourar o prazo devolve lista
+        vazia e a resposta segue com a outra. Erros continuam sendo propagados.
+        
+        Returns:
+            (documentos exatos, documentos semânticos)
+        """
+        bind = self.db.get_bind()
+        
+        def exact_leg() -> List[Document]:
+            # Sessão própria (conexão do pool): a sessão da requisição não é thread-safe
+            with Session(bind=bind) as session:
+                return self._exact_search_restaurants(query, k=k_exact, db=session, filter=filter)
+        
+        # copy_context: a thread herda os parâmetros de hnsw_search(...) do chamador
+        executor = get_leg_executor()
+        futures = {
+            "exata": executor.submit(copy_context().run, exact_leg),
+            "semântica": executor.submit(copy_context().run, self.similarity_search, query, k_semantic, filter),
+        }
+        timeout = settings.RAG_HYBRID_LEG_TIMEOUT
+        deadline = time.monotonic() + timeout
+        results: Dict[str, List[Document]] = {}
+        for leg, future in futures.items():
+            try:
+                results[leg] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                future.cancel()
+                logger.warning(f"Busca {leg} excedeu {timeout}s; usando apenas a outra busca")
+                results[leg] = []
+        return results["exata"], results["semântica"]
+    
+    def _collection_id(self, collection_name: str = DEFAULT_COLLECTION_NAME) -> Any:
+        """uuid da coleção no PGVector (cacheado no processo)."""
+        collection_id = _collection_ids.get(collection_name)
+        if collection_id is None:
+            collection_id = self.db.execute(
+                text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"), {"name": collection_name}
+            ).scalar()
+            if collection_id is None:
+                raise ValueError(f"Coleção {collection_name} não encontrada no PGVector")
+            with _state_lock:
+                _collection_ids[collection_name] = collection_id
+        return collection_id
+    
+    def hybrid_search_rrf(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        lexical_weight: float = 0.5,
+        vector_weight: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Busca híbrida em uma instrução SQL (reciprocal rank fusion).
+        
+        O vetor da consulta é calculado localmente; ranking léxico, ranking
+        vetorial e fusão rodam no banco (build_rrf_statement), que devolve
+        os restaurantes já ordenados pelo score fundido. Roda num SAVEPOINT
+        com hnsw.ef_search aplicado (self.ef_search, no mínimo os candidatos).
+        
+        Args:
+            query: Texto da consulta
+            k: Número de restaurantes (padrão: self.k)
+            lexical_weight: Peso do ranking léxico (nome/descrição)
+            vector_weight: Peso do ranking vetorial (documentos de restaurante)
+            filter: Restrições de restaurante aplicadas nos dois rankings
+        
+        Returns:
+            Documentos de restaurante (search_type "hybrid", metadado rrf_score)
+        """
+        k = k or self.k
+        terms = self._query_terms(query)
+        query_embedding = self.embeddings.embed_query(query)
+        candidates = max(k * 2, settings.RAG_RERANK_CANDIDATES)
+        
+        # SAVEPOINT: uma falha desfaz só a busca, não a transação da sessão do chamador
+        with self.db.begin_nested():
+            # SET LOCAL na mesma transação da instrução (o CTE vetorial usa o índice HNSW)
+            self.db.execute(
+                text("SELECT set_config('hnsw.ef_search', :value, true)"),
+                {"value": str(max(self.ef_search or settings.RAG_HNSW_EF_SEARCH, candidates))}
+            )
+            stmt = build_rrf_statement(
+                self.db,
+                " ".join(terms) if terms else query,
+                query_embedding,
+                self._collection_id(),
+                k,
+                lexical_weight=lexical_weight,
+                vector_weight=vector_weight,
+                candidates=candidates,
+                filter=filter
+            )
+            rows = self.db.execute(stmt).all()
+        
+        documents = []
+        for restaurant, score in rows:
+            doc = self._create_restaurant_document(restaurant, search_type="hybrid")
+            doc.metadata["rrf_score"] = float(score)
+            documents.append(doc)
+        return documents
+
 
 def get_rag_service(db: Session, connection_string: str, eager: bool = False) -> RAGService:
     """
@@ -525,11 +1003,11 @@ def get_rag_service(db: Session, connection_string: str, eager: bool = False) ->
         Instância do RAGService
         
     Nota:
-        Cada requisição cria nova instância (não compartilhamos db entre requisições).
-        Mas se eager=True, o vector_store é inicializado imediatamente, tornando
-        a primeira busca mais rápida e detectando erros cedo.
+        Cada requisição cria uma instância leve com a sua sessão db; validação
+        e vector store são do processo (cacheados após a primeira chamada),
+        então eager=True não custa idas ao banco depois do startup.
     """
-    # Criar nova instância (cada requisição tem sua própria sessão db)
+    # Instância por requisição (sessão própria) sobre o estado compartilhado
     rag_service = RAGService(
         db=db,
         connection_string=connection_string,
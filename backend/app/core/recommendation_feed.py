@@ -0,0 +1,235 @@
+"""
+Feed de recomendações paginado por cursor.
+
+A primeira página ranqueia o catálogo inteiro uma única vez e guarda o
+resultado como snapshot compacto (IDs int32 + scores float16) no cache em
+memória, com chave por usuário e snapshot. As páginas seguintes apenas
+fatiam o snapshot, o que mantém a ordem estável durante a rolagem e custa
+um ranking por sessão em vez de um por página.
+
+O id do snapshot é a impressão digital do estado que determina o ranking
+(pedidos e preferências do usuário, catálogo e rating mínimo). Cada página
+confere essa impressão digital com uma query barata: um pedido novo, um
+vetor de preferências regravado ou uma mudança no catálogo invalida o
+cursor em qualquer worker (410), e um worker que não tem o snapshot em
+memória o reconstrói a partir do mesmo estado, com a mesma ordem.
+"""
+
+import base64
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.cache import SafeMemoryCache
+from app.core.catalog_snapshot import get_catalog_ranker, rank_with_catalog_ranker
+from app.core.recommender import (
+    resolve_user_embedding,
+    get_recent_restaurant_ids,
+    rank_catalog,
+)
+from app.core.logging_config import get_logger
+from app.database.crud import (
+    get_feed_state,
+    get_user_orders,
+    get_restaurants_for_similarity,
+    get_restaurants_by_ids,
+)
+
+logger = get_logger(__name__)
+
+# ~6 bytes por restaurante: 10k restaurantes = ~60KB por snapshot
+feed_snapshot_cache = SafeMemoryCache(max_items=256, default_ttl_minutes=30)
+
+
+class InvalidFeedCursor(ValueError):
+    """Cursor malformado."""
+
+
+class FeedSnapshotExpired(LookupError):
+    """Estado do feed mudou desde o cursor (novo pedido ou catálogo alterado)."""
+
+
+def _snapshot_key(user_id: int, snapshot_id: str) -> str:
+    return f"feed:{user_id}:{snapshot_id}"
+
+
+def encode_cursor(snapshot_id: str, offset: int, min_rating: float = 3.0) -> str:
+    """Codifica (snapshot, offset, rating mínimo) num cursor opaco para o cliente."""
+    raw = f"{snapshot_id}:{offset}:{min_rating:g}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, float]:
+    """
+    Decodifica um cursor gerado por encode_cursor.
+
+    Raises:
+        InvalidFeedCursor: Se o cursor estiver malformado
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        snapshot_id, offset, min_rating = base64.urlsafe_b64decode(padded).decode("ascii").split(":")
+        offset = int(offset)
+        min_rating = float(min_rating)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidFeedCursor("Cursor inválido")
+
+    if not snapshot_id or offset < 0:
+        raise InvalidFeedCursor("Cursor inválido")
+    return snapshot_id, offset, min_rating
+
+
+def feed_fingerprint(user_id: int, db: Session, min_rating: float) -> str:
+    """
+    Id do snapshot: muda com pedidos ou preferências do usuário, catálogo ou rating mínimo.
+
+    Returns:
+        str: 12 caracteres hex
+    """
+    state = get_feed_state(db, user_id)
+    raw = ":".join(str(value) for value in (user_id, f"{min_rating:g}") + state)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _rank_popular(db: Session, min_rating: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Ranking completo de cold start (rating desc), mesmo score de get_popular_restaurants."""
+    restaurants = get_restaurants_for_similarity(db, min_rating=min_rating)
+    ids = np.asarray([r.id for r in restaurants], dtype=np.int32)
+    ratings = np.asarray([float(r.rating or min_rating) for r in restaurants], dtype=np.float32)
+    order = np.argsort(-ratings, kind="stable")
+    scores = np.clip(ratings[order] / 5.0, 0.5, 1.0)
+    return ids[order], scores
+
+
+def build_feed_snapshot(
+    user_id: int,
+    db: Session,
+    min_rating: float = 3.0,
+    refresh: bool = False,
+    snapshot_id: Optional[str] = None
+) -> Tuple[str, np.ndarray, np.ndarray]:
+    """
+    Ranqueia o catálogo inteiro para o usuário e salva o snapshot no cache.
+
+    Args:
+        user_id: ID do usuário
+        db: Sessão do banco de dados
+        min_rating: Rating mínimo para recomendar
+        refresh: Se True, recalcula embedding do usuário (ignora cache)
+        snapshot_id: Impressão digital já calculada (None = calcular)
+
+    Returns:
+        Tuple: (snapshot_id, IDs int32, scores float16)
+    """
+    orders = get_user_orders(db, user_id=user_id, skip=0, limit=1000)
+    user_embedding = resolve_user_embedding(user_id, db, orders, refresh=refresh)
+
+    if user_embedding is None:
+        ids, scores = _rank_popular(db, min_rating)
+    else:
+        recent_ids = get_recent_restaurant_ids(orders)
+        ranked = rank_with_catalog_ranker(get_catalog_ranker(db), user_embedding, recent_ids, min_rating)
+        if ranked is not None:
+            ids, scores = ranked
+        else:
+            candidates = get_restaurants_for_similarity(db, min_rating=min_rating)
+            ids, scores = rank_catalog(user_embedding, candidates, recent_ids)
+
+    ids = ids.astype(np.int32, copy=False)
+    scores = scores.astype(np.float16)
+    snapshot_id = snapshot_id or feed_fingerprint(user_id, db, min_rating)
+    feed_snapshot_cache.set(_snapshot_key(user_id, snapshot_id), (ids, scores))
+
+    logger.info(
+        "Snapshot de feed criado",
+        extra={
+            "user_id": user_id,
+            "snapshot_id": snapshot_id,
+            "total": int(ids.size),
+            "cold_start": user_embedding is None
+        }
+    )
+    return snapshot_id, ids, scores
+
+
+def get_feed_page(
+    user_id: int,
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    min_rating: float = 3.0,
+    refresh: bool = False
+) -> Dict[str, Any]:
+    """
+    Retorna uma página do feed de recomendações.
+
+    Sem cursor, cria (ou reaproveita) o snapshot do estado atual; com cursor,
+    fatia o snapshot do cursor, reconstruindo-o se este worker não o tiver.
+
+    Args:
+        user_id: ID do usuário
+        db: Sessão do banco de dados
+        cursor: Cursor retornado pela página anterior (None = primeira página)
+        limit: Itens por página
+        min_rating: Rating mínimo (apenas na primeira página; depois vem do cursor)
+        refresh: Recalcular embedding do usuário (apenas na primeira página)
+
+    Returns:
+        dict: items (restaurant, similarity_score), next_cursor, total, snapshot_id
+
+    Raises:
+        InvalidFeedCursor: Cursor malformado
+        FeedSnapshotExpired: Pedidos, preferências ou catálogo mudaram desde o cursor
+    """
+    if cursor is None:
+        offset = 0
+        snapshot_id = feed_fingerprint(user_id, db, min_rating)
+        snapshot = None if refresh else feed_snapshot_cache.get(_snapshot_key(user_id, snapshot_id))
+    else:
+        snapshot_id, offset, min_rating = decode_cursor(cursor)
+        if feed_fingerprint(user_id, db, min_rating) != snapshot_id:
+            raise FeedSnapshotExpired(snapshot_id)
+        snapshot = feed_snapshot_cache.get(_snapshot_key(user_id, snapshot_id))
+
+    if snapshot is None:
+        # Mesmo estado, mesmo ranking: outro worker (ou o TTL) não quebra a rolagem
+        snapshot_id, ids, scores = build_feed_snapshot(
+            user_id, db, min_rating, refresh and cursor is None, snapshot_id=snapshot_id
+        )
+    else:
+        ids, scores = snapshot
+
+    page_ids = ids[offset:offset + limit].tolist()
+    page_scores = scores[offset:offset + limit].tolist()
+    restaurants = {r.id: r for r in get_restaurants_by_ids(db, page_ids)}
+
+    items = [
+        {"restaurant": restaurants[rid], "similarity_score": max(0.0, min(1.0, float(score)))}
+        for rid, score in zip(page_ids, page_scores)
+        if rid in restaurants
+    ]
+
+    next_offset = offset + limit
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(snapshot_id, next_offset, min_rating) if next_offset < ids.size else None,
+        "total": int(ids.size),
+        "snapshot_id": snapshot_id,
+        "generated_at": datetime.utcnow()
+    }
+
+
+def invalidate_user_feeds(user_id: int) -> int:
+    """
+    Descarta os snapshots de feed do usuário deste worker (ex: após novos pedidos).
+
+    Os cursores antigos já deixam de valer em qualquer worker pela impressão
+    digital; isto só libera a memória dos snapshots que não serão mais lidos.
+
+    Returns:
+        Número de snapshots removidos
+    """
+    return feed_snapshot_cache.delete_prefix(f"feed:{user_id}:")
@@ -5,7 +5,7 @@ Implementa algoritmo híbrido: collaborative filtering + content-based filtering
 
 import json
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from collections import Counter
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
@@ -15,30 +15,47 @@ from app.database.crud import (
     get_user_orders,
     get_restaurants,
     get_restaurants_for_similarity,
+    get_restaurants_by_ids,
     get_restaurants_metadata,
     get_user_preferences,
     create_or_update_user_preferences
 )
 from app.database.models import Restaurant, Order
-from app.core.embeddings import get_embedding_model
+from app.core.embeddings import get_embedding_model, get_embedding_tag
 from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Restaurantes extras buscados além do top N quando o ranking vem do snapshot
+SNAPSHOT_FETCH_MARGIN = 10
 
-def calculate_weight(order_date: datetime, rating: Optional[int]) -> float:
+# Colunas necessárias para escolher o vetor da versão ativa (select_embedding)
+EMBEDDING_COLUMNS = (
+    Restaurant.embedding,
+    Restaurant.embedding_model,
+    Restaurant.embedding_next,
+    Restaurant.embedding_next_model,
+)
+
+
+def calculate_weight(
+    order_date: datetime,
+    rating: Optional[int],
+    now: Optional[datetime] = None
+) -> float:
     """
     Calcula peso baseado em recência e rating do pedido.
     
     Args:
         order_date: Data do pedido
         rating: Avaliação do pedido (1-5) ou None
+        now: Data de referência (padrão: agora). Usado em avaliações offline.
         
     Returns:
         float: Peso calculado (0.0 a 1.0+)
     """
     # Peso de recência: decai ao longo do ano
-    days_ago = (datetime.now() - order_date).days
+    days_ago = ((now or datetime.now()) - order_date).days
     recency_weight = max(0.0, 1.0 - (days_ago / 365.0))
     
     # Peso de rating: normalizado para 0.0 a 1.0
@@ -48,6 +65,227 @@ def calculate_weight(order_date: datetime, rating: Optional[int]) -> float:
     return recency_weight * rating_weight
 
 
+def calculate_weights(
+    order_dates: np.ndarray,
+    ratings: np.ndarray,
+    now: Optional[datetime] = None
+) -> np.ndarray:
+    """
+    Versão vetorizada de calculate_weight para processamento em lote.
+
+    Args:
+        order_dates: Array datetime64 com as datas dos pedidos
+        ratings: Array float com as avaliações (NaN ou 0 = sem avaliação)
+        now: Data de referência (padrão: agora)
+
+    Returns:
+        np.ndarray: Pesos float64, mesma semântica de calculate_weight
+    """
+    reference = np.datetime64(now or datetime.now(), "s")
+    # floor_divide reproduz a semântica de timedelta.days (arredonda para baixo)
+    days_ago = np.floor_divide(
+        (reference - order_dates.astype("datetime64[s]")).astype(np.int64),
+        86400
+    )
+    recency_weight = np.maximum(0.0, 1.0 - (days_ago / 365.0))
+
+    ratings = np.asarray(ratings, dtype=np.float64)
+    has_rating = np.nan_to_num(ratings, nan=0.0) != 0
+    rating_weight = np.where(has_rating, np.nan_to_num(ratings) / 5.0, 0.5)
+
+    return recency_weight * rating_weight
+
+
+def parse_embedding(value: Any) -> Optional[List[float]]:
+    """
+    Converte o embedding armazenado (JSON em texto ou lista) em lista de floats.
+
+    Returns:
+        Optional[List[float]]: Embedding ou None se ausente/inválido
+    """
+    if not value:
+        return None
+    try:
+        embedding = json.loads(value) if isinstance(value, str) else value
+    except (TypeError, ValueError):
+        return None
+    return embedding if isinstance(embedding, list) and embedding else None
+
+
+def select_embedding(restaurant: Any, tag: Optional[str] = None) -> Optional[List[float]]:
+    """
+    Vetor do restaurante no espaço do modelo ativo (ou de `tag`).
+
+    Durante uma migração de modelo o vetor novo fica em embedding_next até a
+    promoção; vetores de outra versão nunca são devolvidos. Linhas sem tag
+    são de versão desconhecida (a migração d2f6a8b1c3e7 marca as legadas) e
+    também ficam de fora; objetos sem as colunas de versão contam como da
+    versão ativa.
+
+    Returns:
+        Optional[List[float]]: Embedding ou None se não houver vetor desta versão
+    """
+    tag = tag or get_embedding_tag()
+    if getattr(restaurant, "embedding_next_model", None) == tag:
+        return parse_embedding(restaurant.embedding_next)
+    if getattr(restaurant, "embedding_model", tag) == tag:
+        return parse_embedding(restaurant.embedding)
+    return None
+
+
+def build_restaurant_matrix(
+    restaurants: Iterable[Any],
+    tag: Optional[str] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Monta a matriz de embeddings do catálogo para ranking vetorizado.
+
+    Restaurantes sem embedding da versão ativa (ou com dimensão diferente da
+    predominante) são descartados, pois não podem ser comparados por
+    similaridade coseno.
+
+    Args:
+        restaurants: Objetos Restaurant (basta id e EMBEDDING_COLUMNS carregados)
+        tag: Versão dos vetores (padrão: get_embedding_tag())
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (ids int32, matriz float32 n x dim)
+    """
+    tag = tag or get_embedding_tag()
+    ids = []
+    vectors = []
+    for restaurant in restaurants:
+        embedding = select_embedding(restaurant, tag)
+        if embedding is not None:
+            ids.append(restaurant.id)
+            vectors.append(embedding)
+
+    if not vectors:
+        return np.empty(0, dtype=np.int32), np.empty((0, 0), dtype=np.float32)
+
+    dims = Counter(len(v) for v in vectors)
+    dim = dims.most_common(1)[0][0]
+    keep = [i for i, v in enumerate(vectors) if len(v) == dim]
+
+    ids_array = np.asarray([ids[i] for i in keep], dtype=np.int32)
+    matrix = np.asarray([vectors[i] for i in keep], dtype=np.float32)
+    return ids_array, matrix
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas (norma L2) para que o produto interno seja o coseno."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def aggregate_user_embeddings(
+    user_ids: np.ndarray,
+    restaurant_rows: np.ndarray,
+    weights: np.ndarray,
+    restaurant_matrix: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula embeddings de vários usuários de uma vez (média ponderada por segmento).
+
+    Equivalente vetorizado de calculate_user_preference_embedding: os pedidos
+    são agrupados por usuário e somados com np.add.reduceat.
+
+    Args:
+        user_ids: ID do usuário de cada pedido
+        restaurant_rows: Linha do restaurante em restaurant_matrix (-1 = sem embedding)
+        weights: Peso de cada pedido (calculate_weights)
+        restaurant_matrix: Matriz de embeddings do catálogo
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (IDs dos usuários, matriz de embeddings).
+        Usuários sem pedidos válidos ou com peso total zero não aparecem.
+    """
+    dim = restaurant_matrix.shape[1] if restaurant_matrix.ndim == 2 else 0
+    valid = restaurant_rows >= 0
+    if not valid.any() or dim == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32)
+
+    user_ids = np.asarray(user_ids)[valid]
+    rows = np.asarray(restaurant_rows)[valid]
+    weights = np.asarray(weights, dtype=np.float64)[valid]
+
+    # reduceat exige segmentos contíguos: ordenar por usuário (estável)
+    if np.any(user_ids[1:] < user_ids[:-1]):
+        order = np.argsort(user_ids, kind="stable")
+        user_ids, rows, weights = user_ids[order], rows[order], weights[order]
+
+    starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+    weighted = restaurant_matrix[rows].astype(np.float64) * weights[:, None]
+    sums = np.add.reduceat(weighted, starts, axis=0)
+    weight_sums = np.add.reduceat(weights, starts)
+
+    has_weight = weight_sums > 0
+    embeddings = sums[has_weight] / weight_sums[has_weight, None]
+    return user_ids[starts][has_weight], embeddings.astype(np.float32)
+
+
+def rank_restaurants_batch(
+    user_matrix: np.ndarray,
+    restaurant_matrix: np.ndarray,
+    k: int,
+    exclude: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    chunk_size: int = 1024
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ranqueia o catálogo para vários usuários com uma multiplicação de matrizes.
+
+    Args:
+        user_matrix: Embeddings dos usuários (u x dim)
+        restaurant_matrix: Embeddings do catálogo já normalizados (n x dim)
+        k: Tamanho do top-k por usuário
+        exclude: Pares (linha do usuário, coluna do restaurante) a excluir
+        chunk_size: Usuários por bloco (limita a memória da matriz de scores)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (colunas top-k u x k, scores u x k).
+        Posições sem candidato têm coluna -1 e score NaN.
+    """
+    n_users = user_matrix.shape[0]
+    n_items = restaurant_matrix.shape[0]
+    k_eff = min(k, n_items)
+
+    top_cols = np.full((n_users, k), -1, dtype=np.int64)
+    top_scores = np.full((n_users, k), np.nan, dtype=np.float32)
+    if n_users == 0 or k_eff == 0:
+        return top_cols, top_scores
+
+    users_normalized = normalize_rows(user_matrix.astype(np.float32))
+    if exclude is not None:
+        exclude_rows, exclude_cols = (np.asarray(a) for a in exclude)
+        exclude_order = np.argsort(exclude_rows, kind="stable")
+        exclude_rows, exclude_cols = exclude_rows[exclude_order], exclude_cols[exclude_order]
+
+    for start in range(0, n_users, chunk_size):
+        stop = min(start + chunk_size, n_users)
+        scores = users_normalized[start:stop] @ restaurant_matrix.T
+        # Mesmo intervalo de calculate_similarity (0.0 a 1.0)
+        np.clip(scores, 0.0, 1.0, out=scores)
+
+        if exclude is not None:
+            lo, hi = np.searchsorted(exclude_rows, [start, stop])
+            scores[exclude_rows[lo:hi] - start, exclude_cols[lo:hi]] = -np.inf
+
+        candidates = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        cols = np.take_along_axis(candidates, order, axis=1)
+        chunk_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        excluded = np.isneginf(chunk_scores)
+        cols[excluded] = -1
+        chunk_scores[excluded] = np.nan
+        top_cols[start:stop, :k_eff] = cols
+        top_scores[start:stop, :k_eff] = chunk_scores
+
+    return top_cols, top_scores
+
+
 def calculate_user_preference_embedding(
     user_id: int,
     orders: List[Order],
@@ -76,16 +314,16 @@ def calculate_user_preference_embedding(
     restaurant_embeddings = []
     weights = []
     
+    tag = get_embedding_tag()
     for order in orders:
         restaurant = restaurants_dict.get(order.restaurant_id)
-        if not restaurant or not restaurant.embedding:
+        if not restaurant:
             continue
         
-        # Carregar embedding do restaurante
-        if isinstance(restaurant.embedding, str):
-            embedding = json.loads(restaurant.embedding)
-        else:
-            embedding = restaurant.embedding
+        # Carregar embedding do restaurante (apenas da versão ativa do modelo)
+        embedding = select_embedding(restaurant, tag)
+        if embedding is None:
+            continue
         
         # Calcular peso baseado em recência e rating
         weight = calculate_weight(order.order_date, order.rating)
@@ -199,6 +437,13 @@ def calculate_similarity(
     Returns:
         float: Similaridade coseno (0.0 a 1.0)
     """
+    if user_embedding is not None and restaurant_embedding is not None and len(user_embedding) != len(restaurant_embedding):
+        # Vetores de modelos diferentes: não comparáveis (ver select_embedding)
+        logger.warning(
+            "Dimensões de embedding diferentes; similaridade não calculada",
+            extra={"user_embedding_len": len(user_embedding), "restaurant_embedding_len": len(restaurant_embedding)}
+        )
+        return 0.0
     try:
         user_vec = np.array(user_embedding).reshape(1, -1)
         rest_vec = np.array(restaurant_embedding).reshape(1, -1)
@@ -268,6 +513,141 @@ def get_popular_restaurants(
     return recommendations
 
 
+def resolve_user_embedding(
+    user_id: int,
+    db: Session,
+    orders: List[Order],
+    refresh: bool = False
+) -> Optional[List[float]]:
+    """
+    Obtém o embedding de preferências do usuário (cache ou histórico de pedidos).
+    
+    Usa o vetor salvo em UserPreferences (inclui vetor sintético de onboarding)
+    e, se ausente, calcula a partir dos pedidos e grava o resultado no cache.
+    
+    Args:
+        user_id: ID do usuário
+        db: Sessão do banco de dados
+        orders: Pedidos do usuário
+        refresh: Se True, ignora o embedding em cache
+        
+    Returns:
+        Optional[List[float]]: Embedding do usuário ou None (cold start)
+    """
+    # Verificar cache de preferências (se não for refresh)
+    # Isso inclui vetor sintético de onboarding se disponível
+    if not refresh:
+        preferences = get_user_preferences(db, user_id=user_id)
+        # Vetor de outra versão do modelo está em outro espaço: recalcular
+        if preferences and preferences.preference_embedding and preferences.embedding_model != get_embedding_tag():
+            logger.info(
+                "Embedding de preferências de outra versão do modelo; recalculando",
+                extra={"user_id": user_id, "embedding_model": preferences.embedding_model}
+            )
+        elif preferences and preferences.preference_embedding:
+            try:
+                if isinstance(preferences.preference_embedding, str):
+                    return json.loads(preferences.preference_embedding)
+                return preferences.preference_embedding
+            except:
+                pass  # Se erro ao carregar, recalcular
+    
+    # Sem pedidos não há como calcular embedding baseado em histórico
+    if not orders:
+        return None
+    
+    # OTIMIZAÇÃO: Buscar apenas restaurantes que o usuário pediu (não todos)
+    # Reduz drasticamente o uso de memória
+    restaurant_ids = [order.restaurant_id for order in orders]
+    restaurants = get_restaurants_for_similarity(
+        db, 
+        restaurant_ids=restaurant_ids
+    )
+    
+    # Calcular embedding do usuário baseado em pedidos
+    user_embedding = calculate_user_preference_embedding(
+        user_id=user_id,
+        orders=orders,
+        restaurants=restaurants,
+        db=db
+    )
+    
+    if user_embedding is None:
+        logger.warning(
+            f"Não foi possível calcular embedding para usuário {user_id}: sem restaurantes com embeddings",
+            extra={"user_id": user_id, "orders_count": len(orders)}
+        )
+        return None
+    
+    # Cachear embedding nas preferências do usuário
+    try:
+        # Para extract_user_patterns, usar metadados (mais leve)
+        from app.core.cache import get_cached_restaurants_metadata
+        restaurants_metadata = get_cached_restaurants_metadata(db, ttl_minutes=60)
+        favorite_cuisines = extract_user_patterns(user_id, orders, restaurants_metadata)["favorite_cuisines"]
+        create_or_update_user_preferences(
+            db=db,
+            user_id=user_id,
+            preference_embedding=json.dumps(user_embedding),
+            favorite_cuisines=json.dumps(favorite_cuisines) if favorite_cuisines else None
+        )
+    except Exception as e:
+        # Se erro ao salvar cache, continuar (não crítico)
+        pass
+    
+    return user_embedding
+
+
+def get_recent_restaurant_ids(orders: List[Order], limit: int = 10) -> set:
+    """Retorna os IDs dos restaurantes dos últimos `limit` pedidos."""
+    recent_orders = sorted(orders, key=lambda o: o.order_date, reverse=True)[:limit]
+    return {order.restaurant_id for order in recent_orders}
+
+
+def rank_catalog(
+    user_embedding: List[float],
+    restaurants: Iterable[Restaurant],
+    exclude_ids: Optional[Iterable[int]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ranqueia o catálogo inteiro para um usuário com uma única multiplicação.
+    
+    Args:
+        user_embedding: Embedding do usuário
+        restaurants: Restaurantes candidatos (basta id e embedding carregados)
+        exclude_ids: IDs a excluir do ranking (ex: pedidos recentes)
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (IDs int32, scores float32) em ordem
+        decrescente de similaridade coseno (0.0 a 1.0)
+    """
+    ids, matrix = build_restaurant_matrix(restaurants)
+    user_vec = np.asarray(user_embedding, dtype=np.float32)
+    
+    if ids.size == 0 or matrix.shape[1] != user_vec.shape[0]:
+        if ids.size:
+            logger.warning(
+                "Dimensão do embedding do usuário difere do catálogo",
+                extra={"user_embedding_len": int(user_vec.shape[0]), "catalog_dim": int(matrix.shape[1])}
+            )
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+    
+    if exclude_ids:
+        keep = ~np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))
+        ids, matrix = ids[keep], matrix[keep]
+    
+    norm = np.linalg.norm(user_vec)
+    if norm > 0:
+        user_vec = user_vec / norm
+    scores = normalize_rows(matrix) @ user_vec
+    # Garantir que está entre 0.0 e 1.0 (mesmo intervalo de calculate_similarity)
+    np.clip(scores, 0.0, 1.0, out=scores)
+    
+    # Ordenação estável: empates mantêm a ordem do catálogo
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
 def generate_recommendations(
     user_id: int,
     db: Session,
@@ -299,158 +679,56 @@ def generate_recommendations(
     # 1. Obter pedidos do usuário
     orders = get_user_orders(db, user_id=user_id, skip=0, limit=1000)
     
-    # 2. Verificar cache de preferências (se não for refresh)
-    # Isso inclui vetor sintético de onboarding se disponível
-    user_embedding = None
-    if not refresh:
-        preferences = get_user_preferences(db, user_id=user_id)
-        if preferences and preferences.preference_embedding:
-            try:
-                if isinstance(preferences.preference_embedding, str):
-                    user_embedding = json.loads(preferences.preference_embedding)
-                else:
-                    user_embedding = preferences.preference_embedding
-            except:
-                pass  # Se erro ao carregar, recalcular
+    # 2. Embedding do usuário (cache de preferências ou histórico)
+    user_embedding = resolve_user_embedding(user_id, db, orders, refresh=refresh)
     
-    # 3. Cold start: se usuário não tem pedidos E não tem vetor sintético, retornar populares
-    if not orders and user_embedding is None:
+    # 3. Cold start: sem pedidos e sem vetor sintético (ou sem embeddings), retornar populares
+    if user_embedding is None:
         logger.info(
             f"Cold start para usuário {user_id}: retornando restaurantes populares",
             extra={"user_id": user_id, "limit": limit}
         )
         return get_popular_restaurants(db, limit=limit, min_rating=min_rating)
     
-    # 4. Se não há embedding cached (nem sintético nem calculado), calcular novo baseado em pedidos
-    if user_embedding is None:
-        # Se não há pedidos, não podemos calcular embedding baseado em histórico
-        # Neste caso, já retornamos populares acima (linha 272)
-        # Se chegou aqui, há pedidos mas não há embedding cached
-        if not orders:
-            return get_popular_restaurants(db, limit=limit, min_rating=min_rating)
-        
-        # OTIMIZAÇÃO: Buscar apenas restaurantes que o usuário pediu (não todos)
-        # Reduz drasticamente o uso de memória
-        restaurant_ids = [order.restaurant_id for order in orders]
-        restaurants = get_restaurants_for_similarity(
+    # 4. IDs de restaurantes pedidos recentemente (para excluir se solicitado)
+    recent_restaurant_ids = get_recent_restaurant_ids(orders) if exclude_recent else set()
+    
+    # 5. Similaridade com todo o catálogo de uma vez (já ordenada e sem duplicatas)
+    # Com snapshot mapeado em memória, só o top N é carregado do banco
+    # (sidecar que falhar no rank também cai no ranking a partir do banco)
+    from app.core.catalog_snapshot import get_catalog_ranker, rank_with_catalog_ranker
+    ranked = rank_with_catalog_ranker(get_catalog_ranker(db), user_embedding, recent_restaurant_ids, min_rating)
+    if ranked is not None:
+        ranked_ids, ranked_scores = ranked
+        # Margem para restaurantes removidos depois da geração do snapshot
+        all_restaurants = get_restaurants_by_ids(db, ranked_ids[:limit + SNAPSHOT_FETCH_MARGIN].tolist())
+        found = np.isin(ranked_ids, np.fromiter((r.id for r in all_restaurants), dtype=np.int64))
+        ranked_ids, ranked_scores = ranked_ids[found], ranked_scores[found]
+    else:
+        # OTIMIZAÇÃO: Busca apenas id, embedding e rating (não todos os campos)
+        all_restaurants = get_restaurants_for_similarity(
             db, 
-            restaurant_ids=restaurant_ids
-        )
-        
-        # Calcular embedding do usuário baseado em pedidos
-        user_embedding = calculate_user_preference_embedding(
-            user_id=user_id,
-            orders=orders,
-            restaurants=restaurants,
-            db=db
+            limit=None,  # Sem limite (mas apenas campos essenciais)
+            min_rating=min_rating
         )
-        
-        # Se ainda não conseguiu calcular (sem restaurantes com embeddings), fallback
-        if user_embedding is None:
-            logger.warning(
-                f"Não foi possível calcular embedding para usuário {user_id}: sem restaurantes com embeddings",
-                extra={"user_id": user_id, "orders_count": len(orders)}
-            )
-            return get_popular_restaurants(db, limit=limit, min_rating=min_rating)
-        
-        # Cachear embedding nas preferências do usuário
-        try:
-            # Para extract_user_patterns, usar metadados (mais leve)
-            from app.core.cache import get_cached_restaurants_metadata
-            restaurants_metadata = get_cached_restaurants_metadata(db, ttl_minutes=60)
-            favorite_cuisines = extract_user_patterns(user_id, orders, restaurants_metadata)["favorite_cuisines"]
-            create_or_update_user_preferences(
-                db=db,
-                user_id=user_id,
-                preference_embedding=json.dumps(user_embedding),
-                favorite_cuisines=json.dumps(favorite_cuisines) if favorite_cuisines else None
-            )
-        except Exception as e:
-            # Se erro ao salvar cache, continuar (não crítico)
-            pass
-    
-    # 5. Obter restaurantes para calcular similaridade (apenas campos necessários)
-    # OTIMIZAÇÃO: Busca apenas id, embedding e rating (não todos os campos)
-    all_restaurants = get_restaurants_for_similarity(
-        db, 
-        limit=None,  # Sem limite (mas apenas campos essenciais)
-        min_rating=min_rating
-    )
-    
-    # 6. IDs de restaurantes pedidos recentemente (para excluir se solicitado)
-    recent_restaurant_ids = set()
-    if exclude_recent:
-        recent_orders = sorted(orders, key=lambda o: o.order_date, reverse=True)[:10]
-        recent_restaurant_ids = {order.restaurant_id for order in recent_orders}
-    
-    # 7. Calcular similaridade com cada restaurante
-    recommendations = []
-    seen_restaurant_ids = set()  # Rastrear restaurantes já processados para evitar duplicatas
-    
-    for restaurant in all_restaurants:
-        # Pular se já processado (evitar duplicatas)
-        if restaurant.id in seen_restaurant_ids:
-            continue
-        
-        # Pular restaurantes recentes se solicitado
-        if restaurant.id in recent_restaurant_ids:
-            continue
-        
-        # Verificar se restaurante tem embedding
-        if not restaurant.embedding:
-            continue
-        
-        # Carregar embedding do restaurante
-        try:
-            if isinstance(restaurant.embedding, str):
-                restaurant_embedding = json.loads(restaurant.embedding)
-            else:
-                restaurant_embedding = restaurant.embedding
-            
-            # Calcular similaridade
-            similarity = calculate_similarity(user_embedding, restaurant_embedding)
-            
-            # Garantir que similarity está entre 0.0 e 1.0 (pode haver imprecisão de ponto flutuante)
-            similarity = max(0.0, min(1.0, float(similarity)))
-            
-            recommendations.append({
-                "restaurant": restaurant,
-                "similarity_score": similarity
-            })
-            
-            # Marcar como processado
-            seen_restaurant_ids.add(restaurant.id)
-        except Exception as e:
-            # Se erro ao processar restaurante, pular
-            logger.warning(
-                f"Erro ao calcular similaridade para restaurante {restaurant.id}: {e}",
-                extra={"restaurant_id": restaurant.id}
-            )
-            continue
-    
-    # 8. Ordenar por similaridade (maior primeiro)
-    recommendations.sort(key=lambda x: x["similarity_score"], reverse=True)
+        ranked_ids, ranked_scores = rank_catalog(user_embedding, all_restaurants, recent_restaurant_ids)
     
-    # Log para debug: verificar se similarity_score está variando
-    if recommendations:
-        scores = [rec["similarity_score"] for rec in recommendations[:5]]
+    if ranked_ids.size:
         logger.debug(
             f"Top 5 similarity scores para usuário {user_id}",
-            extra={"user_id": user_id, "scores": scores, "total_recommendations": len(recommendations)}
+            extra={
+                "user_id": user_id,
+                "scores": ranked_scores[:5].tolist(),
+                "total_recommendations": int(ranked_ids.size)
+            }
         )
     
-    # 9. Retornar top N (garantir que não há duplicatas mesmo após ordenação)
-    unique_recommendations = []
-    unique_ids = set()
-    for rec in recommendations:
-        restaurant_id = rec["restaurant"].id
-        if restaurant_id not in unique_ids:
-            unique_recommendations.append(rec)
-            unique_ids.add(restaurant_id)
-            if len(unique_recommendations) >= limit:
-                break
-    
-    return unique_recommendations
+    # 6. Retornar top N
+    restaurants_by_id = {restaurant.id: restaurant for restaurant in all_restaurants}
+    return [
+        {"restaurant": restaurants_by_id[int(restaurant_id)], "similarity_score": float(score)}
+        for restaurant_id, score in zip(ranked_ids[:limit], ranked_scores[:limit])
+    ]
 
 
 def select_chef_recommendation(
@@ -0,0 +1,232 @@
+"""
+Compressão de embeddings para o primeiro estágio do ranking.
+
+VectorCompressor combina uma projeção PCA aprendida do catálogo (ex.: 384 →
+128 dimensões) e/ou quantização escalar int8 com escala por vetor. O
+primeiro estágio ranqueia o catálogo inteiro com os vetores comprimidos
+(menos memória lida por consulta) e o segundo reordena os melhores
+candidatos com os vetores completos (two_stage_rank).
+
+A PCA é feita sem centralizar: os componentes maximizam a energia retida
+das linhas normalizadas, que é o que preserva produtos internos/cosseno.
+evaluate_compression mede a perda de recall@k contra o cosseno exato
+(scripts/evaluate_vector_compression.py).
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Linhas por bloco ao converter códigos int8 para float (limita memória temporária)
+SCORE_CHUNK_ROWS = 8192
+COMPONENTS_FILENAME = "compression_components.npy"
+META_FILENAME = "compression.json"
+
+
+class VectorCompressor:
+    """
+    Projeção PCA opcional + quantização int8 opcional.
+
+    Args:
+        components: Matriz (dims x dim original) com linhas ortonormais, ou None
+        quantize: Quantizar em int8 com escala por vetor
+    """
+
+    def __init__(self, components: Optional[np.ndarray] = None, quantize: bool = False):
+        self.components = components
+        self.quantize = quantize
+
+    @classmethod
+    def fit(
+        cls,
+        matrix: np.ndarray,
+        dims: Optional[int] = None,
+        quantize: bool = False,
+        sample_size: int = 20000,
+        seed: int = 0
+    ) -> "VectorCompressor":
+        """
+        Aprende a projeção a partir do catálogo (linhas normalizadas).
+
+        dims None ou >= dimensão original desativa a PCA.
+        """
+        components = None
+        if dims and dims < matrix.shape[1] and matrix.shape[0] > 0:
+            sample = matrix
+            if matrix.shape[0] > sample_size:
+                rows = np.random.default_rng(seed).choice(matrix.shape[0], sample_size, replace=False)
+                sample = matrix[np.sort(rows)]
+            _, _, vt = np.linalg.svd(np.asarray(sample, dtype=np.float32), full_matrices=False)
+            components = np.ascontiguousarray(vt[:dims], dtype=np.float32)
+        return cls(components, quantize)
+
+    @property
+    def enabled(self) -> bool:
+        return self.components is not None or self.quantize
+
+    @property
+    def output_dims(self) -> Optional[int]:
+        return None if self.components is None else int(self.components.shape[0])
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Aplica a PCA (se houver) e devolve float32."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.components is None:
+            return vectors
+        return vectors @ self.components.T
+
+    def encode(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Comprime a matriz do catálogo.
+
+        Returns:
+            Tuple: (códigos int8 ou float32, escalas float32 por linha ou None)
+        """
+        projected = self.project(matrix)
+        if not self.quantize:
+            return projected, None
+        scales = np.abs(projected).max(axis=1) / 127.0 if projected.size else np.empty(0, dtype=np.float32)
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.rint(projected / scales[:, None]).astype(np.int8)
+        return codes, scales
+
+    def score(self, codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """Scores aproximados (produto interno) de todas as linhas contra a consulta."""
+        q = self.project(np.asarray(query, dtype=np.float32)[None, :])[0]
+        if scales is None:
+            return np.asarray(codes @ q, dtype=np.float32)
+
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_CHUNK_ROWS):
+            block = np.asarray(codes[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + SCORE_CHUNK_ROWS] = block @ q
+        return scores * scales
+
+    def save(self, directory: str) -> None:
+        """Grava componentes e configuração ao lado dos códigos."""
+        if self.components is not None:
+            np.save(os.path.join(directory, COMPONENTS_FILENAME), self.components)
+        with open(os.path.join(directory, META_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"dims": self.output_dims, "quantize": self.quantize}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["VectorCompressor"]:
+        """Carrega a configuração gravada por save (None se ausente)."""
+        meta_path = os.path.join(directory, META_FILENAME)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        components = None
+        if meta.get("dims"):
+            components = np.load(os.path.join(directory, COMPONENTS_FILENAME))
+        return cls(components, bool(meta.get("quantize")))
+
+
+def two_stage_rank(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    full_matrix: np.ndarray,
+    approx_scores: np.ndarray,
+    rerank: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reordena os melhores candidatos do primeiro estágio com os vetores completos.
+
+    Args:
+        query: Vetor da consulta normalizado (dimensão completa)
+        candidates: Linhas elegíveis da matriz
+        full_matrix: Matriz completa (linhas normalizadas; pode ser memmap)
+        approx_scores: Scores aproximados de todas as linhas
+        rerank: Quantos candidatos recebem score exato
+
+    Returns:
+        Tuple: (linhas em ordem decrescente, scores) — o top `rerank` com score
+        exato, o restante na ordem aproximada (limitado ao menor score exato)
+    """
+    if candidates.size == 0:
+        return candidates, np.empty(0, dtype=np.float32)
+
+    approx = approx_scores[candidates]
+    m = min(max(rerank, 1), candidates.size)
+    head = np.argpartition(-approx, m - 1)[:m]
+
+    head_rows = candidates[head]
+    exact = np.asarray(full_matrix[np.sort(head_rows)] @ query, dtype=np.float32)
+    exact = exact[np.argsort(np.argsort(head_rows))]  # Volta à ordem de head_rows
+    head_order = np.argsort(-exact, kind="stable")
+
+    tail_mask = np.ones(candidates.size, dtype=bool)
+    tail_mask[head] = False
+    tail = np.flatnonzero(tail_mask)
+    tail_order = tail[np.argsort(-approx[tail], kind="stable")]
+    tail_scores = approx[tail_order]
+    if exact.size:
+        tail_scores = np.minimum(tail_scores, exact.min())
+
+    rows = np.concatenate([head_rows[head_order], candidates[tail_order]])
+    scores = np.concatenate([exact[head_order], tail_scores]).astype(np.float32)
+    return rows, scores
+
+
+def evaluate_compression(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    dims: Optional[int] = None,
+    quantize: bool = False,
+    rerank: int = 100
+) -> Dict[str, Any]:
+    """
+    Mede recall@k de uma configuração contra o ranking exato por cosseno.
+
+    Args:
+        matrix: Catálogo (linhas normalizadas)
+        queries: Consultas (linhas normalizadas, ex.: vetores de usuários)
+        k: Tamanho do top avaliado
+        dims: Dimensões da PCA (None = sem PCA)
+        quantize: Quantização int8
+        rerank: Candidatos reordenados com vetores completos (0 = só primeiro estágio)
+
+    Returns:
+        dict: recall_first_stage, recall_reranked, bytes_per_vector e latências (ms)
+    """
+    compressor = VectorCompressor.fit(matrix, dims=dims, quantize=quantize)
+    codes, scales = compressor.encode(matrix)
+    all_rows = np.arange(matrix.shape[0])
+    k = min(k, matrix.shape[0])
+
+    first_hits = reranked_hits = 0
+    exact_ms = approx_ms = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        exact_scores = matrix @ query
+        exact_top = set(np.argpartition(-exact_scores, k - 1)[:k].tolist())
+        exact_ms += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        approx_scores = compressor.score(codes, scales, query)
+        approx_top = np.argpartition(-approx_scores, k - 1)[:k]
+        if rerank > 0:
+            rows, _ = two_stage_rank(query, all_rows, matrix, approx_scores, max(rerank, k))
+            reranked_hits += len(exact_top.intersection(rows[:k].tolist()))
+        approx_ms += (time.perf_counter() - start) * 1000
+        first_hits += len(exact_top.intersection(approx_top.tolist()))
+
+    total = max(len(queries) * k, 1)
+    bytes_per_vector = (compressor.output_dims or matrix.shape[1]) * (1 if quantize else 4) + (4 if quantize else 0)
+    return {
+        "dims": compressor.output_dims or int(matrix.shape[1]),
+        "quantize": quantize,
+        "rerank": rerank,
+        "k": k,
+        "recall_first_stage": round(first_hits / total, 4),
+        "recall_reranked": round(reranked_hits / total, 4) if rerank > 0 else None,
+        "bytes_per_vector": bytes_per_vector,
+        "compression_ratio": round(matrix.shape[1] * 4 / bytes_per_vector, 2),
+        "exact_ms_per_query": round(exact_ms / max(len(queries), 1), 3),
+        "compressed_ms_per_query": round(approx_ms / max(len(queries), 1), 3),
+    }
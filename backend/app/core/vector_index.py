@@ -0,0 +1,184 @@
+"""
+Índice HNSW da coleção do PGVector (langchain_pg_embedding).
+
+A tabela de embeddings do LangChain é criada sem índice ANN: cada busca do
+Chef Virtual calcula a distância contra todos os documentos. O índice HNSW
+(vector_cosine_ops, a mesma distância do PGVector) é parcial por coleção
+(WHERE collection_id = ...), que é o filtro de toda consulta do PGVector.
+
+O HNSW exige a coluna com dimensão fixa; a tabela do LangChain usa vector
+sem dimensão, então a coluna é convertida para vector(N) com a dimensão dos
+vetores já gravados. Criado pela migração e, em bancos novos, após a
+primeira carga da base de conhecimento (a coleção só existe a partir dela).
+
+Quantização por coleção (RAG_VECTOR_QUANTIZATION / RAG_COLLECTION_QUANTIZATION):
+"halfvec" indexa embedding::halfvec(N) e "binary" indexa
+binary_quantize(embedding)::bit(N) (índices por expressão, metade e 1/32 do
+tamanho). A coluna continua em precisão total: o primeiro estágio percorre
+o índice quantizado e os candidatos são reordenados com o cosseno exato
+(rag_service.TunedPGVector).
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import literal_column, text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+COLLECTION_TABLE = "langchain_pg_collection"
+
+QUANTIZATION_MODES = ("none", "halfvec", "binary")
+
+# Expressão indexada e operator class de cada modo ({dim} = dimensão fixa)
+_INDEX_EXPRESSIONS = {
+    "none": ("embedding", "vector_cosine_ops"),
+    "halfvec": ("(CAST(embedding AS halfvec({dim})))", "halfvec_cosine_ops"),
+    "binary": ("(CAST(binary_quantize(embedding) AS bit({dim})))", "bit_hamming_ops"),
+}
+_INDEX_PREFIXES = {"none": "ix_lc_embedding_hnsw_", "halfvec": "ix_lc_embedding_hnsw_half_", "binary": "ix_lc_embedding_hnsw_bin_"}
+
+
+def collection_quantization(collection_name: str) -> str:
+    """
+    Modo de quantização da coleção (RAG_COLLECTION_QUANTIZATION ou RAG_VECTOR_QUANTIZATION).
+
+    Raises:
+        ValueError: Modo desconhecido
+    """
+    mode = settings.RAG_COLLECTION_QUANTIZATION.get(collection_name, settings.RAG_VECTOR_QUANTIZATION)
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Quantização inválida para {collection_name}: {mode!r} (use {', '.join(QUANTIZATION_MODES)})")
+    return mode
+
+
+def hnsw_index_name(collection_name: str, mode: str = "none") -> str:
+    """Nome do índice HNSW da coleção no modo (identificador seguro, até 63 caracteres)."""
+    slug = re.sub(r"[^a-z0-9_]", "_", collection_name.lower())
+    return f"{_INDEX_PREFIXES[mode]}{slug}"[:63]
+
+
+def quantized_distance(mode: str, embedding: List[float]):
+    """
+    Distância do primeiro estágio no modo (mesma expressão do índice, para o planner usá-lo).
+
+    O vetor da consulta entra como literal: são floats gerados pelo encoder.
+    """
+    dim = len(embedding)
+    vector = "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+    column = f"{EMBEDDING_TABLE}.embedding"
+    if mode == "halfvec":
+        return literal_column(f"CAST({column} AS halfvec({dim})) <=> CAST('{vector}' AS halfvec({dim}))")
+    if mode == "binary":
+        return literal_column(
+            f"CAST(binary_quantize({column}) AS bit({dim})) <~> binary_quantize(CAST('{vector}' AS vector({dim})))"
+        )
+    raise ValueError(f"Modo sem primeiro estágio quantizado: {mode!r}")
+
+
+def _fixed_dimension(connection: Connection) -> Optional[int]:
+    """Dimensão da coluna embedding, convertendo vector sem dimensão para vector(N)."""
+    column_type = connection.execute(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+    ), {"table": EMBEDDING_TABLE}).scalar()
+    match = re.fullmatch(r"vector\((\d+)\)", column_type or "")
+    if match:
+        return int(match.group(1))
+
+    dimension = connection.execute(
+        text(f"SELECT vector_dims(embedding) FROM {EMBEDDING_TABLE} WHERE embedding IS NOT NULL LIMIT 1")
+    ).scalar()
+    if dimension is None:
+        return None
+    # Falha se houver vetores de dimensões diferentes (modelos misturados na tabela)
+    connection.execute(text(
+        f"ALTER TABLE {EMBEDDING_TABLE} ALTER COLUMN embedding TYPE vector({int(dimension)})"
+    ))
+    return int(dimension)
+
+
+def index_size(connection: Connection, index_name: str) -> Optional[int]:
+    """Tamanho do índice em bytes (None se não existir)."""
+    return connection.execute(
+        text("SELECT pg_relation_size(to_regclass(:index))"), {"index": index_name}
+    ).scalar()
+
+
+def ensure_hnsw_index(
+    connection: Connection,
+    collection_name: str,
+    mode: Optional[str] = None,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    drop_others: bool = False
+) -> Dict[str, Any]:
+    """
+    Cria (se não existir) o índice HNSW parcial da coleção.
+
+    Um índice com o nome esperado mas predicado de outro collection_id (coleção
+    recriada com novo uuid) é removido e recriado.
+
+    Args:
+        connection: Conexão PostgreSQL (o chamador controla a transação)
+        collection_name: Nome da coleção no PGVector
+        mode: "none", "halfvec" ou "binary" (padrão: collection_quantization)
+        m: Vizinhos por nó do grafo (padrão: settings.RAG_HNSW_M)
+        ef_construction: Lista de candidatos na construção (padrão: settings.RAG_HNSW_EF_CONSTRUCTION)
+        drop_others: Remover os índices da coleção nos outros modos (troca de modo)
+
+    Returns:
+        dict: index, mode, created e replaced (quando recriado); skipped com o motivo quando nada foi feito
+    """
+    mode = mode or collection_quantization(collection_name)
+    index_name = hnsw_index_name(collection_name, mode)
+    result: Dict[str, Any] = {"index": index_name, "mode": mode, "created": False}
+    if connection.dialect.name != "postgresql":
+        return {**result, "skipped": "PGVector requer PostgreSQL"}
+    if connection.execute(text("SELECT to_regclass(:table)"), {"table": EMBEDDING_TABLE}).scalar() is None:
+        return {**result, "skipped": "tabela do PGVector ainda não criada"}
+
+    collection_id = connection.execute(
+        text(f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name"), {"name": collection_name}
+    ).scalar()
+    if collection_id is None:
+        return {**result, "skipped": "coleção ainda não criada"}
+
+    definition = connection.execute(
+        text("SELECT pg_get_indexdef(to_regclass(:index))"), {"index": index_name}
+    ).scalar()
+    if definition is not None and str(collection_id) not in definition:
+        # Coleção recriada (novo uuid): o predicado antigo não casa mais com as consultas
+        connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        result["replaced"] = True
+        logger.info("Índice HNSW de uuid antigo removido", extra={"index": index_name, "collection": collection_name})
+        definition = None
+
+    if definition is None:
+        dimension = _fixed_dimension(connection)
+        if dimension is None:
+            return {**result, "skipped": "coleção sem vetores (dimensão desconhecida)"}
+
+        expression, opclass = _INDEX_EXPRESSIONS[mode]
+        # uuid vem do banco (tipo uuid): seguro como literal, e o predicado literal
+        # é o que permite ao planner casar o índice parcial com o filtro do PGVector
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON {EMBEDDING_TABLE} "
+            f"USING hnsw ({expression.format(dim=dimension)} {opclass}) "
+            f"WITH (m = {int(m or settings.RAG_HNSW_M)}, "
+            f"ef_construction = {int(ef_construction or settings.RAG_HNSW_EF_CONSTRUCTION)}) "
+            f"WHERE collection_id = '{collection_id}'"
+        ))
+        result["created"] = True
+        logger.info("Índice HNSW criado", extra={"index": index_name, "collection": collection_name, "mode": mode})
+
+    if drop_others:
+        for other in QUANTIZATION_MODES:
+            if other != mode:
+                connection.execute(text(f"DROP INDEX IF EXISTS {hnsw_index_name(collection_name, other)}"))
+    return result
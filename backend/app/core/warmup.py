@@ -0,0 +1,186 @@
+"""
+Aquecimento em segundo plano e gate de prontidão.
+
+No startup, uma thread carrega o modelo de embeddings (com um encode de
+teste), inicializa o vector store (PGVector, ou o local fora do
+PostgreSQL) e pré-abre as conexões do pool do banco. O
+endpoint /health/ready só responde 200 depois que as etapas obrigatórias
+terminam, para o load balancer segurar o tráfego até lá; /health/live
+responde sempre, sem depender de nada disso.
+
+A última etapa sincroniza a base de conhecimento do Chef Virtual se o
+catálogo mudou desde a última carga (e carrega o estado da coleção em
+memória para a checagem do chat).
+
+Etapas opcionais (PGVector, base de conhecimento) que falham não bloqueiam a prontidão: a
+aplicação funciona sem o Chef Virtual, como já acontecia antes.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Texto do encode de aquecimento (força a alocação dos buffers do modelo)
+WARMUP_TEXT = "aquecimento do modelo de embeddings"
+
+
+def _warm_embedding_model() -> Dict[str, Any]:
+    from app.core.embeddings import encode_texts, get_embedding_model, get_model_id
+
+    if settings.INFERENCE_SIDECAR_SOCKET:
+        # Modelo fica no sidecar: só confirma que ele responde
+        vectors = encode_texts([WARMUP_TEXT])
+        return {"model": get_model_id(), "dimension": int(vectors.shape[1]), "sidecar": settings.INFERENCE_SIDECAR_SOCKET}
+
+    get_embedding_model()
+    vectors = encode_texts([WARMUP_TEXT])
+    return {"model": get_model_id(), "dimension": int(vectors.shape[1])}
+
+
+def _warm_vector_store() -> Dict[str, Any]:
+    from app.core.rag_service import RAGService, uses_pgvector
+    from app.database.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        RAGService(db, settings.DATABASE_URL, validate=True, initialize_vector_store=True)
+    finally:
+        db.close()
+    return {"backend": "pgvector" if uses_pgvector(settings.DATABASE_URL) else "local"}
+
+
+def _sync_knowledge_base() -> Dict[str, Any]:
+    from app.core.knowledge_base import sync_knowledge_base
+    from app.core.rag_service import RAGService
+    from app.database.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rag_service = RAGService(db, settings.DATABASE_URL, validate=True, initialize_vector_store=True)
+        status = sync_knowledge_base(db, rag_service)
+    finally:
+        db.close()
+    return {"documents": status["document_count"], "synced": status["synced"]}
+
+
+def _prefill_db_pool() -> Dict[str, Any]:
+    from app.database.base import engine
+
+    size_fn = getattr(engine.pool, "size", None)
+    target = size_fn() if callable(size_fn) else 1
+    connections = []
+    try:
+        for _ in range(target):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        # Devolver ao pool mantém as conexões abertas para as próximas requisições
+        for connection in connections:
+            connection.close()
+    return {"connections": len(connections)}
+
+
+# (nome, função, obrigatória para prontidão)
+DEFAULT_STEPS: List[Tuple[str, Callable[[], Dict[str, Any]], bool]] = [
+    ("db_pool", _prefill_db_pool, True),
+    ("embedding_model", _warm_embedding_model, True),
+    ("vector_store", _warm_vector_store, False),
+    ("knowledge_base", _sync_knowledge_base, False),
+]
+
+
+class WarmupState:
+    """Estado thread-safe das etapas de aquecimento."""
+
+    def __init__(self, steps: List[Tuple[str, Callable[[], Dict[str, Any]], bool]]):
+        self._steps = steps
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[str] = None
+        self.finished = False
+        self.status: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "required": required} for name, _, required in steps
+        }
+
+    def _update(self, name: str, **values) -> None:
+        with self._lock:
+            self.status[name].update(values)
+
+    def run(self) -> None:
+        """Executa as etapas em sequência (bloqueante)."""
+        self.started_at = datetime.utcnow().isoformat() + "Z"
+        for name, step, required in self._steps:
+            self._update(name, status="running")
+            start = time.perf_counter()
+            try:
+                details = step() or {}
+                status = "skipped" if "skipped" in details else "ok"
+                self._update(name, status=status, seconds=round(time.perf_counter() - start, 3), **details)
+                logger.info(f"Aquecimento: {name} {status}", extra={"step": name, **details})
+            except Exception as e:
+                self._update(name, status="error", seconds=round(time.perf_counter() - start, 3), error=str(e)[:200])
+                log = logger.error if required else logger.warning
+                log(f"Aquecimento: falha em {name}: {e}", extra={"step": name})
+        with self._lock:
+            self.finished = True
+
+    def start(self) -> None:
+        """Dispara run() em uma thread daemon (idempotente)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def skip_all(self) -> None:
+        """Marca todas as etapas como puladas (aquecimento desativado)."""
+        with self._lock:
+            for step in self.status.values():
+                step["status"] = "skipped"
+            self.finished = True
+
+    def is_ready(self) -> bool:
+        """Pronto quando todas as etapas obrigatórias concluíram com sucesso."""
+        with self._lock:
+            return all(
+                step["status"] in ("ok", "skipped")
+                for step in self.status.values() if step["required"]
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "finished": self.finished,
+                "steps": {name: dict(step) for name, step in self.status.items()},
+            }
+
+
+_state = WarmupState(DEFAULT_STEPS)
+
+
+def get_warmup_state() -> WarmupState:
+    """Retorna o estado de aquecimento do processo."""
+    return _state
+
+
+def start_warmup() -> None:
+    """
+    Inicia o aquecimento em segundo plano.
+
+    Com WARMUP_ON_STARTUP=false as etapas são marcadas como puladas e o
+    processo fica pronto imediatamente (carregamento lazy como antes).
+    """
+    if not settings.WARMUP_ON_STARTUP:
+        _state.skip_all()
+        return
+    _state.start()
@@ -2,10 +2,14 @@
 Operações CRUD (Create, Read, Update, Delete) para o TasteMatch.
 """
 
+import hashlib
+import json
+import re
+import threading
 from sqlalchemy.orm import Session, joinedload, selectinload, load_only
-from sqlalchemy import select
-from typing import Optional, List, Dict, Any
-from app.database.models import User, Restaurant, Order, Recommendation, UserPreferences, ChatMessage, LLMMetric
+from sqlalchemy import select, func, insert, and_, or_, case, literal_column, text
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Union
+from app.database.models import User, Restaurant, Order, Recommendation, UserPreferences, ChatMessage, LLMMetric, CuisineCentroid
 from app.models.user import UserCreate
 from app.models.restaurant import RestaurantCreate
 from app.models.order import OrderCreate
@@ -98,10 +102,13 @@ def get_restaurants_for_similarity(
         restaurant_ids: Lista opcional de IDs específicos (para buscar apenas restaurantes pedidos)
         
     Returns:
-        Lista de objetos Restaurant (apenas com id, embedding, rating carregados)
+        Lista de objetos Restaurant (apenas id, embeddings com versão, rating e culinária carregados)
     """
     query = db.query(Restaurant).options(
-        load_only(Restaurant.id, Restaurant.embedding, Restaurant.rating, Restaurant.cuisine_type)
+        load_only(
+            Restaurant.id, Restaurant.embedding, Restaurant.rating, Restaurant.cuisine_type,
+            Restaurant.embedding_model, Restaurant.embedding_next, Restaurant.embedding_next_model
+        )
     )
     
     if restaurant_ids:
@@ -116,36 +123,176 @@ def get_restaurants_for_similarity(
     return query.all()
 
 
-def get_restaurants(
+def get_restaurants_by_ids(db: Session, restaurant_ids: List[int]) -> List[Restaurant]:
+    """
+    Busca restaurantes por uma lista de IDs preservando a ordem recebida.
+    
+    IDs inexistentes (ex: restaurantes removidos) são ignorados.
+    """
+    if not restaurant_ids:
+        return []
+    
+    stmt = select(Restaurant).where(Restaurant.id.in_(restaurant_ids))
+    restaurants_by_id = {r.id: r for r in db.execute(stmt).scalars()}
+    return [restaurants_by_id[rid] for rid in restaurant_ids if rid in restaurants_by_id]
+
+
+def get_catalog_version(db: Session) -> str:
+    """
+    Versão barata do catálogo de restaurantes (muda com inclusões, remoções e edições).
+
+    Returns:
+        str: 16 caracteres hex derivados de contagem, maior id e última atualização
+    """
+    count, max_id, last_update = db.execute(
+        select(func.count(Restaurant.id), func.max(Restaurant.id), func.max(Restaurant.updated_at))
+    ).one()
+    raw = f"{count}:{max_id}:{last_update}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# Recursos de busca textual por engine (coluna search_vector e pg_trgm, ver migração b9d4f6a8c1e3)
+_text_search_support: Dict[str, Dict[str, bool]] = {}
+_text_search_lock = threading.Lock()
+
+
+def get_text_search_support(db: Session) -> Dict[str, bool]:
+    """Detecta (uma vez por engine) o tsvector e o pg_trgm; SQLite usa ILIKE."""
+    bind = db.get_bind()
+    key = str(bind.url)
+    support = _text_search_support.get(key)
+    if support is None:
+        support = {"tsvector": False, "trigram": False}
+        if bind.dialect.name == "postgresql":
+            support["tsvector"] = db.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'restaurants' AND column_name = 'search_vector')"
+            )).scalar()
+            support["trigram"] = db.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+            )).scalar()
+        with _text_search_lock:
+            _text_search_support[key] = support
+    return support
+
+
+def search_terms(search: str) -> List[str]:
+    """Palavras da busca (letras/dígitos, 2+ caracteres), sem repetição e na ordem."""
+    terms = re.findall(r"\w+", search.lower())
+    return list(dict.fromkeys(term for term in terms if len(term) >= 2))
+
+
+def restaurant_search_clauses(
+    db: Session,
+    search: str,
+    match_any: bool = False
+) -> Tuple[Any, Any]:
+    """
+    Condição e relevância da busca textual em nome e descrição.
+
+    PostgreSQL: tsvector em português (índice GIN, prefixo em cada termo)
+    mais trigramas no nome (ILIKE e similaridade usam o índice pg_trgm).
+    Sem esses recursos (ou no SQLite): ILIKE por termo, relevância pelo nome.
+
+    Args:
+        db: Sessão do banco de dados
+        search: Texto buscado
+        match_any: True = qualquer termo (chat); False = todos os termos (listagem)
+
+    Returns:
+        tuple: (condição WHERE, expressão de relevância; maior = melhor)
+    """
+    terms = search_terms(search)
+    pattern = f"%{search.strip()}%"
+    support = get_text_search_support(db)
+
+    if support["tsvector"] and terms:
+        tsquery = func.to_tsquery("portuguese", (" | " if match_any else " & ").join(f"{t}:*" for t in terms))
+        search_vector = literal_column("restaurants.search_vector")
+        condition = search_vector.op("@@")(tsquery)
+        rank = func.ts_rank_cd(search_vector, tsquery)
+        if support["trigram"]:
+            condition = or_(condition, Restaurant.name.ilike(pattern), Restaurant.name.op("%")(search))
+            rank = rank + func.similarity(Restaurant.name, search)
+        rank = rank + case((Restaurant.name.ilike(pattern), 1.0), else_=0.0)
+        return condition, rank
+
+    per_term = [
+        or_(Restaurant.name.ilike(f"%{term}%"), Restaurant.description.ilike(f"%{term}%"))
+        for term in terms
+    ] or [or_(Restaurant.name.ilike(pattern), Restaurant.description.ilike(pattern))]
+    condition = or_(*per_term) if match_any else and_(*per_term)
+    rank = case((Restaurant.name.ilike(pattern), 2.0), else_=0.0) + sum(
+        (case((Restaurant.name.ilike(f"%{term}%"), 1.0), else_=0.0) for term in terms), 0.0
+    )
+    return condition, rank
+
+
+def restaurant_filters(
+    cuisine_type: Optional[Union[str, Sequence[str]]] = None,
+    min_rating: Optional[float] = None,
+    price_range: Optional[Union[str, Sequence[str]]] = None,
+    location: Optional[Union[str, Sequence[str]]] = None
+) -> list:
+    """Condições sobre colunas de restaurants (valor único ou lista de valores aceitos)."""
+    filters = []
+    for column, value in (
+        (Restaurant.cuisine_type, cuisine_type),
+        (Restaurant.price_range, price_range),
+        (Restaurant.location, location),
+    ):
+        if isinstance(value, str):
+            filters.append(column == value)
+        elif value:
+            filters.append(column.in_(list(value)))
+    if min_rating is not None:
+        filters.append(Restaurant.rating >= min_rating)
+    return filters
+
+
+def get_restaurant_locations(db: Session) -> List[str]:
+    """Localizações distintas do catálogo (para reconhecer bairros citados no chat)."""
+    return list(db.execute(
+        select(Restaurant.location).where(Restaurant.location.isnot(None)).distinct()
+    ).scalars())
+
+
+def invalidate_restaurant_locations() -> None:
+    """Descarta as localizações em cache (get_cached_restaurant_locations)."""
+    from app.core.cache import RESTAURANT_LOCATIONS_KEY, metadata_cache
+    metadata_cache.delete(RESTAURANT_LOCATIONS_KEY)
+
+
+def get_restaurants_page(
     db: Session,
     skip: int = 0,
     limit: int = 100,
-    cuisine_type: Optional[str] = None,
+    cuisine_type: Optional[Union[str, Sequence[str]]] = None,
     min_rating: Optional[float] = None,
-    price_range: Optional[str] = None,
+    price_range: Optional[Union[str, Sequence[str]]] = None,
     search: Optional[str] = None,
-    sort_by: Optional[str] = None
-) -> List[Restaurant]:
-    """Lista restaurantes com filtros opcionais e ordenação."""
-    stmt = select(Restaurant)
-    
-    # Filtros
-    if cuisine_type:
-        stmt = stmt.where(Restaurant.cuisine_type == cuisine_type)
-    
-    if min_rating is not None:
-        stmt = stmt.where(Restaurant.rating >= min_rating)
-    
-    if price_range:
-        stmt = stmt.where(Restaurant.price_range == price_range)
-    
-    if search:
-        # Busca textual no nome e descrição (case-insensitive)
-        search_pattern = f"%{search}%"
-        stmt = stmt.where(
-            (Restaurant.name.ilike(search_pattern)) |
-            (Restaurant.description.ilike(search_pattern))
-        )
+    sort_by: Optional[str] = None,
+    match_any: bool = False,
+    location: Optional[Union[str, Sequence[str]]] = None
+) -> Tuple[List[Restaurant], int]:
+    """
+    Página de restaurantes e total com os mesmos filtros, numa única consulta.
+
+    O total vem de count(*) over () na própria página. Com busca e sem
+    sort_by explícito, a ordem é por relevância (restaurant_search_clauses).
+    cuisine_type, price_range e location aceitam um valor ou uma lista.
+
+    Returns:
+        tuple: (restaurantes da página, total de restaurantes que atendem aos filtros)
+    """
+    filters = restaurant_filters(cuisine_type, min_rating, price_range, location)
+
+    rank = None
+    if search and search.strip():
+        condition, rank = restaurant_search_clauses(db, search, match_any)
+        filters.append(condition)
+
+    stmt = select(Restaurant, func.count().over().label("total")).where(*filters)
     
     # Ordenação
     if sort_by == "rating_desc":
@@ -156,23 +303,60 @@ def get_restaurants(
         stmt = stmt.order_by(Restaurant.name.asc())
     elif sort_by == "name_desc":
         stmt = stmt.order_by(Restaurant.name.desc())
+    elif rank is not None:
+        stmt = stmt.order_by(rank.desc(), Restaurant.rating.desc(), Restaurant.name.asc())
     else:
         # Default: ordenar por rating desc (maior primeiro)
         stmt = stmt.order_by(Restaurant.rating.desc(), Restaurant.name.asc())
     
-    stmt = stmt.offset(skip).limit(limit)
-    result = db.execute(stmt)
-    restaurants = list(result.scalars().all())
-    
-    # Garantir que não há duplicatas (mesmo ID) - segurança adicional
-    seen_ids = set()
-    unique_restaurants = []
-    for restaurant in restaurants:
-        if restaurant.id not in seen_ids:
-            unique_restaurants.append(restaurant)
-            seen_ids.add(restaurant.id)
-    
-    return unique_restaurants
+    # id como desempate: paginação estável entre páginas
+    stmt = stmt.order_by(Restaurant.id).offset(skip).limit(limit)
+    rows = db.execute(stmt).all()
+    if rows:
+        return [row[0] for row in rows], int(rows[0].total)
+    if skip == 0:
+        return [], 0
+    # Página além do fim: o total precisa de uma contagem própria
+    total = db.execute(select(func.count(Restaurant.id)).where(*filters)).scalar() or 0
+    return [], int(total)
+
+
+def get_restaurants(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cuisine_type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    price_range: Optional[str] = None,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None
+) -> List[Restaurant]:
+    """Lista restaurantes com filtros opcionais e ordenação."""
+    restaurants, _ = get_restaurants_page(
+        db,
+        skip=skip,
+        limit=limit,
+        cuisine_type=cuisine_type,
+        min_rating=min_rating,
+        price_range=price_range,
+        search=search,
+        sort_by=sort_by
+    )
+    return restaurants
+
+
+def _current_embedding_tag() -> str:
+    """Versão ("modelo@versão") dos vetores gerados por este processo."""
+    # Import tardio: app.core.embeddings depende da configuração, não do banco
+    from app.core.embeddings import get_embedding_tag
+    return get_embedding_tag()
+
+
+def _schedule_knowledge_base_sync(db: Session) -> None:
+    """Base de conhecimento do Chef Virtual e snapshot do catálogo acompanham o catálogo (em segundo plano)."""
+    # Import tardio: app.core.knowledge_base importa este módulo
+    from app.core.knowledge_base import schedule_knowledge_base_sync
+    schedule_knowledge_base_sync(db)
 
 
 def create_restaurant(db: Session, restaurant: RestaurantCreate, embedding: Optional[str] = None) -> Restaurant:
@@ -184,11 +368,17 @@ def create_restaurant(db: Session, restaurant: RestaurantCreate, embedding: Opti
         rating=float(restaurant.rating),
         price_range=restaurant.price_range,
         location=restaurant.location,
-        embedding=embedding
+        embedding=embedding,
+        embedding_model=_current_embedding_tag() if embedding else None
     )
     db.add(db_restaurant)
+    # Mesmo commit: centróide e restaurante nunca divergem
+    apply_restaurant_to_centroids(db, db_restaurant, embedding, sign=1, embedding_model=db_restaurant.embedding_model)
     db.commit()
+    invalidate_centroid_cache(db_restaurant.cuisine_type)
+    invalidate_restaurant_locations()
     db.refresh(db_restaurant)
+    _schedule_knowledge_base_sync(db)
     return db_restaurant
 
 
@@ -196,12 +386,124 @@ def update_restaurant_embedding(db: Session, restaurant_id: int, embedding: str)
     """Atualiza o embedding de um restaurante."""
     db_restaurant = db.get(Restaurant, restaurant_id)
     if db_restaurant:
+        # Troca a contribuição antiga pela nova nos centróides
+        # (o vetor antigo só sai se estava somado, isto é, se é da versão ativa)
+        apply_restaurant_to_centroids(
+            db, db_restaurant, db_restaurant.embedding, sign=-1, embedding_model=db_restaurant.embedding_model
+        )
+        apply_restaurant_to_centroids(db, db_restaurant, embedding, sign=1, embedding_model=_current_embedding_tag())
         db_restaurant.embedding = embedding
+        db_restaurant.embedding_model = _current_embedding_tag()
         db.commit()
+        invalidate_centroid_cache(db_restaurant.cuisine_type)
         db.refresh(db_restaurant)
     return db_restaurant
 
 
+# ==================== CUISINE CENTROIDS ====================
+
+# Mesmo critério dos restaurantes "arquétipo" do onboarding
+CENTROID_MIN_RATING = 4.0
+
+
+def get_cuisine_centroids(
+    db: Session,
+    cuisine_types: List[str],
+    price_range: str = "",
+    embedding_model: Optional[str] = None
+) -> List[CuisineCentroid]:
+    """Busca os centróides das culinárias (price_range "" = todas as faixas) na versão do modelo (padrão: ativa)."""
+    stmt = select(CuisineCentroid).where(
+        CuisineCentroid.cuisine_type.in_(cuisine_types),
+        CuisineCentroid.price_range == price_range,
+        CuisineCentroid.embedding_model == (embedding_model or _current_embedding_tag())
+    )
+    return list(db.execute(stmt).scalars())
+
+
+def apply_restaurant_to_centroids(
+    db: Session,
+    restaurant: Restaurant,
+    embedding: Optional[str],
+    sign: int = 1,
+    embedding_model: Optional[str] = None
+) -> None:
+    """
+    Soma (sign=1) ou subtrai (sign=-1) o embedding do restaurante nos centróides
+    da culinária (todas as faixas e faixa do restaurante). Não faz commit.
+    
+    Restaurantes abaixo de CENTROID_MIN_RATING ou sem embedding são ignorados,
+    assim como vetores de outra versão do modelo (embedding_model diferente
+    da tag ativa): só entram nos centróides da versão ativa.
+    """
+    tag = _current_embedding_tag()
+    if not embedding or float(restaurant.rating or 0) < CENTROID_MIN_RATING or embedding_model != tag:
+        return
+    try:
+        vector = json.loads(embedding) if isinstance(embedding, str) else embedding
+    except ValueError:
+        return
+    if not vector:
+        return
+    
+    price_keys = [""]
+    if restaurant.price_range:
+        price_keys.append(restaurant.price_range)
+    
+    for price_key in price_keys:
+        # FOR UPDATE evita perder somas concorrentes (ignorado no SQLite)
+        stmt = select(CuisineCentroid).where(
+            CuisineCentroid.cuisine_type == restaurant.cuisine_type,
+            CuisineCentroid.price_range == price_key,
+            CuisineCentroid.embedding_model == tag
+        ).with_for_update()
+        centroid = db.execute(stmt).scalar_one_or_none()
+        
+        if centroid is None:
+            if sign > 0:
+                db.add(CuisineCentroid(
+                    cuisine_type=restaurant.cuisine_type,
+                    price_range=price_key,
+                    vector_sum=json.dumps(list(vector)),
+                    embedding_model=tag,
+                    count=1
+                ))
+                # Garante que a segunda chave veja a linha nova no mesmo flush
+                db.flush()
+            continue
+        
+        current = json.loads(centroid.vector_sum)
+        if len(current) != len(vector):
+            # Dimensão diferente (troca de modelo): exige rebuild completo
+            continue
+        
+        centroid.count += sign
+        if centroid.count <= 0:
+            db.delete(centroid)
+            db.flush()
+        else:
+            centroid.vector_sum = json.dumps([a + sign * b for a, b in zip(current, vector)])
+
+
+def replace_cuisine_centroids(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Substitui todos os centróides (rebuild completo) em uma transação."""
+    db.query(CuisineCentroid).delete()
+    if rows:
+        db.execute(insert(CuisineCentroid), rows)
+    db.commit()
+    invalidate_centroid_cache()
+    return len(rows)
+
+
+def invalidate_centroid_cache(cuisine_type: Optional[str] = None) -> None:
+    """Descarta centróides em cache (de uma culinária ou todos)."""
+    from app.core.cache import centroid_cache
+    if cuisine_type is None:
+        centroid_cache.clear()
+    else:
+        centroid_cache.delete_prefix(f"centroid:{cuisine_type}:")
+
+
 # ==================== ORDERS ====================
 
 def get_order(db: Session, order_id: int) -> Optional[Order]:
@@ -263,6 +565,30 @@ def create_order(db: Session, order: OrderCreate, user_id: int) -> Order:
     return db_order
 
 
+def get_feed_state(db: Session, user_id: int) -> Tuple[Any, ...]:
+    """
+    Estado que determina o ranking do feed do usuário, numa única query.
+
+    Returns:
+        Tuple: (pedidos do usuário, maior id de pedido, restaurantes,
+        maior id de restaurante, última atualização do catálogo,
+        última atualização e versão do modelo das preferências do usuário)
+    """
+    user_orders = select(Order.id).where(Order.user_id == user_id).subquery()
+    preferences = select(UserPreferences).where(UserPreferences.user_id == user_id).subquery()
+    stmt = select(
+        select(func.count(user_orders.c.id)).scalar_subquery(),
+        select(func.max(user_orders.c.id)).scalar_subquery(),
+        select(func.count(Restaurant.id)).scalar_subquery(),
+        select(func.max(Restaurant.id)).scalar_subquery(),
+        select(func.max(Restaurant.updated_at)).scalar_subquery(),
+        # Onboarding, rebuild em lote e promoção de modelo regravam o vetor do usuário
+        select(preferences.c.last_updated).scalar_subquery(),
+        select(preferences.c.embedding_model).scalar_subquery()
+    )
+    return tuple(db.execute(stmt).one())
+
+
 # ==================== RECOMMENDATIONS ====================
 
 def get_recommendation(
@@ -323,13 +649,20 @@ def create_or_update_user_preferences(
     db: Session,
     user_id: int,
     preference_embedding: str,
-    favorite_cuisines: Optional[str] = None
+    favorite_cuisines: Optional[str] = None,
+    embedding_model: Optional[str] = None
 ) -> UserPreferences:
-    """Cria ou atualiza preferências de um usuário."""
+    """
+    Cria ou atualiza preferências de um usuário.
+    
+    embedding_model é a versão do vetor (padrão: versão ativa deste processo).
+    """
+    embedding_model = embedding_model or _current_embedding_tag()
     existing = get_user_preferences(db, user_id)
     
     if existing:
         existing.preference_embedding = preference_embedding
+        existing.embedding_model = embedding_model
         if favorite_cuisines:
             existing.favorite_cuisines = favorite_cuisines
         db.commit()
@@ -339,7 +672,8 @@ def create_or_update_user_preferences(
         db_preferences = UserPreferences(
             user_id=user_id,
             preference_embedding=preference_embedding,
-            favorite_cuisines=favorite_cuisines
+            favorite_cuisines=favorite_cuisines,
+            embedding_model=embedding_model
         )
         db.add(db_preferences)
         db.commit()
@@ -347,6 +681,56 @@ def create_or_update_user_preferences(
         return db_preferences
 
 
+def bulk_upsert_user_preferences(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insere ou atualiza preferências de vários usuários em um único statement.
+    
+    Usa INSERT ... ON CONFLICT (user_id) DO UPDATE no PostgreSQL e SQLite.
+    favorite_cuisines None preserva o valor existente (mesma regra de
+    create_or_update_user_preferences).
+    
+    Args:
+        db: Sessão do banco de dados
+        rows: Dicts com user_id, preference_embedding (JSON), favorite_cuisines (JSON ou None)
+            e, opcionalmente, embedding_model (padrão: versão ativa)
+        
+    Returns:
+        Número de linhas enviadas
+    """
+    if not rows:
+        return 0
+    
+    tag = _current_embedding_tag()
+    rows = [{**row, "embedding_model": row.get("embedding_model") or tag} for row in rows]
+    
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # Dialeto sem upsert nativo: caminho linha a linha
+        for row in rows:
+            create_or_update_user_preferences(db, **row)
+        return len(rows)
+    
+    stmt = insert(UserPreferences)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserPreferences.user_id],
+        set_={
+            "preference_embedding": stmt.excluded.preference_embedding,
+            "embedding_model": stmt.excluded.embedding_model,
+            "favorite_cuisines": func.coalesce(
+                stmt.excluded.favorite_cuisines, UserPreferences.favorite_cuisines
+            ),
+            "last_updated": func.now(),
+        }
+    )
+    db.execute(stmt, rows)
+    db.commit()
+    return len(rows)
+
+
 # ==================== CHAT MESSAGES ====================
 
 def create_chat_message(
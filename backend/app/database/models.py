@@ -3,7 +3,7 @@ Modelos SQLAlchemy (ORM) para o TasteMatch.
 Define todas as tabelas do banco de dados.
 """
 
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DECIMAL, DateTime, ForeignKey, JSON, Boolean, UniqueConstraint
 from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -43,8 +43,13 @@ class Restaurant(Base):
     price_range = Column(String(10), nullable=True)  # "low", "medium", "high"
     location = Column(String(255), nullable=True)
     embedding = Column(Text, nullable=True)  # JSON serializado para SQLite, Vector(384) para PostgreSQL
+    embedding_hash = Column(String(64), nullable=True)  # sha256(modelo + texto embedado), ver embedding_job
+    embedding_model = Column(String(255), nullable=True)  # "modelo@versão" de embedding (None = outra versão)
+    embedding_next = Column(Text, nullable=True)  # Vetor do próximo modelo durante a migração (embedding_migration)
+    embedding_next_model = Column(String(255), nullable=True)  # "modelo@versão" de embedding_next
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # search_vector (tsvector gerado, só PostgreSQL) não é mapeado: usado em crud.restaurant_search_clauses
     
     # Relacionamentos
     orders = relationship("Order", back_populates="restaurant")
@@ -96,6 +101,7 @@ class UserPreferences(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False, index=True)
     preference_embedding = Column(Text, nullable=False)  # JSON array do embedding agregado
+    embedding_model = Column(String(255), nullable=True)  # "modelo@versão" do vetor (None = outra versão)
     favorite_cuisines = Column(Text, nullable=True)  # JSON array
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -140,3 +146,59 @@ class LLMMetric(Base):
     # Relacionamentos
     user = relationship("User", back_populates="llm_metrics")
 
+
+class CuisineCentroid(Base):
+    """
+    Centróide pré-computado por culinária (e faixa de preço) para o onboarding.
+    
+    Guarda a soma dos embeddings e a contagem dos restaurantes bem avaliados,
+    o que permite atualização incremental e combinação de várias culinárias.
+    Uma linha por versão do modelo: somas de modelos diferentes nunca se misturam.
+    """
+    
+    __tablename__ = "cuisine_centroids"
+    __table_args__ = (
+        UniqueConstraint("cuisine_type", "price_range", "embedding_model", name="uq_cuisine_centroids_cuisine_price_model"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cuisine_type = Column(String(100), nullable=False, index=True)
+    price_range = Column(String(10), nullable=False, default="")  # "" = todas as faixas de preço
+    vector_sum = Column(Text, nullable=False)  # JSON array com a soma dos embeddings
+    embedding_model = Column(String(255), nullable=False, default="")  # "modelo@versão" dos vetores somados
+    count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class KnowledgeBaseStatus(Base):
+    """
+    Estado de sincronização de uma coleção do vector store do Chef Virtual.
+    
+    Atualizado pelo processo de sincronização da base de conhecimento; os
+    workers mantêm uma cópia em memória (checagem de população sem consultar
+    o vector store).
+    """
+    
+    __tablename__ = "knowledge_base_status"
+    
+    collection_name = Column(String(255), primary_key=True)
+    document_count = Column(Integer, nullable=False, default=0)
+    sync_version = Column(String(64), nullable=True)  # Versão do catálogo sincronizada
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class KnowledgeBaseDocument(Base):
+    """
+    Documento indexado numa coleção do vector store, com id estável e hash do conteúdo.
+    
+    A sincronização incremental compara estes hashes com os documentos
+    gerados do catálogo: só os alterados são recodificados e os que sumiram
+    são removidos do vector store.
+    """
+    
+    __tablename__ = "knowledge_base_documents"
+    
+    collection_name = Column(String(255), primary_key=True)
+    document_id = Column(String(255), primary_key=True)  # restaurant:{id}, static:{seção}, user:{id}:{tipo}
+    content_hash = Column(String(64), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -315,6 +315,28 @@ async def health_check():
     return health_status
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Liveness probe: o processo está de pé (não consulta banco nem modelo).
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 apenas após o aquecimento (modelo de embeddings e
+    pool do banco); 503 enquanto ele não termina ou se uma etapa obrigatória falhou.
+    """
+    from app.core.warmup import get_warmup_state
+    
+    state = get_warmup_state()
+    ready = state.is_ready()
+    body = {"status": "ready" if ready else "warming_up", **state.snapshot()}
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
 @app.get("/")
 async def root():
     """
@@ -368,6 +390,10 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Erro crítico ao inicializar bancos de dados: {str(e)}", exc_info=True)
         logger.error("⚠️  Aplicação iniciada, mas bancos de dados podem não estar disponíveis")
+    
+    # Aquecer modelo, PGVector e pool em segundo plano (gate em /health/ready)
+    from app.core.warmup import start_warmup
+    start_warmup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+"""
+Benchmark da busca vetorial do Chef Virtual: tamanho do índice, latência e
+recall@k do HNSW contra a busca exata, para cada modo de quantização do
+primeiro estágio (none, halfvec, binary) e cada valor de hnsw.ef_search.
+
+A busca exata é a mesma consulta do PGVector com o índice desligado
+(enable_indexscan = off). As consultas são perguntas típicas do chat (ou
+um arquivo com uma consulta por linha); os vetores são calculados uma vez.
+Os deltas de cada modo são relativos a "none" no mesmo ef_search. Índices
+criados só para o benchmark (modos diferentes do configurado na coleção)
+são removidos no final, exceto com --keep-indexes.
+
+Uso:
+    python scripts/benchmark_vector_search.py --k 10
+    python scripts/benchmark_vector_search.py --quantization none,halfvec,binary --candidates 40 --output hnsw.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.config import settings
+from app.database.base import SessionLocal
+from app.core.rag_service import DEFAULT_COLLECTION_NAME, RAGService, hnsw_search
+from app.core.vector_index import (
+    QUANTIZATION_MODES,
+    collection_quantization,
+    ensure_hnsw_index,
+    index_size,
+)
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+DEFAULT_QUERIES = [
+    "quero comer sushi hoje",
+    "restaurante italiano com massa fresca",
+    "algo apimentado e barato",
+    "hambúrguer artesanal perto de mim",
+    "comida vegetariana saudável",
+    "churrascaria com rodízio",
+    "onde tomar um café da manhã",
+    "comida árabe com esfiha",
+    "tacos e burritos",
+    "qual a política de cancelamento de pedidos",
+    "lugar romântico para jantar",
+    "comida caseira brasileira",
+]
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_modes(value: str) -> List[str]:
+    modes = [v.strip() for v in value.split(",") if v.strip()]
+    invalid = [mode for mode in modes if mode not in QUANTIZATION_MODES]
+    if invalid:
+        raise argparse.ArgumentTypeError(f"Modos inválidos: {', '.join(invalid)}")
+    return modes
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Latência e recall@k do índice HNSW do PGVector")
+    parser.add_argument("--k", type=int, default=10, help="Tamanho do top avaliado (padrão: 10)")
+    parser.add_argument("--ef-search", type=parse_int_list, default=[20, 40, 80, 160],
+                        help="Valores de hnsw.ef_search a testar (padrão: 20,40,80,160)")
+    parser.add_argument("--quantization", type=parse_modes, default=["none"],
+                        help="Modos do primeiro estágio a comparar (padrão: none)")
+    parser.add_argument("--candidates", type=int, default=None,
+                        help="Candidatos reordenados nos modos quantizados (padrão: RAG_RERANK_CANDIDATES)")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Manter os índices criados para o benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições de cada consulta (padrão: 3)")
+    parser.add_argument("--queries-file", default=None, help="Arquivo com uma consulta por linha")
+    parser.add_argument("--collection", default=DEFAULT_COLLECTION_NAME, help="Coleção do PGVector")
+    parser.add_argument("--output", default=None, help="Salvar relatório JSON neste arquivo")
+    return parser.parse_args(argv)
+
+
+def run_queries(vector_store, vectors: List[List[float]], k: int, repeat: int, **params) -> Dict[str, Any]:
+    """Executa as consultas e devolve os tops (chave: texto do documento) e as latências."""
+    tops, latencies = [], []
+    with hnsw_search(**params):
+        for vector in vectors:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = vector_store.similarity_search_by_vector(vector, k=k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            tops.append([doc.page_content for doc in results])
+    return {
+        "tops": tops,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal do benchmark."""
+    args = parse_args(argv)
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        queries = [line.strip() for line in Path(args.queries_file).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    db = SessionLocal()
+    created: List[str] = []
+    engine = db.get_bind()
+    try:
+        rag = RAGService(db, settings.DATABASE_URL, validate=True)
+        rag.initialize_vector_store(args.collection)
+        vector_store = rag.vector_store
+        configured = collection_quantization(args.collection)
+
+        sizes: Dict[str, Optional[int]] = {}
+        for mode in args.quantization:
+            with engine.begin() as connection:
+                index = ensure_hnsw_index(connection, args.collection, mode=mode)
+                sizes[mode] = index_size(connection, index["index"])
+            if index.get("skipped"):
+                logger.warning(f"⚠️  Sem índice {mode} ({index['skipped']}); resultados equivalem à busca exata")
+            elif index["created"] and mode != configured:
+                created.append(index["index"])
+            logger.info(f"📇 Índice {mode}: {index['index']} ({(sizes[mode] or 0) / 1024:.0f} KB)")
+
+        logger.info(f"🧠 Calculando vetores de {len(queries)} consultas...")
+        vectors = rag.embeddings.embed_documents(queries)
+
+        logger.info("=" * 60)
+        exact = run_queries(vector_store, vectors, args.k, args.repeat, exact=True)
+        logger.info(f"🎯 Exata: p50 {exact['p50_ms']}ms | p95 {exact['p95_ms']}ms")
+
+        report: Dict[str, Any] = {
+            "generated_at": datetime.utcnow().isoformat(),
+            "collection": args.collection,
+            "configured_quantization": configured,
+            "k": args.k,
+            "queries": len(queries),
+            "exact": {"p50_ms": exact["p50_ms"], "p95_ms": exact["p95_ms"]},
+            "index_bytes": sizes,
+            "hnsw": [],
+        }
+        baseline: Dict[int, Dict[str, Any]] = {}
+        for mode in args.quantization:
+            for ef_search in args.ef_search:
+                approx = run_queries(
+                    vector_store, vectors, args.k, args.repeat,
+                    ef_search=ef_search, quantization=mode, candidates=args.candidates
+                )
+                recall = float(np.mean([
+                    len(set(found) & set(expected)) / max(len(expected), 1)
+                    for found, expected in zip(approx["tops"], exact["tops"])
+                ]))
+                entry: Dict[str, Any] = {
+                    "quantization": mode,
+                    "ef_search": ef_search,
+                    "recall": round(recall, 4),
+                    "p50_ms": approx["p50_ms"],
+                    "p95_ms": approx["p95_ms"],
+                }
+                if mode == "none":
+                    baseline[ef_search] = entry
+                elif ef_search in baseline:
+                    entry["recall_delta"] = round(entry["recall"] - baseline[ef_search]["recall"], 4)
+                    entry["p50_delta_ms"] = round(entry["p50_ms"] - baseline[ef_search]["p50_ms"], 2)
+                report["hnsw"].append(entry)
+
+                delta = ""
+                if "recall_delta" in entry:
+                    delta = f" | Δrecall {entry['recall_delta']:+.3f} | Δp50 {entry['p50_delta_ms']:+.2f}ms"
+                logger.info(
+                    f"⚡ {mode} ef_search={ef_search}: recall@{args.k} {recall:.3f} | "
+                    f"p50 {approx['p50_ms']}ms | p95 {approx['p95_ms']}ms{delta}"
+                )
+        logger.info("=" * 60)
+
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+            logger.info(f"💾 Relatório salvo em {args.output}")
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro durante benchmark da busca vetorial: {str(e)}", exc_info=True)
+        return False
+    finally:
+        if created and not args.keep_indexes:
+            with engine.begin() as connection:
+                for index_name in created:
+                    connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            logger.info(f"🧹 Índices do benchmark removidos: {', '.join(created)}")
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
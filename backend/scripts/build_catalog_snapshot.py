@@ -0,0 +1,63 @@
+"""
+Gera e publica o snapshot do catálogo mapeado em memória (CATALOG_SNAPSHOT_DIR).
+
+Os workers do host trocam para a nova versão automaticamente. Rodar após
+cargas de restaurantes (o job de embeddings já publica ao final).
+
+Uso:
+    python scripts/build_catalog_snapshot.py
+    python scripts/build_catalog_snapshot.py --dir /var/lib/tastematch/catalog
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.config import settings
+from app.database.base import SessionLocal
+from app.core.catalog_snapshot import write_catalog_snapshot
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Snapshot do catálogo para ranking em memória compartilhada")
+    parser.add_argument("--dir", default=settings.CATALOG_SNAPSHOT_DIR,
+                        help="Diretório do snapshot (padrão: CATALOG_SNAPSHOT_DIR)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da geração do snapshot."""
+    args = parse_args(argv)
+    if not args.dir:
+        logger.error("❌ Informe --dir ou configure CATALOG_SNAPSHOT_DIR")
+        return False
+
+    logger.info(f"📦 Gerando snapshot do catálogo em {args.dir}...")
+    db = SessionLocal()
+    try:
+        stats = write_catalog_snapshot(db, args.dir)
+        if stats["changed"]:
+            logger.info(f"✅ Versão {stats['version']} publicada ({stats['restaurants']} restaurantes, dim {stats['dimension']})")
+        else:
+            logger.info(f"✅ Catálogo inalterado, versão ativa: {stats['version']}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao gerar snapshot: {str(e)}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
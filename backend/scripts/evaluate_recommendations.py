@@ -0,0 +1,476 @@
+"""
+Avaliação offline de qualidade e latência das recomendações.
+
+Reproduz o histórico de pedidos com divisão temporal (treino = pedidos antes
+do corte, teste = pedidos depois) e ranqueia o catálogo para todos os
+usuários de teste em lote. Reporta precision@k, recall@k, cobertura,
+novidade e distribuição de latência por usuário para cada ranker.
+
+Rankers disponíveis:
+- embedding: réplica vetorizada de generate_recommendations (embedding do
+  usuário = média ponderada dos pedidos de treino, coseno com o catálogo,
+  exclusão dos 10 restaurantes mais recentes, fallback para populares)
+- popular: restaurantes com maior rating (fallback de cold start)
+- live: chama generate_recommendations() usuário a usuário numa amostra.
+  Usa o estado atual do banco (preferências em cache e pedidos de teste),
+  portanto serve principalmente para medir latência do caminho de produção.
+
+Uso:
+    python scripts/evaluate_recommendations.py --k 10 --test-fraction 0.2
+    python scripts/evaluate_recommendations.py --rankers embedding,popular,live --live-sample 200
+    python scripts/evaluate_recommendations.py --split-date 2025-06-01 --output report.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.database.base import SessionLocal
+from app.database.models import Order, Restaurant
+from app.core.recommender import (
+    calculate_weights,
+    build_restaurant_matrix,
+    normalize_rows,
+    aggregate_user_embeddings,
+    rank_restaurants_batch,
+    generate_recommendations,
+    EMBEDDING_COLUMNS,
+)
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+# Mesmo valor usado por generate_recommendations (últimos 10 pedidos)
+RECENT_ORDERS_EXCLUDED = 10
+
+
+def load_orders(db: Session, include_simulation: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Carrega o histórico de pedidos como arrays NumPy (streaming do cursor).
+
+    Returns:
+        dict: user_id, restaurant_id, order_date (datetime64[s]) e rating (NaN = sem rating)
+    """
+    stmt = select(Order.user_id, Order.restaurant_id, Order.order_date, Order.rating)
+    if not include_simulation:
+        stmt = stmt.where(Order.is_simulation == False)  # noqa: E712
+    stmt = stmt.order_by(Order.user_id, Order.order_date)
+
+    user_ids: List[int] = []
+    restaurant_ids: List[int] = []
+    dates: List[datetime] = []
+    ratings: List[float] = []
+
+    result = db.execute(stmt.execution_options(yield_per=50_000))
+    for user_id, restaurant_id, order_date, rating in result:
+        if order_date.tzinfo is not None:
+            order_date = order_date.astimezone().replace(tzinfo=None)
+        user_ids.append(user_id)
+        restaurant_ids.append(restaurant_id)
+        dates.append(order_date)
+        ratings.append(np.nan if rating is None else float(rating))
+
+    return {
+        "user_id": np.asarray(user_ids, dtype=np.int64),
+        "restaurant_id": np.asarray(restaurant_ids, dtype=np.int64),
+        "order_date": np.asarray(dates, dtype="datetime64[s]"),
+        "rating": np.asarray(ratings, dtype=np.float64),
+    }
+
+
+def load_catalog(db: Session) -> Dict[str, np.ndarray]:
+    """Carrega id, rating e embedding de todo o catálogo."""
+    rows = db.execute(
+        select(Restaurant.id, Restaurant.rating, *EMBEDDING_COLUMNS)
+    ).all()
+
+    all_ids = np.asarray([r.id for r in rows], dtype=np.int64)
+    all_ratings = np.asarray([float(r.rating or 0) for r in rows], dtype=np.float64)
+    ids, matrix = build_restaurant_matrix(rows)
+
+    return {"all_ids": all_ids, "all_ratings": all_ratings, "ids": ids, "matrix": matrix}
+
+
+def lookup(sorted_keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Mapeia valores para a posição em sorted_keys (-1 quando ausente)."""
+    if sorted_keys.size == 0:
+        return np.full(values.shape, -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_keys, values)
+    positions = np.clip(positions, 0, sorted_keys.size - 1)
+    return np.where(sorted_keys[positions] == values, positions, -1)
+
+
+def latency_summary(latencies_ms: np.ndarray) -> Dict[str, float]:
+    """Resume a distribuição de latência por usuário."""
+    if latencies_ms.size == 0:
+        return {}
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    return {
+        "mean": round(float(latencies_ms.mean()), 4),
+        "p50": round(float(p50), 4),
+        "p90": round(float(p90), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(latencies_ms.max()), 4),
+    }
+
+
+def compute_metrics(
+    recommended: np.ndarray,
+    test_rows: np.ndarray,
+    test_items: np.ndarray,
+    n_users: int,
+    k: int,
+    catalog_size: int,
+    item_popularity: Dict[int, float],
+) -> Dict[str, float]:
+    """
+    Calcula precision@k, recall@k, cobertura e novidade de forma vetorizada.
+
+    Args:
+        recommended: IDs recomendados (u x k, -1 = posição vazia)
+        test_rows: Linha do usuário de cada par relevante (teste)
+        test_items: ID do restaurante de cada par relevante (teste)
+        n_users: Número de usuários avaliados
+        k: Tamanho da lista
+        catalog_size: Tamanho do catálogo (para cobertura)
+        item_popularity: Probabilidade de cada item no treino (para novidade)
+    """
+    stride = int(max(recommended.max(initial=0), test_items.max(initial=0))) + 1
+    test_keys = np.unique(test_rows * stride + test_items)
+    relevant_per_user = np.bincount(test_keys // stride, minlength=n_users)
+
+    valid = recommended >= 0
+    rec_keys = np.arange(n_users)[:, None] * stride + recommended
+    hits = (np.isin(rec_keys, test_keys) & valid).sum(axis=1)
+
+    evaluated = relevant_per_user > 0
+    precision = hits[evaluated] / float(k)
+    recall = hits[evaluated] / relevant_per_user[evaluated]
+
+    recommended_items = recommended[valid]
+    coverage = np.unique(recommended_items).size / catalog_size if catalog_size else 0.0
+
+    if recommended_items.size:
+        min_popularity = min(item_popularity.values()) if item_popularity else 1.0
+        popularity = np.asarray(
+            [item_popularity.get(int(i), min_popularity) for i in recommended_items]
+        )
+        novelty = float(np.mean(-np.log2(popularity)))
+    else:
+        novelty = 0.0
+
+    return {
+        "precision_at_k": round(float(precision.mean()) if precision.size else 0.0, 4),
+        "recall_at_k": round(float(recall.mean()) if recall.size else 0.0, 4),
+        "coverage": round(float(coverage), 4),
+        "novelty": round(novelty, 4),
+    }
+
+
+def popular_ranking(catalog: Dict[str, np.ndarray], k: int, min_rating: float) -> np.ndarray:
+    """Lista de populares (rating desc), igual para todos os usuários."""
+    eligible = catalog["all_ratings"] >= min_rating
+    ids = catalog["all_ids"][eligible]
+    ratings = catalog["all_ratings"][eligible]
+    order = np.argsort(-ratings, kind="stable")[:k]
+    top = np.full(k, -1, dtype=np.int64)
+    top[:order.size] = ids[order]
+    return top
+
+
+def run_popular(
+    test_users: np.ndarray,
+    catalog: Dict[str, np.ndarray],
+    k: int,
+    min_rating: float,
+) -> Dict[str, Any]:
+    """Ranker de populares (baseline)."""
+    start = time.perf_counter()
+    top = popular_ranking(catalog, k, min_rating)
+    recommended = np.tile(top, (test_users.size, 1))
+    elapsed = time.perf_counter() - start
+    latencies = np.full(test_users.size, elapsed * 1000 / max(test_users.size, 1))
+    return {"recommended": recommended, "latencies_ms": latencies, "seconds": elapsed}
+
+
+def run_embedding(
+    test_users: np.ndarray,
+    train: Dict[str, np.ndarray],
+    catalog: Dict[str, np.ndarray],
+    k: int,
+    min_rating: float,
+    cutoff: datetime,
+    chunk_size: int,
+) -> Dict[str, Any]:
+    """Réplica vetorizada de generate_recommendations sobre os pedidos de treino."""
+    start = time.perf_counter()
+
+    # Catálogo ordenado por ID (permite searchsorted)
+    id_order = np.argsort(catalog["ids"])
+    catalog_ids = catalog["ids"][id_order].astype(np.int64)
+    catalog_matrix = catalog["matrix"][id_order]
+
+    # Embeddings dos usuários: média ponderada por segmento
+    rows = lookup(catalog_ids, train["restaurant_id"])
+    weights = calculate_weights(train["order_date"], train["rating"], now=cutoff)
+    embedded_users, user_matrix = aggregate_user_embeddings(
+        train["user_id"], rows, weights, catalog_matrix
+    )
+
+    # Candidatos: restaurantes com rating mínimo
+    rating_by_id = dict(zip(catalog["all_ids"].tolist(), catalog["all_ratings"].tolist()))
+    eligible = np.asarray([rating_by_id.get(int(i), 0.0) >= min_rating for i in catalog_ids], dtype=bool)
+    candidate_ids = catalog_ids[eligible]
+    candidate_matrix = normalize_rows(catalog_matrix[eligible]) if eligible.any() else catalog_matrix[:0]
+
+    # Exclusão dos restaurantes dos últimos pedidos de cada usuário (treino ordenado por usuário e data)
+    user_rows = lookup(embedded_users, train["user_id"])
+    is_last_segment = np.r_[train["user_id"][1:] != train["user_id"][:-1], True]
+    position_from_end = np.zeros(train["user_id"].size, dtype=np.int64)
+    if train["user_id"].size:
+        segment_ends = np.flatnonzero(is_last_segment)
+        segment_of = np.searchsorted(segment_ends, np.arange(train["user_id"].size))
+        position_from_end = segment_ends[segment_of] - np.arange(train["user_id"].size)
+    recent = (position_from_end < RECENT_ORDERS_EXCLUDED) & (user_rows >= 0)
+    exclude_cols = lookup(candidate_ids, train["restaurant_id"][recent])
+    keep = exclude_cols >= 0
+    exclude = (user_rows[recent][keep], exclude_cols[keep])
+
+    setup_seconds = time.perf_counter() - start
+
+    # Ranking em blocos; latência por usuário = tempo do bloco / usuários do bloco
+    target_rows = lookup(embedded_users, test_users)
+    has_embedding = target_rows >= 0
+    ranked_rows = target_rows[has_embedding]
+
+    recommended = np.tile(popular_ranking(catalog, k, min_rating), (test_users.size, 1))
+    latencies = np.zeros(test_users.size, dtype=np.float64)
+
+    if ranked_rows.size and candidate_ids.size:
+        # Restringir exclusões aos usuários ranqueados e reindexar linhas
+        remap = np.full(embedded_users.size, -1, dtype=np.int64)
+        remap[ranked_rows] = np.arange(ranked_rows.size)
+        excl_rows = remap[exclude[0]]
+        excl_keep = excl_rows >= 0
+        ranked_positions = np.flatnonzero(has_embedding)
+
+        for chunk_start in range(0, ranked_rows.size, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, ranked_rows.size)
+            chunk_timer = time.perf_counter()
+
+            in_chunk = excl_keep & (excl_rows >= chunk_start) & (excl_rows < chunk_stop)
+            cols, _ = rank_restaurants_batch(
+                user_matrix[ranked_rows[chunk_start:chunk_stop]],
+                candidate_matrix,
+                k,
+                exclude=(excl_rows[in_chunk] - chunk_start, exclude[1][in_chunk]),
+                chunk_size=chunk_size,
+            )
+            chunk_ids = np.where(cols >= 0, candidate_ids[np.maximum(cols, 0)], -1)
+
+            positions = ranked_positions[chunk_start:chunk_stop]
+            recommended[positions] = chunk_ids
+            chunk_ms = (time.perf_counter() - chunk_timer) * 1000
+            latencies[positions] = chunk_ms / (chunk_stop - chunk_start)
+
+    # Custo fixo (carga e agregação) distribuído entre todos os usuários
+    latencies += setup_seconds * 1000 / max(test_users.size, 1)
+    elapsed = time.perf_counter() - start
+    return {
+        "recommended": recommended,
+        "latencies_ms": latencies,
+        "seconds": elapsed,
+        "users_with_embedding": int(has_embedding.sum()),
+    }
+
+
+def run_live(
+    db: Session,
+    test_users: np.ndarray,
+    k: int,
+    min_rating: float,
+    sample: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """Chama generate_recommendations() para uma amostra de usuários."""
+    rng = np.random.default_rng(seed)
+    positions = np.arange(test_users.size)
+    if sample and sample < test_users.size:
+        positions = np.sort(rng.choice(positions, size=sample, replace=False))
+
+    recommended = np.full((positions.size, k), -1, dtype=np.int64)
+    latencies = np.zeros(positions.size, dtype=np.float64)
+    start = time.perf_counter()
+
+    for i, position in enumerate(positions):
+        call_start = time.perf_counter()
+        recs = generate_recommendations(
+            user_id=int(test_users[position]),
+            db=db,
+            limit=k,
+            exclude_recent=True,
+            min_rating=min_rating,
+        )
+        latencies[i] = (time.perf_counter() - call_start) * 1000
+        ids = [rec["restaurant"].id for rec in recs][:k]
+        recommended[i, :len(ids)] = ids
+
+    return {
+        "recommended": recommended,
+        "latencies_ms": latencies,
+        "seconds": time.perf_counter() - start,
+        "positions": positions,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Avaliação offline das recomendações")
+    parser.add_argument("--k", type=int, default=10, help="Tamanho da lista avaliada (padrão: 10)")
+    parser.add_argument("--test-fraction", type=float, default=0.2,
+                        help="Fração mais recente dos pedidos usada como teste (padrão: 0.2)")
+    parser.add_argument("--split-date", type=str, default=None,
+                        help="Data de corte ISO (sobrepõe --test-fraction)")
+    parser.add_argument("--min-rating", type=float, default=3.0, help="Rating mínimo dos candidatos")
+    parser.add_argument("--rankers", type=str, default="embedding,popular",
+                        help="Rankers separados por vírgula: embedding, popular, live")
+    parser.add_argument("--live-sample", type=int, default=200,
+                        help="Usuários avaliados pelo ranker live (0 = todos)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Usuários por bloco de ranking")
+    parser.add_argument("--include-simulation", action="store_true",
+                        help="Incluir pedidos de demonstração (is_simulation)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente da amostra do ranker live")
+    parser.add_argument("--output", type=str, default=None, help="Salvar relatório JSON neste caminho")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da avaliação."""
+    args = parse_args(argv)
+    rankers = [r.strip() for r in args.rankers.split(",") if r.strip()]
+
+    db = SessionLocal()
+    try:
+        logger.info("📥 Carregando pedidos e catálogo...")
+        orders = load_orders(db, include_simulation=args.include_simulation)
+        catalog = load_catalog(db)
+
+        if orders["user_id"].size == 0:
+            logger.error("❌ Nenhum pedido encontrado para avaliar")
+            return False
+
+        # Divisão temporal
+        if args.split_date:
+            cutoff = datetime.fromisoformat(args.split_date)
+        else:
+            cutoff_value = np.quantile(
+                orders["order_date"].astype(np.int64), 1.0 - args.test_fraction
+            )
+            cutoff = datetime.utcfromtimestamp(int(cutoff_value))
+        is_test = orders["order_date"] >= np.datetime64(cutoff, "s")
+
+        train = {key: values[~is_test] for key, values in orders.items()}
+        test = {key: values[is_test] for key, values in orders.items()}
+
+        test_users = np.unique(test["user_id"])
+        test_rows = np.searchsorted(test_users, test["user_id"])
+
+        # Popularidade no treino (para novidade), com suavização de Laplace
+        n_train_users = max(np.unique(train["user_id"]).size, 1)
+        train_pairs = np.unique(np.stack([train["user_id"], train["restaurant_id"]]), axis=1)
+        item_ids, item_counts = np.unique(train_pairs[1], return_counts=True)
+        item_popularity = {
+            int(item): (count + 1) / (n_train_users + 1)
+            for item, count in zip(item_ids, item_counts)
+        }
+        for item in catalog["all_ids"].tolist():
+            item_popularity.setdefault(int(item), 1 / (n_train_users + 1))
+
+        logger.info(
+            f"📊 Corte em {cutoff.isoformat()}: {train['user_id'].size} pedidos de treino, "
+            f"{test['user_id'].size} de teste, {test_users.size} usuários avaliados, "
+            f"catálogo com {catalog['all_ids'].size} restaurantes"
+        )
+
+        report: Dict[str, Any] = {
+            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "k": args.k,
+            "cutoff": cutoff.isoformat(),
+            "train_orders": int(train["user_id"].size),
+            "test_orders": int(test["user_id"].size),
+            "test_users": int(test_users.size),
+            "catalog_size": int(catalog["all_ids"].size),
+            "rankers": {},
+        }
+
+        for ranker in rankers:
+            logger.info(f"⏳ Executando ranker '{ranker}'...")
+            if ranker == "popular":
+                result = run_popular(test_users, catalog, args.k, args.min_rating)
+                rows, items, n_users = test_rows, test["restaurant_id"], test_users.size
+            elif ranker == "embedding":
+                result = run_embedding(
+                    test_users, train, catalog, args.k, args.min_rating, cutoff, args.chunk_size
+                )
+                rows, items, n_users = test_rows, test["restaurant_id"], test_users.size
+            elif ranker == "live":
+                result = run_live(db, test_users, args.k, args.min_rating, args.live_sample, args.seed)
+                remap = np.full(test_users.size, -1, dtype=np.int64)
+                remap[result["positions"]] = np.arange(result["positions"].size)
+                rows = remap[test_rows]
+                items = test["restaurant_id"][rows >= 0]
+                rows = rows[rows >= 0]
+                n_users = result["positions"].size
+            else:
+                logger.warning(f"⚠️  Ranker desconhecido ignorado: {ranker}")
+                continue
+
+            metrics = compute_metrics(
+                result["recommended"], rows, items, n_users, args.k,
+                int(catalog["all_ids"].size), item_popularity
+            )
+            metrics["users"] = int(n_users)
+            metrics["total_seconds"] = round(result["seconds"], 3)
+            metrics["latency_ms"] = latency_summary(result["latencies_ms"])
+            if "users_with_embedding" in result:
+                metrics["users_with_embedding"] = result["users_with_embedding"]
+            report["rankers"][ranker] = metrics
+
+            logger.info(
+                f"   ✅ {ranker}: precision@{args.k}={metrics['precision_at_k']} "
+                f"recall@{args.k}={metrics['recall_at_k']} coverage={metrics['coverage']} "
+                f"novelty={metrics['novelty']} p50={metrics['latency_ms'].get('p50')}ms "
+                f"p99={metrics['latency_ms'].get('p99')}ms ({metrics['total_seconds']}s)"
+            )
+
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if args.output:
+            Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+            logger.info(f"💾 Relatório salvo em {args.output}")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro durante avaliação: {str(e)}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,135 @@
+"""
+Avalia a perda de recall@k da compressão de embeddings (PCA e/ou int8).
+
+Compara, para cada configuração, o top-k do primeiro estágio comprimido e
+do ranking em dois estágios (reordenação com vetores completos) contra o
+top-k exato por cosseno. As consultas são os vetores de preferência dos
+usuários (user_preferences); se houver poucos, usa restaurantes do próprio
+catálogo como consultas.
+
+Uso:
+    python scripts/evaluate_vector_compression.py --k 10
+    python scripts/evaluate_vector_compression.py --dims 64,128,192 --rerank 50,200 --output compression.json
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import select
+
+from app.database.base import SessionLocal
+from app.database.models import Restaurant, UserPreferences
+from app.core.recommender import EMBEDDING_COLUMNS, build_restaurant_matrix, normalize_rows, parse_embedding
+from app.core.vector_compression import evaluate_compression
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recall@k da compressão de embeddings")
+    parser.add_argument("--k", type=int, default=10, help="Tamanho do top avaliado (padrão: 10)")
+    parser.add_argument("--dims", type=parse_int_list, default=[64, 128, 192],
+                        help="Dimensões da PCA a testar, separadas por vírgula (padrão: 64,128,192)")
+    parser.add_argument("--rerank", type=parse_int_list, default=[50, 200],
+                        help="Candidatos reordenados a testar (padrão: 50,200)")
+    parser.add_argument("--queries", type=int, default=1000,
+                        help="Máximo de consultas avaliadas (padrão: 1000)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente da amostragem")
+    parser.add_argument("--output", default=None, help="Salvar relatório JSON neste arquivo")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da avaliação."""
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+
+    db = SessionLocal()
+    try:
+        logger.info("📥 Carregando catálogo e vetores de usuários...")
+        rows = db.execute(select(Restaurant.id, *EMBEDDING_COLUMNS)).all()
+        _, matrix = build_restaurant_matrix(rows)
+        if matrix.shape[0] == 0:
+            logger.error("❌ Nenhum restaurante com embedding")
+            return False
+        matrix = normalize_rows(matrix)
+
+        user_vectors = [
+            vector for vector in (
+                parse_embedding(value)
+                for value in db.execute(select(UserPreferences.preference_embedding)).scalars()
+            )
+            if vector is not None and len(vector) == matrix.shape[1]
+        ]
+        if len(user_vectors) >= args.k:
+            queries = normalize_rows(np.asarray(user_vectors, dtype=np.float32))
+            source = "user_preferences"
+        else:
+            queries = matrix
+            source = "catalog"
+        if queries.shape[0] > args.queries:
+            queries = queries[rng.choice(queries.shape[0], args.queries, replace=False)]
+
+        logger.info(
+            f"📊 Catálogo: {matrix.shape[0]} x {matrix.shape[1]}, "
+            f"{queries.shape[0]} consultas ({source})"
+        )
+
+        configs = [(dims, False) for dims in args.dims]
+        configs += [(None, True)] + [(dims, True) for dims in args.dims]
+
+        results: List[Dict[str, Any]] = []
+        for dims, quantize in configs:
+            for rerank in args.rerank:
+                result = evaluate_compression(matrix, queries, k=args.k, dims=dims, quantize=quantize, rerank=rerank)
+                results.append(result)
+                logger.info(
+                    f"   dims={result['dims']:>4} int8={'sim' if quantize else 'não':<3} rerank={rerank:>4} | "
+                    f"recall@{args.k} 1º estágio={result['recall_first_stage']:.4f} "
+                    f"reordenado={result['recall_reranked']:.4f} | "
+                    f"{result['bytes_per_vector']} B/vetor ({result['compression_ratio']}x) | "
+                    f"{result['compressed_ms_per_query']:.2f} ms vs exato {result['exact_ms_per_query']:.2f} ms"
+                )
+
+        if args.output:
+            report = {
+                "generated_at": datetime.utcnow().isoformat() + "Z",
+                "catalog_size": int(matrix.shape[0]),
+                "dimension": int(matrix.shape[1]),
+                "queries": int(queries.shape[0]),
+                "query_source": source,
+                "results": results,
+            }
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"💾 Relatório salvo em {args.output}")
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro durante avaliação: {str(e)}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,102 @@
+"""
+Exporta o modelo de embeddings (EMBEDDING_MODEL) para ONNX com quantização int8.
+
+Gera o diretório usado por EMBEDDING_BACKEND=onnx e compara a saída com o
+modelo PyTorch original (similaridade de cosseno por sentença).
+
+Uso:
+    python scripts/export_onnx_embeddings.py
+    python scripts/export_onnx_embeddings.py --output ./models/onnx-embeddings --no-quantize
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.config import settings
+from app.core.onnx_embeddings import OnnxSentenceEncoder, export_onnx_model
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+# Frases de verificação (domínio do app, português e inglês)
+PARITY_SENTENCES = [
+    "Restaurante japonês com sushi fresco e ambiente tranquilo",
+    "Pizzaria italiana com forno a lenha",
+    "Comida mineira caseira, feijão tropeiro e pão de queijo",
+    "Hamburgueria artesanal com opções vegetarianas",
+    "Quero algo leve e saudável para o almoço",
+    "Cheap Thai food near downtown",
+]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Exportação do modelo de embeddings para ONNX")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL,
+                        help="Modelo sentence-transformers (padrão: EMBEDDING_MODEL)")
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_PATH,
+                        help="Diretório de saída (padrão: EMBEDDING_ONNX_PATH)")
+    parser.add_argument("--no-quantize", action="store_true",
+                        help="Manter pesos em float32")
+    parser.add_argument("--opset", type=int, default=14, help="Versão do opset ONNX (padrão: 14)")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Similaridade mínima exigida contra o PyTorch (padrão: 0.99)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da exportação."""
+    args = parse_args(argv)
+
+    logger.info("=" * 60)
+    logger.info(f"📦 Exportando {args.model} para ONNX...")
+    logger.info("=" * 60)
+
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(args.model, device="cpu")
+        model.eval()
+        config = export_onnx_model(
+            model,
+            args.output,
+            quantize=not args.no_quantize,
+            opset=args.opset,
+            model_id=args.model
+        )
+        logger.info(f"✅ Modelo exportado em {args.output} (quantizado: {config['quantized']})")
+
+        # Paridade com o PyTorch
+        reference = model.encode(PARITY_SENTENCES, normalize_embeddings=True, convert_to_numpy=True)
+        exported = OnnxSentenceEncoder(args.output).encode(PARITY_SENTENCES, normalize_embeddings=True)
+        cosines = np.sum(reference * exported, axis=1)
+
+        logger.info("")
+        logger.info("=" * 60)
+        logger.info("📊 PARIDADE COM PYTORCH:")
+        logger.info(f"   🔻 Cosseno mínimo: {cosines.min():.4f}")
+        logger.info(f"   📈 Cosseno médio: {cosines.mean():.4f}")
+        logger.info("=" * 60)
+
+        if cosines.min() < args.min_cosine:
+            logger.error(f"❌ Paridade abaixo do mínimo ({args.min_cosine}); não use este export")
+            return False
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro durante exportação: {str(e)}", exc_info=True)
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,95 @@
+"""
+Importa históricos de pedidos em lote (NDJSON ou CSV) a partir de arquivo ou stdin.
+
+Diferente do endpoint POST /api/orders/import, cada registro informa o próprio
+user_id (migração de parceiros). Use --user-id para forçar um único dono.
+
+Uso:
+    python scripts/import_orders.py pedidos.ndjson
+    python scripts/import_orders.py pedidos.csv --chunk-size 10000
+    zcat pedidos.ndjson.gz | python scripts/import_orders.py - --format ndjson
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.database.base import SessionLocal
+from app.core.order_import import detect_format, iter_records, import_orders, OrderImportError
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Importação em lote de pedidos")
+    parser.add_argument("path", help="Arquivo NDJSON/CSV ou '-' para stdin")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                        help="Formato do arquivo (padrão: deduzido da extensão)")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="Forçar o dono de todos os pedidos")
+    parser.add_argument("--chunk-size", type=int, default=5000,
+                        help="Registros por bloco de validação/INSERT (padrão: 5000)")
+    parser.add_argument("--skip-preferences", action="store_true",
+                        help="Não recalcular preferências ao final (rodar rebuild_user_preferences depois)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da importação."""
+    args = parse_args(argv)
+    fmt = args.format or detect_format(args.path)
+
+    logger.info("=" * 60)
+    logger.info(f"📥 Importando pedidos de {args.path} ({fmt})...")
+    logger.info("=" * 60)
+
+    db = SessionLocal()
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        stats = import_orders(
+            db=db,
+            records=iter_records(stream, fmt),
+            user_id=args.user_id,
+            chunk_size=args.chunk_size,
+            update_preferences=not args.skip_preferences
+        )
+
+        logger.info("")
+        logger.info("=" * 60)
+        logger.info("📊 RESUMO:")
+        logger.info(f"   📦 Registros lidos: {stats['received']}")
+        logger.info(f"   ✅ Importados: {stats['imported']}")
+        logger.info(f"   ❌ Rejeitados: {stats['rejected']}")
+        logger.info(f"   👤 Usuários afetados: {stats['affected_users']}")
+        logger.info(f"   ⏱️  Tempo total: {stats['seconds']}s")
+        logger.info("=" * 60)
+        for error in stats["errors"]:
+            logger.warning(f"   Linha {error['line']}: {error['error']}")
+
+        print(json.dumps({k: v for k, v in stats.items() if k != "errors"}))
+        return stats["rejected"] == 0
+
+    except (OrderImportError, UnicodeDecodeError) as e:
+        logger.error(f"❌ Arquivo inválido: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Erro durante importação: {str(e)}", exc_info=True)
+        return False
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,135 @@
+"""
+Migração online do modelo de embeddings (sem parada nem reindexação em bloco).
+
+Passos:
+    1. backfill  (configuração atual)  gera vetores do modelo novo em embedding_next
+    2. deploy com EMBEDDING_MODEL / EMBEDDING_MODEL_VERSION novos
+    3. promote   (configuração nova)   move embedding_next para embedding e
+                                       recalcula centróides, preferências e snapshot
+
+Uso:
+    python scripts/migrate_embeddings.py status --model intfloat/multilingual-e5-small --version 1
+    python scripts/migrate_embeddings.py backfill --model intfloat/multilingual-e5-small --version 1
+    EMBEDDING_MODEL=intfloat/multilingual-e5-small python scripts/migrate_embeddings.py promote
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.database.base import SessionLocal
+from app.core.embedding_migration import (
+    EmbeddingMigrationError,
+    backfill_next_embeddings,
+    embedding_status,
+    promote_next_embeddings,
+)
+from app.core.embeddings import make_embedding_tag
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+DEFAULT_CHECKPOINT = str(backend_dir / ".embeddings_migration_checkpoint.json")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Migração online do modelo de embeddings")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    status = sub.add_parser("status", help="Contagem de vetores por versão do modelo")
+    status.add_argument("--model", default=None, help="Modelo de destino (padrão: o ativo)")
+    status.add_argument("--version", default=None, help="Versão de destino")
+
+    backfill = sub.add_parser("backfill", help="Gerar vetores do modelo novo em segundo plano")
+    backfill.add_argument("--model", required=True, help="Modelo de destino (sentence-transformers)")
+    backfill.add_argument("--version", required=True, help="Versão de destino")
+    backfill.add_argument("--page-size", type=int, default=1000,
+                          help="Restaurantes lidos/gravados por página (padrão: 1000)")
+    backfill.add_argument("--batch-size", type=int, default=None,
+                          help="Lote do encoder (padrão: EMBEDDING_BATCH_SIZE)")
+    backfill.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                          help="Arquivo de checkpoint para retomada")
+    backfill.add_argument("--no-resume", action="store_true",
+                          help="Ignorar checkpoint existente e começar do início")
+
+    promote = sub.add_parser("promote", help="Promover os vetores novos (rodar com a configuração nova)")
+    promote.add_argument("--page-size", type=int, default=1000,
+                         help="Restaurantes promovidos por transação (padrão: 1000)")
+    return parser.parse_args(argv)
+
+
+def log_status(status: dict) -> None:
+    logger.info(f"   🏷️  Versão ativa: {status['active_tag']}")
+    logger.info(f"   🎯 Versão de destino: {status['target_tag']}")
+    logger.info(f"   🍽️  Restaurantes: {status['restaurants']}")
+    for tag, count in status["by_model"].items():
+        logger.info(f"      embedding      {tag}: {count}")
+    for tag, count in status["by_next_model"].items():
+        logger.info(f"      embedding_next {tag}: {count}")
+    for tag, count in status["user_preferences"].items():
+        logger.info(f"      preferências   {tag}: {count}")
+    logger.info(f"   ⏳ Pendentes para o destino: {status['pending']}")
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal da migração."""
+    args = parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        logger.info("=" * 60)
+        if args.command == "status":
+            target_tag = make_embedding_tag(args.model, args.version or "1") if args.model else None
+            log_status(embedding_status(db, target_tag))
+
+        elif args.command == "backfill":
+            if args.no_resume and Path(args.checkpoint).exists():
+                Path(args.checkpoint).unlink()
+            logger.info(f"🔄 Backfill de {make_embedding_tag(args.model, args.version)}...")
+            stats = backfill_next_embeddings(
+                db,
+                target_model=args.model,
+                target_version=args.version,
+                page_size=args.page_size,
+                batch_size=args.batch_size,
+                checkpoint_path=args.checkpoint
+            )
+            if stats["resumed_from"]:
+                logger.info(f"   ↩️  Retomado após o restaurante {stats['resumed_from']}")
+            logger.info(f"   🔎 Restaurantes lidos: {stats['scanned']}")
+            logger.info(f"   ✅ Vetores novos gerados: {stats['embedded']}")
+            logger.info(f"   🏷️  Vetores legados marcados: {stats['tagged_legacy']}")
+            logger.info(f"   ⏱️  Tempo total: {stats['seconds']}s")
+            logger.info("👉 Próximo passo: deploy com a configuração nova e depois 'promote'")
+
+        else:
+            logger.info("🔄 Promovendo vetores novos...")
+            stats = promote_next_embeddings(db, page_size=args.page_size)
+            logger.info(f"   ✅ Restaurantes promovidos para {stats['tag']}: {stats['promoted']}")
+            logger.info(f"   👤 Preferências recalculadas: {stats['preferences']}")
+            logger.info(f"   🧭 Vetores de onboarding regenerados: {stats['onboarding_refreshed']}")
+            logger.info(f"   ⏱️  Tempo total: {stats['seconds']}s")
+        logger.info("=" * 60)
+        return True
+
+    except EmbeddingMigrationError as e:
+        logger.error(f"❌ {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Erro durante migração de embeddings: {str(e)}", exc_info=True)
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,49 @@
+"""
+Recalcula a tabela cuisine_centroids (centróides do onboarding) a partir dos restaurantes.
+
+Necessário na primeira implantação da tabela e após regenerar os embeddings
+dos restaurantes com outro modelo. No dia a dia, create_restaurant e
+update_restaurant_embedding mantêm os centróides atualizados.
+
+Uso:
+    python scripts/rebuild_cuisine_centroids.py
+"""
+
+import sys
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.database.base import SessionLocal
+from app.core.cuisine_centroids import rebuild_cuisine_centroids
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+
+def main() -> bool:
+    """Função principal do recalculo de centróides."""
+    logger.info("🔄 Recalculando centróides de culinária...")
+
+    db = SessionLocal()
+    try:
+        stats = rebuild_cuisine_centroids(db)
+        logger.info(
+            f"✅ {stats['centroids']} centróides gravados "
+            f"a partir de {stats['restaurants']} restaurantes"
+        )
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao recalcular centróides: {str(e)}", exc_info=True)
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,118 @@
+"""
+Recalcula os vetores de preferência (user_preferences) de todos os usuários.
+
+Necessário após mudar calculate_weight, o modelo de embeddings ou os embeddings
+dos restaurantes: sem isso, cada usuário só é atualizado quando pede refresh=True.
+Os pedidos são lidos em blocos de usuários e o trabalho pode ser dividido entre
+vários processos (shards por user_id % workers).
+
+Uso:
+    python scripts/rebuild_user_preferences.py
+    python scripts/rebuild_user_preferences.py --workers 4 --chunk-size 5000
+    python scripts/rebuild_user_preferences.py --shard 0 --num-shards 8   # uma máquina por shard
+"""
+
+import sys
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.database.base import SessionLocal
+from app.core.preference_rebuild import rebuild_user_preferences
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+
+def run_shard(shard: int, num_shards: int, chunk_size: int, now: datetime) -> Dict[str, Any]:
+    """Processa um shard com sessão própria (executado em processo separado)."""
+    db = SessionLocal()
+    try:
+        stats = rebuild_user_preferences(
+            db,
+            users_per_chunk=chunk_size,
+            shard=shard,
+            num_shards=num_shards,
+            now=now
+        )
+        logger.info(
+            f"   ✅ Shard {shard}/{num_shards}: {stats['users']} usuários, "
+            f"{stats['orders']} pedidos em {stats['seconds']}s"
+        )
+        return stats
+    finally:
+        db.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Recalcula os vetores de preferência dos usuários")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos em paralelo nesta máquina (padrão: 1)")
+    parser.add_argument("--chunk-size", type=int, default=2000,
+                        help="Usuários por bloco de leitura/upsert (padrão: 2000)")
+    parser.add_argument("--shard", type=int, default=None,
+                        help="Processar apenas este shard (execução distribuída)")
+    parser.add_argument("--num-shards", type=int, default=None,
+                        help="Total de shards quando --shard é usado")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal do recalculo."""
+    args = parse_args(argv)
+    # Mesma referência de tempo para todos os shards (pesos consistentes)
+    now = datetime.now()
+    start_time = time.perf_counter()
+
+    logger.info("=" * 60)
+    logger.info("🔄 Recalculando vetores de preferência dos usuários...")
+    logger.info("=" * 60)
+
+    try:
+        if args.shard is not None:
+            num_shards = args.num_shards or args.workers
+            if not 0 <= args.shard < num_shards:
+                logger.error(f"❌ Shard inválido: {args.shard} (num_shards={num_shards})")
+                return False
+            results = [run_shard(args.shard, num_shards, args.chunk_size, now)]
+        elif args.workers > 1:
+            # spawn: cada processo cria seu próprio engine/pool de conexões
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(args.workers) as pool:
+                results = pool.starmap(
+                    run_shard,
+                    [(shard, args.workers, args.chunk_size, now) for shard in range(args.workers)]
+                )
+        else:
+            results = [run_shard(0, 1, args.chunk_size, now)]
+
+        total_users = sum(r["users"] for r in results)
+        total_orders = sum(r["orders"] for r in results)
+        elapsed = time.perf_counter() - start_time
+
+        logger.info("")
+        logger.info("=" * 60)
+        logger.info("📊 RESUMO:")
+        logger.info(f"   ✅ Usuários atualizados: {total_users}")
+        logger.info(f"   📦 Pedidos processados: {total_orders}")
+        logger.info(f"   ⏱️  Tempo total: {elapsed:.1f}s")
+        logger.info("=" * 60)
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Erro durante recalculo: {str(e)}", exc_info=True)
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,70 @@
+"""
+Sidecar de inferência: carrega o modelo de embeddings (e o snapshot do
+catálogo, se CATALOG_SNAPSHOT_DIR estiver configurado) uma vez por host e
+atende os workers web por um socket Unix.
+
+Os workers apontam para o mesmo caminho com INFERENCE_SIDECAR_SOCKET.
+
+Uso:
+    python scripts/run_inference_sidecar.py --socket /run/tastematch/inference.sock
+"""
+
+import sys
+import signal
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório raiz ao path para imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.config import settings
+from app.core.embeddings import encode_texts_local, get_embedding_model, get_embedding_tag
+from app.core.inference_sidecar import InferenceSidecarServer
+from app.core.logging_config import setup_logging, get_logger
+
+# Configurar logging
+setup_logging()
+logger = get_logger(__name__)
+
+DEFAULT_SOCKET = "/tmp/tastematch-inference.sock"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sidecar de inferência (socket Unix)")
+    parser.add_argument("--socket", default=settings.INFERENCE_SIDECAR_SOCKET or DEFAULT_SOCKET,
+                        help=f"Caminho do socket (padrão: INFERENCE_SIDECAR_SOCKET ou {DEFAULT_SOCKET})")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    """Função principal do sidecar."""
+    args = parse_args(argv)
+
+    try:
+        logger.info("⏳ Carregando modelo de embeddings...")
+        get_embedding_model()
+        dimension = encode_texts_local(["aquecimento do sidecar"]).shape[1]
+        logger.info(f"✅ Modelo carregado: {get_embedding_tag()} ({dimension} dimensões)")
+
+        server = InferenceSidecarServer(args.socket, encode_fn=encode_texts_local).start()
+    except Exception as e:
+        logger.error(f"❌ Erro ao iniciar sidecar de inferência: {str(e)}", exc_info=True)
+        return False
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    logger.info(f"🚀 Sidecar de inferência escutando em {args.socket}")
+    stop.wait()
+    logger.info("🛑 Encerrando sidecar de inferência...")
+    server.stop()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -9,10 +9,14 @@ from sqlalchemy.pool import StaticPool
 import tempfile
 import os
 
+# Sem aquecimento em segundo plano nos testes (modelo/PGVector carregam sob demanda)
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+
 from app.database.base import Base, get_db
 from app.main import app
 from app.database.models import User, Restaurant, Order
 from app.core.security import get_password_hash
+from app.core.embeddings import get_embedding_tag
 
 
 # Criar banco de dados em memória para testes
@@ -97,7 +101,8 @@ def test_restaurant(test_db):
         location="123 Test St, Test City, TS 12345",
         rating=4.5,
         price_range="$$",
-        embedding='[0.1, 0.2, 0.3]'  # Embedding simplificado para testes
+        embedding='[0.1, 0.2, 0.3]',  # Embedding simplificado para testes
+        embedding_model=get_embedding_tag()
     )
     test_db.add(restaurant)
     test_db.commit()
@@ -116,7 +121,8 @@ def test_restaurants(test_db):
             location="100 Main St, City, ST 12345",
             rating=4.5,
             price_range="$$",
-            embedding='[0.1, 0.2, 0.3, 0.4]'
+            embedding='[0.1, 0.2, 0.3, 0.4]',
+            embedding_model=get_embedding_tag()
         ),
         Restaurant(
             name="Sushi Bar",
@@ -125,7 +131,8 @@ def test_restaurants(test_db):
             location="200 Main St, City, ST 12345",
             rating=4.8,
             price_range="$$$",
-            embedding='[0.2, 0.3, 0.4, 0.5]'
+            embedding='[0.2, 0.3, 0.4, 0.5]',
+            embedding_model=get_embedding_tag()
         ),
         Restaurant(
             name="Burger Joint",
@@ -134,7 +141,8 @@ def test_restaurants(test_db):
             location="300 Main St, City, ST 12345",
             rating=4.2,
             price_range="$",
-            embedding='[0.3, 0.4, 0.5, 0.6]'
+            embedding='[0.3, 0.4, 0.5, 0.6]',
+            embedding_model=get_embedding_tag()
         ),
     ]
     
@@ -0,0 +1,104 @@
+"""
+Testes para os filtros de metadados extraídos da pergunta do Chef Virtual.
+"""
+from app.core.chef_chat import extract_metadata_filter
+
+LOCATIONS = ["Centro", "Jardins", "Vila Madalena"]
+
+
+class TestMetadataFilter:
+    """Testes para culinária, preço, nota mínima e localização na pergunta."""
+
+    def test_constraints_become_filters(self):
+        """Testa a conversão das restrições da pergunta em filtro do vector store."""
+        assert extract_metadata_filter("quero comida italiana barata", LOCATIONS) == {
+            "type": "restaurant",
+            "cuisine_type": {"in": ["italiana"]},
+            "price_range": {"in": ["low"]},
+        }
+        assert extract_metadata_filter("restaurante japonês bem avaliado no Centro", LOCATIONS) == {
+            "type": "restaurant",
+            "cuisine_type": {"in": ["japonesa"]},
+            "rating": {"gte": 4.5},
+            "location": {"in": ["Centro"]},
+        }
+        assert extract_metadata_filter("algo não muito caro com nota acima de 4,2", LOCATIONS) == {
+            "type": "restaurant",
+            "price_range": {"in": ["low", "medium"]},
+            "rating": {"gte": 4.2},
+        }
+
+    def test_questions_without_constraints(self):
+        """Testa que perguntas sem restrições não filtram a busca."""
+        assert extract_metadata_filter("cara, quero sushi", LOCATIONS) == {}
+        assert extract_metadata_filter("qual a política de cancelamento?", LOCATIONS) == {}
+        assert extract_metadata_filter("nota 9 para o atendimento", LOCATIONS) == {}
+        assert extract_metadata_filter("pizza no centro", []) == {}
+
+
+class TestCachedLocations:
+    """Testes para o cache das localizações usadas nos filtros do chat."""
+
+    def test_locations_are_cached_until_catalog_write(self, test_db, test_restaurants, monkeypatch):
+        """Testa que mensagens seguidas não repetem a consulta e um novo restaurante invalida o cache."""
+        from app.core.cache import get_cached_restaurant_locations, metadata_cache
+        from app.database import crud
+        from app.models.restaurant import RestaurantCreate
+
+        queries = []
+        original = crud.get_restaurant_locations
+        monkeypatch.setattr(crud, "get_restaurant_locations", lambda db: queries.append(1) or original(db))
+        metadata_cache.clear()
+        try:
+            first = get_cached_restaurant_locations(test_db)
+            assert get_cached_restaurant_locations(test_db) == first
+            assert len(queries) == 1
+
+            crud.create_restaurant(test_db, RestaurantCreate(name="Nova", cuisine_type="italiana", location="Jardins"))
+            assert "Jardins" in get_cached_restaurant_locations(test_db)
+            assert len(queries) == 2
+        finally:
+            metadata_cache.clear()
+
+
+class TestPushedDownFilter:
+    """Testes para o filtro de tags sobre resultados já filtrados na busca."""
+
+    def test_cuisine_filter_hits_are_not_rechecked(self, monkeypatch):
+        """Testa que restaurantes da busca com filtro de culinária chegam ao contexto sem a palavra literal."""
+        from types import SimpleNamespace
+        from langchain_core.documents import Document
+        import app.core.chef_chat as chef_chat
+
+        sushi = Document(
+            page_content="Sushi Zen - culinária japonesa",
+            metadata={"type": "restaurant", "name": "Sushi Zen", "cuisine_type": "japonesa",
+                      "keywords": "sushi, sashimi, temaki", "rating": 4.8, "restaurant_id": 1}
+        )
+        izakaya = Document(
+            page_content="Izakaya Kai - japonês",
+            metadata={"type": "restaurant", "name": "Izakaya Kai", "cuisine_type": "japonesa",
+                      "keywords": "japonês, lámen, gyoza", "rating": 4.6, "restaurant_id": 2}
+        )
+        searches = []
+
+        class _RAGService:
+            vector_store = object()
+
+            def hybrid_search(self, query, k=None, exact_weight=0.6, semantic_weight=0.4, filter=None):
+                searches.append(filter)
+                return [sushi, izakaya] if filter else []
+
+            def similarity_search(self, query, k=None, filter=None):
+                return self.hybrid_search(query, k, filter=filter)
+
+        monkeypatch.setattr(chef_chat, "create_chef_chain", lambda rag_service, user_id, db: SimpleNamespace(
+            invoke=lambda question, config=None: "O Sushi Zen é uma ótima opção japonesa."
+        ))
+        monkeypatch.setattr(chef_chat, "log_llm_metrics", lambda metrics, db=None, save_to_db=True: None)
+
+        response = chef_chat.get_chef_response("restaurante japonês bem avaliado", _RAGService())
+
+        assert searches[0]["cuisine_type"] == {"in": ["japonesa"]}
+        # Só o Izakaya tem "japonês" nas tags; o filtro de tags não pode descartar o Sushi Zen
+        assert [doc["metadata"]["name"] for doc in response["source_documents"]] == ["Sushi Zen", "Izakaya Kai"]
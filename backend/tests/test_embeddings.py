@@ -1,6 +1,8 @@
 """
 Testes unitários para módulo de embeddings.
 """
+import json
+import time
 import pytest
 import numpy as np
 
@@ -114,3 +116,382 @@ class TestRestaurantEmbedding:
         similarity = np.dot(embedding1, embedding2)
         assert similarity < 1.0
 
+
+
+class TestSharedEmbeddingService:
+    """Testes para o serviço único de embeddings (recomendações + RAG)."""
+
+    class _FakeModel:
+        """Modelo mínimo com a interface encode do SentenceTransformer."""
+
+        def __init__(self):
+            self.calls = 0
+
+        def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+            self.calls += 1
+            vectors = np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float64)
+            return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_rag_adapter_uses_shared_model(self, monkeypatch):
+        """Testa que o adaptador LangChain do RAG usa a mesma instância do recommender."""
+        import app.core.embeddings as embeddings
+        from app.core.rag_service import get_shared_embeddings
+
+        fake = self._FakeModel()
+        monkeypatch.setattr(embeddings, "_model", fake)
+
+        adapter = get_shared_embeddings()
+        query = adapter.embed_query("sushi")
+        documents = adapter.embed_documents(["pizza", "feijoada"])
+
+        assert adapter is embeddings.get_langchain_embeddings()
+        assert isinstance(query, list) and len(query) == 3
+        assert len(documents) == 2
+        assert fake.calls == 2
+        assert embeddings.encode_texts(["pizza"]).dtype == np.float32
+
+
+class TestOnnxBackend:
+    """Testes de paridade do backend ONNX Runtime com o SentenceTransformer."""
+
+    SENTENCES = [
+        "restaurante japonês com sushi fresco",
+        "pizza italiana",
+        "comida mineira caseira com feijão",
+        "hamburguer",
+    ]
+
+    @pytest.fixture
+    def tiny_model(self, tmp_path):
+        """SentenceTransformer mínimo criado localmente (sem download)."""
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnx")
+        from sentence_transformers import SentenceTransformer, models
+        from transformers import BertConfig, BertModel, BertTokenizerFast
+
+        words = sorted({w for s in self.SENTENCES for w in s.split()})
+        vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words
+        vocab_file = tmp_path / "vocab.txt"
+        vocab_file.write_text("\n".join(vocab), encoding="utf-8")
+
+        model_dir = tmp_path / "tiny-bert"
+        BertTokenizerFast(vocab_file=str(vocab_file)).save_pretrained(str(model_dir))
+        torch = pytest.importorskip("torch")
+        torch.manual_seed(0)
+        BertModel(BertConfig(
+            vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+            num_attention_heads=2, intermediate_size=64
+        )).save_pretrained(str(model_dir))
+
+        transformer = models.Transformer(str(model_dir), max_seq_length=32)
+        pooling = models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")
+        return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+    @pytest.mark.parametrize("quantize", [False, True])
+    def test_onnx_matches_torch(self, tiny_model, tmp_path, quantize):
+        """Testa que o export (float32 e int8) preserva a direção dos embeddings."""
+        from app.core.onnx_embeddings import OnnxSentenceEncoder, export_onnx_model
+
+        output_dir = tmp_path / "onnx"
+        config = export_onnx_model(tiny_model, str(output_dir), quantize=quantize, model_id="tiny")
+        encoder = OnnxSentenceEncoder(str(output_dir))
+
+        reference = tiny_model.encode(self.SENTENCES, normalize_embeddings=True, convert_to_numpy=True)
+        exported = encoder.encode(self.SENTENCES, batch_size=3, normalize_embeddings=True)
+        cosines = np.sum(reference * exported, axis=1)
+
+        assert config["quantized"] is quantize
+        assert encoder.model_id == "tiny"
+        assert exported.shape == reference.shape
+        assert exported.dtype == np.float32
+        assert cosines.min() > (0.99 if quantize else 0.9999)
+        assert encoder.encode(self.SENTENCES[0]).shape == (reference.shape[1],)
+
+    def test_embedding_service_selects_onnx_backend(self, tiny_model, tmp_path, monkeypatch):
+        """Testa que EMBEDDING_BACKEND=onnx carrega o encoder ONNX."""
+        import app.core.embeddings as embeddings
+        from app.core.onnx_embeddings import OnnxSentenceEncoder, export_onnx_model
+
+        output_dir = tmp_path / "onnx"
+        export_onnx_model(tiny_model, str(output_dir), model_id="tiny")
+        monkeypatch.setattr(embeddings.settings, "EMBEDDING_BACKEND", "onnx")
+        monkeypatch.setattr(embeddings.settings, "EMBEDDING_ONNX_PATH", str(output_dir))
+        monkeypatch.setattr(embeddings, "_model", None)
+
+        assert isinstance(embeddings.get_embedding_model(), OnnxSentenceEncoder)
+        vector = embeddings.encode_text("pizza italiana")
+        assert vector.dtype == np.float32
+        assert abs(np.linalg.norm(vector) - 1.0) < 1e-5
+
+
+class TestEmbeddingCache:
+    """Testes para o cache texto → vetor de consultas."""
+
+    def test_normalized_text_hits_memory(self):
+        """Testa que variações de caixa/espaços usam a mesma entrada."""
+        from app.core.embedding_cache import EmbeddingCache
+
+        cache = EmbeddingCache(max_items=10)
+        assert cache.get("m", "Pizza perto de mim") is None
+        cache.set("m", "Pizza perto de mim", np.array([1.0, 0.0]))
+
+        vector = cache.get("m", "  pizza   PERTO de mim ")
+        assert vector is not None and vector.dtype == np.float32
+        assert not vector.flags.writeable
+        assert cache.get("outro-modelo", "pizza perto de mim") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+        assert stats["hit_rate"] == pytest.approx(33.33)
+
+    def test_lru_eviction(self):
+        """Testa que o item menos usado sai ao atingir o limite."""
+        from app.core.embedding_cache import EmbeddingCache
+
+        cache = EmbeddingCache(max_items=2)
+        cache.set("m", "sushi", np.ones(2))
+        cache.set("m", "pizza", np.ones(2))
+        cache.get("m", "sushi")
+        cache.set("m", "taco", np.ones(2))
+
+        assert cache.get("m", "pizza") is None
+        assert cache.get("m", "sushi") is not None
+        assert cache.get_stats()["size"] == 2
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Testa que a camada SQLite é reaproveitada por outro processo/instância."""
+        from app.core.embedding_cache import EmbeddingCache
+
+        path = str(tmp_path / "embeddings.sqlite")
+        EmbeddingCache(path=path).set("m", "sushi", np.array([0.6, 0.8]))
+
+        cache = EmbeddingCache(path=path)
+        vector = cache.get("m", "Sushi")
+        np.testing.assert_allclose(vector, [0.6, 0.8], rtol=1e-6)
+        assert cache.get_stats()["disk_hits"] == 1
+        cache.get("m", "sushi")
+        assert cache.get_stats()["hits"] == 1
+
+    def test_embed_query_skips_encoder_on_hit(self, monkeypatch):
+        """Testa que consultas repetidas do RAG não chamam o modelo novamente."""
+        import app.core.embeddings as embeddings
+        import app.core.embedding_cache as embedding_cache
+
+        fake = TestSharedEmbeddingService._FakeModel()
+        monkeypatch.setattr(embeddings, "_model", fake)
+        monkeypatch.setattr(embedding_cache, "_cache", embedding_cache.EmbeddingCache(max_items=10))
+
+        adapter = embeddings.get_langchain_embeddings()
+        first = adapter.embed_query("sushi")
+        second = adapter.embed_query("SUSHI ")
+
+        assert first == second
+        assert fake.calls == 1
+        assert embedding_cache.get_embedding_cache().get_stats()["hits"] == 1
+
+
+class TestEmbeddingJob:
+    """Testes para o job de embeddings em lote (hash de conteúdo e checkpoint)."""
+
+    def _add(self, db, name, description=None):
+        restaurant = Restaurant(
+            name=name, cuisine_type="italiana", description=description,
+            rating=4.5, price_range="medium", location="Centro"
+        )
+        db.add(restaurant)
+        db.commit()
+        return restaurant
+
+    def test_skips_unchanged_restaurants(self, test_db, monkeypatch):
+        """Testa que só restaurantes novos ou alterados passam pelo encoder."""
+        import app.core.embeddings as embeddings
+        from app.core.embedding_job import run_embedding_job
+
+        fake = TestSharedEmbeddingService._FakeModel()
+        monkeypatch.setattr(embeddings, "_model", fake)
+        restaurants = [self._add(test_db, f"Cantina {i}") for i in range(5)]
+
+        first = run_embedding_job(test_db, page_size=2)
+        assert (first["scanned"], first["embedded"], first["skipped"]) == (5, 5, 0)
+        assert fake.calls == 3  # Uma chamada em lote por página
+
+        second = run_embedding_job(test_db, page_size=2)
+        assert (second["embedded"], second["skipped"]) == (0, 5)
+
+        restaurants[3].description = "Massas frescas"
+        test_db.commit()
+        third = run_embedding_job(test_db, page_size=2)
+        assert third["embedded"] == 1
+
+        test_db.expire_all()
+        assert all(r.embedding_hash and len(json.loads(r.embedding)) == 3 for r in restaurants)
+        assert run_embedding_job(test_db, force=True)["embedded"] == 5
+
+    def test_resumes_from_checkpoint(self, test_db, tmp_path, monkeypatch):
+        """Testa que uma execução interrompida continua após o último id confirmado."""
+        import app.core.embeddings as embeddings
+        from app.core.embedding_job import run_embedding_job, save_checkpoint
+
+        monkeypatch.setattr(embeddings, "_model", TestSharedEmbeddingService._FakeModel())
+        restaurants = [self._add(test_db, f"Trattoria {i}") for i in range(4)]
+        checkpoint = tmp_path / "checkpoint.json"
+        save_checkpoint(str(checkpoint), restaurants[1].id, embeddings.get_model_id(), False)
+
+        stats = run_embedding_job(test_db, checkpoint_path=str(checkpoint))
+
+        assert stats["resumed_from"] == restaurants[1].id
+        assert stats["embedded"] == 2
+        assert not checkpoint.exists()
+        test_db.expire_all()
+        assert [r.embedding is not None for r in restaurants] == [False, False, True, True]
+
+
+class TestEmbeddingMigration:
+    """Testes para a migração online de modelo (backfill em embedding_next e promoção)."""
+
+    class _NextModel:
+        """Modelo de destino fictício (dimensão diferente do atual)."""
+
+        def __init__(self):
+            self.calls = 0
+
+        def encode(self, texts, batch_size=32, **kwargs):
+            self.calls += 1
+            return np.array([[1.0, 0.0, 0.0, 0.0, float(len(t))] for t in texts])
+
+    @pytest.fixture
+    def catalog(self, test_db, monkeypatch):
+        import app.core.embeddings as embeddings
+        from app.core.embedding_job import run_embedding_job
+
+        monkeypatch.setattr(embeddings, "_model", TestSharedEmbeddingService._FakeModel())
+        restaurants = [TestEmbeddingJob()._add(test_db, f"Osteria {i}") for i in range(3)]
+        run_embedding_job(test_db, rebuild_centroids=False)
+        return restaurants
+
+    def test_backfill_keeps_old_vectors_serving(self, test_db, catalog, monkeypatch):
+        """Testa que o backfill só preenche embedding_next e cada versão lê o seu vetor."""
+        from app.config import settings
+        from app.core.embedding_migration import backfill_next_embeddings, embedding_status
+        from app.core.recommender import build_restaurant_matrix
+
+        active_tag = f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+        model = self._NextModel()
+        stats = backfill_next_embeddings(test_db, settings.EMBEDDING_MODEL, "2", page_size=2, encoder=model)
+        assert (stats["embedded"], model.calls) == (3, 2)
+        assert backfill_next_embeddings(test_db, settings.EMBEDDING_MODEL, "2", encoder=model)["embedded"] == 0
+
+        test_db.expire_all()
+        assert all(r.embedding_model == active_tag and len(json.loads(r.embedding)) == 3 for r in catalog)
+        assert build_restaurant_matrix(catalog)[1].shape == (3, 3)
+
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "2")
+        assert build_restaurant_matrix(catalog)[1].shape == (3, 5)
+        assert embedding_status(test_db)["pending"] == 0
+
+    def test_promote_swaps_columns(self, test_db, catalog, monkeypatch):
+        """Testa que a promoção move os vetores novos e o job não os recodifica."""
+        from app.config import settings
+        from app.core.embedding_job import run_embedding_job
+        from app.core.embedding_migration import (
+            EmbeddingMigrationError, backfill_next_embeddings, promote_next_embeddings
+        )
+
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "2")
+        with pytest.raises(EmbeddingMigrationError):
+            promote_next_embeddings(test_db)
+
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "1")
+        backfill_next_embeddings(test_db, settings.EMBEDDING_MODEL, "2", encoder=self._NextModel())
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "2")
+        stats = promote_next_embeddings(test_db, page_size=2)
+
+        assert stats["promoted"] == 3
+        test_db.expire_all()
+        for restaurant in catalog:
+            assert restaurant.embedding_model == f"{settings.EMBEDDING_MODEL}@2"
+            assert len(json.loads(restaurant.embedding)) == 5
+            assert restaurant.embedding_next is None and restaurant.embedding_next_model is None
+        assert run_embedding_job(test_db, rebuild_centroids=False)["embedded"] == 0
+
+    def test_legacy_vectors_need_current_config(self, test_db, catalog):
+        """Testa que vetores sem tag não são confundidos com o modelo de destino."""
+        from app.config import settings
+        from app.core.embedding_migration import EmbeddingMigrationError, backfill_next_embeddings
+
+        for restaurant in catalog:
+            restaurant.embedding_model = None
+        test_db.commit()
+
+        with pytest.raises(EmbeddingMigrationError):
+            backfill_next_embeddings(
+                test_db, settings.EMBEDDING_MODEL, settings.EMBEDDING_MODEL_VERSION, encoder=self._NextModel()
+            )
+        assert backfill_next_embeddings(test_db, "outro-modelo", "1", encoder=self._NextModel())["tagged_legacy"] == 3
+
+
+class TestEmbeddingBatcher:
+    """Testes para o micro-batching de embeddings de consultas."""
+
+    @staticmethod
+    def _slow_encode(calls):
+        def encode(texts):
+            calls.append(list(texts))
+            time.sleep(0.02)  # Simula uma passada do modelo
+            return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        return encode
+
+    def test_concurrent_requests_share_batches(self):
+        """Testa que pedidos concorrentes viram poucos lotes e cada um recebe seu vetor."""
+        from concurrent.futures import ThreadPoolExecutor
+        from app.core.embedding_batcher import EmbeddingBatcher
+
+        calls = []
+        batcher = EmbeddingBatcher(self._slow_encode(calls), max_batch=8, max_wait_ms=20)
+        texts = [f"prato {'x' * i}" for i in range(16)]
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                results = list(pool.map(batcher.encode, texts))
+        finally:
+            batcher.close()
+
+        assert [r[0] for r in results] == [len(t) for t in texts]
+        assert len(calls) < len(texts)
+        assert all(len(batch) <= 8 for batch in calls)
+        stats = batcher.get_stats()
+        assert stats["items"] == 16
+        assert stats["avg_batch_size"] > 1
+
+    def test_duplicates_and_errors(self):
+        """Testa deduplicação no lote e propagação de erros aos chamadores."""
+        from app.core.embedding_batcher import EmbeddingBatcher
+
+        calls = []
+        batcher = EmbeddingBatcher(self._slow_encode(calls), max_batch=4, max_wait_ms=50)
+        futures = [batcher.submit("sushi") for _ in range(3)]
+        assert all(f.result(timeout=5)[0] == 5 for f in futures)
+        assert calls == [["sushi"]]
+        batcher.close()
+
+        def failing(texts):
+            raise RuntimeError("modelo indisponível")
+
+        broken = EmbeddingBatcher(failing, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            broken.encode("pizza", timeout=5)
+        broken.close()
+
+    @pytest.mark.asyncio
+    async def test_async_callers(self):
+        """Testa aencode com várias corrotinas concorrentes."""
+        import asyncio
+        from app.core.embedding_batcher import EmbeddingBatcher
+
+        calls = []
+        batcher = EmbeddingBatcher(self._slow_encode(calls), max_batch=16, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.aencode(t) for t in ["a", "bb", "ccc"]))
+        batcher.close()
+
+        assert [r[0] for r in results] == [1, 2, 3]
+        assert len(calls) == 1
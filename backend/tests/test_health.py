@@ -0,0 +1,70 @@
+"""
+Testes para liveness/readiness e o aquecimento em segundo plano.
+"""
+import pytest
+
+from app.core.warmup import WarmupState
+
+
+class TestWarmupState:
+    """Testes para as etapas de aquecimento."""
+
+    def test_ready_only_after_required_steps(self):
+        """Testa que a prontidão espera as etapas obrigatórias e ignora falhas opcionais."""
+        calls = []
+
+        def optional_failure():
+            raise RuntimeError("pgvector indisponível")
+
+        state = WarmupState([
+            ("model", lambda: calls.append("model") or {"dimension": 3}, True),
+            ("vector_store", optional_failure, False),
+        ])
+        assert not state.is_ready()
+
+        state.run()
+
+        snapshot = state.snapshot()
+        assert state.is_ready()
+        assert snapshot["finished"]
+        assert snapshot["steps"]["model"]["status"] == "ok"
+        assert snapshot["steps"]["model"]["dimension"] == 3
+        assert snapshot["steps"]["vector_store"]["status"] == "error"
+        assert calls == ["model"]
+
+    def test_required_failure_blocks_readiness(self):
+        """Testa que falha em etapa obrigatória mantém o processo fora do balanceador."""
+        def failing():
+            raise RuntimeError("modelo não encontrado")
+
+        state = WarmupState([("model", failing, True)])
+        state.run()
+
+        assert not state.is_ready()
+        assert "modelo não encontrado" in state.snapshot()["steps"]["model"]["error"]
+
+
+class TestHealthEndpoints:
+    """Testes para /health/live e /health/ready."""
+
+    def test_liveness_is_instant(self, client):
+        """Testa que liveness não depende do aquecimento."""
+        response = client.get("/health/live")
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
+    def test_readiness_gate(self, client, monkeypatch):
+        """Testa 503 durante o aquecimento e 200 ao final."""
+        import app.core.warmup as warmup
+
+        state = WarmupState([("model", lambda: {}, True)])
+        monkeypatch.setattr(warmup, "_state", state)
+
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+
+        state.run()
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json()["steps"]["model"]["status"] == "ok"
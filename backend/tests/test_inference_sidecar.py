@@ -0,0 +1,182 @@
+"""
+Testes para o sidecar de inferência (servidor iniciado no próprio processo).
+"""
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+from app.core.inference_sidecar import (
+    InferenceSidecarServer,
+    SidecarClient,
+    SidecarError,
+    SidecarUnavailable,
+)
+
+
+def fake_encode(texts):
+    """Encoder fictício em lote: vetor depende só do texto."""
+    fake_encode.batches.append(len(texts))
+    vectors = np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def socket_path():
+    # Caminhos de socket Unix têm limite de ~100 caracteres: usar /tmp curto
+    directory = tempfile.mkdtemp(prefix="sidecar-")
+    yield os.path.join(directory, "inference.sock")
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def sidecar(socket_path):
+    fake_encode.batches = []
+    server = InferenceSidecarServer(socket_path, encode_fn=fake_encode, snapshot_fn=lambda: None).start()
+    yield server
+    server.stop()
+
+
+class TestInferenceSidecar:
+    """Testes para protocolo, batching entre clientes e integração com embeddings."""
+
+    def test_encode_round_trip(self, sidecar, socket_path):
+        """Testa que os vetores voltam idênticos ao encoder local."""
+        client = SidecarClient(socket_path)
+        texts = ["pizza", "sushi de salmão", "açaí"]
+
+        vectors = client.encode(texts)
+
+        assert vectors.dtype == np.float32
+        np.testing.assert_allclose(vectors, fake_encode(texts), rtol=1e-6)
+        assert client.encode([]).shape == (0, 0)
+        assert client.info()["pid"] == os.getpid()
+        client.close()
+
+    def test_concurrent_clients_share_batches(self, socket_path):
+        """Testa que pedidos de vários clientes entram nos mesmos lotes."""
+        fake_encode.batches = []
+        server = InferenceSidecarServer(socket_path, encode_fn=fake_encode, snapshot_fn=lambda: None)
+        server.batcher._max_wait = 0.05
+        server.start()
+        try:
+            results = {}
+
+            def worker(i):
+                results[i] = SidecarClient(socket_path).encode([f"consulta {i}"])
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.stop()
+
+        assert len(results) == 8
+        assert sum(fake_encode.batches) == 8
+        assert len(fake_encode.batches) < 8
+
+    def test_rank_uses_sidecar_snapshot(self, socket_path, test_db, test_restaurants, tmp_path, monkeypatch):
+        """Testa que o ranking no sidecar equivale ao snapshot local."""
+        from app.config import settings
+        from app.core.catalog_snapshot import (
+            get_catalog_ranker, get_catalog_snapshot, reset_catalog_snapshot, write_catalog_snapshot
+        )
+
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DIR", str(tmp_path))
+        reset_catalog_snapshot()
+        write_catalog_snapshot(test_db, str(tmp_path))
+        snapshot = get_catalog_snapshot()
+        server = InferenceSidecarServer(socket_path, encode_fn=fake_encode, snapshot_fn=lambda: snapshot).start()
+        try:
+            monkeypatch.setattr(settings, "INFERENCE_SIDECAR_SOCKET", socket_path)
+            ranker = get_catalog_ranker()
+            user_embedding = [0.4, 0.1, 0.0, 0.2]
+            exclude = {test_restaurants[1].id}
+
+            ids, scores = ranker.rank(user_embedding, exclude, min_rating=4.0)
+            expected_ids, expected_scores = snapshot.rank(user_embedding, exclude, 4.0)
+        finally:
+            server.stop()
+            reset_catalog_snapshot()
+
+        assert ranker.version == snapshot.version
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_sidecar_stopped_after_info_falls_back_to_database(
+        self, socket_path, test_db, test_user, test_restaurants, tmp_path, monkeypatch
+    ):
+        """Testa que um sidecar parado entre info (cacheada) e rank não derruba as recomendações."""
+        from datetime import datetime
+        from app.config import settings
+        from app.core.catalog_snapshot import (
+            get_catalog_ranker, get_catalog_snapshot, rank_with_catalog_ranker,
+            reset_catalog_snapshot, write_catalog_snapshot
+        )
+        from app.core.recommender import generate_recommendations
+        from app.database.models import Order
+
+        test_db.add(Order(user_id=test_user.id, restaurant_id=test_restaurants[0].id, order_date=datetime.now(), rating=5))
+        test_db.commit()
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_CHECK_SECONDS", 3600)
+        reset_catalog_snapshot()
+        write_catalog_snapshot(test_db, str(tmp_path))
+        served = {"snapshot": get_catalog_snapshot()}
+        server = InferenceSidecarServer(
+            socket_path, encode_fn=fake_encode, snapshot_fn=lambda: served["snapshot"]
+        ).start()
+        try:
+            monkeypatch.setattr(settings, "INFERENCE_SIDECAR_SOCKET", socket_path)
+            ranker = get_catalog_ranker(test_db)
+            assert ranker is not None
+
+            # Sidecar sem snapshot depois do info: SidecarUnavailable vira ranking pelo banco
+            served["snapshot"] = None
+            assert rank_with_catalog_ranker(ranker, [0.4, 0.1, 0.0, 0.2]) is None
+
+            # Sidecar parado (conexão persistente derrubada, como num reinício do processo)
+            served["snapshot"] = get_catalog_snapshot()
+            ranker = get_catalog_ranker(test_db)
+            server.stop()
+            ranker.client.close()
+            assert rank_with_catalog_ranker(ranker, [0.4, 0.1, 0.0, 0.2]) is None
+
+            # Outro worker com o info de antes da queda ainda em cache: ranker devolvido, rank falha
+            monkeypatch.setattr(ranker.client, "info", lambda max_age=0.0: {
+                "catalog_version": ranker.version, "catalog_tag": get_catalog_snapshot().embedding_tag,
+                "catalog_source_version": ranker.source_version
+            })
+            recommendations = generate_recommendations(test_user.id, test_db, exclude_recent=False)
+        finally:
+            server.stop()
+            reset_catalog_snapshot()
+
+        assert recommendations
+
+    def test_errors(self, sidecar, socket_path):
+        """Testa erros do sidecar e sidecar fora do ar."""
+        with pytest.raises(SidecarUnavailable):
+            SidecarClient(socket_path).rank([1.0, 0.0, 0.0])
+
+        with pytest.raises(SidecarError):
+            SidecarClient(socket_path + ".inexistente").encode(["pizza"])
+
+    def test_encode_texts_delegates_to_sidecar(self, sidecar, socket_path, monkeypatch):
+        """Testa que, com o socket configurado, o worker não carrega modelo."""
+        import app.core.embeddings as embeddings
+        from app.config import settings
+
+        def no_local_model():
+            raise AssertionError("modelo local não deveria ser carregado")
+
+        monkeypatch.setattr(settings, "INFERENCE_SIDECAR_SOCKET", socket_path)
+        monkeypatch.setattr(embeddings, "get_embedding_model", no_local_model)
+
+        vectors = embeddings.encode_texts(["pizza", "sushi"])
+
+        np.testing.assert_allclose(vectors, fake_encode(["pizza", "sushi"]), rtol=1e-6)
@@ -2,6 +2,7 @@
 Testes de integração para endpoints de pedidos.
 """
 
+import json
 import pytest
 from fastapi.testclient import TestClient
 from datetime import datetime, timezone
@@ -126,3 +127,65 @@ class TestOrdersEndpoint:
         )
         assert response.status_code == 400
 
+
+
+class TestOrdersImport:
+    """Testes para importação em lote /api/orders/import."""
+
+    def test_import_ndjson_updates_preferences(
+        self,
+        client: TestClient,
+        auth_token: str,
+        test_user,
+        test_restaurants,
+        test_db
+    ):
+        """Testa importação NDJSON com linhas inválidas e recalculo de preferências."""
+        from app.database.crud import get_user_preferences
+
+        now = datetime.now(timezone.utc)
+        lines = [
+            json.dumps({"restaurant_id": test_restaurants[0].id, "order_date": now.isoformat(), "rating": 5}),
+            json.dumps({"restaurant_id": test_restaurants[1].id, "order_date": now.isoformat()}),
+            "{nao e json",
+            json.dumps({"restaurant_id": 99999, "order_date": now.isoformat()}),
+            json.dumps({"restaurant_id": test_restaurants[2].id, "order_date": now.isoformat(), "rating": 9}),
+        ]
+
+        response = client.post(
+            "/api/orders/import",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            files={"file": ("pedidos.ndjson", "\n".join(lines).encode("utf-8"), "application/x-ndjson")}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["received"] == 5
+        assert data["imported"] == 2
+        assert data["rejected"] == 3
+        assert [e["line"] for e in data["errors"]] == [3, 4, 5]
+        assert data["affected_users"] == 1
+
+        preferences = get_user_preferences(test_db, test_user.id)
+        assert preferences is not None
+        assert len(json.loads(preferences.preference_embedding)) == 4
+
+    def test_import_csv(self, client: TestClient, auth_token: str, test_restaurant):
+        """Testa importação CSV com cabeçalho."""
+        csv_content = (
+            "restaurant_id,order_date,total_amount,rating\n"
+            f"{test_restaurant.id},2025-01-10T12:00:00,42.50,4\n"
+            f"{test_restaurant.id},2025-01-11T12:00:00,,\n"
+        )
+
+        response = client.post(
+            "/api/orders/import",
+            headers={"Authorization": f"Bearer {auth_token}"},
+            files={"file": ("pedidos.csv", csv_content.encode("utf-8"), "text/csv")}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["imported"] == 2
+
+        listing = client.get("/api/orders", headers={"Authorization": f"Bearer {auth_token}"})
+        assert listing.json()["total"] == 2
@@ -94,6 +94,92 @@ class TestRecommendationsEndpoint:
         assert len(data["recommendations"]) > 0
 
 
+class TestRecommendationsFeed:
+    """Testes para endpoint /api/recommendations/feed."""
+    
+    def test_feed_pages_are_stable_slices(self, authenticated_client, test_restaurants):
+        """Testa que as páginas seguintes fatiam o mesmo snapshot, sem repetições."""
+        first = authenticated_client.get("/api/recommendations/feed?limit=2")
+        
+        assert first.status_code == 200
+        data = first.json()
+        assert data["count"] == 2
+        assert data["total"] == 3
+        assert data["next_cursor"] is not None
+        
+        second = authenticated_client.get(
+            f"/api/recommendations/feed?limit=2&cursor={data['next_cursor']}"
+        )
+        
+        assert second.status_code == 200
+        page = second.json()
+        assert page["snapshot_id"] == data["snapshot_id"]
+        assert page["next_cursor"] is None
+        
+        ids = [r["restaurant"]["id"] for r in data["recommendations"] + page["recommendations"]]
+        assert len(ids) == len(set(ids)) == 3
+        scores = [r["similarity_score"] for r in data["recommendations"] + page["recommendations"]]
+        assert scores == sorted(scores, reverse=True)
+    
+    def test_feed_invalid_cursor(self, authenticated_client, test_restaurants):
+        """Testa que cursor malformado retorna 400."""
+        response = authenticated_client.get("/api/recommendations/feed?cursor=@@@")
+        
+        assert response.status_code == 400
+    
+    def test_feed_expired_snapshot(self, authenticated_client, test_restaurants):
+        """Testa que cursor de snapshot descartado retorna 410."""
+        from app.core.recommendation_feed import encode_cursor
+        
+        response = authenticated_client.get(
+            f"/api/recommendations/feed?cursor={encode_cursor('inexistente', 2)}"
+        )
+        
+        assert response.status_code == 410
+
+    def test_feed_survives_missing_snapshot(self, authenticated_client, test_restaurants):
+        """Testa que outro worker (sem o snapshot em memória) reconstrói a mesma ordem."""
+        from app.core.recommendation_feed import feed_snapshot_cache
+
+        first = authenticated_client.get("/api/recommendations/feed?limit=1").json()
+        second = authenticated_client.get(f"/api/recommendations/feed?limit=1&cursor={first['next_cursor']}").json()
+        feed_snapshot_cache.clear()
+
+        rebuilt = authenticated_client.get(f"/api/recommendations/feed?limit=1&cursor={first['next_cursor']}")
+
+        assert rebuilt.status_code == 200
+        assert rebuilt.json()["snapshot_id"] == first["snapshot_id"]
+        assert [r["restaurant"]["id"] for r in rebuilt.json()["recommendations"]] == [
+            r["restaurant"]["id"] for r in second["recommendations"]
+        ]
+
+    def test_new_order_expires_feed(self, authenticated_client, test_restaurants):
+        """Testa que um pedido pela API invalida os cursores do feed."""
+        first = authenticated_client.get("/api/recommendations/feed?limit=1").json()
+
+        order = authenticated_client.post(
+            "/api/orders",
+            json={"restaurant_id": test_restaurants[0].id, "order_date": datetime.now().isoformat(), "rating": 5}
+        )
+        assert order.status_code == 201
+
+        response = authenticated_client.get(f"/api/recommendations/feed?limit=1&cursor={first['next_cursor']}")
+
+        assert response.status_code == 410
+        assert authenticated_client.get("/api/recommendations/feed?limit=1").json()["snapshot_id"] != first["snapshot_id"]
+
+    def test_preference_rewrite_expires_feed(self, authenticated_client, test_user, test_restaurants, test_db):
+        """Testa que regravar o vetor de preferências (onboarding, rebuild) invalida os cursores."""
+        from app.database.crud import create_or_update_user_preferences
+
+        first = authenticated_client.get("/api/recommendations/feed?limit=1").json()
+
+        create_or_update_user_preferences(test_db, test_user.id, json.dumps([0.1, 0.2, 0.3, 0.4]))
+
+        response = authenticated_client.get(f"/api/recommendations/feed?limit=1&cursor={first['next_cursor']}")
+        assert response.status_code == 410
+
+
 class TestInsightEndpoint:
     """Testes para endpoint /api/recommendations/{id}/insight."""
     
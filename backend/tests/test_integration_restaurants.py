@@ -153,3 +153,57 @@ class TestRestaurantsFilters:
         if data1["total"] > 5:
             assert data1["restaurants"] != data2["restaurants"]
 
+
+
+class TestRestaurantTextSearch:
+    """Testes para a busca textual ranqueada em uma única consulta."""
+
+    def test_listing_total_comes_from_same_query(self, client: TestClient, test_restaurants):
+        """Testa que total e página batem com a busca por todos os termos."""
+        response = client.get("/api/restaurants?search=sushi fresh&limit=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert [r["name"] for r in data["restaurants"]] == ["Sushi Bar"]
+
+        # Termos em campos diferentes (nome + descrição) também casam
+        data = client.get("/api/restaurants?search=burger classic").json()
+        assert data["total"] == 1
+
+        # Página além do fim mantém o total
+        data = client.get("/api/restaurants?limit=2&page=3").json()
+        assert data["restaurants"] == [] and data["total"] == 3
+
+    def test_any_term_ranked_by_name(self, test_db, test_restaurants):
+        """Testa a busca do chat: qualquer termo, nome acima de descrição."""
+        from app.database.crud import get_restaurants_page, search_terms
+
+        assert search_terms("Sushi, sushi e BURGER!") == ["sushi", "burger"]
+
+        restaurants, total = get_restaurants_page(test_db, limit=5, search="italian burgers", match_any=True)
+        assert total == 2
+        assert {r.name for r in restaurants} == {"Italian Place", "Burger Joint"}
+
+        restaurants, _ = get_restaurants_page(test_db, limit=5, search="great italian", match_any=True)
+        assert restaurants[0].name == "Italian Place"
+
+    def test_chat_exact_search_single_query(self, test_db, test_restaurants, monkeypatch):
+        """Testa que a busca exata do chat faz uma consulta para todos os termos."""
+        import app.core.rag_service as rag_service
+        from app.database import crud
+
+        calls = []
+        original = crud.get_restaurants_page
+
+        def counting(*args, **kwargs):
+            calls.append(kwargs.get("search"))
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(crud, "get_restaurants_page", counting)
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db = test_db
+
+        documents = rag._exact_search_restaurants("quero sushi ou burger", k=4)
+
+        assert len(calls) == 1
+        assert {d.metadata["name"] for d in documents} == {"Sushi Bar", "Burger Joint"}
@@ -0,0 +1,197 @@
+"""
+Testes para o estado da base de conhecimento e a sincronização fora do chat.
+"""
+import pytest
+
+from app.core.knowledge_base import (
+    get_collection_status,
+    is_knowledge_base_populated,
+    load_collection_status,
+    record_sync,
+    reset_collection_status,
+    sync_knowledge_base,
+)
+
+
+class _FakeVectorStore:
+    """Substitui o PGVector (requer PostgreSQL): documentos por id."""
+
+    def __init__(self):
+        self.documents = {}
+        self.recreated = 0
+        self.encoded = 0
+
+    def delete_collection(self):
+        self.recreated += 1
+        self.documents.clear()
+
+    def create_collection(self):
+        pass
+
+    def delete(self, ids=None, collection_only=False):
+        for doc_id in ids or []:
+            self.documents.pop(doc_id, None)
+
+    def add_documents(self, documents, ids=None):
+        self.encoded += len(documents)
+        for doc_id, document in zip(ids, documents):
+            assert doc_id not in self.documents
+            self.documents[doc_id] = document
+
+
+class _FakeRAGService:
+    """RAGService mínimo para a sincronização."""
+
+    def __init__(self):
+        self.vector_store = None
+
+    def initialize_vector_store(self, collection_name):
+        self.vector_store = _FakeVectorStore()
+
+
+@pytest.fixture(autouse=True)
+def clean_status():
+    reset_collection_status()
+    yield
+    reset_collection_status()
+
+
+class TestKnowledgeBaseStatus:
+    """Testes para o estado persistido e a cópia em memória da coleção."""
+
+    def test_record_and_load_status(self, test_db):
+        """Testa que o estado gravado é relido por outro processo (memória limpa)."""
+        assert is_knowledge_base_populated() is False
+        assert load_collection_status(test_db) is None
+
+        record_sync(test_db, document_count=12, sync_version="abc")
+        assert is_knowledge_base_populated() is True
+
+        reset_collection_status()
+        assert get_collection_status() is None
+        status = load_collection_status(test_db)
+        assert status["document_count"] == 12
+        assert status["sync_version"] == "abc"
+        assert is_knowledge_base_populated() is True
+
+    def test_sync_skips_unchanged_catalog(self, test_db, test_restaurants):
+        """Testa que a sincronização só compara hashes quando o catálogo muda."""
+        from app.database.models import Restaurant
+
+        rag = _FakeRAGService()
+        first = sync_knowledge_base(test_db, rag)
+        assert first["synced"] is True
+        assert first["document_count"] == len(rag.vector_store.documents) > 0
+        assert is_knowledge_base_populated() is True
+
+        second = sync_knowledge_base(test_db, rag)
+        assert second["synced"] is False
+
+        test_db.add(Restaurant(name="Cantina Nova", cuisine_type="italiana", rating=4.1, price_range="$$"))
+        test_db.commit()
+        third = sync_knowledge_base(test_db, rag)
+        assert third["synced"] is True
+        assert third["sync_version"] != first["sync_version"]
+        # Coleção só é recriada na primeira carga
+        assert rag.vector_store.recreated == 1
+
+
+class TestIncrementalSync:
+    """Testes para ids estáveis e sincronização só do que mudou."""
+
+    def test_stable_ids(self, test_db, test_restaurants):
+        """Testa os ids dos documentos de restaurante, seção estática e usuário."""
+        from langchain_core.documents import Document
+        from app.core.knowledge_base import assign_document_ids, build_restaurant_documents, document_id
+
+        ids = [document_id(doc) for doc in build_restaurant_documents(test_db)]
+        assert sorted(ids) == sorted(f"restaurant:{r.id}" for r in test_restaurants)
+
+        preference = Document(page_content="x", metadata={"type": "user_preference", "user_id": 7, "preference_type": "cuisine"})
+        assert document_id(preference) == "user:7:cuisine"
+
+        sections = [Document(page_content=str(i), metadata={"type": "static_knowledge", "section": "Dicas"}) for i in range(2)]
+        assert list(assign_document_ids(sections)) == ["static:Dicas", "static:Dicas#2"]
+
+    def test_only_changed_documents_are_reembedded(self, test_db, test_restaurants):
+        """Testa que edições recodificam um documento e remoções o apagam."""
+        rag = _FakeRAGService()
+        first = sync_knowledge_base(test_db, rag)
+        store = rag.vector_store
+        total = len(store.documents)
+        assert first["added"] == total and store.encoded == total
+
+        again = sync_knowledge_base(test_db, rag, force=True)
+        assert again["unchanged"] == total
+        assert again["added"] == again["updated"] == again["deleted"] == 0
+        assert store.encoded == total
+
+        edited, removed = test_restaurants[0], test_restaurants[1]
+        edited.description = "Agora com menu degustação"
+        test_db.delete(removed)
+        test_db.commit()
+
+        result = sync_knowledge_base(test_db, rag)
+        assert result["updated"] == 1
+        assert result["deleted"] == 1
+        assert store.encoded == total + 1
+        assert f"restaurant:{removed.id}" not in store.documents
+        assert "menu degustação" in store.documents[f"restaurant:{edited.id}"].page_content
+        assert result["document_count"] == len(store.documents) == total - 1
+
+    def test_model_change_reembeds_collection(self, test_db, test_restaurants, monkeypatch):
+        """Testa que uma nova versão do modelo recodifica a coleção sem mudança no catálogo."""
+        from app.config import settings
+
+        rag = _FakeRAGService()
+        total = sync_knowledge_base(test_db, rag)["added"]
+        assert sync_knowledge_base(test_db, rag)["synced"] is False
+
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "2")
+        result = sync_knowledge_base(test_db, rag)
+
+        assert result["synced"] is True
+        assert result["updated"] == total
+        assert rag.vector_store.encoded == 2 * total
+
+    def test_user_scope_does_not_touch_catalog(self, test_db, test_restaurants, test_user):
+        """Testa que a sincronização de um usuário não remove documentos do catálogo."""
+        from app.core.knowledge_base import sync_user_knowledge
+
+        rag = _FakeRAGService()
+        sync_knowledge_base(test_db, rag)
+        before = set(rag.vector_store.documents)
+
+        stats = sync_user_knowledge(test_db, rag, test_user.id)
+
+        assert stats["deleted"] == 0
+        assert before <= set(rag.vector_store.documents)
+
+
+class TestKnowledgeBaseSyncWorker:
+    """Testes para a sincronização em segundo plano após gravações."""
+
+    def test_writes_are_coalesced(self):
+        """Testa que várias gravações próximas resultam numa única sincronização."""
+        import threading
+        from app.core.knowledge_base import KnowledgeBaseSyncWorker
+
+        done = threading.Event()
+        calls = []
+
+        def fake_sync():
+            calls.append(1)
+            done.set()
+
+        worker = KnowledgeBaseSyncWorker(fake_sync, debounce=0.05)
+        for _ in range(5):
+            worker.schedule()
+
+        assert done.wait(timeout=5)
+        assert len(calls) == 1
+
+    def test_sqlite_writes_do_not_schedule(self, test_db):
+        """Testa que sem PostgreSQL (PGVector) nada é agendado."""
+        from app.core.knowledge_base import schedule_knowledge_base_sync
+
+        assert schedule_knowledge_base_sync(test_db) is False
@@ -0,0 +1,170 @@
+"""
+Testes para o vector store local (NumPy) usado fora do PostgreSQL.
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import app.core.rag_service as rag_service
+from app.core.local_vector_store import LocalVectorStore, default_directory
+
+VOCABULARY = ("sushi", "pizza", "burger", "italian", "japanese", "american", "política")
+
+
+class _FakeEmbeddings:
+    """Embeddings determinísticos: contagem de palavras do vocabulário (mais um termo constante)."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def _vector(self, text):
+        lowered = text.lower()
+        return [float(lowered.count(word)) for word in VOCABULARY] + [0.1]
+
+    def embed_documents(self, texts):
+        self.encoded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def local_rag(monkeypatch):
+    monkeypatch.setattr(rag_service, "get_shared_embeddings", _FakeEmbeddings)
+    rag_service.reset_rag_state()
+    yield
+    rag_service.reset_rag_state()
+
+
+class TestLocalVectorStore:
+    """Testes para busca, filtros, substituição por id e persistência."""
+
+    def test_search_filter_and_ids(self):
+        """Testa o top-k por cosseno, o filtro de metadados e a troca de documentos por id."""
+        store = LocalVectorStore(_FakeEmbeddings(), "teste")
+        store.add_documents(
+            [
+                Document(page_content="Sushi Bar: sushi japanese", metadata={"type": "restaurant", "restaurant_id": 2}),
+                Document(page_content="Italian Place: pizza italian", metadata={"type": "restaurant", "restaurant_id": 1}),
+                Document(page_content="política de sushi", metadata={"type": "static_knowledge"}),
+            ],
+            ids=["restaurant:2", "restaurant:1", "static:Política"],
+        )
+
+        results = store.similarity_search_with_score("sushi japanese", k=2)
+        assert [doc.id for doc, _ in results] == ["restaurant:2", "static:Política"]
+        assert results[0][1] < results[1][1]  # distância de cosseno (menor = mais próximo)
+
+        only_restaurants = store.similarity_search("sushi", k=5, filter={"type": "restaurant"})
+        assert [doc.metadata["restaurant_id"] for doc in only_restaurants] == [2, 1]
+        assert store.similarity_search("sushi", k=5, filter={"restaurant_id": {"in": [1]}})[0].id == "restaurant:1"
+
+        store.add_documents([Document(page_content="Sushi Bar: burger", metadata={"type": "restaurant"})], ids=["restaurant:2"])
+        assert len(store) == 3
+        assert store.similarity_search("burger", k=1)[0].id == "restaurant:2"
+
+        store.delete(ids=["restaurant:2", "inexistente"], collection_only=True)
+        assert len(store) == 2
+        assert store.similarity_search("sushi", k=3, filter={"type": "user_preference"}) == []
+
+    def test_persisted_next_to_sqlite_file(self, tmp_path):
+        """Testa que a coleção é relida do disco e que outros processos veem as gravações."""
+        directory = default_directory(f"sqlite:///{tmp_path / 'tastematch.db'}")
+        assert directory == str(tmp_path / "tastematch.db.vectors")
+        assert default_directory("sqlite://") is None
+        assert default_directory("sqlite:///:memory:") is None
+
+        writer = LocalVectorStore(_FakeEmbeddings(), "tastematch_knowledge", directory)
+        reader = LocalVectorStore(_FakeEmbeddings(), "tastematch_knowledge", directory)
+        writer.add_texts(["pizza italian", "sushi"], [{"n": 1}, {"n": 2}], ids=["a", "b"])
+
+        assert reader.similarity_search("sushi", k=1)[0].metadata == {"n": 2}
+        reopened = LocalVectorStore(_FakeEmbeddings(), "tastematch_knowledge", directory)
+        assert len(reopened) == 2
+        assert np.load(tmp_path / "tastematch.db.vectors" / "tastematch_knowledge.npy").dtype == np.float32
+
+        reopened.delete_collection()
+        assert len(LocalVectorStore(_FakeEmbeddings(), "tastematch_knowledge", directory)) == 0
+        assert reader.similarity_search("sushi", k=1) == []
+
+    def test_dimension_mismatch(self):
+        """Testa que vetores de outro modelo não entram na coleção."""
+        store = LocalVectorStore(_FakeEmbeddings(), "teste")
+        store.add_texts(["sushi"])
+
+        class _OtherModel(_FakeEmbeddings):
+            def embed_documents(self, texts):
+                return [[1.0, 0.0] for _ in texts]
+
+        store.embedding_function = _OtherModel()
+        with pytest.raises(ValueError):
+            store.add_texts(["pizza"])
+        assert store.similarity_search_by_vector([1.0, 0.0], k=1) == []
+
+
+class TestRAGOnSQLite:
+    """Testes para o RAGService com SQLite (vector store local selecionado automaticamente)."""
+
+    def test_validation_accepts_sqlite(self, test_db):
+        """Testa que SQLite passa na validação com o backend local."""
+        validation = rag_service.validate_database_requirements("sqlite:///./tastematch.db", test_db)
+        assert validation["valid"] is True and validation["backend"] == "local"
+
+    def test_chat_retrieval_on_sqlite(self, local_rag, test_db, test_restaurants):
+        """Testa carga da base de conhecimento e busca híbrida sem PostgreSQL."""
+        from app.core.knowledge_base import reset_collection_status, sync_knowledge_base
+
+        rag = rag_service.get_rag_service(test_db, "sqlite://", eager=True)
+        assert isinstance(rag.vector_store, LocalVectorStore)
+        assert rag.vector_store.directory is None
+
+        try:
+            status = sync_knowledge_base(test_db, rag)
+            assert status["synced"] is True
+            assert status["document_count"] == len(rag.vector_store) >= len(test_restaurants)
+            assert rag.has_documents()
+
+            semantic = rag.similarity_search("sushi japanese", k=1, filter={"type": "restaurant"})
+            assert semantic[0].metadata["name"] == "Sushi Bar"
+
+            documents = rag.hybrid_search("Sushi", k=4)
+            assert documents[0].metadata["name"] == "Sushi Bar"
+            assert documents[0].metadata["search_type"] == "exact"
+            assert len(documents) == len({doc.metadata.get("restaurant_id", id(doc)) for doc in documents})
+        finally:
+            reset_collection_status()
+
+    def test_lost_collection_files_are_rebuilt(self, local_rag, test_db, test_restaurants, tmp_path, monkeypatch):
+        """Testa que, sem os arquivos da coleção, a próxima sincronização recodifica tudo."""
+        from app.config import settings
+        from app.core.knowledge_base import reset_collection_status, sync_knowledge_base
+
+        monkeypatch.setattr(settings, "RAG_LOCAL_VECTOR_DIR", str(tmp_path))
+        rag = rag_service.get_rag_service(test_db, "sqlite:///./tastematch.db")
+        try:
+            first = sync_knowledge_base(test_db, rag)
+            rag.vector_store.delete_collection()
+
+            rebuilt = sync_knowledge_base(test_db, rag, force=True)
+            assert rebuilt["added"] == first["added"]
+            assert len(rag.vector_store) == first["document_count"]
+        finally:
+            reset_collection_status()
+
+    def test_filters_are_pushed_into_retrieval(self, local_rag, test_db, test_restaurants):
+        """Testa que o filtro de metadados chega às duas buscas da híbrida no SQLite."""
+        from app.core.knowledge_base import reset_collection_status, sync_knowledge_base
+
+        rag = rag_service.get_rag_service(test_db, "sqlite://", eager=True)
+        try:
+            sync_knowledge_base(test_db, rag)
+            high_rated = {"type": "restaurant", "rating": {"gte": 4.5}}
+
+            semantic = rag.similarity_search("burger american", k=5, filter=high_rated)
+            assert sorted(doc.metadata["name"] for doc in semantic) == ["Italian Place", "Sushi Bar"]
+
+            documents = rag.hybrid_search("Burger Sushi", k=4, filter=high_rated)
+            assert [doc.metadata["name"] for doc in documents] == ["Sushi Bar", "Italian Place"]
+        finally:
+            reset_collection_status()
@@ -146,3 +146,97 @@ def test_onboarding_with_price_preference(db: Session, test_user: User):
         if synthetic_vector is not None:
             assert len(synthetic_vector) == 384, f"Vetor deve ter 384 dimensões para preço {price}"
 
+
+
+class TestCuisineCentroids:
+    """Testes para os centróides pré-computados do onboarding."""
+
+    def _create(self, db, name, cuisine_type, rating, price_range, embedding):
+        from app.database.crud import create_restaurant
+        from app.models.restaurant import RestaurantCreate
+        return create_restaurant(
+            db,
+            RestaurantCreate(
+                name=name,
+                cuisine_type=cuisine_type,
+                rating=rating,
+                price_range=price_range,
+                location="Centro"
+            ),
+            embedding=json.dumps(embedding)
+        )
+
+    def test_incremental_centroids_match_rebuild(self, test_db):
+        """Testa que a manutenção incremental equivale ao recalculo completo."""
+        from app.core.cache import centroid_cache
+        from app.core.cuisine_centroids import rebuild_cuisine_centroids
+        from app.database.crud import get_cuisine_centroids, update_restaurant_embedding
+
+        centroid_cache.clear()
+        first = self._create(test_db, "A", "italiana", 4.5, "medium", [1.0, 0.0])
+        self._create(test_db, "B", "italiana", 4.2, "high", [0.0, 1.0])
+        self._create(test_db, "C", "italiana", 3.0, "medium", [5.0, 5.0])  # Abaixo de 4.0: ignorado
+        update_restaurant_embedding(test_db, first.id, json.dumps([3.0, 0.0]))
+
+        incremental = {
+            (c.price_range, c.count, tuple(json.loads(c.vector_sum)))
+            for price in ("", "medium", "high")
+            for c in get_cuisine_centroids(test_db, ["italiana"], price)
+        }
+        assert ("", 2, (3.0, 1.0)) in incremental
+        assert ("medium", 1, (3.0, 0.0)) in incremental
+
+        rebuild_cuisine_centroids(test_db)
+        rebuilt = {
+            (c.price_range, c.count, tuple(json.loads(c.vector_sum)))
+            for price in ("", "medium", "high")
+            for c in get_cuisine_centroids(test_db, ["italiana"], price)
+        }
+        assert rebuilt == incremental
+
+    def test_cold_start_embedding_uses_centroids(self, test_db):
+        """Testa que o vetor sintético é a média normalizada dos centróides escolhidos."""
+        import numpy as np
+        from app.core.cache import centroid_cache
+
+        centroid_cache.clear()
+        self._create(test_db, "A", "italiana", 4.5, "medium", [1.0, 0.0])
+        self._create(test_db, "B", "japonesa", 4.8, "medium", [0.0, 1.0])
+        self._create(test_db, "C", "japonesa", 4.1, "high", [0.0, 3.0])
+
+        vector = generate_cold_start_embedding(["Italiano", "japonesa"], db=test_db)
+        expected = np.array([1.0, 4.0]) / 3
+        assert np.allclose(vector, expected / np.linalg.norm(expected))
+
+        vector_medium = generate_cold_start_embedding(["italiana", "japonesa"], price_preference="moderado", db=test_db)
+        assert np.allclose(vector_medium, np.array([1.0, 1.0]) / np.sqrt(2))
+
+    def test_mixed_tag_catalog_keeps_centroids_per_model(self, test_db, monkeypatch):
+        """Testa que vetores de outra versão do modelo não entram nem saem dos centróides ativos."""
+        import numpy as np
+        from app.config import settings
+        from app.core.cache import centroid_cache
+        from app.core.cuisine_centroids import get_centroid_sums, rebuild_cuisine_centroids
+        from app.database.crud import get_cuisine_centroids, update_restaurant_embedding
+
+        centroid_cache.clear()
+        old = self._create(test_db, "Antigo", "italiana", 4.5, "medium", [1.0, 0.0])
+        old_tag = old.embedding_model
+        rebuild_cuisine_centroids(test_db)
+
+        # Migração em andamento: nova versão ativa, catálogo ainda com vetores da antiga
+        monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "2")
+        centroid_cache.clear()
+        assert get_centroid_sums(test_db, ["italiana"]) == []
+
+        new = self._create(test_db, "Novo", "italiana", 4.8, "medium", [0.0, 2.0])
+        update_restaurant_embedding(test_db, old.id, json.dumps([0.0, 4.0]))
+
+        active = get_cuisine_centroids(test_db, ["italiana"])
+        assert [(c.count, json.loads(c.vector_sum)) for c in active] == [(2, [0.0, 6.0])]
+        legacy = get_cuisine_centroids(test_db, ["italiana"], embedding_model=old_tag)
+        assert [(c.count, json.loads(c.vector_sum)) for c in legacy] == [(1, [1.0, 0.0])]
+
+        vector = generate_cold_start_embedding(["italiana"], db=test_db)
+        assert np.allclose(vector, [0.0, 1.0])
+        assert new.embedding_model != old_tag
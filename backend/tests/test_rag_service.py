@@ -0,0 +1,390 @@
+"""
+Testes para o estado compartilhado do RAG service (validação e vector store).
+"""
+import pytest
+
+import app.core.rag_service as rag_service
+
+
+class _FakePGVector:
+    """Substitui o PGVector (requer PostgreSQL) registrando os argumentos."""
+
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        _FakePGVector.instances.append(self)
+
+
+@pytest.fixture
+def rag_state(monkeypatch):
+    calls = []
+
+    def fake_validation(connection_string, db):
+        calls.append(connection_string)
+        return {"valid": True, "errors": [], "warnings": []}
+
+    _FakePGVector.instances = []
+    monkeypatch.setattr(rag_service, "TunedPGVector", _FakePGVector)
+    monkeypatch.setattr(rag_service, "validate_database_requirements", fake_validation)
+    rag_service.reset_rag_state()
+    yield calls
+    rag_service.reset_rag_state()
+
+
+class TestSharedRAGState:
+    """Testes para reuso do vector store e da validação entre requisições."""
+
+    def test_requests_share_vector_store_and_validation(self, rag_state, test_db):
+        """Testa que só a sessão muda entre requisições."""
+        from app.database.base import engine
+
+        first = rag_service.get_rag_service(test_db, "postgres://u:p@db/tastematch", eager=True)
+        second = rag_service.get_rag_service(object(), "postgresql://u:p@db/tastematch", eager=True)
+
+        assert rag_state == ["postgres://u:p@db/tastematch"]
+        assert first.vector_store is second.vector_store
+        assert len(_FakePGVector.instances) == 1
+        assert _FakePGVector.instances[0].kwargs["connection"] is engine
+        assert _FakePGVector.instances[0].kwargs["create_extension"] is False
+        assert first.db is test_db and second.db is not test_db
+
+    def test_failed_validation_is_not_cached(self, monkeypatch, test_db):
+        """Testa que uma validação que falhou é refeita na próxima requisição."""
+        results = [
+            {"valid": False, "errors": ["extensão vector ausente"], "warnings": []},
+            {"valid": True, "errors": [], "warnings": []},
+        ]
+        monkeypatch.setattr(rag_service, "validate_database_requirements", lambda cs, db: results.pop(0))
+        monkeypatch.setattr(rag_service, "TunedPGVector", _FakePGVector)
+        rag_service.reset_rag_state()
+        try:
+            with pytest.raises(ValueError):
+                rag_service.get_rag_service(test_db, "postgresql://db/tastematch")
+            assert rag_service.get_rag_service(test_db, "postgresql://db/tastematch") is not None
+            assert results == []
+        finally:
+            rag_service.reset_rag_state()
+
+
+class TestHNSWSearchTuning:
+    """Testes para ef_search/k por instância e o índice HNSW."""
+
+    def test_search_applies_instance_settings(self, rag_state, test_db):
+        """Testa que ef_search e k da instância chegam à consulta do PGVector."""
+        seen = []
+
+        class _RecordingStore:
+            def similarity_search(self, query, k):
+                seen.append((k, rag_service._search_params.get()))
+                return []
+
+        rag = rag_service.RAGService(test_db, "postgresql://db/tastematch")
+        rag.vector_store = _RecordingStore()
+        rag.ef_search, rag.k = 120, 7
+
+        rag.similarity_search("sushi")
+        rag.similarity_search("pizza", k=3)
+
+        assert seen[0][0] == 7
+        assert seen[0][1]["ef_search"] == 120 and seen[0][1]["exact"] is False
+        assert seen[1][0] == 3
+        assert rag_service._search_params.get() is None
+
+    def test_index_is_skipped_outside_postgres(self, test_db):
+        """Testa o nome do índice e que SQLite não tenta criá-lo."""
+        from app.core.vector_index import ensure_hnsw_index, hnsw_index_name
+
+        assert hnsw_index_name("tastematch_knowledge") == "ix_lc_embedding_hnsw_tastematch_knowledge"
+        assert len(hnsw_index_name("x" * 100)) <= 63
+
+        result = ensure_hnsw_index(test_db.connection(), "tastematch_knowledge")
+        assert result["created"] is False and result["skipped"]
+
+    def test_index_of_recreated_collection_is_rebuilt(self):
+        """Testa que um índice com predicado de outro uuid é removido e recriado."""
+        from types import SimpleNamespace
+        from app.core.vector_index import ensure_hnsw_index
+
+        class _Connection:
+            dialect = SimpleNamespace(name="postgresql")
+
+            def __init__(self, definition):
+                self.definition = definition
+                self.statements = []
+
+            def execute(self, statement, params=None):
+                sql = str(statement)
+                self.statements.append(sql)
+                value = {
+                    "to_regclass(:table)": "langchain_pg_embedding",
+                    "SELECT uuid": "new-uuid",
+                    "pg_get_indexdef": self.definition,
+                    "format_type": "vector(384)",
+                }
+                return SimpleNamespace(scalar=lambda: next((v for k, v in value.items() if k in sql), None))
+
+        current = _Connection("CREATE INDEX ... WHERE (collection_id = 'new-uuid'::uuid)")
+        assert ensure_hnsw_index(current, "tastematch_knowledge", mode="none")["created"] is False
+
+        stale = _Connection("CREATE INDEX ... WHERE (collection_id = 'old-uuid'::uuid)")
+        result = ensure_hnsw_index(stale, "tastematch_knowledge", mode="none")
+
+        assert result["replaced"] is True and result["created"] is True
+        assert any(sql.startswith("DROP INDEX IF EXISTS ix_lc_embedding_hnsw_tastematch_knowledge") for sql in stale.statements)
+        assert "WHERE collection_id = 'new-uuid'" in stale.statements[-1]
+
+    def test_quantization_per_collection(self, rag_state, monkeypatch):
+        """Testa o modo por coleção, a expressão do primeiro estágio e o store compartilhado."""
+        from app.config import settings
+        from app.core.vector_index import collection_quantization, hnsw_index_name, quantized_distance
+
+        monkeypatch.setattr(settings, "RAG_VECTOR_QUANTIZATION", "none")
+        monkeypatch.setattr(settings, "RAG_COLLECTION_QUANTIZATION", {"grande": "binary"})
+
+        assert collection_quantization("tastematch_knowledge") == "none"
+        assert collection_quantization("grande") == "binary"
+        assert hnsw_index_name("grande", "binary") != hnsw_index_name("grande", "halfvec")
+
+        half = str(quantized_distance("halfvec", [0.5, -0.25, 1.0]))
+        assert "CAST(langchain_pg_embedding.embedding AS halfvec(3)) <=>" in half
+        assert "'[0.5,-0.25,1.0]'" in half
+        assert "bit(3)) <~> binary_quantize(" in str(quantized_distance("binary", [0.5, -0.25, 1.0]))
+
+        rag_service.get_shared_vector_store("grande", "postgresql://db/tastematch")
+        assert _FakePGVector.instances[-1].kwargs["quantization"] == "binary"
+
+        monkeypatch.setattr(settings, "RAG_COLLECTION_QUANTIZATION", {"grande": "int4"})
+        with pytest.raises(ValueError):
+            collection_quantization("grande")
+
+
+class TestHybridRRF:
+    """Testes para a busca híbrida em uma instrução (reciprocal rank fusion)."""
+
+    def test_statement_fuses_both_rankings(self, test_db, monkeypatch):
+        """Testa que léxico, vetor e fusão saem numa única instrução com pesos como parâmetros."""
+        import uuid
+        from sqlalchemy.dialects import postgresql
+        from app.database import crud
+
+        monkeypatch.setattr(crud, "get_text_search_support", lambda db: {"tsvector": True, "trigram": True})
+        collection_id = uuid.uuid4()
+
+        stmt = rag_service.build_rrf_statement(
+            test_db, "sushi bar", [0.1, 0.2, 0.3], collection_id, k=5, lexical_weight=0.7, vector_weight=0.3
+        )
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+
+        assert sql.startswith("WITH lexical AS")
+        assert "semantic AS" in sql and "fused AS" in sql and "UNION ALL" in sql
+        assert "search_vector @@ to_tsquery" in sql
+        assert "embedding <=>" in sql
+        assert compiled.params["lexical_weight"] == 0.7
+        assert compiled.params["vector_weight"] == 0.3
+        assert compiled.params["rrf_k"] == 60
+
+    def test_sqlite_and_failures_use_sequential_mode(self, test_db, monkeypatch):
+        """Testa o modo sequencial fora do PostgreSQL e como fallback do RRF."""
+        from langchain_core.documents import Document
+
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db, rag.k = test_db, 4
+        exact = Document(page_content="Sushi Bar", metadata={"restaurant_id": 1})
+        semantic = Document(page_content="Dica", metadata={"type": "static_knowledge"})
+        monkeypatch.setattr(rag, "_exact_search_restaurants", lambda query, k, db=None, filter=None: [exact])
+        monkeypatch.setattr(rag, "similarity_search", lambda query, k, filter=None: [semantic])
+
+        def broken_rrf(*args, **kwargs):
+            raise RuntimeError("falha simulada")
+
+        monkeypatch.setattr(rag, "hybrid_search_rrf", broken_rrf)
+        assert rag.hybrid_search("sushi") == [exact, semantic]
+
+        class _PostgresSession:
+            def __init__(self, db):
+                self.db, self.rolled_back = db, False
+
+            def get_bind(self):
+                class _Bind:
+                    class dialect:
+                        name = "postgresql"
+                return _Bind()
+
+            def rollback(self):
+                self.rolled_back = True
+
+        rag.db = _PostgresSession(test_db)
+        assert rag.hybrid_search("sushi") == [exact, semantic]
+        # A transação do chamador não é desfeita (o RRF usa SAVEPOINT)
+        assert rag.db.rolled_back is False
+
+    def test_rrf_keeps_static_knowledge(self, test_db, monkeypatch):
+        """Testa que o modo RRF ainda devolve documentos que não são de restaurante."""
+        from langchain_core.documents import Document
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "RAG_HYBRID_MODE", "rrf")
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db, rag.k = test_db, 4
+        monkeypatch.setattr(test_db.get_bind().dialect, "name", "postgresql")
+        fused = [Document(page_content=f"R{i}", metadata={"type": "restaurant", "restaurant_id": i}) for i in range(4)]
+        static = Document(page_content="Política de cancelamento", metadata={"type": "static_knowledge"})
+        searches = []
+        monkeypatch.setattr(rag, "hybrid_search_rrf", lambda query, **kwargs: list(fused))
+
+        def semantic(query, k, filter=None):
+            searches.append(filter)
+            return [fused[0], static]
+
+        monkeypatch.setattr(rag, "similarity_search", semantic)
+
+        documents = rag.hybrid_search("qual a política de cancelamento?")
+        assert documents == fused[:3] + [static]
+        assert static.metadata["search_type"] == "semantic"
+
+        # Filtro só de restaurantes: nada a completar, sem segunda busca
+        assert rag.hybrid_search("pizza barata", filter={"type": "restaurant"}) == fused
+        assert searches == [None]
+
+    def test_rrf_runs_in_savepoint_with_ef_search(self, monkeypatch):
+        """Testa o SAVEPOINT e o hnsw.ef_search na mesma transação da instrução RRF."""
+        from contextlib import contextmanager
+        from types import SimpleNamespace
+        from app.config import settings
+
+        class _Session:
+            def __init__(self):
+                self.events = []
+
+            @contextmanager
+            def begin_nested(self):
+                self.events.append("savepoint")
+                try:
+                    yield
+                except Exception:
+                    self.events.append("rollback to savepoint")
+                    raise
+                self.events.append("release")
+
+            def execute(self, statement, params=None):
+                if statement == "rrf":
+                    self.events.append("rrf")
+                    return SimpleNamespace(all=lambda: [])
+                self.events.append(params["value"])
+
+        monkeypatch.setattr(settings, "RAG_RERANK_CANDIDATES", 50)
+        monkeypatch.setattr(rag_service, "build_rrf_statement", lambda db, *args, **kwargs: "rrf")
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db, rag.k, rag.ef_search = _Session(), 4, 40
+        rag.embeddings = SimpleNamespace(embed_query=lambda query: [0.1, 0.2])
+        monkeypatch.setattr(rag, "_collection_id", lambda: "uuid")
+
+        assert rag.hybrid_search_rrf("sushi") == []
+        assert rag.db.events == ["savepoint", "50", "rrf", "release"]
+
+
+class TestHybridSearchLegs:
+    """Testes para as buscas exata e semântica em paralelo (modo sequencial)."""
+
+    @staticmethod
+    def _service(test_db, monkeypatch, exact_delay, semantic_delay):
+        import time
+        from langchain_core.documents import Document
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "RAG_HYBRID_MODE", "sequential")
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db, rag.k = test_db, 4
+        exact = Document(page_content="Sushi Bar", metadata={"restaurant_id": 1})
+        semantic = Document(page_content="Burger Joint", metadata={"restaurant_id": 2})
+
+        def exact_leg(query, k, db=None, filter=None):
+            assert db is not None and db is not test_db  # sessão própria da thread
+            time.sleep(exact_delay)
+            return [exact]
+
+        def semantic_leg(query, k, filter=None):
+            time.sleep(semantic_delay)
+            return [semantic]
+
+        monkeypatch.setattr(rag, "_exact_search_restaurants", exact_leg)
+        monkeypatch.setattr(rag, "similarity_search", semantic_leg)
+        return rag, exact, semantic
+
+    def test_latency_is_the_slowest_leg(self, test_db, monkeypatch):
+        """Testa que a latência é a da busca mais lenta, não a soma."""
+        import time
+
+        rag, exact, semantic = self._service(test_db, monkeypatch, 0.3, 0.3)
+        start = time.perf_counter()
+        documents = rag.hybrid_search("sushi")
+
+        assert time.perf_counter() - start < 0.55
+        assert documents == [exact, semantic]
+
+    def test_slow_leg_degrades_to_the_other(self, test_db, monkeypatch):
+        """Testa que a busca que estoura o prazo é descartada."""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "RAG_HYBRID_LEG_TIMEOUT", 0.1)
+
+        rag, exact, _ = self._service(test_db, monkeypatch, 0.0, 0.5)
+        assert rag.hybrid_search("sushi") == [exact]
+
+        rag, _, semantic = self._service(test_db, monkeypatch, 0.5, 0.0)
+        assert rag.hybrid_search("sushi") == [semantic]
+
+
+class TestMetadataFilterPushdown:
+    """Testes para filtros de metadados aplicados dentro da busca."""
+
+    def test_rrf_statement_filters_both_rankings(self, test_db, monkeypatch):
+        """Testa que as restrições entram nos dois rankings, antes do limite de candidatos."""
+        import uuid
+        from sqlalchemy.dialects import postgresql
+        from app.database import crud
+
+        monkeypatch.setattr(crud, "get_text_search_support", lambda db: {"tsvector": True, "trigram": True})
+        metadata_filter = {
+            "type": "restaurant", "cuisine_type": {"in": ["italiana"]},
+            "price_range": {"in": ["low", "medium"]}, "rating": {"gte": 4.5},
+        }
+
+        stmt = rag_service.build_rrf_statement(
+            test_db, "massa", [0.1, 0.2], uuid.uuid4(), k=5, filter=metadata_filter
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        lexical, semantic = sql.split("semantic AS")[0], sql.split("semantic AS")[1].split("fused AS")[0]
+
+        assert "restaurants.cuisine_type IN" in lexical and "restaurants.rating >=" in lexical
+        assert semantic.count(") IN (__[POSTCOMPILE") == 2  # culinária e faixa de preço
+        assert "CAST((langchain_pg_embedding.cmetadata ->>" in semantic and "AS FLOAT) >=" in semantic
+        assert rag_service.restaurant_constraints(metadata_filter) == {
+            "cuisine_type": ["italiana"], "price_range": ["low", "medium"], "min_rating": 4.5
+        }
+
+    def test_pgvector_rating_filter_is_numeric(self):
+        """Testa que gte/lte comparam números (o PGVector compara gt/lt como texto)."""
+        from sqlalchemy.dialects import postgresql
+        from langchain_community.vectorstores.pgvector import _get_embedding_collection_store
+
+        class _Store:
+            EmbeddingStore = _get_embedding_collection_store()[0]
+
+        clause = rag_service.TunedPGVector._create_filter_clause_deprecated(_Store(), "rating", {"gte": 4.5})
+        assert "AS FLOAT) >=" in str(clause.compile(dialect=postgresql.dialect()))
+
+    def test_exact_leg_uses_same_constraints(self, test_db, test_restaurants):
+        """Testa que a busca exata aplica as restrições do filtro em SQL."""
+        rag = rag_service.RAGService.__new__(rag_service.RAGService)
+        rag.db = test_db
+
+        everything = rag._exact_search_restaurants("sushi burger italian", k=4)
+        filtered = rag._exact_search_restaurants(
+            "sushi burger italian", k=4, filter={"type": "restaurant", "rating": {"gte": 4.5}}
+        )
+
+        assert len(everything) == 3
+        assert sorted(doc.metadata["name"] for doc in filtered) == ["Italian Place", "Sushi Bar"]
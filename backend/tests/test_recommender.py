@@ -3,10 +3,14 @@ Testes unitários para módulo de recomendação.
 """
 import pytest
 import json
+import numpy as np
 from datetime import datetime, timedelta
 
 from app.core.recommender import (
     calculate_weight,
+    calculate_weights,
+    aggregate_user_embeddings,
+    rank_restaurants_batch,
     calculate_user_preference_embedding,
     extract_user_patterns,
     calculate_similarity,
@@ -234,3 +238,326 @@ class TestGenerateRecommendations:
         for rec in recommendations:
             assert rec["restaurant"].rating >= 3.5
 
+
+class TestBatchRanking:
+    """Testes para os helpers vetorizados usados na avaliação offline."""
+
+    def test_calculate_weights_matches_scalar(self):
+        """Testa que a versão vetorizada reproduz calculate_weight."""
+        now = datetime(2025, 6, 1, 12, 0, 0)
+        dates = [now - timedelta(days=d, hours=5) for d in (0, 10, 200, 400)]
+        ratings = [5, None, 3, 4]
+
+        weights = calculate_weights(
+            np.asarray(dates, dtype="datetime64[s]"),
+            np.asarray([np.nan if r is None else r for r in ratings], dtype=np.float64),
+            now=now
+        )
+        expected = [calculate_weight(d, r, now=now) for d, r in zip(dates, ratings)]
+
+        assert np.allclose(weights, expected)
+
+    def test_aggregate_user_embeddings_weighted_mean(self):
+        """Testa média ponderada por usuário, ignorando pedidos sem embedding."""
+        matrix = np.asarray([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        user_ids = np.asarray([2, 1, 1, 2])
+        rows = np.asarray([1, 0, 1, -1])
+        weights = np.asarray([1.0, 3.0, 1.0, 5.0])
+
+        users, embeddings = aggregate_user_embeddings(user_ids, rows, weights, matrix)
+
+        assert users.tolist() == [1, 2]
+        assert np.allclose(embeddings[0], [0.75, 0.25])
+        assert np.allclose(embeddings[1], [0.0, 1.0])
+
+    def test_rank_restaurants_batch_excludes_pairs(self):
+        """Testa top-k ordenado e exclusão de pares usuário/restaurante."""
+        restaurants = np.asarray([[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], dtype=np.float32)
+        users = np.asarray([[1.0, 0.0], [0.0, 2.0]], dtype=np.float32)
+
+        cols, scores = rank_restaurants_batch(
+            users, restaurants, k=4,
+            exclude=(np.asarray([1]), np.asarray([1])),
+            chunk_size=1
+        )
+
+        assert cols[0].tolist() == [0, 2, 1, -1]
+        assert cols[1].tolist() == [2, 0, -1, -1]
+        assert np.isclose(scores[1, 0], 0.8)
+        assert np.isnan(scores[1, 2])
+
+
+class TestRebuildUserPreferences:
+    """Testes para o recalculo em lote de user_preferences."""
+
+    def test_bulk_rebuild_matches_per_user_embedding(self, test_db, test_user, test_user_2, test_restaurants):
+        """Testa que o recalculo em lote reproduz o embedding e as culinárias por usuário."""
+        from app.core.preference_rebuild import rebuild_user_preferences
+        from app.database.crud import get_user_orders, get_user_preferences
+
+        now = datetime.now()
+        history = [
+            (test_user, test_restaurants[0], 1, 5),
+            (test_user, test_restaurants[1], 40, None),
+            (test_user, test_restaurants[0], 90, 3),
+            (test_user_2, test_restaurants[2], 5, 4),
+        ]
+        for user, restaurant, days_ago, rating in history:
+            test_db.add(Order(
+                user_id=user.id,
+                restaurant_id=restaurant.id,
+                order_date=now - timedelta(days=days_ago),
+                total_amount=30.0,
+                rating=rating
+            ))
+        test_db.commit()
+
+        stats = rebuild_user_preferences(test_db, users_per_chunk=1, now=now)
+        assert stats["users"] == 2
+        assert stats["chunks"] == 2
+
+        for user in (test_user, test_user_2):
+            orders = get_user_orders(test_db, user_id=user.id, limit=1000)
+            restaurants = [o.restaurant for o in orders]
+            expected = calculate_user_preference_embedding(user.id, orders, restaurants, test_db)
+            expected_cuisines = extract_user_patterns(user.id, orders, restaurants)["favorite_cuisines"]
+
+            preferences = get_user_preferences(test_db, user.id)
+            assert np.allclose(json.loads(preferences.preference_embedding), expected, atol=1e-4)
+            assert json.loads(preferences.favorite_cuisines) == expected_cuisines
+
+        # Segunda execução atualiza as linhas existentes (upsert)
+        assert rebuild_user_preferences(test_db, now=now)["users"] == 2
+
+
+class TestCatalogSnapshot:
+    """Testes para o snapshot do catálogo mapeado em memória."""
+
+    @pytest.fixture
+    def snapshot_dir(self, tmp_path, monkeypatch):
+        from app.config import settings
+        from app.core.catalog_snapshot import reset_catalog_snapshot
+
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_CHECK_SECONDS", 0.0)
+        reset_catalog_snapshot()
+        yield str(tmp_path)
+        reset_catalog_snapshot()
+
+    def test_rank_matches_database_path(self, test_db, test_restaurants, snapshot_dir):
+        """Testa que o ranking do snapshot equivale ao rank_catalog."""
+        from app.core.catalog_snapshot import get_catalog_snapshot, write_catalog_snapshot
+        from app.core.recommender import rank_catalog
+
+        stats = write_catalog_snapshot(test_db, snapshot_dir)
+        snapshot = get_catalog_snapshot()
+        user_embedding = [0.4, 0.1, 0.0, 0.2]
+        exclude = {test_restaurants[1].id}
+
+        ids, scores = snapshot.rank(user_embedding, exclude, min_rating=4.0)
+        expected_ids, expected_scores = rank_catalog(user_embedding, test_restaurants, exclude)
+
+        assert stats["changed"] and stats["restaurants"] == 3
+        assert isinstance(snapshot.matrix, np.memmap)
+        assert ids.tolist() == expected_ids.tolist()
+        assert np.allclose(scores, expected_scores, atol=1e-6)
+        assert snapshot.rank(user_embedding, min_rating=4.6)[0].tolist() == [test_restaurants[1].id]
+
+    def test_new_version_swaps_atomically(self, test_db, test_restaurants, snapshot_dir):
+        """Testa que o worker troca de versão quando o ponteiro muda."""
+        from app.core.catalog_snapshot import get_catalog_snapshot, write_catalog_snapshot
+
+        first = write_catalog_snapshot(test_db, snapshot_dir)
+        assert not write_catalog_snapshot(test_db, snapshot_dir)["changed"]
+        old = get_catalog_snapshot()
+
+        test_restaurants[2].embedding = "[0.9, 0.0, 0.0, 0.1]"
+        test_db.commit()
+        second = write_catalog_snapshot(test_db, snapshot_dir)
+        current = get_catalog_snapshot()
+
+        assert second["version"] != first["version"]
+        assert current.version == second["version"]
+        assert old.version == first["version"] and len(old) == 3  # Versão antiga segue legível
+        assert current.rank([1.0, 0.0, 0.0, 0.0])[0][0] == test_restaurants[2].id
+
+    def test_generate_recommendations_uses_snapshot(self, test_db, test_user, test_restaurants, snapshot_dir):
+        """Testa que generate_recommendations com snapshot retorna o mesmo top N."""
+        from app.core.catalog_snapshot import write_catalog_snapshot
+
+        test_db.add(Order(
+            user_id=test_user.id, restaurant_id=test_restaurants[0].id,
+            order_date=datetime.now() - timedelta(days=40), rating=5
+        ))
+        test_db.commit()
+
+        # Sem ponteiro CURRENT ainda: caminho pelo banco
+        expected = generate_recommendations(test_user.id, test_db, limit=2, exclude_recent=False)
+
+        write_catalog_snapshot(test_db, snapshot_dir)
+        recommendations = generate_recommendations(test_user.id, test_db, limit=2, exclude_recent=False)
+
+        assert [r["restaurant"].id for r in recommendations] == [r["restaurant"].id for r in expected]
+        assert np.allclose(
+            [r["similarity_score"] for r in recommendations],
+            [r["similarity_score"] for r in expected], atol=1e-6
+        )
+
+    def test_catalog_writes_republish_snapshot(self, test_db, test_user, test_restaurants, snapshot_dir, monkeypatch):
+        """Testa que um restaurante novo entra no ranking antes e depois da republicação."""
+        import app.database.base as base
+        from app.core.embeddings import get_embedding_tag
+        from app.core.catalog_snapshot import get_catalog_ranker, get_catalog_snapshot, write_catalog_snapshot
+        from app.core.knowledge_base import _sync_with_new_session
+
+        test_db.add(Order(
+            user_id=test_user.id, restaurant_id=test_restaurants[1].id,
+            order_date=datetime.now() - timedelta(days=40), rating=5
+        ))
+        test_db.commit()
+        write_catalog_snapshot(test_db, snapshot_dir)
+        assert get_catalog_ranker(test_db) is not None
+
+        new = Restaurant(
+            name="Novo", cuisine_type="Japanese", rating=4.9, price_range="$$",
+            embedding=json.dumps([0.0, 0.9, 0.0, 0.1]), embedding_model=get_embedding_tag()
+        )
+        test_db.add(new)
+        test_db.commit()
+
+        # Snapshot antigo: descartado até a republicação
+        assert get_catalog_ranker(test_db) is None
+        recommendations = generate_recommendations(test_user.id, test_db, limit=4, exclude_recent=False)
+        assert new.id in [r["restaurant"].id for r in recommendations]
+
+        monkeypatch.setattr(base, "SessionLocal", lambda: test_db)
+        assert _sync_with_new_session()["snapshot"]["changed"]
+        assert new.id in get_catalog_snapshot().ids.tolist()
+        assert get_catalog_ranker(test_db) is not None
+
+
+class TestVectorCompression:
+    """Testes para a compressão (PCA/int8) do primeiro estágio do ranking."""
+
+    @staticmethod
+    def _catalog(n=400, dim=48, rank=12, seed=0):
+        """Catálogo sintético com estrutura de baixa dimensão (como embeddings reais)."""
+        rng = np.random.default_rng(seed)
+        matrix = rng.normal(size=(n, rank)) @ rng.normal(size=(rank, dim)) + 0.05 * rng.normal(size=(n, dim))
+        return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+
+    def test_int8_scores_close_to_exact(self):
+        """Testa que int8 com escala por vetor preserva os scores."""
+        from app.core.vector_compression import VectorCompressor
+
+        matrix = self._catalog()
+        compressor = VectorCompressor.fit(matrix, quantize=True)
+        codes, scales = compressor.encode(matrix)
+
+        approx = compressor.score(codes, scales, matrix[0])
+        assert codes.dtype == np.int8
+        assert np.abs(approx - matrix @ matrix[0]).max() < 0.02
+
+    def test_rerank_recovers_recall(self):
+        """Testa que reordenar o topo recupera o recall perdido pela PCA."""
+        from app.core.vector_compression import evaluate_compression
+
+        matrix = self._catalog()
+        result = evaluate_compression(matrix, matrix[:50], k=10, dims=8, quantize=True, rerank=100)
+
+        assert result["dims"] == 8
+        assert result["compression_ratio"] > 10
+        assert result["recall_reranked"] >= result["recall_first_stage"]
+        assert result["recall_reranked"] > 0.95
+
+    def test_snapshot_two_stage_ranking(self, test_db, test_restaurants, tmp_path, monkeypatch):
+        """Testa que o snapshot comprimido mantém o ranking exato no topo."""
+        from app.config import settings
+        from app.core.catalog_snapshot import CatalogSnapshot, write_catalog_snapshot
+        from app.core.recommender import rank_catalog
+
+        monkeypatch.setattr(settings, "EMBEDDING_COMPRESSION_DIMS", 2)
+        monkeypatch.setattr(settings, "EMBEDDING_COMPRESSION_INT8", True)
+        monkeypatch.setattr(settings, "RERANK_CANDIDATES", 2)
+        stats = write_catalog_snapshot(test_db, str(tmp_path))
+        snapshot = CatalogSnapshot(str(tmp_path), stats["version"])
+
+        user_embedding = [0.4, 0.1, 0.0, 0.2]
+        ids, scores = snapshot.rank(user_embedding)
+        expected_ids, expected_scores = rank_catalog(user_embedding, test_restaurants)
+
+        assert snapshot.codes.dtype == np.int8
+        assert snapshot.compressor.output_dims == 2
+        assert ids.tolist()[:2] == expected_ids.tolist()[:2]
+        assert np.allclose(scores[:2], expected_scores[:2], atol=1e-6)
+        assert sorted(ids.tolist()) == sorted(expected_ids.tolist())
+        assert np.all(np.diff(scores) <= 1e-6)
+
+
+class TestEmbeddingVersioning:
+    """Testes para a separação de vetores por versão do modelo."""
+
+    def test_other_version_vectors_are_ignored(self, test_restaurants, monkeypatch):
+        """Testa que o ranking só usa vetores da versão ativa (nunca os sem tag)."""
+        from app.config import settings
+        from app.core.recommender import build_restaurant_matrix, select_embedding
+
+        active = f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+        test_restaurants[0].embedding_model = active
+        test_restaurants[1].embedding_model = "outro-modelo@1"
+        test_restaurants[2].embedding_model = "outro-modelo@1"
+        test_restaurants[2].embedding_next = "[0.5, 0.5, 0.5, 0.5]"
+        test_restaurants[2].embedding_next_model = active
+
+        ids, matrix = build_restaurant_matrix(test_restaurants)
+
+        assert ids.tolist() == [test_restaurants[0].id, test_restaurants[2].id]
+        assert matrix[1].tolist() == [0.5, 0.5, 0.5, 0.5]
+        assert select_embedding(test_restaurants[1]) is None
+        assert select_embedding(test_restaurants[1], "outro-modelo@1") == [0.2, 0.3, 0.4, 0.5]
+
+        test_restaurants[1].embedding_model = None
+        assert select_embedding(test_restaurants[1]) is None
+
+    def test_stale_user_vector_is_recomputed(self, test_db, test_user, test_restaurants):
+        """Testa que o vetor de preferências de outra versão não é reutilizado."""
+        from app.config import settings
+        from app.core.recommender import resolve_user_embedding
+        from app.database.models import UserPreferences
+
+        order = Order(
+            user_id=test_user.id, restaurant_id=test_restaurants[0].id,
+            order_date=datetime.now(), rating=5
+        )
+        test_db.add(order)
+        test_db.add(UserPreferences(
+            user_id=test_user.id, preference_embedding="[1, 0, 0]", embedding_model="outro-modelo@1"
+        ))
+        test_db.commit()
+
+        embedding = resolve_user_embedding(test_user.id, test_db, [order])
+
+        assert np.allclose(embedding, [0.1, 0.2, 0.3, 0.4])
+        preferences = test_db.query(UserPreferences).filter_by(user_id=test_user.id).one()
+        assert preferences.embedding_model == f"{settings.EMBEDDING_MODEL}@{settings.EMBEDDING_MODEL_VERSION}"
+
+    def test_similarity_of_different_dimensions_is_zero(self):
+        """Testa que vetores de modelos com dimensões diferentes não são comparados."""
+        assert calculate_similarity([0.1, 0.2, 0.3], [0.1, 0.2, 0.3, 0.4]) == 0.0
+
+    def test_snapshot_of_other_version_is_ignored(self, test_db, test_restaurants, tmp_path, monkeypatch):
+        """Testa que workers com outra versão do modelo voltam ao ranking pelo banco."""
+        from app.config import settings
+        from app.core.catalog_snapshot import get_catalog_snapshot, reset_catalog_snapshot, write_catalog_snapshot
+
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_DIR", str(tmp_path))
+        monkeypatch.setattr(settings, "CATALOG_SNAPSHOT_CHECK_SECONDS", 0.0)
+        reset_catalog_snapshot()
+        try:
+            write_catalog_snapshot(test_db, str(tmp_path))
+            assert get_catalog_snapshot() is not None
+
+            monkeypatch.setattr(settings, "EMBEDDING_MODEL_VERSION", "novo")
+            assert get_catalog_snapshot() is None
+        finally:
+            reset_catalog_snapshot()